@@ -20,7 +20,10 @@ from backend.database import (
     User,
     V2Document,
 )
-from backend.deps import get_current_user, get_db
+from backend.deps import Principal, consultation_ws_manager, get_db, get_principal
+from backend.read_cache import read_cache_stats
+from backend.snapshot_cache import snapshot_cache_stats
+from backend.v2.extraction_cache import extraction_cache_stats
 
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -50,21 +53,37 @@ def _iso(value: datetime | None) -> str | None:
     return value.isoformat() + "Z" if value else None
 
 
-def _admin_user(user: User = Depends(get_current_user)) -> User:
+def _admin_user(user: Principal = Depends(get_principal)) -> Principal:
     require_admin_email(user.email)
     return user
 
 
 @router.get("/access")
-async def admin_access(_: User = Depends(_admin_user)):
+async def admin_access(_: Principal = Depends(_admin_user)):
     return {"allowed": True}
 
 
+@router.get("/cache")
+async def admin_cache_stats(_: Principal = Depends(_admin_user)) -> dict[str, Any]:
+    """Process-local cache counters (this worker only)."""
+    return {
+        "local": read_cache_stats(),
+        "analyteSnapshot": snapshot_cache_stats(),
+        "v2Extraction": extraction_cache_stats(),
+    }
+
+
+@router.get("/websockets")
+async def admin_websocket_stats(_: Principal = Depends(_admin_user)) -> dict[str, Any]:
+    """WebSocket fan-out counters: queue depths, coalesced and dropped events (this worker only)."""
+    return consultation_ws_manager.stats()
+
+
 @router.get("/overview")
 async def admin_overview(
     date_from: date = Query(...),
     date_to: date = Query(...),
-    _: User = Depends(_admin_user),
+    _: Principal = Depends(_admin_user),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
     start, end = _period_bounds(date_from, date_to)
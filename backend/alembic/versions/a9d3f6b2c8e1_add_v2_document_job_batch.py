@@ -0,0 +1,48 @@
+"""add v2_document_jobs.batch_id
+
+Revision ID: a9d3f6b2c8e1
+Revises: f5b2d8c1a4e6
+Create Date: 2026-10-17 00:00:03.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+revision: str = "a9d3f6b2c8e1"
+down_revision: Union[str, None] = "f5b2d8c1a4e6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if "v2_document_jobs" not in set(inspector.get_table_names()):
+        return
+
+    existing = {column["name"] for column in inspector.get_columns("v2_document_jobs")}
+    if "batch_id" not in existing:
+        with op.batch_alter_table("v2_document_jobs") as batch_op:
+            batch_op.add_column(sa.Column("batch_id", sa.String(length=36), nullable=True))
+    indexes = {index["name"] for index in inspector.get_indexes("v2_document_jobs")}
+    if "ix_v2_document_jobs_batch_id" not in indexes:
+        op.create_index("ix_v2_document_jobs_batch_id", "v2_document_jobs", ["batch_id"], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if "v2_document_jobs" not in set(inspector.get_table_names()):
+        return
+
+    indexes = {index["name"] for index in inspector.get_indexes("v2_document_jobs")}
+    if "ix_v2_document_jobs_batch_id" in indexes:
+        op.drop_index("ix_v2_document_jobs_batch_id", table_name="v2_document_jobs")
+    existing = {column["name"] for column in inspector.get_columns("v2_document_jobs")}
+    if "batch_id" in existing:
+        with op.batch_alter_table("v2_document_jobs") as batch_op:
+            batch_op.drop_column("batch_id")
@@ -0,0 +1,44 @@
+"""add consultation_messages (thread_id, created_at, id) index
+
+Revision ID: b6e4c2a9f1d3
+Revises: a9d3f6b2c8e1
+Create Date: 2026-10-17 00:00:04.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+revision: str = "b6e4c2a9f1d3"
+down_revision: Union[str, None] = "a9d3f6b2c8e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if "consultation_messages" not in set(inspector.get_table_names()):
+        return
+
+    indexes = {index["name"] for index in inspector.get_indexes("consultation_messages")}
+    if "ix_consultation_messages_thread_created" not in indexes:
+        op.create_index(
+            "ix_consultation_messages_thread_created",
+            "consultation_messages",
+            ["thread_id", "created_at", "id"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if "consultation_messages" not in set(inspector.get_table_names()):
+        return
+
+    indexes = {index["name"] for index in inspector.get_indexes("consultation_messages")}
+    if "ix_consultation_messages_thread_created" in indexes:
+        op.drop_index("ix_consultation_messages_thread_created", table_name="consultation_messages")
@@ -0,0 +1,95 @@
+"""add v2_analyte_latest projection
+
+Revision ID: d7b1e3a5c9f2
+Revises: c4a2f7e9d1b3
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+revision: str = "d7b1e3a5c9f2"
+down_revision: Union[str, None] = "c4a2f7e9d1b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if "v2_analyte_latest" not in tables:
+        op.create_table(
+            "v2_analyte_latest",
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("analyte_key", sa.String(), nullable=False),
+            sa.Column("metric_id", sa.String(length=36), nullable=False),
+            sa.Column("document_id", sa.String(length=36), nullable=False),
+            sa.Column("raw_name", sa.String(), nullable=False),
+            sa.Column("value_numeric", sa.Float(), nullable=True),
+            sa.Column("value_text", sa.Text(), nullable=True),
+            sa.Column("unit", sa.String(), nullable=True),
+            sa.Column("dt", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.ForeignKeyConstraint(["document_id"], ["v2_documents.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("user_id", "analyte_key"),
+        )
+        op.create_index(
+            "ix_v2_analyte_latest_document_id",
+            "v2_analyte_latest",
+            ["document_id"],
+            unique=False,
+        )
+
+    if "v2_metrics" in tables and "v2_documents" in tables:
+        op.execute(
+            """
+            INSERT INTO v2_analyte_latest (
+                user_id, analyte_key, metric_id, document_id, raw_name,
+                value_numeric, value_text, unit, dt, updated_at
+            )
+            SELECT user_id, analyte_key, metric_id, document_id, raw_name,
+                   value_numeric, value_text, unit, dt, CURRENT_TIMESTAMP
+            FROM (
+                SELECT d.user_id AS user_id,
+                       m.analyte_key AS analyte_key,
+                       m.id AS metric_id,
+                       d.id AS document_id,
+                       m.raw_name AS raw_name,
+                       m.value_numeric AS value_numeric,
+                       m.value_text AS value_text,
+                       m.unit AS unit,
+                       COALESCE(d.analysis_date, d.created_at) AS dt,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY d.user_id, m.analyte_key
+                           ORDER BY COALESCE(d.analysis_date, d.created_at) DESC, d.id DESC, m.id DESC
+                       ) AS rn
+                FROM v2_metrics m
+                JOIN v2_documents d ON d.id = m.document_id
+            ) ranked
+            WHERE rn = 1
+              AND NOT EXISTS (
+                  SELECT 1 FROM v2_analyte_latest existing
+                  WHERE existing.user_id = ranked.user_id
+                    AND existing.analyte_key = ranked.analyte_key
+              )
+            """
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if "v2_analyte_latest" in tables:
+        indexes = {index["name"] for index in inspector.get_indexes("v2_analyte_latest")}
+        if "ix_v2_analyte_latest_document_id" in indexes:
+            op.drop_index("ix_v2_analyte_latest_document_id", table_name="v2_analyte_latest")
+        op.drop_table("v2_analyte_latest")
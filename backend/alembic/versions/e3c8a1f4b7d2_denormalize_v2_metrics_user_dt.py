@@ -0,0 +1,80 @@
+"""denormalize v2_metrics user_id and effective_dt
+
+Revision ID: e3c8a1f4b7d2
+Revises: d7b1e3a5c9f2
+Create Date: 2026-10-17 00:00:01.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+revision: str = "e3c8a1f4b7d2"
+down_revision: Union[str, None] = "d7b1e3a5c9f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    if "v2_metrics" not in tables:
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("v2_metrics")}
+    with op.batch_alter_table("v2_metrics") as batch_op:
+        if "user_id" not in columns:
+            batch_op.add_column(sa.Column("user_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key("fk_v2_metrics_user_id_users", "users", ["user_id"], ["id"])
+        if "effective_dt" not in columns:
+            batch_op.add_column(sa.Column("effective_dt", sa.DateTime(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE v2_metrics
+        SET user_id = (
+                SELECT v2_documents.user_id FROM v2_documents
+                WHERE v2_documents.id = v2_metrics.document_id
+            ),
+            effective_dt = (
+                SELECT COALESCE(v2_documents.analysis_date, v2_documents.created_at) FROM v2_documents
+                WHERE v2_documents.id = v2_metrics.document_id
+            )
+        WHERE user_id IS NULL OR effective_dt IS NULL
+        """
+    )
+
+    indexes = {index["name"] for index in inspector.get_indexes("v2_metrics")}
+    if "ix_v2_metrics_user_analyte_dt" not in indexes:
+        op.create_index(
+            "ix_v2_metrics_user_analyte_dt",
+            "v2_metrics",
+            ["user_id", "analyte_key", "effective_dt"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    if "v2_metrics" not in tables:
+        return
+
+    indexes = {index["name"] for index in inspector.get_indexes("v2_metrics")}
+    if "ix_v2_metrics_user_analyte_dt" in indexes:
+        op.drop_index("ix_v2_metrics_user_analyte_dt", table_name="v2_metrics")
+
+    columns = {column["name"] for column in inspector.get_columns("v2_metrics")}
+    foreign_keys = {fk["name"] for fk in inspector.get_foreign_keys("v2_metrics")}
+    with op.batch_alter_table("v2_metrics") as batch_op:
+        if "fk_v2_metrics_user_id_users" in foreign_keys:
+            batch_op.drop_constraint("fk_v2_metrics_user_id_users", type_="foreignkey")
+        if "effective_dt" in columns:
+            batch_op.drop_column("effective_dt")
+        if "user_id" in columns:
+            batch_op.drop_column("user_id")
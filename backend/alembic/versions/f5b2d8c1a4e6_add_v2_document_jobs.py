@@ -0,0 +1,59 @@
+"""add v2_document_jobs
+
+Revision ID: f5b2d8c1a4e6
+Revises: e3c8a1f4b7d2
+Create Date: 2026-10-17 00:00:02.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+revision: str = "f5b2d8c1a4e6"
+down_revision: Union[str, None] = "e3c8a1f4b7d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if "v2_document_jobs" in set(inspector.get_table_names()):
+        return
+
+    op.create_table(
+        "v2_document_jobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=True),
+        sa.Column("document_hash", sa.String(), nullable=False),
+        sa.Column("source_filename", sa.String(), nullable=True),
+        sa.Column("free_credit_reserved", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("document_id", sa.String(length=36), nullable=True),
+        sa.Column("num_metrics", sa.Integer(), nullable=True),
+        sa.Column("error_code", sa.String(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["document_id"], ["v2_documents.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_v2_document_jobs_user_id", "v2_document_jobs", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if "v2_document_jobs" not in set(inspector.get_table_names()):
+        return
+
+    indexes = {index["name"] for index in inspector.get_indexes("v2_document_jobs")}
+    if "ix_v2_document_jobs_user_id" in indexes:
+        op.drop_index("ix_v2_document_jobs_user_id", table_name="v2_document_jobs")
+    op.drop_table("v2_document_jobs")
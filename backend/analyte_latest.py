@@ -0,0 +1,208 @@
+"""Per-user "latest analyte" projection backing the V2 analyte dashboards.
+
+``v2_analyte_latest`` holds one row per (user_id, analyte_key) with the most
+recent metric, ordered like the original window query:
+``effective_dt`` (the document's ``coalesce(analysis_date, created_at)``),
+then document id, then metric id.
+Callers update it inside the same transaction as the document write.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.database import V2AnalyteLatest, V2Document, V2Metric
+
+
+def _latest_metric_rows(
+    db: Session,
+    user_id: int,
+    analyte_keys: Optional[Iterable[str]] = None,
+    exclude_document_id: Optional[str] = None,
+):
+    rn = func.row_number().over(
+        partition_by=V2Metric.analyte_key,
+        order_by=(V2Metric.effective_dt.desc(), V2Metric.document_id.desc(), V2Metric.id.desc()),
+    ).label("rn")
+
+    query = db.query(
+        V2Metric.id.label("metric_id"),
+        V2Metric.document_id.label("document_id"),
+        V2Metric.analyte_key.label("analyte_key"),
+        V2Metric.raw_name.label("raw_name"),
+        V2Metric.value_numeric.label("value_numeric"),
+        V2Metric.value_text.label("value_text"),
+        V2Metric.unit.label("unit"),
+        V2Metric.effective_dt.label("dt"),
+        rn,
+    ).filter(V2Metric.user_id == user_id)
+    if analyte_keys is not None:
+        query = query.filter(V2Metric.analyte_key.in_(list(analyte_keys)))
+    if exclude_document_id is not None:
+        query = query.filter(V2Metric.document_id != exclude_document_id)
+
+    subq = query.subquery()
+    return db.query(subq).filter(subq.c.rn == 1).all()
+
+
+def recompute_analyte_latest(
+    db: Session,
+    user_id: int,
+    analyte_keys: Optional[Iterable[str]] = None,
+    *,
+    exclude_document_id: Optional[str] = None,
+) -> int:
+    """Recompute projection rows for the given keys (all keys when None); returns rows written."""
+    keys = None if analyte_keys is None else sorted(set(analyte_keys))
+    if keys == []:
+        return 0
+
+    stale = db.query(V2AnalyteLatest).filter(V2AnalyteLatest.user_id == user_id)
+    if keys is not None:
+        stale = stale.filter(V2AnalyteLatest.analyte_key.in_(keys))
+    stale.delete(synchronize_session=False)
+
+    rows = _latest_metric_rows(db, user_id, keys, exclude_document_id)
+    for row in rows:
+        db.add(
+            V2AnalyteLatest(
+                user_id=user_id,
+                analyte_key=row.analyte_key,
+                metric_id=row.metric_id,
+                document_id=row.document_id,
+                raw_name=row.raw_name,
+                value_numeric=row.value_numeric,
+                value_text=row.value_text,
+                unit=row.unit,
+                dt=row.dt,
+            )
+        )
+    db.flush()
+    return len(rows)
+
+
+def _upsert_insert(db: Session):
+    """The dialect's ``INSERT ... ON CONFLICT`` construct, or None when it has none."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql_insert
+    if dialect == "sqlite":
+        return sqlite_insert
+    return None
+
+
+def _apply_by_select(db: Session, document: V2Document, candidates: dict[str, V2Metric], doc_dt) -> None:
+    """Portable read-then-write fallback; concurrent first inserts of a key can still collide."""
+    existing = {
+        row.analyte_key: row
+        for row in db.query(V2AnalyteLatest).filter(
+            V2AnalyteLatest.user_id == document.user_id,
+            V2AnalyteLatest.analyte_key.in_(list(candidates)),
+        )
+    }
+    for analyte_key, metric in candidates.items():
+        row = existing.get(analyte_key)
+        if row is not None and (row.dt, row.document_id, row.metric_id) >= (doc_dt, document.id, metric.id):
+            continue
+        if row is None:
+            row = V2AnalyteLatest(user_id=document.user_id, analyte_key=analyte_key)
+            db.add(row)
+        row.metric_id = metric.id
+        row.document_id = document.id
+        row.raw_name = metric.raw_name
+        row.value_numeric = metric.value_numeric
+        row.value_text = metric.value_text
+        row.unit = metric.unit
+        row.dt = doc_dt
+    db.flush()
+
+
+def apply_document_to_analyte_latest(db: Session, document: V2Document, metrics: Iterable[V2Metric]) -> None:
+    """Fold a newly flushed document's metrics into the projection.
+
+    One ``INSERT ... ON CONFLICT (user_id, analyte_key) DO UPDATE`` whose
+    ``WHERE`` only lets a newer metric replace the stored one, so the cost is
+    proportional to the document, not the history, and two uploads of the
+    same user racing on a new key cannot fail on the primary key. Dialects
+    without ``ON CONFLICT`` fall back to a read-then-write in the same
+    transaction.
+    ``metrics`` may be ``V2Metric`` rows or any objects with the same
+    attributes (the bulk insert path passes namespaces over its row dicts).
+    """
+    doc_dt = document.analysis_date or document.created_at
+    candidates: dict[str, V2Metric] = {}
+    for metric in metrics:
+        current = candidates.get(metric.analyte_key)
+        if current is None or metric.id > current.id:
+            candidates[metric.analyte_key] = metric
+    if not candidates:
+        return
+
+    insert = _upsert_insert(db)
+    if insert is None:
+        _apply_by_select(db, document, candidates, doc_dt)
+        return
+
+    now = datetime.utcnow()
+    table = V2AnalyteLatest.__table__
+    stmt = insert(table).values(
+        [
+            {
+                "user_id": document.user_id,
+                "analyte_key": analyte_key,
+                "metric_id": metric.id,
+                "document_id": document.id,
+                "raw_name": metric.raw_name,
+                "value_numeric": metric.value_numeric,
+                "value_text": metric.value_text,
+                "unit": metric.unit,
+                "dt": doc_dt,
+                "updated_at": now,
+            }
+            for analyte_key, metric in sorted(candidates.items())
+        ]
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.analyte_key],
+        set_={
+            column: excluded[column]
+            for column in ("metric_id", "document_id", "raw_name", "value_numeric", "value_text", "unit", "dt", "updated_at")
+        },
+        where=tuple_(table.c.dt, table.c.document_id, table.c.metric_id)
+        < tuple_(excluded.dt, excluded.document_id, excluded.metric_id),
+    )
+    db.execute(stmt)
+
+
+def remove_document_from_analyte_latest(db: Session, user_id: int, document_id: str) -> None:
+    """Repoint projection rows that referenced ``document_id`` before it is deleted."""
+    affected_keys = [
+        key
+        for (key,) in db.query(V2AnalyteLatest.analyte_key).filter(
+            V2AnalyteLatest.user_id == user_id,
+            V2AnalyteLatest.document_id == document_id,
+        )
+    ]
+    recompute_analyte_latest(db, user_id, affected_keys, exclude_document_id=document_id)
+
+
+def rebuild_analyte_latest(db: Session, user_id: Optional[int] = None) -> int:
+    """Backfill the projection for one user, or for every user with V2 documents."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [uid for (uid,) in db.query(V2Document.user_id).distinct().order_by(V2Document.user_id)]
+        db.query(V2AnalyteLatest).filter(V2AnalyteLatest.user_id.notin_(user_ids)).delete(
+            synchronize_session=False
+        )
+    written = 0
+    for uid in user_ids:
+        written += recompute_analyte_latest(db, uid)
+    return written
@@ -26,6 +26,7 @@ from backend.auth import (
     get_current_user_id,
 )
 from backend.admin_auth import is_admin_email
+from backend.principal import Principal, require_principal
 from backend.email_service import send_verification_code_email
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -312,15 +313,19 @@ def _ensure_email_verification_code(db: Session, user: User) -> bool:
     return True
 
 
-def _build_user_response(user: User) -> UserResponse:
+def _build_user_response(user: User | Principal) -> UserResponse:
     role = "ADMIN" if is_admin_email(user.email) else ("DOCTOR" if user.is_doctor else "PATIENT")
+    if isinstance(user, Principal):
+        email_verified = user.email_verified
+    else:
+        email_verified = user.email_verified_at is not None
     return UserResponse(
         id=user.id,
         email=user.email,
         full_name=user.full_name,
         is_doctor=user.is_doctor,
         is_active=user.is_active,
-        email_verified=user.email_verified_at is not None,
+        email_verified=email_verified,
         role=role,
     )
 
@@ -1076,14 +1081,7 @@ async def get_current_user(
     db: Session = Depends(get_db)
 ):
     """Get current user info."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return _build_user_response(user)
+    return _build_user_response(require_principal(db, user_id))
 
 
 @router.post("/upgrade/doctor", response_model=UserResponse)
@@ -15,6 +15,7 @@ from backend.auth import get_current_user_id
 from backend.database import Payment, SessionLocal, SubscriberWelcomeEmail, Subscription, User
 from backend.email_service import send_subscriber_welcome_email
 from backend.entitlements import get_ai_allowance, get_upload_allowance
+from backend.principal import require_principal
 
 try:
     import stripe
@@ -343,9 +344,7 @@ async def create_checkout_session(
     db: Session = Depends(get_db),
 ):
     stripe_client = _stripe_client()
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
     existing = db.query(Subscription).filter(Subscription.user_id == user_id).order_by(Subscription.id.desc()).first()
     if existing and existing.status in ACTIVE_STRIPE_STATUSES:
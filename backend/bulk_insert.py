@@ -0,0 +1,131 @@
+"""Bulk INSERT path for ingestion rows.
+
+Adding parsed rows with ``session.add`` makes the unit of work emit one
+INSERT per ``LabResult`` / ``V2Metric`` at flush, so an 80-150 analyte
+report costs that many statements. The helpers here send the rows as plain
+dicts in one Core statement per chunk:
+
+* PostgreSQL: a multi-row ``INSERT ... VALUES (...), (...)``, chunked
+  below the driver's bind-parameter limit;
+* everything else (SQLite): a single ``executemany``.
+
+Core statements skip the ORM: no ``before_insert`` listener fills
+``V2Metric.user_id``/``effective_dt`` and no ``after_flush`` hook sees the
+rows. Callers therefore pass complete rows, and the helpers queue the
+lab read-model invalidation for the affected users themselves
+(``invalidate_after_commit``, dropped on rollback).
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import Table, insert, select
+from sqlalchemy.orm import Session
+
+from backend.database import LabResult, Patient, V2Metric
+from backend.read_cache import invalidate_after_commit
+from backend.snapshot_cache import LAB_DATA_NAMESPACES
+
+# PostgreSQL accepts at most 65535 bind parameters per statement.
+MAX_BIND_PARAMS = 30000
+
+LAB_RESULT_COLUMNS = (
+    "patient_id",
+    "analyte_name",
+    "value",
+    "value_text",
+    "unit",
+    "material",
+    "taken_at",
+    "ref_range",
+    "ref_min",
+    "ref_max",
+    "source_pdf",
+    "document_hash",
+    "series_key",
+    "created_at",
+)
+
+V2_METRIC_COLUMNS = (
+    "id",
+    "document_id",
+    "user_id",
+    "effective_dt",
+    "analyte_key",
+    "raw_name",
+    "specimen",
+    "context",
+    "value_numeric",
+    "value_text",
+    "unit",
+    "reference_json",
+    "page",
+    "evidence",
+)
+
+
+def _complete_rows(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> List[Dict[str, Any]]:
+    # A multi-row VALUES needs the same keys in every row.
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def _multi_values_insert(session: Session, table: Table, rows: List[Dict[str, Any]]) -> None:
+    chunk_size = max(1, MAX_BIND_PARAMS // max(1, len(rows[0])))
+    for start in range(0, len(rows), chunk_size):
+        session.execute(insert(table).values(rows[start:start + chunk_size]))
+
+
+def _executemany_insert(session: Session, table: Table, rows: List[Dict[str, Any]]) -> None:
+    session.execute(insert(table), rows)
+
+
+def insert_rows(session: Session, table: Table, rows: List[Dict[str, Any]]) -> int:
+    """Insert ``rows`` into ``table`` in the session's transaction; returns the row count."""
+    if not rows:
+        return 0
+    if session.get_bind().dialect.name == "postgresql":
+        _multi_values_insert(session, table, rows)
+    else:
+        _executemany_insert(session, table, rows)
+    return len(rows)
+
+
+def insert_lab_results(session: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """Bulk insert ``LabResult`` rows and invalidate their owners' lab read models on commit."""
+    now = datetime.utcnow()
+    complete = _complete_rows(rows, LAB_RESULT_COLUMNS)
+    for row in complete:
+        if row["created_at"] is None:
+            row["created_at"] = now
+    inserted = insert_rows(session, LabResult.__table__, complete)
+    if inserted:
+        patient_ids = {row["patient_id"] for row in complete}
+        owners = session.execute(select(Patient.user_id).where(Patient.id.in_(patient_ids)))
+        _invalidate_lab_data(session, [user_id for (user_id,) in owners])
+    return inserted
+
+
+def insert_v2_metrics(session: Session, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Bulk insert ``V2Metric`` rows; returns them with their generated ids.
+
+    Rows must carry ``user_id`` and ``effective_dt`` (the parent document's
+    ``coalesce(analysis_date, created_at)``), which the ORM listener would
+    otherwise have filled in.
+    """
+    complete = _complete_rows(rows, V2_METRIC_COLUMNS)
+    for row in complete:
+        if row["id"] is None:
+            row["id"] = str(uuid.uuid4())
+        if row["user_id"] is None or row["effective_dt"] is None:
+            raise ValueError("Bulk V2 metric rows need user_id and effective_dt")
+    insert_rows(session, V2Metric.__table__, complete)
+    if complete:
+        _invalidate_lab_data(session, {row["user_id"] for row in complete})
+    return complete
+
+
+def _invalidate_lab_data(session: Session, user_ids: Iterable[Optional[int]]) -> None:
+    invalidate_after_commit(session, user_ids, LAB_DATA_NAMESPACES)
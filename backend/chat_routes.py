@@ -1,4 +1,4 @@
-__all__ = ['_build_positive_trend_notes', '_build_deterministic_advice', '_is_low_signal_advice', '_build_doctor_chat_context', '_summarize_patient_metrics_for_ai', '_trim_chat_context', '_openai_chat_completion', '_openai_chat_completion_with_history', '_openai_chat_with_tools', 'ChatSessionCreate', 'ChatSessionItem', 'ChatSessionMessageItem', 'AdviceRequest', 'AdviceMetric', 'AdviceResponse', 'list_chat_sessions', 'create_chat_session', 'get_session_messages', 'delete_chat_session', 'PatientMemoryItem', 'list_patient_memory', 'delete_patient_memory', 'get_advice']
+__all__ = ['_build_positive_trend_notes', '_build_deterministic_advice', '_is_low_signal_advice', '_lab_snapshot', '_build_doctor_chat_context', '_summarize_patient_metrics_for_ai', '_trim_chat_context', '_openai_chat_completion', '_openai_chat_completion_with_history', '_openai_chat_with_tools', '_openai_chat_with_tools_stream', '_sse_event', '_sse_response', 'ChatSessionCreate', 'ChatSessionItem', 'ChatSessionMessageItem', 'AdviceRequest', 'AdviceMetric', 'AdviceResponse', 'list_chat_sessions', 'create_chat_session', 'get_session_messages', 'delete_chat_session', 'PatientMemoryItem', 'list_patient_memory', 'delete_patient_memory', 'get_advice', 'stream_advice']
 
 from backend.deps import *
 from backend.utils import *
@@ -6,13 +6,13 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy import func, text
 from sqlalchemy.sql import over
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, Field, ValidationError
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import io
 import os
 import logging
@@ -68,6 +68,10 @@ from backend.database import (
 )
 from backend.auth import decode_token, get_current_user_id
 from backend.encryption import encrypt_file_data
+from backend.openai_http import post_chat_completion, stream_chat_completion
+from backend.lab_context import ALL_HISTORY_DAYS, PatientLabContext, select_metrics
+from backend.snapshot_cache import get_or_build_snapshot
+from dataclasses import dataclass
 from backend.entitlements import (
     get_ai_allowance,
     get_chart_allowance,
@@ -77,6 +81,7 @@ from backend.entitlements import (
 )
 from backend.auth_routes import router as auth_router, UserResponse as AuthUserResponse
 from backend.patient_routes import router as patient_router
+import asyncio
 import datetime as dt
 import json
 import re
@@ -405,9 +410,22 @@ def _is_low_signal_advice(answer: str) -> bool:
     return False
 
 
+def _lab_snapshot(db: Session, user_id: int, patient_id: Optional[int], days: int) -> Dict[str, Any]:
+    """Full lab summary for the user as {"source", "metrics", "has_legacy"}, via the versioned snapshot cache."""
+
+    def _build() -> Dict[str, Any]:
+        lab_context = PatientLabContext.probe(db, user_id, patient_id)
+        source, metrics = lab_context.summarize_with_source(db, days=days)
+        return {"source": source, "metrics": metrics, "has_legacy": lab_context.has_legacy}
+
+    return get_or_build_snapshot(user_id, days, _build)
+
+
 def _build_doctor_chat_context(db: Session, patient: Patient) -> Dict[str, Any]:
-    metrics_summary = _summarize_patient_metrics_for_ai(db, patient, days=36500)
+    snapshot = _lab_snapshot(db, patient.user_id, patient.id, ALL_HISTORY_DAYS)
+    metrics_summary = snapshot["metrics"]
     if metrics_summary:
+        summary_source = snapshot["source"]
         latest_dates = [
             str(entry.get("t") or "")
             for entries in metrics_summary.values()
@@ -438,13 +456,15 @@ def _build_doctor_chat_context(db: Session, patient: Patient) -> Dict[str, Any]:
         return {
             "patient": {"id": patient.id, "name": patient.full_name},
             "latest_analysis_date": latest_ts,
-            "recent_analyses": [{"date": latest_ts, "source": "v2_documents"}] if latest_ts else [],
+            "recent_analyses": [{"date": latest_ts, "source": summary_source}] if latest_ts else [],
             "metrics_snapshot": metrics_snapshot,
             "trends": {},
             "egfr": None,
         }
 
-    results = db.query(LabResult).filter(LabResult.patient_id == patient.id).all()
+    # Snapshots cached before "has_legacy" was stored keep the unguarded query.
+    has_legacy = snapshot.get("has_legacy", True)
+    results = db.query(LabResult).filter(LabResult.patient_id == patient.id).all() if has_legacy else []
     results.sort(
         key=lambda r: (r.taken_at or r.created_at or dt.datetime.min),
         reverse=True,
@@ -550,14 +570,7 @@ def _build_doctor_chat_context(db: Session, patient: Patient) -> Dict[str, Any]:
 
 def _summarize_patient_metrics_for_ai(db: Session, patient: Patient, days: int = 180) -> Dict[str, List[Dict[str, Any]]]:
     """Collect the same lab context used by the patient AI chat for a granted patient."""
-    metrics_summary = _summarize_metrics_v2(db, user_id=patient.user_id, metric_names=None, days=days)
-    if not metrics_summary:
-        metrics_summary = _summarize_metrics(db, patient_id=patient.id, metric_names=None, days=days)
-    if not metrics_summary and days < 36500:
-        metrics_summary = _summarize_metrics_v2(db, user_id=patient.user_id, metric_names=None, days=36500)
-    if not metrics_summary and days < 36500:
-        metrics_summary = _summarize_metrics(db, patient_id=patient.id, metric_names=None, days=36500)
-    return metrics_summary
+    return _lab_snapshot(db, patient.user_id, patient.id, days)["metrics"]
 
 
 def _trim_chat_context(context: Dict[str, Any], max_chars: int = 12000) -> Dict[str, Any]:
@@ -577,7 +590,7 @@ def _trim_chat_context(context: Dict[str, Any], max_chars: int = 12000) -> Dict[
     return trimmed
 
 
-def _openai_chat_completion(system_prompt: str, user_prompt: str):
+async def _openai_chat_completion(system_prompt: str, user_prompt: str):
     """Call OpenAI chat completion."""
     key = os.getenv("OPENAI_API_KEY")
     model = os.getenv("OPENAI_MODEL", "gpt-4o")
@@ -585,7 +598,6 @@ def _openai_chat_completion(system_prompt: str, user_prompt: str):
     if not key:
         raise HTTPException(status_code=500, detail="OpenAI API key is missing.")
 
-    url = "https://api.openai.com/v1/chat/completions"
     headers = {
         "Authorization": f"Bearer {key}",
         "Content-Type": "application/json",
@@ -610,7 +622,7 @@ def _openai_chat_completion(system_prompt: str, user_prompt: str):
     for token_param in dict.fromkeys(token_params):
         payload = dict(base_payload)
         payload[token_param] = 800
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=120)
+        resp = await post_chat_completion(headers, payload)
         if resp.status_code < 400:
             break
 
@@ -656,7 +668,7 @@ def _openai_chat_completion(system_prompt: str, user_prompt: str):
         raise HTTPException(status_code=502, detail="Malformed response from OpenAI.")
 
 
-def _openai_chat_completion_with_history(system_prompt: str, messages: list[dict]) -> str:
+async def _openai_chat_completion_with_history(system_prompt: str, messages: list[dict]) -> str:
     """Call OpenAI chat completion with a full messages list.
 
     `messages` is a list of {role, content} dicts in chronological order.
@@ -667,7 +679,6 @@ def _openai_chat_completion_with_history(system_prompt: str, messages: list[dict
     if not key:
         raise HTTPException(status_code=500, detail="OpenAI API key is missing.")
 
-    url = "https://api.openai.com/v1/chat/completions"
     headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
     full_messages = [{"role": "system", "content": system_prompt}] + messages
     base_payload = {"model": model, "messages": full_messages, "temperature": 0.4}
@@ -683,7 +694,7 @@ def _openai_chat_completion_with_history(system_prompt: str, messages: list[dict
     for token_param in dict.fromkeys(token_params):
         payload = dict(base_payload)
         payload[token_param] = 1500
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=120)
+        resp = await post_chat_completion(headers, payload)
         if resp.status_code < 400:
             break
         last_error_text = resp.text
@@ -712,7 +723,65 @@ def _openai_chat_completion_with_history(system_prompt: str, messages: list[dict
         raise HTTPException(status_code=502, detail="Malformed response from OpenAI.")
 
 
-def _openai_chat_with_tools(
+_METRIC_DETAILS_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_metric_details",
+            "description": (
+                "Obtiene los datos históricos completos (todas las mediciones recientes) "
+                "de una o varias métricas de laboratorio. Úsalo cuando necesites analizar "
+                "la tendencia o el detalle de analitos específicos."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "metric_names": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": (
+                            "Lista de claves de analito en mayúsculas "
+                            "(ej: [\"CREATININE\", \"UREA\", \"POTASSIUM\"])"
+                        ),
+                    }
+                },
+                "required": ["metric_names"],
+            },
+        },
+    }
+]
+
+
+def _openai_tools_request_setup(system_prompt: str, messages: list[dict]) -> tuple[dict, str, str, list[dict]]:
+    """Return headers, model, token parameter name and seeded messages for a tool-calling chat."""
+    key = os.getenv("OPENAI_API_KEY")
+    model = os.getenv("OPENAI_MODEL", "gpt-4o")
+    if not key:
+        raise HTTPException(status_code=500, detail="OpenAI API key is missing.")
+
+    headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+    model_lc = model.lower()
+    token_param = "max_completion_tokens" if model_lc.startswith(("gpt-5", "o1", "o3", "o4")) else "max_tokens"
+    current_messages = [{"role": "system", "content": system_prompt}] + list(messages)
+    return headers, model, token_param, current_messages
+
+
+def _run_metric_tool_call(tool_call: dict, metrics_upper: dict) -> dict:
+    """Resolve one tool call against the metrics summary and return the tool message."""
+    fn_name = tool_call["function"]["name"]
+    fn_args = json.loads(tool_call["function"]["arguments"] or "{}")
+
+    if fn_name == "get_metric_details":
+        requested = [str(n).strip().upper() for n in fn_args.get("metric_names", [])]
+        result = {k: metrics_upper[k] for k in requested if k in metrics_upper}
+        result_str = json.dumps(result, ensure_ascii=False)
+    else:
+        result_str = json.dumps({"error": f"Unknown function: {fn_name}"})
+
+    return {"role": "tool", "tool_call_id": tool_call["id"], "content": result_str}
+
+
+async def _openai_chat_with_tools(
     system_prompt: str,
     messages: list[dict],
     metrics_summary: dict,
@@ -724,60 +793,21 @@ def _openai_chat_with_tools(
     analytes.  We loop up to 3 times to handle chained tool calls, then force
     a final answer.
     """
-    key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("OPENAI_MODEL", "gpt-4o")
-    if not key:
-        raise HTTPException(status_code=500, detail="OpenAI API key is missing.")
-
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
-
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_metric_details",
-                "description": (
-                    "Obtiene los datos históricos completos (todas las mediciones recientes) "
-                    "de una o varias métricas de laboratorio. Úsalo cuando necesites analizar "
-                    "la tendencia o el detalle de analitos específicos."
-                ),
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "metric_names": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": (
-                                "Lista de claves de analito en mayúsculas "
-                                "(ej: [\"CREATININE\", \"UREA\", \"POTASSIUM\"])"
-                            ),
-                        }
-                    },
-                    "required": ["metric_names"],
-                },
-            },
-        }
-    ]
-
-    model_lc = model.lower()
-    token_param = "max_completion_tokens" if model_lc.startswith(("gpt-5", "o1", "o3", "o4")) else "max_tokens"
+    headers, model, token_param, current_messages = _openai_tools_request_setup(system_prompt, messages)
 
     # Build a case-insensitive lookup so the AI can match even if case differs
     metrics_upper = {k.upper(): v for k, v in metrics_summary.items()}
 
-    current_messages = [{"role": "system", "content": system_prompt}] + list(messages)
-
     for _ in range(3):
         payload = {
             "model": model,
             "messages": current_messages,
             token_param: 1500,
             "temperature": 0.4,
-            "tools": tools,
+            "tools": _METRIC_DETAILS_TOOLS,
             "tool_choice": "auto",
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=120)
+        resp = await post_chat_completion(headers, payload)
         if resp.status_code >= 400:
             raise HTTPException(status_code=502, detail=f"OpenAI error: {resp.text}")
 
@@ -798,19 +828,7 @@ def _openai_chat_with_tools(
             return content.strip()
 
         for tc in message.get("tool_calls", []):
-            fn_name = tc["function"]["name"]
-            fn_args = json.loads(tc["function"]["arguments"])
-
-            if fn_name == "get_metric_details":
-                requested = [str(n).strip().upper() for n in fn_args.get("metric_names", [])]
-                result = {k: metrics_upper[k] for k in requested if k in metrics_upper}
-                result_str = json.dumps(result, ensure_ascii=False)
-            else:
-                result_str = json.dumps({"error": f"Unknown function: {fn_name}"})
-
-            current_messages.append(
-                {"role": "tool", "tool_call_id": tc["id"], "content": result_str}
-            )
+            current_messages.append(_run_metric_tool_call(tc, metrics_upper))
 
     # Max iterations reached — force a final answer without tools
     payload_final = {
@@ -818,16 +836,88 @@ def _openai_chat_with_tools(
         "messages": current_messages,
         token_param: 1500,
         "temperature": 0.4,
-        "tools": tools,
+        "tools": _METRIC_DETAILS_TOOLS,
         "tool_choice": "none",
     }
-    resp = requests.post(url, headers=headers, data=json.dumps(payload_final), timeout=120)
+    resp = await post_chat_completion(headers, payload_final)
     if resp.status_code >= 400:
         raise HTTPException(status_code=502, detail=f"OpenAI error: {resp.text}")
     content = resp.json()["choices"][0]["message"].get("content") or ""
     return content.strip()
 
 
+async def _openai_chat_with_tools_stream(
+    system_prompt: str,
+    messages: list[dict],
+    metrics_summary: dict,
+) -> AsyncIterator[str]:
+    """Streaming variant of _openai_chat_with_tools that yields answer text deltas.
+
+    Tool-call rounds are accumulated from the stream and resolved locally; only
+    assistant text is yielded, as soon as OpenAI sends it.
+    """
+    headers, model, token_param, current_messages = _openai_tools_request_setup(system_prompt, messages)
+    metrics_upper = {k.upper(): v for k, v in metrics_summary.items()}
+
+    # Three tool-enabled rounds, then a final round that forbids further tool calls
+    for round_index in range(4):
+        payload = {
+            "model": model,
+            "messages": current_messages,
+            token_param: 1500,
+            "temperature": 0.4,
+            "tools": _METRIC_DETAILS_TOOLS,
+            "tool_choice": "auto" if round_index < 3 else "none",
+        }
+        content_parts: list[str] = []
+        tool_calls: dict[int, dict] = {}
+        finish_reason = None
+        async for chunk in stream_chat_completion(headers, payload):
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            choice = choices[0]
+            delta = choice.get("delta") or {}
+            text_delta = delta.get("content")
+            if text_delta:
+                content_parts.append(text_delta)
+                yield text_delta
+            for tc_delta in delta.get("tool_calls") or []:
+                slot = tool_calls.setdefault(
+                    tc_delta.get("index", 0),
+                    {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+                )
+                if tc_delta.get("id"):
+                    slot["id"] = tc_delta["id"]
+                fn_delta = tc_delta.get("function") or {}
+                slot["function"]["name"] += fn_delta.get("name") or ""
+                slot["function"]["arguments"] += fn_delta.get("arguments") or ""
+            finish_reason = choice.get("finish_reason") or finish_reason
+
+        if finish_reason != "tool_calls" or not tool_calls:
+            return
+
+        ordered_calls = [tool_calls[index] for index in sorted(tool_calls)]
+        current_messages.append(
+            {"role": "assistant", "content": "".join(content_parts) or None, "tool_calls": ordered_calls}
+        )
+        for tc in ordered_calls:
+            current_messages.append(_run_metric_tool_call(tc, metrics_upper))
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 class ChatSessionCreate(BaseModel):
     title: Optional[str] = None
 
@@ -1001,22 +1091,32 @@ async def delete_patient_memory(
     return {"deleted": memory_id}
 
 
-@router.post("/api/advice", response_model=AdviceResponse)
-async def get_advice(
-    req: AdviceRequest,
-    user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
-):
-    """Generate wellness-style advice based on recent labs with conversation memory."""
-    current_user = db.query(User).filter(User.id == user_id).first()
-    if not current_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    active_subscription = (
-        db.query(Subscription)
-        .filter(Subscription.user_id == user_id, Subscription.status.in_(("active", "trialing")))
-        .first()
-    )
-    if not active_subscription:
+@dataclass
+class _AdviceTurn:
+    """State carried from prompt preparation to the LLM call and persistence."""
+
+    user_id: int
+    question: str
+    patient: Optional[Patient]
+    session: Optional[ChatSession]
+    user_message_record: Optional[ChatMessageRecord]
+    should_persist: bool
+    days: int
+    system_prompt: str
+    history_messages: list[dict]
+    metrics_summary: Dict[str, List[Dict[str, Any]]]
+    current_allowance: Any
+    reserved_allowance: Any
+
+
+def _prepare_advice_turn(req: AdviceRequest, user_id: int, db: Session):
+    """Validate access, build the prompt and reserve allowance for one advice turn.
+
+    Returns an AdviceResponse for requests answered without the LLM (scope
+    rejection), otherwise the prepared _AdviceTurn.
+    """
+    current_user = require_principal(db, user_id)
+    if not current_user.has_subscription:
         raise HTTPException(status_code=403, detail="Se requiere una suscripción activa para usar el chat de IA.")
 
     patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
@@ -1105,37 +1205,9 @@ async def get_advice(
     else:
         patient_memory_text = "Aún no tienes información guardada sobre este paciente."
 
-    # ── 5. Analyte snapshot (Redis cache) ─────────────────────────────────
-    requested_metric_names = req.metric_names or None
-    cache_key = f"analyte_snapshot:{user_id}"
-    use_snapshot_cache = not requested_metric_names
-    r = _get_redis()
-    metrics_summary = None
-    if r and use_snapshot_cache:
-        try:
-            cached = r.get(cache_key)
-            if cached:
-                metrics_summary = json.loads(cached)
-        except Exception:
-            pass
-
-    if metrics_summary is None:
-        metrics_summary = _summarize_metrics_v2(db, user_id=user_id, metric_names=requested_metric_names, days=days)
-        if not metrics_summary and patient:
-            metrics_summary = _summarize_metrics(db, patient_id=patient.id, metric_names=requested_metric_names, days=days)
-        if not metrics_summary and requested_metric_names:
-            metrics_summary = _summarize_metrics_v2(db, user_id=user_id, metric_names=None, days=days)
-            if not metrics_summary and patient:
-                metrics_summary = _summarize_metrics(db, patient_id=patient.id, metric_names=None, days=days)
-        if not metrics_summary:
-            metrics_summary = _summarize_metrics_v2(db, user_id=user_id, metric_names=None, days=36500)
-        if not metrics_summary and patient:
-            metrics_summary = _summarize_metrics(db, patient_id=patient.id, metric_names=None, days=36500)
-        if r and use_snapshot_cache and metrics_summary:
-            try:
-                r.setex(cache_key, 3 * 3600, json.dumps(metrics_summary, ensure_ascii=False))
-            except Exception:
-                pass
+    # ── 5. Analyte snapshot (versioned cache) ─────────────────────────────
+    snapshot = _lab_snapshot(db, user_id, patient.id if patient else None, days)
+    metrics_summary = select_metrics(snapshot["metrics"], req.metric_names or None)
 
     if not metrics_summary:
         raise HTTPException(status_code=400, detail="No lab data available for advice.")
@@ -1256,7 +1328,7 @@ async def get_advice(
     else:
         history_messages.append({"role": "user", "content": user_prompt})
 
-    # ── 8. Reserve allowance and call OpenAI with Function Calling ────────
+    # ── 8. Reserve allowance ──────────────────────────────────────────────
     reserved_allowance = (
         reserve_ai_message(db, user_id)
         if should_persist
@@ -1278,19 +1350,48 @@ async def get_advice(
                 chart=not should_persist,
             ),
         )
-    try:
-        answer = _openai_chat_with_tools(system_prompt, history_messages, metrics_summary)
-    except Exception:
-        db.rollback()
-        if user_message_record is not None and user_message_record.id is not None:
-            persisted_user_message = db.query(ChatMessageRecord).filter(
-                ChatMessageRecord.id == user_message_record.id
-            ).first()
-            if persisted_user_message is not None:
-                db.delete(persisted_user_message)
-                db.commit()
-        refund_ai_message(db, user_id, reserved_allowance.period_key)
-        raise
+    return _AdviceTurn(
+        user_id=user_id,
+        question=req.question,
+        patient=patient,
+        session=session,
+        user_message_record=user_message_record,
+        should_persist=should_persist,
+        days=days,
+        system_prompt=system_prompt,
+        history_messages=history_messages,
+        metrics_summary=metrics_summary,
+        current_allowance=current_allowance,
+        reserved_allowance=reserved_allowance,
+    )
+
+
+def _abort_advice_turn(db: Session, turn: _AdviceTurn) -> None:
+    """Undo the user message and refund the allowance after a failed or aborted LLM call."""
+    db.rollback()
+    if turn.user_message_record is not None and turn.user_message_record.id is not None:
+        persisted_user_message = db.query(ChatMessageRecord).filter(
+            ChatMessageRecord.id == turn.user_message_record.id
+        ).first()
+        if persisted_user_message is not None:
+            db.delete(persisted_user_message)
+            db.commit()
+    refund_ai_message(db, turn.user_id, turn.reserved_allowance.period_key)
+
+
+def _commit_advice_turn(db: Session, turn: _AdviceTurn, answer: Any) -> str:
+    """Persist the assistant answer and audit the turn; returns the final answer text.
+
+    Once this commits the reply counts as delivered, so later failures must not refund.
+    """
+    user_id = turn.user_id
+    patient = turn.patient
+    session = turn.session
+    should_persist = turn.should_persist
+    days = turn.days
+    metrics_summary = turn.metrics_summary
+    current_allowance = turn.current_allowance
+    reserved_allowance = turn.reserved_allowance
     if isinstance(answer, str):
         answer = answer.strip()
     if not answer or _is_low_signal_advice(answer):
@@ -1300,7 +1401,7 @@ async def get_advice(
     if should_persist and session is not None:
         db.add(ChatMessageRecord(session_id=session.id, role="assistant", content=answer))
         if not session.title:
-            session.title = req.question[:60]
+            session.title = turn.question[:60]
         session.updated_at = dt.datetime.utcnow()
     write_audit_log(
         db,
@@ -1323,6 +1424,17 @@ async def get_advice(
         },
     )
     db.commit()
+    return answer
+
+
+async def _finish_advice_turn(turn: _AdviceTurn, answer: str) -> AdviceResponse:
+    """Kick off memory extraction for a committed turn and build the response."""
+    user_id = turn.user_id
+    session = turn.session
+    should_persist = turn.should_persist
+    metrics_summary = turn.metrics_summary
+    current_allowance = turn.current_allowance
+    reserved_allowance = turn.reserved_allowance
 
     # ── 10. Async memory extraction ───────────────────────────────────────
     from backend.tasks import extract_patient_memory, CELERY_ENABLED as _CELERY_ENABLED
@@ -1332,7 +1444,7 @@ async def get_advice(
         else:
             try:
                 from backend.tasks import _run_extract_patient_memory
-                _run_extract_patient_memory(session.id, user_id)
+                await asyncio.to_thread(_run_extract_patient_memory, session.id, user_id)
             except Exception:
                 pass
 
@@ -1357,3 +1469,71 @@ async def get_advice(
             else None
         ),
     )
+
+
+async def _complete_advice_turn(db: Session, turn: _AdviceTurn, answer: Any) -> AdviceResponse:
+    """Persist the assistant answer, audit the turn and build the response."""
+    answer = _commit_advice_turn(db, turn, answer)
+    return await _finish_advice_turn(turn, answer)
+
+
+@router.post("/api/advice", response_model=AdviceResponse)
+async def get_advice(
+    req: AdviceRequest,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Generate wellness-style advice based on recent labs with conversation memory."""
+    turn = _prepare_advice_turn(req, user_id, db)
+    if isinstance(turn, AdviceResponse):
+        return turn
+    try:
+        answer = await _openai_chat_with_tools(turn.system_prompt, turn.history_messages, turn.metrics_summary)
+    except Exception:
+        _abort_advice_turn(db, turn)
+        raise
+    return await _complete_advice_turn(db, turn, answer)
+
+
+@router.post("/api/advice/stream")
+async def stream_advice(
+    req: AdviceRequest,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Server-Sent Events variant of /api/advice.
+
+    Emits ``delta`` events with answer text as it arrives, then a ``done`` event
+    carrying the final AdviceResponse. Validation errors are returned as regular
+    HTTP errors before the stream starts; an LLM failure emits an ``error`` event.
+    """
+    turn = _prepare_advice_turn(req, user_id, db)
+    if isinstance(turn, AdviceResponse):
+        async def rejected_events():
+            yield _sse_event("done", turn)
+
+        return _sse_response(rejected_events())
+
+    async def events():
+        chunks: list[str] = []
+        # Only failures before the assistant turn is committed refund the allowance;
+        # once committed the reply is the user's even if building the response fails.
+        try:
+            async for text_delta in _openai_chat_with_tools_stream(
+                turn.system_prompt, turn.history_messages, turn.metrics_summary
+            ):
+                chunks.append(text_delta)
+                yield _sse_event("delta", {"text": text_delta})
+            answer = _commit_advice_turn(db, turn, "".join(chunks))
+        except Exception as exc:
+            _abort_advice_turn(db, turn)
+            detail = exc.detail if isinstance(exc, HTTPException) else "AI response failed."
+            yield _sse_event("error", {"detail": detail})
+            return
+        except BaseException:
+            # Client disconnected mid-stream: nothing was delivered in full, so refund.
+            _abort_advice_turn(db, turn)
+            raise
+        yield _sse_event("done", await _finish_advice_turn(turn, answer))
+
+    return _sse_response(events())
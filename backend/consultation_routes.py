@@ -1,4 +1,4 @@
-__all__ = ['ConsultationThreadCreate', 'ConsultationMessageCreate', 'ConsultationThreadItem', 'ConsultationMessageItem', 'ConsultationCallCreate', 'ConsultationCallAction', 'ConsultationPermissionsUpdate', 'ConsultationCallItem', 'ConsultationCallTokenResponse', '_get_or_create_consultation_thread', '_serialize_consultation_thread', '_ensure_consultation_participant', '_serialize_consultation_call', '_get_livekit_settings', '_consultation_event_user_ids', '_broadcast_consultation_event', 'consultations_websocket', 'list_consultations', 'create_consultation_thread', 'list_consultation_messages', 'create_consultation_message', 'mark_consultation_read', 'update_consultation_permissions', 'list_active_consultation_calls', 'create_consultation_call', 'update_consultation_call', 'get_consultation_call_token']
+__all__ = ['ConsultationThreadCreate', 'ConsultationMessageCreate', 'ConsultationThreadItem', 'ConsultationMessageItem', 'ConsultationCallCreate', 'ConsultationCallAction', 'ConsultationPermissionsUpdate', 'ConsultationCallItem', 'ConsultationCallTokenResponse', '_get_or_create_consultation_thread', '_consultation_thread_item', '_serialize_consultation_thread', '_build_consultation_inbox', '_ensure_consultation_participant', '_serialize_consultation_call', 'MESSAGE_PAGE_LIMIT', '_encode_message_cursor', '_decode_message_cursor', '_serialize_consultation_message', '_get_livekit_settings', '_consultation_event_user_ids', '_broadcast_consultation_event', 'consultations_websocket', 'list_consultations', 'create_consultation_thread', 'list_consultation_messages', 'create_consultation_message', 'mark_consultation_read', 'update_consultation_permissions', 'list_active_consultation_calls', 'create_consultation_call', 'update_consultation_call', 'get_consultation_call_token']
 
 from backend.deps import *
 from backend.utils import *
@@ -7,13 +7,14 @@ from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Web
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy import func, text
+from sqlalchemy import func, text, tuple_
 from sqlalchemy.sql import over
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import jwt
 from pydantic import BaseModel, ValidationError
 from typing import Any, Dict, List, Optional, Tuple
+import base64
 import io
 import os
 import logging
@@ -118,6 +119,8 @@ class ConsultationMessageItem(BaseModel):
     message_type: str
     read_at: Optional[dt.datetime] = None
     created_at: dt.datetime
+    # Opaque keyset position; pass it back as ``before`` / ``since``.
+    cursor: Optional[str] = None
 
 
 class ConsultationCallCreate(BaseModel):
@@ -156,7 +159,7 @@ class ConsultationCallTokenResponse(BaseModel):
 def _get_or_create_consultation_thread(
     db: Session,
     patient: Patient,
-    doctor: User,
+    doctor: User | Principal,
     grant: DoctorGrant,
     created_by_user_id: int,
 ) -> ConsultationThread:
@@ -190,6 +193,31 @@ def _get_or_create_consultation_thread(
     return thread
 
 
+def _consultation_thread_item(
+    thread: Optional[ConsultationThread],
+    grant: DoctorGrant,
+    patient: Optional[Patient],
+    doctor: Optional[User],
+    last_message: Optional[str],
+    unread_count: int,
+) -> ConsultationThreadItem:
+    return ConsultationThreadItem(
+        id=thread.id if thread else None,
+        patient_id=patient.id if patient else grant.patient_id,
+        patient_name=patient.full_name if patient else None,
+        doctor_id=doctor.id if doctor else grant.doctor_id,
+        doctor_email=grant.doctor_email,
+        doctor_name=doctor.full_name if doctor else None,
+        grant_id=grant.id,
+        status=thread.status if thread else "not_started",
+        can_message=bool(getattr(grant, "can_message", True)),
+        can_call=bool(getattr(grant, "can_call", False)),
+        unread_count=int(unread_count),
+        last_message=last_message,
+        updated_at=thread.updated_at if thread else grant.granted_at,
+    )
+
+
 def _serialize_consultation_thread(
     db: Session,
     thread: ConsultationThread,
@@ -223,24 +251,117 @@ def _serialize_consultation_thread(
     else:
         unread_count = 0
 
-    return ConsultationThreadItem(
-        id=thread.id if thread else None,
-        patient_id=patient.id if patient else grant.patient_id,
-        patient_name=patient.full_name if patient else None,
-        doctor_id=doctor.id if doctor else grant.doctor_id,
-        doctor_email=grant.doctor_email,
-        doctor_name=doctor.full_name if doctor else None,
-        grant_id=grant.id,
-        status=thread.status if thread else "not_started",
-        can_message=bool(getattr(grant, "can_message", True)),
-        can_call=bool(getattr(grant, "can_call", False)),
-        unread_count=int(unread_count),
-        last_message=last_message,
-        updated_at=thread.updated_at if thread else grant.granted_at,
+    return _consultation_thread_item(thread, grant, patient, doctor, last_message, unread_count)
+
+
+def _build_consultation_inbox(
+    db: Session,
+    grants: List[DoctorGrant],
+    viewer_user_id: int,
+) -> List[ConsultationThreadItem]:
+    """Serialize the inbox for ``grants`` in a fixed number of queries.
+
+    ``_serialize_consultation_thread`` costs four or five queries per entry,
+    which made the inbox grow linearly with the number of grants. Here the
+    latest thread per grant and the last message per thread come from
+    ``row_number()`` windows, unread counts from one grouped count, and
+    patients/doctors from ``IN`` lookups: at most six queries for any inbox.
+    """
+    if not grants:
+        return []
+    grant_ids = [grant.id for grant in grants]
+
+    thread_rn = func.row_number().over(
+        partition_by=ConsultationThread.grant_id,
+        order_by=(ConsultationThread.updated_at.desc(), ConsultationThread.id.desc()),
+    ).label("rn")
+    ranked_threads = (
+        db.query(ConsultationThread.id.label("id"), thread_rn)
+        .filter(ConsultationThread.grant_id.in_(grant_ids))
+        .subquery()
+    )
+    threads = (
+        db.query(ConsultationThread)
+        .join(ranked_threads, ranked_threads.c.id == ConsultationThread.id)
+        .filter(ranked_threads.c.rn == 1)
+        .all()
     )
+    thread_by_grant = {thread.grant_id: thread for thread in threads}
+    thread_ids = [thread.id for thread in threads]
+
+    patient_ids = {grant.patient_id for grant in grants} | {thread.patient_id for thread in threads}
+    patients = {row.id: row for row in db.query(Patient).filter(Patient.id.in_(patient_ids)).all()}
+
+    # Same lookup order as _resolve_doctor_user: by id first, then by email.
+    doctor_ids = {grant.doctor_id for grant in grants if grant.doctor_id}
+    doctors_by_id = (
+        {row.id: row for row in db.query(User).filter(User.id.in_(doctor_ids)).all()} if doctor_ids else {}
+    )
+    missing_emails = {
+        grant.doctor_email.lower()
+        for grant in grants
+        if grant.doctor_email and doctors_by_id.get(grant.doctor_id) is None
+    }
+    doctors_by_email: Dict[str, User] = {}
+    if missing_emails:
+        for row in (
+            db.query(User).filter(func.lower(User.email).in_(missing_emails)).order_by(User.id.asc()).all()
+        ):
+            doctors_by_email.setdefault(row.email.lower(), row)
+
+    last_messages: Dict[int, str] = {}
+    unread_counts: Dict[int, int] = {}
+    if thread_ids:
+        message_rn = func.row_number().over(
+            partition_by=ConsultationMessage.thread_id,
+            order_by=(ConsultationMessage.created_at.desc(), ConsultationMessage.id.desc()),
+        ).label("rn")
+        ranked_messages = (
+            db.query(
+                ConsultationMessage.thread_id.label("thread_id"),
+                func.substr(ConsultationMessage.body, 1, 120).label("preview"),
+                message_rn,
+            )
+            .filter(ConsultationMessage.thread_id.in_(thread_ids))
+            .subquery()
+        )
+        last_messages = {
+            row.thread_id: row.preview
+            for row in db.query(ranked_messages.c.thread_id, ranked_messages.c.preview)
+            .filter(ranked_messages.c.rn == 1)
+            .all()
+        }
+        unread_counts = dict(
+            db.query(ConsultationMessage.thread_id, func.count(ConsultationMessage.id))
+            .filter(
+                ConsultationMessage.thread_id.in_(thread_ids),
+                ConsultationMessage.sender_user_id != viewer_user_id,
+                ConsultationMessage.read_at.is_(None),
+            )
+            .group_by(ConsultationMessage.thread_id)
+            .all()
+        )
+
+    items: List[ConsultationThreadItem] = []
+    for grant in grants:
+        thread = thread_by_grant.get(grant.id)
+        doctor = doctors_by_id.get(grant.doctor_id)
+        if doctor is None and grant.doctor_email:
+            doctor = doctors_by_email.get(grant.doctor_email.lower())
+        items.append(
+            _consultation_thread_item(
+                thread,
+                grant,
+                patients.get(thread.patient_id if thread else grant.patient_id),
+                doctor,
+                last_messages.get(thread.id) if thread else None,
+                unread_counts.get(thread.id, 0) if thread else 0,
+            )
+        )
+    return items
 
 
-def _ensure_consultation_participant(db: Session, thread_id: int, user: User) -> tuple[ConsultationThread, DoctorGrant]:
+def _ensure_consultation_participant(db: Session, thread_id: int, user: Principal) -> tuple[ConsultationThread, DoctorGrant]:
     """Ensure current user is the patient or doctor participant for a thread."""
     thread = db.query(ConsultationThread).filter(ConsultationThread.id == thread_id).first()
     if not thread:
@@ -276,6 +397,38 @@ def _serialize_consultation_call(db: Session, call: ConsultationCall) -> Consult
     )
 
 
+MESSAGE_PAGE_LIMIT = 200
+
+
+def _encode_message_cursor(message: ConsultationMessage) -> str:
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_message_cursor(cursor: str) -> Tuple[dt.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, message_id = raw.rsplit("|", 1)
+        return dt.datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _serialize_consultation_message(message: ConsultationMessage, sender: Optional[User]) -> ConsultationMessageItem:
+    return ConsultationMessageItem(
+        id=message.id,
+        thread_id=message.thread_id,
+        sender_user_id=message.sender_user_id,
+        sender_name=sender.full_name if sender else None,
+        sender_role="doctor" if (sender and sender.is_doctor) else "patient",
+        body=message.body,
+        message_type=message.message_type,
+        read_at=message.read_at,
+        created_at=message.created_at,
+        cursor=_encode_message_cursor(message),
+    )
+
+
 def _get_livekit_settings() -> Tuple[str, str, str]:
     server_url = (os.getenv("LIVEKIT_URL") or "").strip()
     api_key = (os.getenv("LIVEKIT_API_KEY") or "").strip()
@@ -306,7 +459,7 @@ async def _broadcast_consultation_event(
         "doctor_id": thread.doctor_id,
         **payload,
     }
-    await consultation_ws_manager.send_to_users(_consultation_event_user_ids(db, thread), event)
+    await consultation_ws_manager.publish(_consultation_event_user_ids(db, thread), event)
 
 
 @router.websocket("/api/consultations/ws")
@@ -338,48 +491,46 @@ async def list_consultations(
     db: Session = Depends(get_db),
 ):
     """List patient-doctor consultation entries for the current user."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
     if user.is_doctor:
+        email = user.email
+        # Claim grants issued to this email before the doctor registered. One UPDATE,
+        # and no commit (which would expire every loaded grant) when nothing changed.
+        claimed = (
+            db.query(DoctorGrant)
+            .filter(
+                DoctorGrant.revoked_at.is_(None),
+                DoctorGrant.doctor_id.is_(None),
+                func.lower(DoctorGrant.doctor_email) == email.lower(),
+            )
+            .update({DoctorGrant.doctor_id: user_id}, synchronize_session=False)
+        )
+        if claimed:
+            db.commit()
         grants = (
             db.query(DoctorGrant)
             .filter(
                 DoctorGrant.revoked_at.is_(None),
                 (
-                    (DoctorGrant.doctor_id == user.id)
-                    | (DoctorGrant.doctor_email.ilike(user.email))
+                    (DoctorGrant.doctor_id == user_id)
+                    | (DoctorGrant.doctor_email.ilike(email))
                 ),
             )
             .order_by(DoctorGrant.granted_at.desc(), DoctorGrant.id.desc())
             .all()
         )
-        for grant in grants:
-            if grant.doctor_id is None and grant.doctor_email.lower() == user.email.lower():
-                grant.doctor_id = user.id
-        if grants:
-            db.commit()
     else:
-        patient = get_patient_for_user(db, user_id)
-        if not patient:
+        if user.patient_id is None:
             return []
         grants = (
             db.query(DoctorGrant)
-            .filter(DoctorGrant.patient_id == patient.id, DoctorGrant.revoked_at.is_(None))
+            .filter(DoctorGrant.patient_id == user.patient_id, DoctorGrant.revoked_at.is_(None))
             .order_by(DoctorGrant.granted_at.desc(), DoctorGrant.id.desc())
             .all()
         )
 
-    result: list[ConsultationThreadItem] = []
-    for grant in grants:
-        thread = (
-            db.query(ConsultationThread)
-            .filter(ConsultationThread.grant_id == grant.id)
-            .order_by(ConsultationThread.updated_at.desc(), ConsultationThread.id.desc())
-            .first()
-        )
-        result.append(_serialize_consultation_thread(db, thread, grant, user_id))
+    result = _build_consultation_inbox(db, grants, user_id)
     result.sort(key=lambda item: item.updated_at or dt.datetime.min, reverse=True)
     return result
 
@@ -391,9 +542,7 @@ async def create_consultation_thread(
     db: Session = Depends(get_db),
 ):
     """Create or return a consultation thread backed by an active doctor grant."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
     if user.is_doctor:
         if not payload.patient_id:
@@ -453,36 +602,49 @@ async def create_consultation_thread(
 @router.get("/api/consultations/threads/{thread_id}/messages", response_model=List[ConsultationMessageItem])
 async def list_consultation_messages(
     thread_id: int,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = MESSAGE_PAGE_LIMIT,
     user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db),
 ):
-    """List messages for a consultation thread."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    """List messages for a consultation thread, oldest first, one keyset page at a time.
+
+    Without a cursor this is the newest page. ``before=<cursor>`` pages back
+    through older history; ``since=<cursor>`` returns what was posted after
+    the cursor (e.g. the last message a client saw before its WebSocket
+    dropped). A page shorter than ``limit`` is the last one in that direction.
+    """
+    user = require_principal(db, user_id)
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either before or since, not both")
+    limit = max(1, min(int(limit), MESSAGE_PAGE_LIMIT))
     thread, _grant = _ensure_consultation_participant(db, thread_id, user)
-    messages = (
-        db.query(ConsultationMessage)
-        .filter(ConsultationMessage.thread_id == thread.id)
-        .order_by(ConsultationMessage.created_at.asc(), ConsultationMessage.id.asc())
-        .limit(200)
-        .all()
-    )
+
+    position = tuple_(ConsultationMessage.created_at, ConsultationMessage.id)
+    query = db.query(ConsultationMessage).filter(ConsultationMessage.thread_id == thread.id)
+    if since:
+        messages = (
+            query.filter(position > tuple_(*_decode_message_cursor(since)))
+            .order_by(ConsultationMessage.created_at.asc(), ConsultationMessage.id.asc())
+            .limit(limit)
+            .all()
+        )
+    else:
+        if before:
+            query = query.filter(position < tuple_(*_decode_message_cursor(before)))
+        messages = (
+            query.order_by(ConsultationMessage.created_at.desc(), ConsultationMessage.id.desc())
+            .limit(limit)
+            .all()
+        )
+        messages.reverse()
+
     sender_ids = {message.sender_user_id for message in messages}
     senders = db.query(User).filter(User.id.in_(sender_ids)).all() if sender_ids else []
     senders_by_id = {sender.id: sender for sender in senders}
     return [
-        ConsultationMessageItem(
-            id=message.id,
-            thread_id=message.thread_id,
-            sender_user_id=message.sender_user_id,
-            sender_name=senders_by_id.get(message.sender_user_id).full_name if senders_by_id.get(message.sender_user_id) else None,
-            sender_role="doctor" if (senders_by_id.get(message.sender_user_id) and senders_by_id[message.sender_user_id].is_doctor) else "patient",
-            body=message.body,
-            message_type=message.message_type,
-            read_at=message.read_at,
-            created_at=message.created_at,
-        )
+        _serialize_consultation_message(message, senders_by_id.get(message.sender_user_id))
         for message in messages
     ]
 
@@ -495,9 +657,7 @@ async def create_consultation_message(
     db: Session = Depends(get_db),
 ):
     """Send a text message in a consultation thread."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
     thread, grant = _ensure_consultation_participant(db, thread_id, user)
     if not getattr(grant, "can_message", True):
         raise HTTPException(status_code=403, detail="Messaging is not enabled for this grant")
@@ -528,17 +688,7 @@ async def create_consultation_message(
     )
     db.commit()
     db.refresh(message)
-    item = ConsultationMessageItem(
-        id=message.id,
-        thread_id=message.thread_id,
-        sender_user_id=message.sender_user_id,
-        sender_name=user.full_name,
-        sender_role="doctor" if user.is_doctor else "patient",
-        body=message.body,
-        message_type=message.message_type,
-        read_at=message.read_at,
-        created_at=message.created_at,
-    )
+    item = _serialize_consultation_message(message, user)
     await _broadcast_consultation_event(db, thread, "message.created", {"message": item})
     return item
 
@@ -550,9 +700,7 @@ async def mark_consultation_read(
     db: Session = Depends(get_db),
 ):
     """Mark incoming messages in a consultation thread as read."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
     thread, _grant = _ensure_consultation_participant(db, thread_id, user)
     now = dt.datetime.utcnow()
     updated = (
@@ -623,9 +771,7 @@ async def list_active_consultation_calls(
     db: Session = Depends(get_db),
 ):
     """List ringing/accepted calls visible to the current user."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
     active_statuses = ["ringing", "accepted"]
     if user.is_doctor:
@@ -636,12 +782,11 @@ async def list_active_consultation_calls(
             .all()
         )
     else:
-        patient = get_patient_for_user(db, user_id)
-        if not patient:
+        if user.patient_id is None:
             return []
         calls = (
             db.query(ConsultationCall)
-            .filter(ConsultationCall.patient_id == patient.id, ConsultationCall.status.in_(active_statuses))
+            .filter(ConsultationCall.patient_id == user.patient_id, ConsultationCall.status.in_(active_statuses))
             .order_by(ConsultationCall.created_at.desc(), ConsultationCall.id.desc())
             .all()
         )
@@ -655,9 +800,7 @@ async def create_consultation_call(
     db: Session = Depends(get_db),
 ):
     """Doctor starts a consultation call lifecycle."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
     if not user.is_doctor:
         raise HTTPException(status_code=403, detail="Only doctors can start calls")
 
@@ -713,9 +856,7 @@ async def update_consultation_call(
     db: Session = Depends(get_db),
 ):
     """Accept, decline, or end a consultation call."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
     call = db.query(ConsultationCall).filter(ConsultationCall.id == call_id).first()
     if not call:
@@ -777,9 +918,7 @@ async def get_consultation_call_token(
     db: Session = Depends(get_db),
 ):
     """Issue a LiveKit room token for an active consultation call."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
     call = db.query(ConsultationCall).filter(ConsultationCall.id == call_id).first()
     if not call:
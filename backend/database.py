@@ -18,7 +18,11 @@ from sqlalchemy import (
     Boolean,
     JSON,
     UniqueConstraint,
+    Index,
+    event,
     inspect,
+    select,
+    func,
     text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
@@ -170,6 +174,10 @@ class ConsultationMessage(Base):
     """Message in a patient-doctor consultation thread."""
 
     __tablename__ = "consultation_messages"
+    __table_args__ = (
+        # Keyset pagination of a thread's history (list_consultation_messages).
+        Index("ix_consultation_messages_thread_created", "thread_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     thread_id = Column(Integer, ForeignKey("consultation_threads.id"), nullable=False, index=True)
@@ -322,9 +330,16 @@ class V2Metric(Base):
     """V2 extracted metric rows linked to V2Document."""
 
     __tablename__ = "v2_metrics"
+    __table_args__ = (
+        Index("ix_v2_metrics_user_analyte_dt", "user_id", "analyte_key", "effective_dt"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     document_id = Column(String(36), ForeignKey("v2_documents.id"), nullable=False, index=True)
+    # Denormalized from the parent document (user_id, coalesce(analysis_date, created_at))
+    # so per-user time-series reads hit a single composite index without the join.
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    effective_dt = Column(DateTime, nullable=True)
     analyte_key = Column(String, nullable=False, index=True)
     raw_name = Column(String, nullable=False)
     specimen = Column(String, nullable=False)
@@ -339,6 +354,71 @@ class V2Metric(Base):
     document = relationship("V2Document", back_populates="metrics")
 
 
+@event.listens_for(V2Metric, "before_insert")
+def _fill_v2_metric_denormalized_columns(mapper, connection, target) -> None:
+    """Fill user_id/effective_dt from the parent document when the caller did not."""
+    if target.user_id is not None and target.effective_dt is not None:
+        return
+    document = target.document
+    if document is not None and document.user_id is not None:
+        user_id, effective_dt = document.user_id, document.analysis_date or document.created_at
+    else:
+        row = connection.execute(
+            select(
+                V2Document.user_id,
+                func.coalesce(V2Document.analysis_date, V2Document.created_at),
+            ).where(V2Document.id == target.document_id)
+        ).first()
+        if row is None:
+            return
+        user_id, effective_dt = row
+    if target.user_id is None:
+        target.user_id = user_id
+    if target.effective_dt is None:
+        target.effective_dt = effective_dt
+
+
+class V2AnalyteLatest(Base):
+    """Latest V2 metric per (user, analyte_key), maintained on document create/delete."""
+
+    __tablename__ = "v2_analyte_latest"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    analyte_key = Column(String, primary_key=True)
+    metric_id = Column(String(36), nullable=False)
+    document_id = Column(String(36), ForeignKey("v2_documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    raw_name = Column(String, nullable=False)
+    value_numeric = Column(Float, nullable=True)
+    value_text = Column(Text, nullable=True)
+    unit = Column(String, nullable=True)
+    dt = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class V2DocumentJob(Base):
+    """Queued V2 extraction of an uploaded PDF (POST /api/v2/documents/jobs)."""
+
+    __tablename__ = "v2_document_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Set for files uploaded together through POST /api/v2/documents/batch.
+    batch_id = Column(String(36), nullable=True, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, processing, done, duplicate, failed
+    # Encrypted, unlocked PDF; removed once the job finishes.
+    file_path = Column(String, nullable=True)
+    document_hash = Column(String, nullable=False)
+    source_filename = Column(String, nullable=True)
+    free_credit_reserved = Column(Boolean, nullable=False, default=False)
+    document_id = Column(String(36), ForeignKey("v2_documents.id", ondelete="SET NULL"), nullable=True)
+    num_metrics = Column(Integer, nullable=True)
+    error_code = Column(String, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
 class V2DoctorNote(Base):
     """Doctor-authored point note for V2 series."""
 
@@ -532,6 +612,20 @@ def get_session_factory(engine):
     return sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+V2_METRICS_DENORMALIZE_BACKFILL_SQL = """
+UPDATE v2_metrics
+SET user_id = (
+        SELECT v2_documents.user_id FROM v2_documents
+        WHERE v2_documents.id = v2_metrics.document_id
+    ),
+    effective_dt = (
+        SELECT COALESCE(v2_documents.analysis_date, v2_documents.created_at) FROM v2_documents
+        WHERE v2_documents.id = v2_metrics.document_id
+    )
+WHERE user_id IS NULL OR effective_dt IS NULL
+"""
+
+
 def create_all_tables(engine) -> None:
     """Create tables, serialized on Postgres to avoid multi-worker startup races."""
     if engine.dialect.name != "postgresql":
@@ -580,7 +674,11 @@ def init_db(engine):
     code_added_columns = ensure_email_code_purpose_column(engine)
     grant_added_columns = ensure_doctor_grant_columns(engine)
     subscription_added_columns = ensure_subscription_columns(engine)
+    v2_metric_added_columns = ensure_v2_metrics_columns(engine)
+    v2_job_added_columns = ensure_v2_document_jobs_columns(engine)
+    message_added_indexes = ensure_consultation_message_indexes(engine)
     ensure_chat_tables(engine)
+    analyte_latest_rows = ensure_v2_analyte_latest(engine)
     if added_columns:
         print(f"[DB] added columns: {', '.join(added_columns)}")
     if user_added_columns:
@@ -591,6 +689,35 @@ def init_db(engine):
         print(f"[DB] added doctor_grant columns: {', '.join(grant_added_columns)}")
     if subscription_added_columns:
         print(f"[DB] added subscription columns: {', '.join(subscription_added_columns)}")
+    if v2_metric_added_columns:
+        print(f"[DB] added v2_metrics columns: {', '.join(v2_metric_added_columns)}")
+    if v2_job_added_columns:
+        print(f"[DB] added v2_document_jobs columns: {', '.join(v2_job_added_columns)}")
+    if message_added_indexes:
+        print(f"[DB] added consultation_messages indexes: {', '.join(message_added_indexes)}")
+    if analyte_latest_rows:
+        print(f"[DB] backfilled v2_analyte_latest rows: {analyte_latest_rows}")
+
+
+def ensure_v2_analyte_latest(engine) -> int:
+    """Backfill v2_analyte_latest when it is empty but V2 metrics already exist."""
+    from backend.analyte_latest import rebuild_analyte_latest
+
+    try:
+        session = sessionmaker(bind=engine)()
+        try:
+            if session.query(V2AnalyteLatest.user_id).first() is not None:
+                return 0
+            if session.query(V2Metric.id).first() is None:
+                return 0
+            written = rebuild_analyte_latest(session)
+            session.commit()
+            return written
+        finally:
+            session.close()
+    except Exception as exc:
+        print(f"[WARN] Could not backfill v2_analyte_latest: {exc}")
+        return 0
 
 
 def ensure_subscription_columns(engine) -> list[str]:
@@ -649,6 +776,80 @@ def ensure_lab_results_columns(engine) -> list[str]:
         return []
 
 
+def ensure_v2_metrics_columns(engine) -> list[str]:
+    """Add and backfill denormalized v2_metrics.user_id/effective_dt without Alembic."""
+    try:
+        inspector = inspect(engine)
+        if "v2_metrics" not in inspector.get_table_names():
+            return []
+        existing = {col["name"] for col in inspector.get_columns("v2_metrics")}
+        additions: list[tuple[str, str]] = []
+        if "user_id" not in existing:
+            additions.append(("user_id", "INTEGER"))
+        if "effective_dt" not in existing:
+            additions.append(("effective_dt", "TIMESTAMP"))
+        indexes = {index["name"] for index in inspector.get_indexes("v2_metrics")}
+
+        if not additions and "ix_v2_metrics_user_analyte_dt" in indexes:
+            return []
+
+        with engine.begin() as conn:
+            for name, col_type in additions:
+                conn.execute(text(f"ALTER TABLE v2_metrics ADD COLUMN {name} {col_type}"))
+            conn.execute(text(V2_METRICS_DENORMALIZE_BACKFILL_SQL))
+            if "ix_v2_metrics_user_analyte_dt" not in indexes:
+                conn.execute(
+                    text(
+                        "CREATE INDEX ix_v2_metrics_user_analyte_dt "
+                        "ON v2_metrics (user_id, analyte_key, effective_dt)"
+                    )
+                )
+        return [name for name, _ in additions]
+    except Exception as exc:
+        print(f"[WARN] Could not ensure v2_metrics columns: {exc}")
+        return []
+
+
+def ensure_v2_document_jobs_columns(engine) -> list[str]:
+    """Add v2_document_jobs.batch_id (and its index) if missing."""
+    try:
+        inspector = inspect(engine)
+        if "v2_document_jobs" not in inspector.get_table_names():
+            return []
+        existing = {col["name"] for col in inspector.get_columns("v2_document_jobs")}
+        if "batch_id" in existing:
+            return []
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE v2_document_jobs ADD COLUMN batch_id VARCHAR(36)"))
+            conn.execute(text("CREATE INDEX ix_v2_document_jobs_batch_id ON v2_document_jobs (batch_id)"))
+        return ["batch_id"]
+    except Exception as exc:
+        print(f"[WARN] Could not ensure v2_document_jobs columns: {exc}")
+        return []
+
+
+def ensure_consultation_message_indexes(engine) -> list[str]:
+    """Create the (thread_id, created_at, id) keyset index on existing databases."""
+    try:
+        inspector = inspect(engine)
+        if "consultation_messages" not in inspector.get_table_names():
+            return []
+        indexes = {index["name"] for index in inspector.get_indexes("consultation_messages")}
+        if "ix_consultation_messages_thread_created" in indexes:
+            return []
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE INDEX ix_consultation_messages_thread_created "
+                    "ON consultation_messages (thread_id, created_at, id)"
+                )
+            )
+        return ["ix_consultation_messages_thread_created"]
+    except Exception as exc:
+        print(f"[WARN] Could not ensure consultation_messages indexes: {exc}")
+        return []
+
+
 def ensure_doctor_grant_columns(engine) -> list[str]:
     """Add consultation permission columns to doctor_grants without Alembic."""
     try:
@@ -730,7 +931,10 @@ def save_import_to_db(session: Session, import_data: "ImportJson", patient_db_id
     Returns:
         Number of items saved
     """
-    items_count = 0
+    # Imported lazily: backend.bulk_insert imports this module.
+    from backend.bulk_insert import insert_lab_results
+
+    rows = []
     source_pdf = import_data.source_pdf
 
     def _parse_datetime(value) -> Optional[datetime]:
@@ -813,22 +1017,23 @@ def save_import_to_db(session: Session, import_data: "ImportJson", patient_db_id
             continue
         seen.add(key)
 
-        db_item = LabResult(
-            patient_id=patient_db_id,  # Use the actual patient_id from DB
-            analyte_name=name_clean,
-            value=item.value,
-            value_text=item.value_text,
-            unit=item.unit,
-            material=item.material,
-            taken_at=taken_at,
-            ref_range=item.ref_range,
-            ref_min=ref_min,
-            ref_max=ref_max,
-            source_pdf=source_pdf,
+        rows.append(
+            {
+                "patient_id": patient_db_id,  # Use the actual patient_id from DB
+                "analyte_name": name_clean,
+                "value": item.value,
+                "value_text": item.value_text,
+                "unit": item.unit,
+                "material": item.material,
+                "taken_at": taken_at,
+                "ref_range": item.ref_range,
+                "ref_min": ref_min,
+                "ref_max": ref_max,
+                "source_pdf": source_pdf,
+            }
         )
-        session.add(db_item)
-        items_count += 1
-    
+
+    items_count = insert_lab_results(session, rows)
     session.commit()
     return items_count
 
@@ -912,7 +1117,10 @@ def save_parsed_records(
                 value_key = ("text", vt)
             existing_keys.add((series_key, value_key, row[3], row[4]))
 
-    inserted = 0
+    # Imported lazily: backend.bulk_insert imports this module.
+    from backend.bulk_insert import insert_lab_results
+
+    rows = []
     seen_keys = set()
 
     for record in records:
@@ -942,24 +1150,25 @@ def save_parsed_records(
         if dedup_key in existing_keys or dedup_key in seen_keys:
             continue
 
-        db_item = LabResult(
-            patient_id=patient_id,
-            analyte_name=name_clean,
-            value=value_num if value_num is not None else None,
-            value_text=value_text if value_num is None else None,
-            unit=unit_value,
-            material=record.get("specimen"),
-            taken_at=taken_at,
-            ref_range=ref_range,
-            ref_min=ref_min,
-            ref_max=ref_max,
-            source_pdf=source_pdf,
-            document_hash=document_hash,
-            series_key=series_key,
+        rows.append(
+            {
+                "patient_id": patient_id,
+                "analyte_name": name_clean,
+                "value": value_num if value_num is not None else None,
+                "value_text": value_text if value_num is None else None,
+                "unit": unit_value,
+                "material": record.get("specimen"),
+                "taken_at": taken_at,
+                "ref_range": ref_range,
+                "ref_min": ref_min,
+                "ref_max": ref_max,
+                "source_pdf": source_pdf,
+                "document_hash": document_hash,
+                "series_key": series_key,
+            }
         )
-        session.add(db_item)
         seen_keys.add(dedup_key)
-        inserted += 1
 
+    inserted = insert_lab_results(session, rows)
     session.commit()
     return inserted
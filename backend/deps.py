@@ -1,4 +1,4 @@
-__all__ = ['_redis_client', 'consultation_ws_manager', 'ConsultationConnectionManager', '_get_redis', 'get_db', 'get_patient_for_user', 'get_current_user', 'write_audit_log']
+__all__ = ['_redis_client', 'consultation_ws_manager', 'ConsultationConnectionManager', '_get_redis', '_report_redis_failure', 'get_db', 'get_patient_for_user', 'get_current_user', 'Principal', 'get_principal', 'load_principal', 'require_principal', 'write_audit_log']
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.encoders import jsonable_encoder
@@ -10,6 +10,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, ValidationError
 from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+from collections import deque
 import io
 import os
 import logging
@@ -37,6 +39,7 @@ from backend.analyte_utils import normalize_analyte_name
 from backend.pdf_parser import extract_raw_text
 from backend.parsing.pipeline import coerce_raw_text, parse_with_ocr_fallback
 from backend.tasks import process_pdf_task, CELERY_ENABLED
+from backend.principal import Principal, load_principal, require_principal
 from backend.database import (
     create_db_engine,
     get_session_factory,
@@ -65,11 +68,13 @@ from backend.database import (
 )
 from backend.auth import decode_token, get_current_user_id
 from backend.encryption import encrypt_file_data
+from backend import user_events
 from backend.auth_routes import router as auth_router, UserResponse as AuthUserResponse
 from backend.patient_routes import router as patient_router
 import datetime as dt
 import json
 import re
+import time
 import requests
 import unicodedata
 from urllib.parse import urljoin
@@ -79,54 +84,223 @@ import redis as redis_lib
 
 from fastapi import APIRouter
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _ws_send_queue_size() -> int:
+    try:
+        return max(1, int(os.getenv("WS_SEND_QUEUE_SIZE", "64")))
+    except ValueError:
+        return 64
+
+
+def _ws_send_timeout_sec() -> float:
+    try:
+        return max(0.1, float(os.getenv("WS_SEND_TIMEOUT_SEC", "10")))
+    except ValueError:
+        return 10.0
+
+
+def _coalesce_key(event: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """Events that carry a full state snapshot: a newer one replaces a queued older one."""
+    event_type = event.get("type")
+    if event_type == "thread.updated":
+        return (event_type, event.get("thread_id"))
+    if event_type == "messages.read":
+        return (event_type, event.get("thread_id"), event.get("reader_user_id"))
+    if event_type == "call.updated":
+        return (event_type, (event.get("call") or {}).get("id"))
+    if event_type == "v2_document_job":
+        return (event_type, event.get("job_id"))
+    return None
+
+
+class _Connection:
+    """One socket with its bounded outbound queue, drained by a writer task."""
+
+    __slots__ = ("socket", "queue", "wakeup", "writer")
+
+    def __init__(self, socket: WebSocket) -> None:
+        self.socket = socket
+        # (coalesce key, serialized event)
+        self.queue: deque[Tuple[Optional[Tuple[Any, ...]], str]] = deque()
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
 
 class ConsultationConnectionManager:
-    def __init__(self) -> None:
-        self._connections: Dict[int, set[WebSocket]] = {}
+    """WebSockets held by this process, fed by the per-user event bus (``backend.user_events``).
+
+    Sending never waits on a recipient: each socket has a queue of at most
+    ``WS_SEND_QUEUE_SIZE`` events drained by its own writer task. A newer
+    state snapshot (``_coalesce_key``) replaces a queued one. A socket whose
+    queue still overflows, or whose send takes longer than
+    ``WS_SEND_TIMEOUT_SEC``, is closed (1013); the client reconnects and
+    refetches.
+    """
+
+    def __init__(self, bus=None) -> None:
+        self._connections: Dict[int, Dict[WebSocket, _Connection]] = {}
+        self._bus = bus
+        self._stats = {"enqueued": 0, "sent": 0, "coalesced": 0, "dropped": 0, "slow_disconnects": 0}
+
+    @property
+    def bus(self):
+        return self._bus if self._bus is not None else user_events.event_bus
 
     async def connect(self, user_id: int, websocket: WebSocket) -> None:
         await websocket.accept()
-        self._connections.setdefault(user_id, set()).add(websocket)
+        connections = self._connections.setdefault(user_id, {})
+        if not connections:
+            self.bus.subscribe(user_id)
+        connection = _Connection(websocket)
+        connection.writer = asyncio.create_task(self._write(user_id, connection))
+        connections[websocket] = connection
 
     def disconnect(self, user_id: int, websocket: WebSocket) -> None:
-        sockets = self._connections.get(user_id)
-        if not sockets:
+        connections = self._connections.get(user_id)
+        if not connections:
             return
-        sockets.discard(websocket)
-        if not sockets:
+        connection = connections.pop(websocket, None)
+        if connection is not None and connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        if not connections:
             self._connections.pop(user_id, None)
+            self.bus.unsubscribe(user_id)
+
+    async def publish(self, user_ids: List[int], event: Dict[str, Any]) -> None:
+        """Send ``event`` to every device of ``user_ids``, whichever process holds the socket.
+
+        This process's sockets get it straight away rather than through the
+        bus relay, which may be reconnecting or not yet subscribed to a user
+        who just connected; the relay drops the copy it receives back.
+        """
+        self.bus.publish(user_ids, event, skip_local=True)
+        await self.send_to_users(user_ids, event)
+
+    async def deliver(self, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Bus callback: queue a batch of (user_id, event) on the local sockets."""
+        for user_id, event in batch:
+            self._enqueue(user_id, event)
 
     async def send_to_user(self, user_id: int, event: Dict[str, Any]) -> None:
-        sockets = list(self._connections.get(user_id, set()))
-        if not sockets:
+        self._enqueue(user_id, event)
+
+    async def send_to_users(self, user_ids: List[int], event: Dict[str, Any]) -> None:
+        for user_id in set(user_ids):
+            self._enqueue(user_id, event)
+
+    def _enqueue(self, user_id: int, event: Dict[str, Any]) -> None:
+        connections = list(self._connections.get(user_id, {}).values())
+        if not connections:
             return
-        payload = json.dumps(jsonable_encoder(event))
-        stale: list[WebSocket] = []
-        for socket in sockets:
+        # Keyed on the encoded form: locally published events carry Pydantic models
+        # where relayed ones carry the dicts they were serialized to.
+        encoded = jsonable_encoder(event)
+        payload = json.dumps(encoded)
+        key = _coalesce_key(encoded)
+        limit = _ws_send_queue_size()
+        for connection in connections:
+            if key is not None and self._replace_queued(connection, key, payload):
+                self._stats["coalesced"] += 1
+                continue
+            if len(connection.queue) >= limit:
+                self._stats["dropped"] += len(connection.queue) + 1
+                self._drop_slow(user_id, connection, "send queue overflow")
+                continue
+            connection.queue.append((key, payload))
+            connection.wakeup.set()
+            self._stats["enqueued"] += 1
+
+    @staticmethod
+    def _replace_queued(connection: _Connection, key: Tuple[Any, ...], payload: str) -> bool:
+        for index, (queued_key, _payload) in enumerate(connection.queue):
+            if queued_key == key:
+                connection.queue[index] = (key, payload)
+                return True
+        return False
+
+    async def _write(self, user_id: int, connection: _Connection) -> None:
+        timeout = _ws_send_timeout_sec()
+        while True:
+            if not connection.queue:
+                connection.wakeup.clear()
+                await connection.wakeup.wait()
+                continue
+            _key, payload = connection.queue.popleft()
             try:
-                await socket.send_text(payload)
+                await asyncio.wait_for(connection.socket.send_text(payload), timeout)
+            except asyncio.TimeoutError:
+                self._stats["dropped"] += len(connection.queue) + 1
+                self._drop_slow(user_id, connection, "send timed out")
+                return
             except Exception:
-                stale.append(socket)
-        for socket in stale:
-            self.disconnect(user_id, socket)
+                self.disconnect(user_id, connection.socket)
+                return
+            self._stats["sent"] += 1
 
-    async def send_to_users(self, user_ids: List[int], event: Dict[str, Any]) -> None:
-        for user_id in set(user_ids):
-            await self.send_to_user(user_id, event)
+    def _drop_slow(self, user_id: int, connection: _Connection, reason: str) -> None:
+        self._stats["slow_disconnects"] += 1
+        logger.info("Dropping slow WebSocket user_id=%s: %s", user_id, reason)
+        connection.queue.clear()
+        self.disconnect(user_id, connection.socket)
+        asyncio.create_task(self._close_quietly(connection.socket))
+
+    @staticmethod
+    async def _close_quietly(socket: WebSocket) -> None:
+        try:
+            await asyncio.wait_for(socket.close(code=1013), _ws_send_timeout_sec())
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-local fan-out counters for the admin metrics endpoint."""
+        depths = [len(c.queue) for connections in self._connections.values() for c in connections.values()]
+        return {
+            "users": len(self._connections),
+            "connections": len(depths),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_limit": _ws_send_queue_size(),
+            **self._stats,
+        }
 
 
 def _get_redis() -> Optional[redis_lib.Redis]:
-    global _redis_client
+    """Shared Redis client, or None while the circuit breaker is open.
+
+    A failed connect (or a command failure reported through
+    _report_redis_failure) opens the breaker for REDIS_RETRY_BACKOFF_SEC, so
+    request paths stop paying a blocking connect timeout on every call.
+    """
+    global _redis_client, _redis_retry_at
     if _redis_client is None:
+        if time.monotonic() < _redis_retry_at:
+            return None
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         try:
-            _redis_client = redis_lib.from_url(redis_url, socket_connect_timeout=2)
-            _redis_client.ping()
+            client = redis_lib.from_url(redis_url, socket_connect_timeout=2, socket_timeout=2)
+            client.ping()
+            _redis_client = client
         except Exception:
             _redis_client = None
+            _redis_retry_at = time.monotonic() + _redis_retry_backoff_sec()
     return _redis_client
 
 
+def _redis_retry_backoff_sec() -> float:
+    try:
+        return max(0.0, float(os.getenv("REDIS_RETRY_BACKOFF_SEC", "30")))
+    except ValueError:
+        return 30.0
+
+
+def _report_redis_failure() -> None:
+    """Drop the shared client after a command error and open the breaker."""
+    global _redis_client, _redis_retry_at
+    _redis_client = None
+    _redis_retry_at = time.monotonic() + _redis_retry_backoff_sec()
+
+
 def get_db():
     """Database session dependency."""
     db = SessionLocal()
@@ -141,6 +315,11 @@ def get_patient_for_user(db: Session, user_id: int):
     return db.query(Patient).filter(Patient.user_id == user_id).first()
 
 
+def get_principal(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)) -> Principal:
+    """Authenticated principal, loaded once per request (see backend.principal)."""
+    return require_principal(db, user_id)
+
+
 def get_current_user(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
     """Get current authenticated user."""
     user = db.query(User).filter(User.id == user_id).first()
@@ -180,4 +359,5 @@ def write_audit_log(
 
 
 _redis_client = None
+_redis_retry_at = 0.0
 consultation_ws_manager = ConsultationConnectionManager()
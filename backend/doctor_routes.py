@@ -1,10 +1,11 @@
 
 from backend.v2_routes import _query_v2_series_rows_for_user
 from backend.chat_routes import _trim_chat_context, _openai_chat_with_tools, _is_low_signal_advice
+from backend.chat_routes import _build_deterministic_advice, _openai_chat_with_tools_stream, _sse_event, _sse_response
 
 from backend.v2_routes import _query_v2_analytes_for_user
 from backend.chat_routes import _build_doctor_chat_context, _summarize_patient_metrics_for_ai
-__all__ = ['DoctorChatHistoryItem', 'DoctorChatRequest', 'DoctorChatResponse', 'DoctorNoteRequest', 'DoctorNoteResponse', 'list_v2_doctor_patients', 'list_v2_doctor_patient_analytes', 'get_v2_doctor_patient_series', 'list_v2_patient_notes', 'list_v2_doctor_patient_notes', 'upsert_v2_doctor_patient_note', 'doctor_patients', 'doctor_patient_analyses', 'doctor_patient_series', 'add_doctor_note', 'list_doctor_notes', 'doctor_patient_chat_context', 'doctor_patient_chat', 'list_notes_for_patient']
+__all__ = ['DoctorChatHistoryItem', 'DoctorChatRequest', 'DoctorChatResponse', 'DoctorNoteRequest', 'DoctorNoteResponse', 'list_v2_doctor_patients', 'list_v2_doctor_patient_analytes', 'get_v2_doctor_patient_series', 'list_v2_patient_notes', 'list_v2_doctor_patient_notes', 'upsert_v2_doctor_patient_note', 'doctor_patients', 'doctor_patient_analyses', 'doctor_patient_series', 'add_doctor_note', 'list_doctor_notes', 'doctor_patient_chat_context', 'doctor_patient_chat', 'stream_doctor_patient_chat', 'list_notes_for_patient']
 
 from backend.deps import *
 from backend.utils import *
@@ -19,6 +20,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, ValidationError
 from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass
 import io
 import os
 import logging
@@ -125,7 +127,7 @@ async def list_v2_doctor_patients(
     db: Session = Depends(get_db),
 ):
     """List patients who granted V2 access to the authenticated doctor."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     if not doctor or not doctor.is_doctor:
         raise HTTPException(status_code=403, detail="Not a doctor")
 
@@ -216,7 +218,7 @@ async def list_v2_doctor_patient_analytes(
     db: Session = Depends(get_db),
 ):
     """List V2 analytes for a granted patient in doctor scope."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
     result = _query_v2_analytes_for_user(db, patient.user_id)
     write_audit_log(
@@ -242,7 +244,7 @@ async def get_v2_doctor_patient_series(
     db: Session = Depends(get_db),
 ):
     """Return V2 series for a granted patient and analyte_key in doctor scope."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
     rows = _query_v2_series_rows_for_user(db, patient.user_id, analyte_key)
 
@@ -330,7 +332,7 @@ async def list_v2_doctor_patient_notes(
     db: Session = Depends(get_db),
 ):
     """List current doctor's point notes for a granted patient and analyte."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
     rows = (
         db.query(V2DoctorNote)
@@ -367,7 +369,7 @@ async def upsert_v2_doctor_patient_note(
     db: Session = Depends(get_db),
 ):
     """Create/update a doctor's point note for a granted patient and analyte."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
 
     note_text = payload.note.strip()
@@ -429,7 +431,7 @@ async def doctor_patients(
     db: Session = Depends(get_db),
 ):
     """List patients who granted access to the doctor."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     if not doctor or not doctor.is_doctor:
         raise HTTPException(status_code=403, detail="Not a doctor")
 
@@ -484,7 +486,7 @@ async def doctor_patient_analyses(
     db: Session = Depends(get_db),
 ):
     """Get analyses for a patient (doctor view with grant)."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
 
     results = db.query(LabResult).filter(LabResult.patient_id == patient.id).all()
@@ -534,7 +536,7 @@ async def doctor_patient_series(
     db: Session = Depends(get_db),
 ):
     """Get series for a patient (doctor view with grant)."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     _ensure_doctor_access(db, doctor, patient_id)
 
     # reuse logic from patient series by calling directly
@@ -668,7 +670,7 @@ async def add_doctor_note(
     db: Session = Depends(get_db),
 ):
     """Add a doctor note for the patient."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     _ensure_doctor_access(db, doctor, patient_id)
     if not payload.text or not payload.text.strip():
         raise HTTPException(status_code=400, detail="Note text is required")
@@ -700,7 +702,7 @@ async def list_doctor_notes(
     db: Session = Depends(get_db),
 ):
     """List notes for a patient (doctor view with grant)."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     _ensure_doctor_access(db, doctor, patient_id)
     notes = (
         db.query(DoctorNote)
@@ -733,7 +735,7 @@ async def doctor_patient_chat_context(
     db: Session = Depends(get_db),
 ):
     """Provide chat context for a doctor viewing a patient."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
     context = _build_doctor_chat_context(db, patient)
     context = _trim_chat_context(context)
@@ -755,15 +757,22 @@ async def doctor_patient_chat_context(
     return context
 
 
-@router.post("/api/doctor/patient/{patient_id}/chat", response_model=DoctorChatResponse)
-async def doctor_patient_chat(
-    patient_id: int,
-    payload: DoctorChatRequest,
-    user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
-):
-    """Doctor-facing assistant chat with patient lab context."""
-    doctor = db.query(User).filter(User.id == user_id).first()
+@dataclass
+class _DoctorChatTurn:
+    """Prepared prompt and context for one doctor assistant reply."""
+
+    doctor_user_id: int
+    doctor: Optional[Principal]
+    patient: Patient
+    system_prompt: str
+    history_messages: list[dict]
+    metrics_summary: Dict[str, List[Dict[str, Any]]]
+    history_count: int
+
+
+def _prepare_doctor_chat_turn(patient_id: int, payload: DoctorChatRequest, user_id: int, db: Session):
+    """Check access and build the prompt; returns a DoctorChatResponse when there is nothing to ask."""
+    doctor = load_principal(db, user_id)
     patient = _ensure_doctor_access(db, doctor, patient_id)
     question = (payload.message or "").strip()
     if not question:
@@ -853,23 +862,35 @@ async def doctor_patient_chat(
         user_prompt_parts.extend(notes_lines)
     history_messages.append({"role": "user", "content": "\n".join(user_prompt_parts)})
 
-    reply = _openai_chat_with_tools(system_prompt, history_messages, metrics_summary)
+    return _DoctorChatTurn(
+        doctor_user_id=user_id,
+        doctor=doctor,
+        patient=patient,
+        system_prompt=system_prompt,
+        history_messages=history_messages,
+        metrics_summary=metrics_summary,
+        history_count=len(payload.history or []),
+    )
+
+
+def _complete_doctor_chat_turn(db: Session, turn: _DoctorChatTurn, reply: Any) -> DoctorChatResponse:
+    """Apply the deterministic fallback, audit the reply and build the response."""
     if isinstance(reply, str):
         reply = reply.strip()
     if not reply or _is_low_signal_advice(reply):
-        reply = _build_deterministic_advice(metrics_summary, "es", 36500)
+        reply = _build_deterministic_advice(turn.metrics_summary, "es", 36500)
     write_audit_log(
         db,
-        actor_user_id=user_id,
+        actor_user_id=turn.doctor_user_id,
         actor_role="doctor",
         action="doctor_ai_chat_completed",
         resource_type="patient",
-        resource_id=patient.id,
-        patient_id=patient.id,
-        doctor_id=doctor.id if doctor else None,
+        resource_id=turn.patient.id,
+        patient_id=turn.patient.id,
+        doctor_id=turn.doctor.id if turn.doctor else None,
         metadata={
-            "metrics_count": len(metrics_summary),
-            "history_count": len(payload.history or []),
+            "metrics_count": len(turn.metrics_summary),
+            "history_count": turn.history_count,
             "reply_chars": len(reply or ""),
         },
     )
@@ -877,6 +898,54 @@ async def doctor_patient_chat(
     return DoctorChatResponse(reply=reply, disclaimer=True)
 
 
+@router.post("/api/doctor/patient/{patient_id}/chat", response_model=DoctorChatResponse)
+async def doctor_patient_chat(
+    patient_id: int,
+    payload: DoctorChatRequest,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Doctor-facing assistant chat with patient lab context."""
+    turn = _prepare_doctor_chat_turn(patient_id, payload, user_id, db)
+    if isinstance(turn, DoctorChatResponse):
+        return turn
+    reply = await _openai_chat_with_tools(turn.system_prompt, turn.history_messages, turn.metrics_summary)
+    return _complete_doctor_chat_turn(db, turn, reply)
+
+
+@router.post("/api/doctor/patient/{patient_id}/chat/stream")
+async def stream_doctor_patient_chat(
+    patient_id: int,
+    payload: DoctorChatRequest,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Server-Sent Events variant of the doctor assistant chat (``delta`` events, then ``done``)."""
+    turn = _prepare_doctor_chat_turn(patient_id, payload, user_id, db)
+    if isinstance(turn, DoctorChatResponse):
+        async def empty_events():
+            yield _sse_event("done", turn)
+
+        return _sse_response(empty_events())
+
+    async def events():
+        chunks: list[str] = []
+        try:
+            async for text_delta in _openai_chat_with_tools_stream(
+                turn.system_prompt, turn.history_messages, turn.metrics_summary
+            ):
+                chunks.append(text_delta)
+                yield _sse_event("delta", {"text": text_delta})
+        except Exception as exc:
+            db.rollback()
+            detail = exc.detail if isinstance(exc, HTTPException) else "AI response failed."
+            yield _sse_event("error", {"detail": detail})
+            return
+        yield _sse_event("done", _complete_doctor_chat_turn(db, turn, "".join(chunks)))
+
+    return _sse_response(events())
+
+
 @router.get("/api/patient/notes", response_model=List[DoctorNoteResponse])
 async def list_notes_for_patient(
     name: Optional[str] = None,
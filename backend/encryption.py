@@ -1,8 +1,55 @@
+"""Encryption of stored uploads.
+
+New files use a chunked AES-256-GCM container that can be encrypted and
+decrypted as a stream and read at random offsets:
+
+    header   = b"NAEC" | version (1 byte) | segment size (4 bytes, big endian) | nonce prefix (7 bytes)
+    segments = AES-GCM(plaintext[i * size:(i + 1) * size]) for i = 0..n-1
+
+Each segment's nonce is ``nonce prefix | i (4 bytes) | final flag (1 byte)``
+and its associated data is the header. Segments cannot be reordered,
+dropped or moved to another file, and the final flag detects truncation.
+The key is ``FILE_ENCRYPTION_KEY`` (urlsafe base64, 32 bytes) or, when
+unset, is derived from ``FERNET_KEY`` with HKDF.
+
+Files written before the container existed are single Fernet tokens; they
+are still read transparently (``scripts/migrate_upload_encryption.py``
+rewrites them). Anything that is neither raises ``DecryptionError``. The
+old silent plaintext fallback is gone, except for unencrypted PDFs from
+before uploads were encrypted at all, which are logged.
+"""
+
+import base64
+import io
+import logging
 import os
-from cryptography.fernet import Fernet
-from typing import Optional
+import struct
+from typing import BinaryIO, Iterator, Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_MAGIC = b"NAEC"
+CONTAINER_VERSION = 1
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+_NONCE_PREFIX_SIZE = 7
+_HEADER = struct.Struct(">4sBI7s")
+HEADER_SIZE = _HEADER.size
+_FERNET_PREFIX = b"gAAAAA"
 
 _fernet: Optional[Fernet] = None
+_aesgcm: Optional[AESGCM] = None
+
+
+class DecryptionError(ValueError):
+    """Stored data is corrupt, truncated, or encrypted with another key."""
+
 
 def get_fernet() -> Fernet:
     global _fernet
@@ -16,15 +63,199 @@ def get_fernet() -> Fernet:
         _fernet = Fernet(key.encode("utf-8"))
     return _fernet
 
-def encrypt_file_data(data: bytes) -> bytes:
-    """Encrypts binary file data."""
-    f = get_fernet()
-    return f.encrypt(data)
 
-def decrypt_file_data(data: bytes) -> bytes:
-    """Decrypts binary file data, with fallback if not encrypted."""
+def _get_aesgcm() -> AESGCM:
+    global _aesgcm
+    if _aesgcm is None:
+        raw = os.getenv("FILE_ENCRYPTION_KEY")
+        if raw:
+            key = base64.urlsafe_b64decode(raw.encode("utf-8"))
+            if len(key) != 32:
+                raise ValueError("FILE_ENCRYPTION_KEY must be 32 bytes (urlsafe base64)")
+        else:
+            get_fernet()
+            key = HKDF(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=None,
+                info=b"nephroai-upload-container-v1",
+            ).derive(base64.urlsafe_b64decode(os.environ["FERNET_KEY"].encode("utf-8")))
+        _aesgcm = AESGCM(key)
+    return _aesgcm
+
+
+def _nonce(prefix: bytes, index: int, final: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if final else 0)
+
+
+def _read_exact(src: BinaryIO, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = src.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def encrypt_stream(src: BinaryIO, dst: BinaryIO, segment_size: int = DEFAULT_SEGMENT_SIZE) -> int:
+    """Encrypt ``src`` into ``dst`` one segment at a time; returns the plaintext size."""
+    aesgcm = _get_aesgcm()
+    header = _HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, segment_size, os.urandom(_NONCE_PREFIX_SIZE))
+    prefix = header[-_NONCE_PREFIX_SIZE:]
+    dst.write(header)
+    total = 0
+    index = 0
+    current = _read_exact(src, segment_size)
+    while True:
+        # Read ahead one segment so the last one can carry the final flag.
+        following = _read_exact(src, segment_size) if len(current) == segment_size else b""
+        final = not following
+        dst.write(aesgcm.encrypt(_nonce(prefix, index, final), current, header))
+        total += len(current)
+        if final:
+            return total
+        current = following
+        index += 1
+
+
+def _parse_header(header: bytes) -> tuple[int, bytes]:
+    if len(header) != HEADER_SIZE:
+        raise DecryptionError("Encrypted file is truncated")
+    magic, version, segment_size, prefix = _HEADER.unpack(header)
+    if magic != CONTAINER_MAGIC or version != CONTAINER_VERSION or segment_size <= 0:
+        raise DecryptionError("Unsupported encrypted file format")
+    return segment_size, prefix
+
+
+def _decrypt_segment(header: bytes, prefix: bytes, index: int, final: bool, data: bytes) -> bytes:
     try:
-        f = get_fernet()
-        return f.decrypt(data)
-    except Exception:
+        return _get_aesgcm().decrypt(_nonce(prefix, index, final), data, header)
+    except InvalidTag as exc:
+        raise DecryptionError(f"Encrypted segment {index} failed authentication") from exc
+
+
+def iter_decrypt_stream(src: BinaryIO) -> Iterator[bytes]:
+    """Yield authenticated plaintext segments of a container read from ``src``."""
+    header = _read_exact(src, HEADER_SIZE)
+    segment_size, prefix = _parse_header(header)
+    stored_size = segment_size + TAG_SIZE
+    index = 0
+    current = _read_exact(src, stored_size)
+    while True:
+        following = _read_exact(src, stored_size) if len(current) == stored_size else b""
+        final = not following
+        yield _decrypt_segment(header, prefix, index, final, current)
+        if final:
+            return
+        current = following
+        index += 1
+
+
+def decrypt_stream(src: BinaryIO, dst: BinaryIO) -> int:
+    """Decrypt a container (or a legacy Fernet file) from ``src`` into ``dst``."""
+    head = src.read(len(CONTAINER_MAGIC))
+    if head != CONTAINER_MAGIC:
+        plaintext = _decrypt_legacy(head + src.read())
+        dst.write(plaintext)
+        return len(plaintext)
+    src.seek(-len(head), os.SEEK_CUR)
+    total = 0
+    for segment in iter_decrypt_stream(src):
+        dst.write(segment)
+        total += len(segment)
+    return total
+
+
+def encrypt_file(src_path: str, dst_path: str) -> int:
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return encrypt_stream(src, dst)
+
+
+def decrypt_file(src_path: str, dst_path: str) -> int:
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return decrypt_stream(src, dst)
+
+
+def is_container(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(CONTAINER_MAGIC)) == CONTAINER_MAGIC
+
+
+class EncryptedFileReader:
+    """Random-access reads of plaintext ranges from a container on disk.
+
+    Only the segments overlapping the requested range are read and
+    authenticated, e.g. to pull a page's object stream out of a large PDF.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        try:
+            self._header = _read_exact(self._file, HEADER_SIZE)
+            self._segment_size, self._prefix = _parse_header(self._header)
+            body = os.fstat(self._file.fileno()).st_size - HEADER_SIZE
+            stored_size = self._segment_size + TAG_SIZE
+            self._segments = max(1, -(-body // stored_size))
+            self.size = body - self._segments * TAG_SIZE
+            if self.size < 0:
+                raise DecryptionError("Encrypted file is truncated")
+        except BaseException:
+            self._file.close()
+            raise
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "EncryptedFileReader":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+    def _segment(self, index: int) -> bytes:
+        stored_size = self._segment_size + TAG_SIZE
+        self._file.seek(HEADER_SIZE + index * stored_size)
+        data = _read_exact(self._file, stored_size)
+        final = index == self._segments - 1
+        return _decrypt_segment(self._header, self._prefix, index, final, data)
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        if offset < 0 or length < 0:
+            raise ValueError("offset and length must be non-negative")
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b""
+        first = offset // self._segment_size
+        last = (end - 1) // self._segment_size
+        data = b"".join(self._segment(index) for index in range(first, last + 1))
+        start = offset - first * self._segment_size
+        return data[start:start + (end - offset)]
+
+
+def _decrypt_legacy(data: bytes) -> bytes:
+    if data.startswith(_FERNET_PREFIX):
+        try:
+            return get_fernet().decrypt(data)
+        except InvalidToken as exc:
+            raise DecryptionError("Legacy encrypted file failed authentication") from exc
+    if data.startswith(b"%PDF-"):
+        logger.warning("Read an unencrypted stored upload (written before encryption was enabled)")
         return data
+    raise DecryptionError("Unrecognized encrypted file format")
+
+
+def encrypt_file_data(data: bytes) -> bytes:
+    """Encrypts binary file data (chunked AES-GCM container)."""
+    out = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), out)
+    return out.getvalue()
+
+
+def decrypt_file_data(data: bytes) -> bytes:
+    """Decrypts binary file data written by ``encrypt_file_data`` or the legacy Fernet format."""
+    if not data.startswith(CONTAINER_MAGIC):
+        return _decrypt_legacy(data)
+    return b"".join(iter_decrypt_stream(io.BytesIO(data)))
@@ -9,10 +9,11 @@ import os
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from backend.database import AiUsagePeriod, Subscription, User
+from backend.database import AiUsagePeriod, User
+# The subscription snapshot lives with the principal; re-exported for existing imports.
+from backend.principal import ActiveSubscription, active_subscription_for_user, load_principal  # noqa: F401
 
 
-ACTIVE_SUBSCRIPTION_STATUSES = ("active", "trialing")
 DEFAULT_AI_MONTHLY_LIMIT = 20
 DEFAULT_AI_TRIAL_LIMIT = 5
 DEFAULT_AI_CHART_DAILY_LIMIT = 5
@@ -25,16 +26,9 @@ def _positive_env_int(name: str, default: int) -> int:
         return default
 
 
-def active_subscription_for_user(db: Session, user_id: int) -> Subscription | None:
-    return (
-        db.query(Subscription)
-        .filter(
-            Subscription.user_id == user_id,
-            Subscription.status.in_(ACTIVE_SUBSCRIPTION_STATUSES),
-        )
-        .order_by(Subscription.id.desc())
-        .first()
-    )
+def _subscription(db: Session, user_id: int) -> ActiveSubscription | None:
+    principal = load_principal(db, user_id)
+    return principal.subscription if principal is not None else None
 
 
 @dataclass(frozen=True)
@@ -47,32 +41,43 @@ class UploadAllowance:
 
 
 def get_upload_allowance(db: Session, user_id: int) -> UploadAllowance:
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    principal = load_principal(db, user_id)
+    # The counters move with every upload, so they are read fresh rather than from the principal.
+    counters = (
+        db.query(User.free_upload_limit, User.free_uploads_used).filter(User.id == user_id).first()
+        if principal is not None
+        else None
+    )
+    if counters is None:
         return UploadAllowance(limit=0, used=0, remaining=0, has_subscription=False, can_upload=False)
-    limit = max(0, int(user.free_upload_limit or 0))
-    used = min(limit, max(0, int(user.free_uploads_used or 0)))
+    limit = max(0, int(counters.free_upload_limit or 0))
+    used = min(limit, max(0, int(counters.free_uploads_used or 0)))
     remaining = max(0, limit - used)
-    subscribed = active_subscription_for_user(db, user_id) is not None
+    subscribed = principal.has_subscription
     return UploadAllowance(
         limit=limit,
         used=used,
         remaining=remaining,
         has_subscription=subscribed,
-        can_upload=subscribed or remaining > 0 or bool(user.is_doctor),
+        can_upload=subscribed or remaining > 0 or principal.is_doctor,
     )
 
 
 def reserve_free_upload(db: Session, user_id: int) -> UploadAllowance | None:
     """Atomically reserve one free upload and return the updated allowance."""
+    return reserve_free_uploads(db, user_id, 1)
+
+
+def reserve_free_uploads(db: Session, user_id: int, count: int) -> UploadAllowance | None:
+    """Atomically reserve ``count`` free uploads (all or none) and return the updated allowance."""
     updated = (
         db.query(User)
         .filter(
             User.id == user_id,
-            User.free_uploads_used < User.free_upload_limit,
+            User.free_uploads_used + count <= User.free_upload_limit,
         )
         .update(
-            {User.free_uploads_used: User.free_uploads_used + 1},
+            {User.free_uploads_used: User.free_uploads_used + count},
             synchronize_session=False,
         )
     )
@@ -82,12 +87,12 @@ def reserve_free_upload(db: Session, user_id: int) -> UploadAllowance | None:
     return get_upload_allowance(db, user_id)
 
 
-def refund_free_upload(db: Session, user_id: int) -> None:
+def refund_free_upload(db: Session, user_id: int, count: int = 1) -> None:
     db.query(User).filter(
         User.id == user_id,
-        User.free_uploads_used > 0,
+        User.free_uploads_used >= count,
     ).update(
-        {User.free_uploads_used: User.free_uploads_used - 1},
+        {User.free_uploads_used: User.free_uploads_used - count},
         synchronize_session=False,
     )
     db.commit()
@@ -111,7 +116,7 @@ def _next_month_start(now: dt.datetime) -> dt.datetime:
 
 
 def _ai_period(
-    subscription: Subscription,
+    subscription: ActiveSubscription,
     now: dt.datetime,
 ) -> tuple[str, dt.datetime, dt.datetime | None, int, bool]:
     if subscription.status == "trialing":
@@ -141,7 +146,7 @@ def get_ai_allowance(
     now: dt.datetime | None = None,
 ) -> AiAllowance:
     current = now or dt.datetime.utcnow()
-    subscription = active_subscription_for_user(db, user_id)
+    subscription = _subscription(db, user_id)
     if subscription is None:
         return AiAllowance(
             limit=0,
@@ -214,7 +219,7 @@ def reserve_ai_message(
 ) -> AiAllowance | None:
     """Atomically reserve one chat message; return None when the allowance is exhausted."""
     current = now or dt.datetime.utcnow()
-    subscription = active_subscription_for_user(db, user_id)
+    subscription = _subscription(db, user_id)
     if subscription is None:
         return None
     period_key, start, end, limit, _is_trial = _ai_period(subscription, current)
@@ -275,7 +280,7 @@ def reserve_chart_advice(
 ) -> AiAllowance | None:
     """Reserve one non-persistent chart insight under a separate daily cap."""
     current = now or dt.datetime.utcnow()
-    subscription = active_subscription_for_user(db, user_id)
+    subscription = _subscription(db, user_id)
     if subscription is None:
         return None
     start = dt.datetime(current.year, current.month, current.day)
@@ -302,7 +307,7 @@ def get_chart_allowance(
     now: dt.datetime | None = None,
 ) -> AiAllowance:
     current = now or dt.datetime.utcnow()
-    subscription = active_subscription_for_user(db, user_id)
+    subscription = _subscription(db, user_id)
     start = dt.datetime(current.year, current.month, current.day)
     end = start + dt.timedelta(days=1)
     limit = _positive_env_int("AI_CHART_DAILY_LIMIT", DEFAULT_AI_CHART_DAILY_LIMIT)
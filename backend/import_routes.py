@@ -23,6 +23,7 @@ import hashlib
 from pathlib import Path
 from backend.models import ImportJson
 from backend.v2.extractor import extract as extract_v2
+from backend.v2.triage import NOT_A_LAB_REPORT_DETAIL, NotALabReport
 from backend.v2.schemas import (
     ImportV2,
     V2AnalyteItemResponse,
@@ -37,8 +38,8 @@ from backend.v2.schemas import (
     V2SeriesResponse,
 )
 from backend.analyte_utils import normalize_analyte_name
-from backend.pdf_parser import extract_raw_text
-from backend.parsing.pipeline import coerce_raw_text, parse_with_ocr_fallback
+from backend.pdf_workers import extract_pdf_raw_text, parse_pdf_with_ocr_fallback
+from backend.uploads import spool_pdf_upload
 from backend.tasks import process_pdf_task, CELERY_ENABLED
 from backend.database import (
     create_db_engine,
@@ -67,7 +68,7 @@ from backend.database import (
     save_parsed_records,
 )
 from backend.auth import decode_token, get_current_user_id
-from backend.encryption import encrypt_file_data
+from backend.encryption import encrypt_file, encrypt_file_data
 from backend.auth_routes import router as auth_router, UserResponse as AuthUserResponse
 from backend.patient_routes import router as patient_router
 import datetime as dt
@@ -108,17 +109,12 @@ async def preview_import(
     Returns ImportJson with empty items.
     """
     try:
-        # Read PDF file
-        pdf_bytes = await file.read()
-
-        if not pdf_bytes:
-            raise HTTPException(status_code=400, detail="Empty file")
-
-        # Extract raw text only (no parsing)
-        try:
-            extract_raw_text(pdf_bytes)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+        # Extract raw text only (no parsing), straight from the spooled file
+        with await spool_pdf_upload(file) as upload:
+            try:
+                await extract_pdf_raw_text(upload.path)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
         return ImportJson(
             patient_id=patient_id,
@@ -139,13 +135,13 @@ async def preview_import_v2(
     user_id: int = Depends(get_current_user_id),
 ):
     """Preview v2 extraction from uploaded PDF via GPT-5.2 structured output."""
-    pdf_bytes = await file.read()
-    if not pdf_bytes:
-        raise HTTPException(status_code=400, detail="Empty file")
-    try:
-        return await extract_v2(pdf_bytes)
-    except ValidationError as e:
-        raise HTTPException(status_code=422, detail=e.errors())
+    with await spool_pdf_upload(file) as upload:
+        try:
+            return await extract_v2(upload.read_bytes(), source_path=upload.path)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
+        except NotALabReport:
+            raise HTTPException(status_code=422, detail=NOT_A_LAB_REPORT_DETAIL)
 
 
 @router.post("/api/files/pdf")
@@ -159,17 +155,11 @@ async def upload_pdf_file(
     Returns analysis_id for the uploaded file.
     """
     # Get current user
-    current_user = db.query(User).filter(User.id == user_id).first()
-    if not current_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    current_user = require_principal(db, user_id)
 
     # Hard paywall check
     if not current_user.is_doctor:
-        sub = db.query(Subscription).filter(
-            Subscription.user_id == user_id,
-            Subscription.status.in_(("active", "trialing")),
-        ).first()
-        if not sub:
+        if not current_user.has_subscription:
             raise HTTPException(status_code=403, detail="Se requiere una suscripción activa para subir documentos.")
 
     # Get or create patient for current user
@@ -184,11 +174,8 @@ async def upload_pdf_file(
         db.commit()
         db.refresh(patient)
 
+    spooled = await spool_pdf_upload(file)
     try:
-        pdf_bytes = await file.read()
-        if not pdf_bytes:
-            raise HTTPException(status_code=400, detail="Empty file")
-
         upload_dir = os.getenv("UPLOAD_DIR", "uploads")
         os.makedirs(upload_dir, exist_ok=True)
 
@@ -205,8 +192,7 @@ async def upload_pdf_file(
 
         file_name = f"{upload.id}_{file.filename}"
         file_path = os.path.join(upload_dir, file_name)
-        with open(file_path, "wb") as f:
-            f.write(encrypt_file_data(pdf_bytes))
+        encrypt_file(spooled.path, file_path)
 
         upload.file_path = file_path
         db.commit()
@@ -216,36 +202,10 @@ async def upload_pdf_file(
             upload.status = "processing"
             db.commit()
             try:
-                raw_text = extract_raw_text(pdf_bytes)
-                raw_text_str = coerce_raw_text(raw_text)
-                print(
-                    "[RAW_TEXT] type={type_name} len={length} preview={preview}".format(
-                        type_name=type(raw_text).__name__,
-                        length=len(raw_text_str),
-                        preview=repr(raw_text_str[:200]),
-                    )
-                )
-
-                parse_result = parse_with_ocr_fallback(pdf_bytes, raw_text_str)
-                metrics_before = parse_result["metrics_before"]
-                print(
-                    "[PARSE] records_count={records_count}".format(**metrics_before)
-                )
-                if parse_result["triggered_by"]:
-                    print(
-                        "[OCR] triggered_by={triggered_by}".format(
-                            triggered_by=parse_result["triggered_by"]
-                        )
-                    )
-                    print(
-                        "[PARSE_AFTER_OCR] records_count={records_count}".format(
-                            **parse_result["metrics"]
-                        )
-                    )
-
+                parse_result = await parse_pdf_with_ocr_fallback(spooled.path)
                 records = parse_result["records"]
                 metrics = parse_result["metrics"]
-                document_hash = hashlib.sha256(pdf_bytes).hexdigest()
+                document_hash = spooled.sha256
                 save_parsed_records(
                     db,
                     patient.id,
@@ -267,6 +227,12 @@ async def upload_pdf_file(
                 if metrics["records_count"] == 0:
                     response["warning"] = "no records extracted"
                 return response
+            except HTTPException as e:
+                # Worker pool saturated (503) or timed out (504): keep the status code.
+                upload.status = "error"
+                upload.error_message = str(e.detail)
+                db.commit()
+                raise
             except Exception as e:
                 upload.status = "error"
                 upload.error_message = str(e)
@@ -284,6 +250,8 @@ async def upload_pdf_file(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        spooled.close()
 
 
 @router.get("/api/files/status/{upload_id}")
@@ -324,21 +292,15 @@ async def import_lab_results(
 
     Returns status and number of items imported.
     """
+    spooled = None
     try:
-        # Read PDF file
-        pdf_bytes = await file.read()
-
-        if not pdf_bytes:
-            raise HTTPException(status_code=400, detail="Empty file")
+        # Spool the PDF to a temp file (size and signature are checked while copying)
+        spooled = await spool_pdf_upload(file)
 
         # Hard paywall check
-        current_user = db.query(User).filter(User.id == user_id).first()
+        current_user = load_principal(db, user_id)
         if current_user and not current_user.is_doctor:
-            sub = db.query(Subscription).filter(
-                Subscription.user_id == user_id,
-                Subscription.status.in_(("active", "trialing")),
-            ).first()
-            if not sub:
+            if not current_user.has_subscription:
                 raise HTTPException(status_code=403, detail="Se requiere una suscripción activa para subir documentos.")
 
         # Verify patient belongs to authenticated user
@@ -351,36 +313,10 @@ async def import_lab_results(
 
         # Extract raw text and parse into minimal records
         try:
-            raw_text = extract_raw_text(pdf_bytes)
-            raw_text_str = coerce_raw_text(raw_text)
-            print(
-                "[RAW_TEXT] type={type_name} len={length} preview={preview}".format(
-                    type_name=type(raw_text).__name__,
-                    length=len(raw_text_str),
-                    preview=repr(raw_text_str[:200]),
-                )
-            )
-
-            parse_result = parse_with_ocr_fallback(pdf_bytes, raw_text_str)
-            metrics_before = parse_result["metrics_before"]
-            print(
-                "[PARSE] records_count={records_count}".format(**metrics_before)
-            )
-            if parse_result["triggered_by"]:
-                print(
-                    "[OCR] triggered_by={triggered_by}".format(
-                        triggered_by=parse_result["triggered_by"]
-                    )
-                )
-                print(
-                    "[PARSE_AFTER_OCR] records_count={records_count}".format(
-                        **parse_result["metrics"]
-                    )
-                )
-
+            parse_result = await parse_pdf_with_ocr_fallback(spooled.path)
             records = parse_result["records"]
             metrics = parse_result["metrics"]
-            document_hash = hashlib.sha256(pdf_bytes).hexdigest()
+            document_hash = spooled.sha256
             save_parsed_records(
                 db,
                 patient_id,
@@ -408,3 +344,6 @@ async def import_lab_results(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        if spooled is not None:
+            spooled.close()
@@ -0,0 +1,156 @@
+"""Which lab data a user has, probed once per chat turn.
+
+Chat paths used to try ``_summarize_metrics_v2`` and ``_summarize_metrics``
+with the requested window and then again over the whole history, running up
+to six summarization scans before giving up. ``PatientLabContext`` answers
+"which sources exist and how recent are they" with one min/max probe, after
+which ``summarize`` picks a single source and window and runs exactly one
+summarization query.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+
+from backend.database import LabResult, V2Metric
+from backend.utils import _summarize_metrics, _summarize_metrics_v2
+
+ALL_HISTORY_DAYS = 36500
+
+SOURCE_V2 = "v2_documents"
+SOURCE_LEGACY = "lab_results"
+
+
+@dataclass(frozen=True)
+class PatientLabContext:
+    """Date range of a user's V2 metrics and legacy lab results."""
+
+    user_id: int
+    patient_id: Optional[int]
+    v2_first: Optional[dt.datetime] = None
+    v2_last: Optional[dt.datetime] = None
+    legacy_first: Optional[dt.datetime] = None
+    legacy_last: Optional[dt.datetime] = None
+
+    @classmethod
+    def probe(cls, db: Session, user_id: int, patient_id: Optional[int] = None) -> "PatientLabContext":
+        """Read both sources' date ranges in a single round trip."""
+        owned = V2Metric.user_id == user_id
+        columns = [
+            select(func.min(V2Metric.effective_dt)).where(owned).scalar_subquery(),
+            select(func.max(V2Metric.effective_dt)).where(owned).scalar_subquery(),
+        ]
+        if patient_id is not None:
+            legacy = LabResult.patient_id == patient_id
+            columns += [
+                select(func.min(func.coalesce(LabResult.taken_at, LabResult.created_at))).where(legacy).scalar_subquery(),
+                # The legacy summary window matches on taken_at OR created_at, so keep the later of the two.
+                select(func.max(LabResult.taken_at)).where(legacy).scalar_subquery(),
+                select(func.max(LabResult.created_at)).where(legacy).scalar_subquery(),
+            ]
+        else:
+            columns += [literal(None), literal(None), literal(None)]
+
+        v2_first, v2_last, legacy_first, legacy_taken_last, legacy_created_last = db.execute(select(*columns)).one()
+        legacy_candidates = [value for value in (legacy_taken_last, legacy_created_last) if value is not None]
+        return cls(
+            user_id=user_id,
+            patient_id=patient_id,
+            v2_first=v2_first,
+            v2_last=v2_last,
+            legacy_first=legacy_first,
+            legacy_last=max(legacy_candidates) if legacy_candidates else None,
+        )
+
+    @property
+    def has_v2(self) -> bool:
+        return self.v2_last is not None
+
+    @property
+    def has_legacy(self) -> bool:
+        return self.legacy_last is not None
+
+    @property
+    def has_data(self) -> bool:
+        return self.has_v2 or self.has_legacy
+
+    def summary_source(self, days: int = 180) -> Tuple[Optional[str], int]:
+        """Pick the source and window the old fallback chain would have settled on.
+
+        V2 data inside the window wins, then legacy data inside the window,
+        then V2 over the whole history, then legacy over the whole history.
+        """
+        since = dt.datetime.utcnow() - dt.timedelta(days=days)
+        if self.v2_last is not None and self.v2_last >= since:
+            return SOURCE_V2, days
+        if self.legacy_last is not None and self.legacy_last >= since:
+            return SOURCE_LEGACY, days
+        if self.has_v2:
+            return SOURCE_V2, max(days, ALL_HISTORY_DAYS)
+        if self.has_legacy:
+            return SOURCE_LEGACY, max(days, ALL_HISTORY_DAYS)
+        return None, days
+
+    def summarize_with_source(
+        self,
+        db: Session,
+        days: int = 180,
+        metric_names: Optional[List[str]] = None,
+    ) -> Tuple[Optional[str], Dict[str, List[Dict[str, Any]]]]:
+        """Run the one summarization query for this user; returns (source, summary)."""
+        source, window = self.summary_source(days)
+        if source == SOURCE_V2:
+            return source, _summarize_metrics_v2(db, user_id=self.user_id, metric_names=metric_names, days=window)
+        if source == SOURCE_LEGACY:
+            return source, _summarize_metrics(db, patient_id=self.patient_id, metric_names=metric_names, days=window)
+        return None, {}
+
+    def summarize(
+        self,
+        db: Session,
+        metric_names: Optional[Iterable[str]] = None,
+        days: int = 180,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Summarize ``metric_names`` (analyte keys or raw names), filtered in SQL.
+
+        When none of the names match, the full summary is returned, as the old
+        fallback chain did.
+        """
+        names = sorted({str(name).strip() for name in (metric_names or []) if str(name).strip()})
+        if names:
+            _source, summary = self.summarize_with_source(db, days=days, metric_names=names)
+            if summary:
+                return summary
+        _source, summary = self.summarize_with_source(db, days=days)
+        return summary
+
+
+def select_metrics(
+    summary: Dict[str, List[Dict[str, Any]]],
+    metric_names: Optional[Iterable[str]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Narrow a full (cached) summary to the requested analytes.
+
+    A name matches a summary key (the analyte key) or the ``raw_name`` of a
+    V2 point, case-insensitively, like the SQL filter of
+    ``_summarize_metrics_v2``; a raw-name match keeps only the matching points.
+    When none of the names match, the full summary is returned, as the old
+    fallback chain did.
+    """
+    wanted = {str(name).strip().upper() for name in (metric_names or []) if str(name).strip()}
+    if not wanted:
+        return summary
+    filtered: Dict[str, List[Dict[str, Any]]] = {}
+    for key, points in summary.items():
+        if key.strip().upper() in wanted:
+            filtered[key] = points
+            continue
+        matching = [point for point in points if str(point.get("raw_name") or "").strip().upper() in wanted]
+        if matching:
+            filtered[key] = matching
+    return filtered or summary
@@ -50,6 +50,7 @@ from pydantic import BaseModel, ValidationError
 
 from typing import Any, Dict, List, Optional, Tuple
 
+import asyncio
 import io
 
 import os
@@ -68,6 +69,12 @@ from pathlib import Path
 
 from backend.models import ImportJson
 
+from backend.openai_http import close_openai_http_client
+from backend.pdf_workers import shutdown_pdf_workers
+from backend.read_cache import stop_invalidation_subscriber
+from backend.user_events import start_user_event_relay, stop_user_event_relay
+from backend import deps as _deps
+
 from backend.v2.extractor import extract as extract_v2
 
 from backend.v2.schemas import (
@@ -144,8 +151,6 @@ logger = logging.getLogger(__name__)
 
 _redis_client: Optional[redis_lib.Redis] = None
 
-consultation_ws_manager = ConsultationConnectionManager()
-
 def _ensure_note_columns():
     """Ensure doctor_notes has metric_name/metric_time columns (only for SQLite)."""
     if engine.dialect.name != "sqlite":
@@ -185,7 +190,13 @@ async def lifespan(app: FastAPI):
     """Initialize database on startup."""
     init_db(engine)
     _ensure_note_columns()
+    # Events published by other API workers and Celery go to the sockets this process holds.
+    start_user_event_relay(asyncio.get_running_loop(), _deps.consultation_ws_manager.deliver)
     yield
+    await close_openai_http_client()
+    stop_invalidation_subscriber()
+    stop_user_event_relay()
+    shutdown_pdf_workers()
 
 
 _env_value_pre = (os.getenv("ENV") or os.getenv("APP_ENV") or "development").lower()
@@ -0,0 +1,83 @@
+"""Shared async HTTP transport for OpenAI chat completions."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import weakref
+from typing import Any, AsyncIterator
+
+import httpx
+from fastapi import HTTPException
+
+OPENAI_CHAT_COMPLETIONS_URL = "https://api.openai.com/v1/chat/completions"
+DEFAULT_TIMEOUT_SEC = 120.0
+DEFAULT_CONNECT_TIMEOUT_SEC = 10.0
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# httpx connection pools are bound to the event loop that opened them, so keep
+# one client per loop: the uvicorn worker loop in production, and short-lived
+# loops from asyncio.run() in Celery tasks, background threads and tests.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _build_client() -> httpx.AsyncClient:
+    timeout_sec = float(os.getenv("OPENAI_CHAT_TIMEOUT_SEC", str(DEFAULT_TIMEOUT_SEC)))
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout_sec, connect=DEFAULT_CONNECT_TIMEOUT_SEC),
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", str(DEFAULT_MAX_CONNECTIONS))),
+            max_keepalive_connections=int(
+                os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", str(DEFAULT_MAX_KEEPALIVE_CONNECTIONS))
+            ),
+        ),
+    )
+
+
+def get_openai_http_client() -> httpx.AsyncClient:
+    """Return the pooled client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_client()
+        _clients[loop] = client
+    return client
+
+
+async def close_openai_http_client() -> None:
+    """Close the pooled client of the running event loop, if one was opened."""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+async def post_chat_completion(headers: dict, payload: dict) -> httpx.Response:
+    return await get_openai_http_client().post(
+        OPENAI_CHAT_COMPLETIONS_URL,
+        headers=headers,
+        json=payload,
+    )
+
+
+async def stream_chat_completion(headers: dict, payload: dict) -> AsyncIterator[dict[str, Any]]:
+    """POST a ``stream: true`` chat completion and yield each decoded SSE chunk."""
+    async with get_openai_http_client().stream(
+        "POST",
+        OPENAI_CHAT_COMPLETIONS_URL,
+        headers=headers,
+        json={**payload, "stream": True},
+    ) as resp:
+        if resp.status_code >= 400:
+            await resp.aread()
+            raise HTTPException(status_code=502, detail=f"OpenAI error: {resp.text}")
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            if data:
+                yield json.loads(data)
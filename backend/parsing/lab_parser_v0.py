@@ -1,4 +1,12 @@
-"""Minimal raw-text lab parser (v1)."""
+"""Minimal raw-text lab parser (v1).
+
+The text is tokenized in one pass: every kept line is stripped, normalized
+once (``_normalize_for_match``) and wrapped in a ``_Line`` that memoizes its
+classifications (unit line, value line, inline record, ...). The band-row
+filter, the multi-line stitcher and the record loop share those records, and
+"next significant line" look-ahead reads a precomputed index instead of
+rescanning and re-normalizing the following lines.
+"""
 
 from __future__ import annotations
 
@@ -30,6 +38,8 @@ SECTION_BANNED_KEYWORDS = (
     "MODERADO",
 )
 VALUE_BANNED_KEYWORDS = ("RIESGO", "ESTADIO", "LIMITE")
+SECTION_NOISE_KEYWORDS = ("FECHA", "NUMERO", "PACIENTE", "MEDICO", "IMP")
+EGFR_KEYWORDS = ("TFG", "EGFR", "GFR", "FILTRACION")
 
 REF_RANGE_RE = re.compile(
     r"(?P<min>\d+(?:[.,]\d+)*)\s*(?:a|to|\-|\u2013|\u2014)\s*(?P<max>\d+(?:[.,]\d+)*)",
@@ -47,6 +57,168 @@ DATE_LIKE_RE = re.compile(
     r"^(\d{1,2}/\d{1,2}/\d{2,4}|\d{1,2}/\d{4}|\d{1,2}:\d{2})$",
     re.IGNORECASE,
 )
+RULE_LINE_RE = re.compile(r"[_\-\.\s\u2013\u2014]{3,}")
+UNIT_LINE_RE = re.compile(r"[A-Za-z0-9%/\.\\^\\-]+")
+NUMERIC_LINE_RE = re.compile(r"(?:[<>]=?)?\s*[\d.,]+")
+LEADING_OPERATOR_RE = re.compile(r"^[<>]=?")
+DIGIT_RE = re.compile(r"\d")
+LETTER_RE = re.compile(r"[A-Za-z]")
+WHITESPACE_RE = re.compile(r"\s+")
+NON_MATCH_CHARS_RE = re.compile(r"[^A-Z0-9:/. ]")
+
+# Look-ahead windows of the section heuristics, in lines.
+NEXT_SIGNIFICANT_WINDOW = 6
+UPCOMING_RECORD_WINDOW = 15
+
+_MISSING = object()
+
+
+class _Line:
+    """One cleaned line: text, normalized form and memoized classifications."""
+
+    __slots__ = (
+        "text",
+        "normalized",
+        "has_digit",
+        "has_digit_char",
+        "_unit_line",
+        "_value_line",
+        "_section_like",
+        "_ref_split",
+        "_numeric",
+        "_categorical",
+    )
+
+    def __init__(self, text: str, normalized: Optional[str] = None) -> None:
+        self.text = text
+        self.normalized = _normalize_for_match(text) if normalized is None else normalized
+        # ``\d`` and ``str.isdigit`` differ on e.g. superscripts; each heuristic keeps its own test.
+        self.has_digit = DIGIT_RE.search(text) is not None
+        self.has_digit_char = self.has_digit or any(ch.isdigit() for ch in text)
+        self._unit_line: Optional[bool] = None
+        self._value_line: Optional[bool] = None
+        self._section_like: Optional[bool] = None
+        self._ref_split = None
+        self._numeric = _MISSING
+        self._categorical = _MISSING
+
+    @property
+    def is_specimen(self) -> bool:
+        return ":" in self.text and "MUESTRA" in self.normalized and "ANAL" in self.normalized
+
+    @property
+    def is_unit_line(self) -> bool:
+        if self._unit_line is None:
+            self._unit_line = _is_unit_line(self.text)
+        return self._unit_line
+
+    @property
+    def is_value_line(self) -> bool:
+        if self._value_line is None:
+            self._value_line = _is_numeric_line(self.text) or self._is_categorical_line()
+        return self._value_line
+
+    @property
+    def is_ref_line(self) -> bool:
+        return REF_RANGE_RE.search(self.text) is not None
+
+    @property
+    def looks_like_section(self) -> bool:
+        if self._section_like is None:
+            self._section_like = _looks_like_section(self)
+        return self._section_like
+
+    @property
+    def looks_like_test(self) -> bool:
+        normalized = self.normalized
+        if not normalized or len(normalized) < 2:
+            return False
+        if self.has_digit_char:
+            return False
+        if ":" in self.text:
+            return False
+        if normalized in TABLE_HEADERS:
+            return False
+        return not self.is_unit_line
+
+    @property
+    def looks_like_inline_record(self) -> bool:
+        return bool(self.numeric or self.categorical)
+
+    @property
+    def is_band_range_only(self) -> bool:
+        return bool(RANGE_ONLY_RE.match(self.text))
+
+    @property
+    def is_band_description(self) -> bool:
+        normalized = self.normalized
+        if not normalized:
+            return False
+        return "ESTADIO" in normalized or "TFG" in normalized or "EGFR" in normalized or "GFR" in normalized
+
+    @property
+    def is_significant(self) -> bool:
+        """Whether section look-ahead stops here (headers, noise and method notes are skipped)."""
+        normalized = self.normalized
+        if not normalized:
+            return False
+        if normalized in TABLE_HEADERS or normalized.startswith(NOISE_PREFIXES):
+            return False
+        if self.is_specimen:
+            return False
+        if normalized.startswith("METODO") or normalized.startswith("ANALITOS"):
+            return False
+        return not self.text.strip().startswith(".")
+
+    @property
+    def is_demographic(self) -> bool:
+        normalized = self.normalized
+        if not normalized:
+            return False
+        if "ANOS" in normalized:
+            return True
+        if "MASCULINO" in normalized or "FEMENINO" in normalized:
+            return True
+        if DATE_LIKE_RE.match(self.text.strip()):
+            return True
+        return "HRS" in normalized
+
+    @property
+    def ref_split(self) -> tuple[Optional[float], Optional[float], str]:
+        """``(ref_min, ref_max, text without the reference range)``."""
+        if self._ref_split is None:
+            self._ref_split = _extract_ref_range(self.text)
+        return self._ref_split
+
+    @property
+    def numeric(self) -> Optional[tuple[str, str, int]]:
+        if self._numeric is _MISSING:
+            self._numeric = _extract_numeric_value(self.ref_split[2])
+        return self._numeric
+
+    @property
+    def categorical(self) -> Optional[tuple[str, str, int]]:
+        if self._categorical is _MISSING:
+            self._categorical = _extract_categorical_value(self.ref_split[2])
+        return self._categorical
+
+    def _is_categorical_line(self) -> bool:
+        if self.has_digit:
+            return False
+        if ":" in self.text:
+            return False
+        normalized = self.normalized
+        if not normalized:
+            return False
+        if any(keyword in normalized for keyword in VALUE_BANNED_KEYWORDS):
+            return False
+        if self.looks_like_section:
+            return False
+        if normalized in TABLE_HEADERS:
+            return False
+        if normalized.startswith(NOISE_PREFIXES):
+            return False
+        return not self.is_unit_line
 
 
 def parse_raw_text(
@@ -59,24 +231,23 @@ def parse_raw_text(
     current_specimen: Optional[str] = None
     current_section: Optional[str] = None
 
-    lines = _iter_clean_lines(raw_text)
+    lines = _tokenize(raw_text)
     lines = _filter_band_rows(lines)
     lines = _stitch_multiline_records(lines)
+    next_significant = _next_significant_index(lines)
     record_source = taken_at_source if default_date else "missing"
     for idx, line in enumerate(lines):
-        normalized = _normalize_for_match(line)
-
-        if _is_specimen_line(line, normalized):
-            specimen = _extract_after_colon(line)
+        if line.is_specimen:
+            specimen = _extract_after_colon(line.text)
             if specimen:
                 current_specimen = specimen
             continue
 
-        if _should_update_section(line, normalized, lines, idx):
-            current_section = line.strip()
+        if _should_update_section(line, lines, idx, next_significant):
+            current_section = line.text.strip()
             continue
 
-        record = _parse_record_line(line, normalized, default_date, record_source)
+        record = _parse_record_line(line, default_date, record_source)
         if not record:
             continue
 
@@ -87,7 +258,8 @@ def parse_raw_text(
     return records
 
 
-def _iter_clean_lines(raw_text: str) -> List[str]:
+def _tokenize(raw_text: str) -> List[_Line]:
+    """Strip, drop blank/rule/header/noise lines and normalize each kept line once."""
     lines = []
     for raw in raw_text.splitlines():
         line = raw.strip()
@@ -95,7 +267,7 @@ def _iter_clean_lines(raw_text: str) -> List[str]:
             continue
         if line == ".":
             continue
-        if re.fullmatch(r"[_\-\.\s\u2013\u2014]{3,}", line):
+        if RULE_LINE_RE.fullmatch(line):
             continue
 
         normalized = _normalize_for_match(line)
@@ -106,23 +278,23 @@ def _iter_clean_lines(raw_text: str) -> List[str]:
         if normalized.startswith(NOISE_PREFIXES):
             continue
 
-        lines.append(line)
+        lines.append(_Line(line, normalized))
     return lines
 
 
-def _filter_band_rows(lines: List[str]) -> List[str]:
-    filtered: List[str] = []
+def _filter_band_rows(lines: List[_Line]) -> List[_Line]:
+    filtered: List[_Line] = []
+    next_significant = _next_significant_index(lines)
     i = 0
     skip_band_block = False
 
     while i < len(lines):
         line = lines[i]
-        normalized = _normalize_for_match(line)
 
         if not skip_band_block:
-            if _is_band_range_only(line):
-                next_line = _next_significant_line(lines, i + 1)
-                if next_line and _is_band_description(next_line):
+            if line.is_band_range_only:
+                next_line = _next_significant_line(lines, next_significant, i + 1)
+                if next_line and next_line.is_band_description:
                     skip_band_block = True
                     i += 1
                     continue
@@ -130,10 +302,10 @@ def _filter_band_rows(lines: List[str]) -> List[str]:
             i += 1
             continue
 
-        if _is_band_range_only(line) or _is_band_description(line):
+        if line.is_band_range_only or line.is_band_description:
             i += 1
             continue
-        if _looks_like_test_line(line, normalized) or _looks_like_inline_record(line):
+        if line.looks_like_test or line.looks_like_inline_record:
             skip_band_block = False
             continue
 
@@ -142,33 +314,32 @@ def _filter_band_rows(lines: List[str]) -> List[str]:
     return filtered
 
 
-def _stitch_multiline_records(lines: List[str]) -> List[str]:
-    stitched: List[str] = []
+def _stitch_multiline_records(lines: List[_Line]) -> List[_Line]:
+    stitched: List[_Line] = []
     i = 0
     while i < len(lines):
         line = lines[i]
-        normalized = _normalize_for_match(line)
 
-        if _is_specimen_line(line, normalized):
+        if line.is_specimen:
             stitched.append(line)
             i += 1
             continue
 
-        if _looks_like_inline_record(line):
+        if line.looks_like_inline_record:
             stitched.append(line)
             i += 1
             continue
 
-        if _looks_like_test_line(line, normalized) and i + 2 < len(lines):
+        if line.looks_like_test and i + 2 < len(lines):
             value_line = lines[i + 1]
             unit_line = lines[i + 2]
-            if _is_value_line(value_line) and _is_unit_line(unit_line):
+            if value_line.is_value_line and unit_line.is_unit_line:
                 ref_line = lines[i + 3] if i + 3 < len(lines) else None
-                if ref_line and _is_ref_line(ref_line):
-                    stitched.append(f"{line} {value_line} {unit_line} {ref_line}")
+                if ref_line and ref_line.is_ref_line:
+                    stitched.append(_Line(f"{line.text} {value_line.text} {unit_line.text} {ref_line.text}"))
                     i += 4
                 else:
-                    stitched.append(f"{line} {value_line} {unit_line}")
+                    stitched.append(_Line(f"{line.text} {value_line.text} {unit_line.text}"))
                     i += 3
                 continue
 
@@ -178,24 +349,35 @@ def _stitch_multiline_records(lines: List[str]) -> List[str]:
     return stitched
 
 
+def _next_significant_index(lines: List[_Line]) -> List[int]:
+    """``index[i]`` is the first significant line at or after ``i`` (``len(lines)`` if none)."""
+    index = [len(lines)] * (len(lines) + 1)
+    for idx in range(len(lines) - 1, -1, -1):
+        index[idx] = idx if lines[idx].is_significant else index[idx + 1]
+    return index
+
+
+def _next_significant_line(lines: List[_Line], next_significant: List[int], start_index: int) -> Optional[_Line]:
+    idx = next_significant[min(start_index, len(lines))]
+    if idx < min(start_index + NEXT_SIGNIFICANT_WINDOW, len(lines)):
+        return lines[idx]
+    return None
+
+
 def _normalize_for_match(text: str) -> str:
     text = _strip_accents(text)
-    text = re.sub(r"\s+", " ", text).strip().upper()
-    text = re.sub(r"[^A-Z0-9:/. ]", "", text)
+    text = WHITESPACE_RE.sub(" ", text).strip().upper()
+    text = NON_MATCH_CHARS_RE.sub("", text)
     return text
 
 
 def _strip_accents(text: str) -> str:
+    if text.isascii():
+        return text
     normalized = unicodedata.normalize("NFD", text)
     return "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
 
 
-def _is_specimen_line(line: str, normalized: str) -> bool:
-    if ":" not in line:
-        return False
-    return "MUESTRA" in normalized and "ANAL" in normalized
-
-
 def _extract_after_colon(line: str) -> Optional[str]:
     if ":" not in line:
         return None
@@ -203,61 +385,61 @@ def _extract_after_colon(line: str) -> Optional[str]:
     return value or None
 
 
-def _looks_like_section(line: str, normalized: str) -> bool:
-    length = len(line.strip())
+def _looks_like_section(line: _Line) -> bool:
+    text = line.text.strip()
+    length = len(text)
     if length < 8 or length > 60:
         return False
-    if " " not in line.strip():
+    if " " not in text:
         return False
-    if line.strip().endswith("."):
+    if text.endswith("."):
         return False
-    if any(ch.isdigit() for ch in line):
+    if line.has_digit_char:
         return False
-    if ":" in line:
+    if ":" in line.text:
         return False
-    if line != line.upper():
+    if line.text != line.text.upper():
         return False
-    if normalized in TABLE_HEADERS:
+    if line.normalized in TABLE_HEADERS:
         return False
-    if any(keyword in normalized for keyword in SECTION_BANNED_KEYWORDS):
+    if any(keyword in line.normalized for keyword in SECTION_BANNED_KEYWORDS):
         return False
     return True
 
 
 def _should_update_section(
-    line: str,
-    normalized: str,
-    lines: List[str],
+    line: _Line,
+    lines: List[_Line],
     idx: int,
+    next_significant: List[int],
 ) -> bool:
-    if not _looks_like_section(line, normalized):
+    if not line.looks_like_section:
         return False
-    if _is_section_header_noise(line, normalized):
+    if _is_section_header_noise(line):
         return False
-    if _looks_like_person_name(line):
+    if _looks_like_person_name(line.text):
         return False
-    if _has_upcoming_record_with_prefix(lines, idx, line):
+    if _has_upcoming_record_with_prefix(lines, idx, line.normalized):
         return False
 
-    next_line = _next_significant_line(lines, idx + 1)
+    next_line = _next_significant_line(lines, next_significant, idx + 1)
     if next_line:
-        if _looks_like_test_line(line, normalized) and _is_value_line(next_line):
+        if line.looks_like_test and next_line.is_value_line:
             return False
-        if _looks_like_inline_record(next_line):
+        if next_line.looks_like_inline_record:
             return False
-        if _is_demographic_line(next_line):
+        if next_line.is_demographic:
             return False
     return True
 
 
-def _is_section_header_noise(line: str, normalized: str) -> bool:
-    if ":" in line:
+def _is_section_header_noise(line: _Line) -> bool:
+    if ":" in line.text:
         return True
+    normalized = line.normalized
     if normalized.startswith(NOISE_PREFIXES):
         return True
-    if normalized.startswith("PAG."):
-        return True
-    if any(keyword in normalized for keyword in ("FECHA", "NUMERO", "PACIENTE", "MEDICO", "IMP")):
+    if any(keyword in normalized for keyword in SECTION_NOISE_KEYWORDS):
         return True
     return False
 
@@ -271,85 +453,24 @@ def _looks_like_person_name(line: str) -> bool:
     return False
 
 
-def _is_demographic_line(line: str) -> bool:
-    normalized = _normalize_for_match(line)
-    if not normalized:
-        return False
-    if "ANOS" in normalized or "ANOS," in normalized:
-        return True
-    if "MASCULINO" in normalized or "FEMENINO" in normalized:
-        return True
-    if DATE_LIKE_RE.match(line.strip()):
-        return True
-    if "HRS" in normalized:
-        return True
-    return False
-
-
-def _next_significant_line(lines: List[str], start_index: int) -> Optional[str]:
-    for idx in range(start_index, min(start_index + 6, len(lines))):
-        line = lines[idx]
-        normalized = _normalize_for_match(line)
-        if not normalized:
-            continue
-        if normalized in TABLE_HEADERS or normalized.startswith(NOISE_PREFIXES):
-            continue
-        if _is_specimen_line(line, normalized):
-            continue
-        if normalized.startswith("METODO") or normalized.startswith("ANALITOS"):
-            continue
-        if line.strip().startswith("."):
-            continue
-        return line
-    return None
-
-
-def _has_upcoming_record_with_prefix(
-    lines: List[str],
-    start_index: int,
-    prefix: str,
-) -> bool:
-    prefix_norm = _normalize_for_match(prefix)
+def _has_upcoming_record_with_prefix(lines: List[_Line], start_index: int, prefix_norm: str) -> bool:
     if not prefix_norm:
         return False
-    for idx in range(start_index + 1, min(start_index + 15, len(lines))):
+    for idx in range(start_index + 1, min(start_index + UPCOMING_RECORD_WINDOW, len(lines))):
         line = lines[idx]
-        if not re.search(r"\d", line):
-            continue
-        candidate_norm = _normalize_for_match(line)
-        if candidate_norm.startswith(prefix_norm):
+        if line.has_digit and line.normalized.startswith(prefix_norm):
             return True
     return False
 
 
-def _looks_like_inline_record(line: str) -> bool:
-    _, _, line_wo_ref = _extract_ref_range(line)
-    return bool(_extract_numeric_value(line_wo_ref) or _extract_categorical_value(line_wo_ref))
-
-
-def _looks_like_test_line(line: str, normalized: str) -> bool:
-    if not normalized or len(normalized) < 2:
-        return False
-    if any(ch.isdigit() for ch in line):
-        return False
-    if ":" in line:
-        return False
-    if normalized in TABLE_HEADERS:
-        return False
-    if _is_unit_line(line):
-        return False
-    return True
-
-
 def _parse_record_line(
-    line: str,
-    normalized: str,
+    line: _Line,
     default_date: Optional[date],
     taken_at_source: str,
 ) -> Optional[Dict[str, Optional[object]]]:
-    ref_min, ref_max, line_wo_ref = _extract_ref_range(line)
+    ref_min, ref_max, _ = line.ref_split
 
-    numeric = _extract_numeric_value(line_wo_ref)
+    numeric = line.numeric
     if numeric:
         value_raw, unit_raw, start_index = numeric
         if not _is_unit_valid(unit_raw):
@@ -357,7 +478,7 @@ def _parse_record_line(
         value_operator, value_num = _parse_numeric_value(value_raw)
         if value_num is None:
             return None
-        test_name_raw = line[:start_index].strip()
+        test_name_raw = line.text[:start_index].strip()
         if not test_name_raw or test_name_raw.strip().lower() == "x":
             return None
         if not (_is_unit_like(unit_raw) or ref_min is not None):
@@ -379,12 +500,12 @@ def _parse_record_line(
             record["derived_stage"] = stage
         return record
 
-    categorical = _extract_categorical_value(line_wo_ref)
+    categorical = line.categorical
     if categorical:
         value_raw, unit_raw, start_index = categorical
         if not _is_unit_valid(unit_raw):
             return None
-        test_name_raw = line[:start_index].strip()
+        test_name_raw = line.text[:start_index].strip()
         if not test_name_raw or test_name_raw.strip().lower() == "x":
             return None
         if not (_is_unit_like(unit_raw) or ref_min is not None):
@@ -415,60 +536,31 @@ def _extract_ref_range(line: str) -> tuple[Optional[float], Optional[float], str
     return ref_min, ref_max, line_wo_ref
 
 
-def _is_value_line(line: str) -> bool:
-    return _is_numeric_line(line) or _is_categorical_line(line)
-
-
 def _is_numeric_line(line: str) -> bool:
     stripped = line.strip()
     if not stripped:
         return False
-    if re.search(r"[A-Za-z]", stripped):
+    if LETTER_RE.search(stripped):
         return False
-    if not re.search(r"\d", stripped):
+    if not DIGIT_RE.search(stripped):
         return False
-    if not re.fullmatch(r"(?:[<>]=?)?\s*[\d.,]+", stripped):
+    if not NUMERIC_LINE_RE.fullmatch(stripped):
         return False
-    candidate = re.sub(r"^[<>]=?", "", stripped).strip()
+    candidate = LEADING_OPERATOR_RE.sub("", stripped).strip()
     return parse_number(candidate) is not None
 
 
-def _is_categorical_line(line: str) -> bool:
-    if re.search(r"\d", line):
-        return False
-    if ":" in line:
-        return False
-    normalized = _normalize_for_match(line)
-    if not normalized:
-        return False
-    if any(keyword in normalized for keyword in VALUE_BANNED_KEYWORDS):
-        return False
-    if _looks_like_section(line, normalized):
-        return False
-    if normalized in TABLE_HEADERS:
-        return False
-    if normalized.startswith(NOISE_PREFIXES):
-        return False
-    if _is_unit_line(line):
-        return False
-    return True
-
-
 def _is_unit_line(line: str) -> bool:
     stripped = line.strip()
     if not stripped:
         return False
-    if not re.fullmatch(r"[A-Za-z0-9%/\.\\^\\-]+", stripped):
+    if not UNIT_LINE_RE.fullmatch(stripped):
         return False
     if DATE_LIKE_RE.match(stripped):
         return False
     return _is_unit_like(stripped)
 
 
-def _is_ref_line(line: str) -> bool:
-    return bool(REF_RANGE_RE.search(line))
-
-
 def _extract_numeric_value(line: str) -> Optional[tuple[str, str, int]]:
     for match in VALUE_UNIT_RE.finditer(line):
         value_raw = match.group("value").strip()
@@ -489,7 +581,7 @@ def _extract_categorical_value(line: str) -> Optional[tuple[str, str, int]]:
         if not _is_unit_valid(unit_raw) or not _is_unit_like(unit_raw):
             continue
         value_raw = tokens[idx - 1].strip()
-        if re.search(r"\d", value_raw):
+        if DIGIT_RE.search(value_raw):
             continue
         marker = f"{value_raw} {unit_raw}"
         start_index = line.rfind(marker)
@@ -513,17 +605,6 @@ def _is_unit_like(unit_raw: str) -> bool:
     return bool(UNIT_LIKE_RE.search(unit_raw))
 
 
-def _is_band_range_only(line: str) -> bool:
-    return bool(RANGE_ONLY_RE.match(line))
-
-
-def _is_band_description(line: str) -> bool:
-    normalized = _normalize_for_match(line)
-    if not normalized:
-        return False
-    return "ESTADIO" in normalized or "TFG" in normalized or "EGFR" in normalized or "GFR" in normalized
-
-
 def _derive_egfr_stage(
     test_name_raw: str,
     unit_norm: Optional[str],
@@ -534,7 +615,7 @@ def _derive_egfr_stage(
     if not unit_norm or "ML/MIN/1.73" not in unit_norm.upper():
         return None
     name_norm = _normalize_for_match(test_name_raw)
-    if not any(keyword in name_norm for keyword in ("TFG", "EGFR", "GFR", "FILTRACION")):
+    if not any(keyword in name_norm for keyword in EGFR_KEYWORDS):
         return None
 
     if value_num >= 90:
@@ -6,9 +6,8 @@ from datetime import date
 import re
 from typing import Any, Callable, Dict, List, Optional
 
-import fitz  # PyMuPDF
-
 from backend.parsing.lab_parser_v0 import parse_raw_text
+from backend.pdf_document import PdfSource, borrow_pdf
 
 
 
@@ -36,12 +35,35 @@ def compute_parse_metrics(records: List[Dict[str, Any]]) -> Dict[str, Any]:
 
 
 def parse_with_ocr_fallback(
-    pdf_bytes: bytes,
+    pdf_source: PdfSource,
     raw_text: Any,
     parse_func: Callable[[str, Optional[date], str], List[Dict[str, Any]]] = parse_raw_text,
-    select_pages_func: Optional[Callable[[bytes], List[int]]] = None,
-    ocr_func: Optional[Callable[[bytes, List[int]], List[Dict[str, Any]]]] = None,
+    select_pages_func: Optional[Callable[[PdfSource], List[int]]] = None,
+    ocr_func: Optional[Callable[[PdfSource, List[int]], List[Dict[str, Any]]]] = None,
 ) -> Dict[str, Any]:
+    result = parse_text_layer(raw_text, parse_func)
+    if not result["triggered_by"]:
+        return result
+    if select_pages_func is None or ocr_func is None:
+        select_pages_func, ocr_func = _load_ocr_funcs()
+    ocr_text = ""
+    ocr_error: Optional[str] = None
+    try:
+        ocr_text = _collect_ocr_text(pdf_source, select_pages_func, ocr_func)
+    except Exception as exc:
+        ocr_error = str(exc)
+    return merge_ocr_text(result, ocr_text, ocr_error, parse_func)
+
+
+def parse_text_layer(
+    raw_text: Any,
+    parse_func: Callable[[str, Optional[date], str], List[Dict[str, Any]]] = parse_raw_text,
+) -> Dict[str, Any]:
+    """First pass of ``parse_with_ocr_fallback``: parse the text layer only.
+
+    ``triggered_by`` says whether the OCR fallback should run; the result has
+    the same keys as the full pipeline's, with empty OCR fields.
+    """
     raw_text = coerce_raw_text(raw_text)
     report_date, report_source = extract_report_date(raw_text)
     records = parse_func(
@@ -49,48 +71,49 @@ def parse_with_ocr_fallback(
         default_date=report_date,
         taken_at_source=report_source,
     )
-    metrics_before = compute_parse_metrics(records)
-    trigger = _should_trigger_ocr(metrics_before, len(raw_text))
-
-    ocr_text = ""
-    ocr_error: Optional[str] = None
-    metrics_after = metrics_before
-
-    if trigger:
-        if select_pages_func is None or ocr_func is None:
-            select_pages_func, ocr_func = _load_ocr_funcs()
-        try:
-            ocr_text = _collect_ocr_text(pdf_bytes, select_pages_func, ocr_func)
-        except Exception as exc:
-            ocr_error = str(exc)
-
-        if ocr_text:
-            merged_text = f"{raw_text}\n{ocr_text}" if raw_text else ocr_text
-            ocr_date, ocr_source = extract_report_date(ocr_text)
-            report_date, report_source = _pick_report_date(
-                report_date,
-                report_source,
-                ocr_date,
-                ocr_source,
-            )
-            records = parse_func(
-                merged_text,
-                default_date=report_date,
-                taken_at_source=report_source,
-            )
-            metrics_after = compute_parse_metrics(records)
-
+    metrics = compute_parse_metrics(records)
     return {
         "raw_text": raw_text,
         "records": records,
-        "metrics": metrics_after,
-        "metrics_before": metrics_before,
-        "triggered_by": trigger,
-        "ocr_text": ocr_text,
-        "ocr_error": ocr_error,
+        "metrics": metrics,
+        "metrics_before": metrics,
+        "triggered_by": _should_trigger_ocr(metrics, len(raw_text)),
+        "ocr_text": "",
+        "ocr_error": None,
     }
 
 
+def merge_ocr_text(
+    result: Dict[str, Any],
+    ocr_text: str,
+    ocr_error: Optional[str] = None,
+    parse_func: Callable[[str, Optional[date], str], List[Dict[str, Any]]] = parse_raw_text,
+) -> Dict[str, Any]:
+    """Second pass: re-parse the text layer merged with the OCR text."""
+    result = dict(result, ocr_text=ocr_text, ocr_error=ocr_error)
+    if not ocr_text:
+        return result
+
+    raw_text = result["raw_text"]
+    merged_text = f"{raw_text}\n{ocr_text}" if raw_text else ocr_text
+    report_date, report_source = extract_report_date(raw_text)
+    ocr_date, ocr_source = extract_report_date(ocr_text)
+    report_date, report_source = _pick_report_date(
+        report_date,
+        report_source,
+        ocr_date,
+        ocr_source,
+    )
+    records = parse_func(
+        merged_text,
+        default_date=report_date,
+        taken_at_source=report_source,
+    )
+    result["records"] = records
+    result["metrics"] = compute_parse_metrics(records)
+    return result
+
+
 def _should_trigger_ocr(metrics: Dict[str, Any], raw_text_len: int) -> Optional[str]:
     if metrics.get("records_count", 0) == 0:
         return "records_zero"
@@ -100,26 +123,23 @@ def _should_trigger_ocr(metrics: Dict[str, Any], raw_text_len: int) -> Optional[
 
 
 def _collect_ocr_text(
-    pdf_bytes: bytes,
-    select_pages_func: Callable[[bytes], List[int]],
-    ocr_func: Callable[[bytes, List[int]], List[Dict[str, Any]]],
+    pdf_source: PdfSource,
+    select_pages_func: Callable[[PdfSource], List[int]],
+    ocr_func: Callable[[PdfSource, List[int]], List[Dict[str, Any]]],
 ) -> str:
-    pages = select_pages_func(pdf_bytes)
+    pages = select_pages_func(pdf_source)
     if not pages:
-        pages = _all_page_indices(pdf_bytes)
+        pages = _all_page_indices(pdf_source)
 
-    ocr_pages = ocr_func(pdf_bytes, pages)
+    ocr_pages = ocr_func(pdf_source, pages)
     return "\n\n".join(
         page.get("text", "") for page in ocr_pages if page.get("text")
     )
 
 
-def _all_page_indices(pdf_bytes: bytes) -> List[int]:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    try:
-        return list(range(len(doc)))
-    finally:
-        doc.close()
+def _all_page_indices(pdf_source: PdfSource) -> List[int]:
+    with borrow_pdf(pdf_source) as pdf:
+        return list(range(pdf.page_count))
 
 
 def extract_report_date(raw_text: str) -> tuple[Optional[date], str]:
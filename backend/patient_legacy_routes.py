@@ -219,9 +219,7 @@ async def get_patient_analyses(
         return False
 
     # Get current user
-    current_user = db.query(User).filter(User.id == user_id).first()
-    if not current_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    current_user = require_principal(db, user_id)
 
     # Get patient for current user
     patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
@@ -281,9 +279,7 @@ async def get_patient_series(
 ):
     """Get time series data for a specific metric."""
     # Get current user
-    current_user = db.query(User).filter(User.id == user_id).first()
-    if not current_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    current_user = require_principal(db, user_id)
 
     # Get patient for current user
     patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
@@ -452,7 +448,7 @@ async def get_me_shortcut(
     """Shortcut for /api/auth/me (frontend compatibility)."""
     print(f"[DEBUG] GET /api/me called for user_id={user_id}")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_principal(db, user_id)
     if not user:
         print(f"[DEBUG] User not found: id={user_id}")
         raise HTTPException(status_code=404, detail="User not found")
@@ -475,9 +471,7 @@ async def update_me(
     db: Session = Depends(get_db),
 ):
     """Update current user's profile (currently only full_name)."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
     if payload.full_name is not None:
         full = payload.full_name.strip()
         if not full:
@@ -0,0 +1,188 @@
+"""Parse-once handle for an uploaded PDF.
+
+The legacy extraction path used to call ``fitz.open`` on the same bytes in
+``_extract_pages_text``, ``select_pages_for_vision`` (twice),
+``_all_page_indices`` and ``_extract_page_text_and_images``, extracting page
+text two or three times. A ``PdfDocument`` opens the bytes once and memoizes
+per-page text, image lists and word/number counts. It also offers a generic
+``memo`` for derived values such as compressed page images or OCR text.
+
+Functions in ``pdf_parser``, ``vision_parser`` and ``parsing.pipeline`` accept
+either raw bytes or a ``PdfDocument``. Callers that run several steps on one
+upload should open it once and pass the handle along:
+
+    with PdfDocument.open(pdf_bytes) as pdf:
+        raw_text = extract_raw_text(pdf)
+        result = parse_with_ocr_fallback(pdf, raw_text)
+
+A handle is not thread-safe; finish all PyMuPDF work before fanning out.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import re
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, TypeVar, Union
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+T = TypeVar("T")
+
+_WORD_RE = re.compile(r"[A-Za-zÀ-ÿ]{2,}")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+class PdfDocument:
+    """An opened PDF with memoized per-page data."""
+
+    def __init__(self, source: Union[bytes, str], doc: fitz.Document) -> None:
+        # Raw bytes, or the path of a spooled upload (PyMuPDF then reads the file itself).
+        self._source = source
+        self._doc = doc
+        self._text: Dict[int, str] = {}
+        self._images: Dict[int, List[tuple]] = {}
+        self._counts: Dict[int, tuple[int, int]] = {}
+        self._plumber_text: Optional[List[str]] = None
+        self._memo: Dict[Hashable, Any] = {}
+
+    @classmethod
+    def open(cls, pdf_bytes: bytes) -> "PdfDocument":
+        if not pdf_bytes or len(pdf_bytes) < 100:
+            raise ValueError("Empty or invalid PDF file")
+        try:
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        except Exception as exc:
+            raise ValueError(f"Invalid PDF: {exc}") from exc
+        return cls(pdf_bytes, doc)
+
+    @classmethod
+    def open_file(cls, path: str) -> "PdfDocument":
+        """Open a PDF on disk (e.g. a spooled upload) without reading it into memory."""
+        try:
+            doc = fitz.open(path, filetype="pdf")
+        except Exception as exc:
+            raise ValueError(f"Invalid PDF: {exc}") from exc
+        return cls(path, doc)
+
+    def close(self) -> None:
+        self._doc.close()
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+    @property
+    def page_count(self) -> int:
+        return len(self._doc)
+
+    @property
+    def needs_pass(self) -> bool:
+        return bool(self._doc.needs_pass)
+
+    def page_text(self, page_index: int) -> str:
+        text = self._text.get(page_index)
+        if text is None:
+            text = self._doc[page_index].get_text("text") or ""
+            self._text[page_index] = text
+        return text
+
+    def page_images(self, page_index: int) -> List[tuple]:
+        """``page.get_images(full=True)`` for the page."""
+        images = self._images.get(page_index)
+        if images is None:
+            images = self._doc[page_index].get_images(full=True)
+            self._images[page_index] = images
+        return images
+
+    def page_image_coverage(self, page_index: int) -> float:
+        """Share of the page area covered by images (overlaps counted twice)."""
+        def compute() -> float:
+            page = self._doc[page_index]
+            area = abs(page.rect) or 1.0
+            return sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info()) / area
+
+        return self.memo(("image_coverage", page_index), compute)
+
+    def page_content_hash(self, page_index: int) -> str:
+        """sha256 of what the page shows (content streams, text, image streams).
+
+        Unlike the bytes of a one-page copy, it does not change when the
+        same page is re-saved or appears in another file.
+        """
+        def compute() -> str:
+            digest = hashlib.sha256(self._doc[page_index].read_contents())
+            digest.update(self.page_text(page_index).encode("utf-8"))
+            for image in self.page_images(page_index):
+                digest.update(self._doc.xref_stream_raw(image[0]) or b"")
+            return digest.hexdigest()
+
+        return self.memo(("content_hash", page_index), compute)
+
+    def page_word_count(self, page_index: int) -> int:
+        return self._page_counts(page_index)[0]
+
+    def page_number_count(self, page_index: int) -> int:
+        return self._page_counts(page_index)[1]
+
+    def _page_counts(self, page_index: int) -> tuple[int, int]:
+        counts = self._counts.get(page_index)
+        if counts is None:
+            text = self.page_text(page_index)
+            counts = (len(_WORD_RE.findall(text)), len(_NUMBER_RE.findall(text)))
+            self._counts[page_index] = counts
+        return counts
+
+    def extract_image(self, xref: int) -> Dict[str, Any]:
+        return self._doc.extract_image(xref)
+
+    def plumber_page_texts(self) -> List[str]:
+        """Per-page text from pdfplumber (fallback when PyMuPDF finds no text layer)."""
+        if self._plumber_text is None:
+            source = self._source if isinstance(self._source, str) else io.BytesIO(self._source)
+            with pdfplumber.open(source) as pdf:
+                self._plumber_text = [page.extract_text() or "" for page in pdf.pages]
+        return self._plumber_text
+
+    def subset_bytes(self, page_indices: Sequence[int]) -> bytes:
+        """A new PDF holding only ``page_indices`` (ascending), e.g. to trim what is sent to a model."""
+        ranges: List[List[int]] = []
+        for index in page_indices:
+            if ranges and index == ranges[-1][1] + 1:
+                ranges[-1][1] = index
+            else:
+                ranges.append([index, index])
+        out = fitz.open()
+        try:
+            for first, last in ranges:
+                out.insert_pdf(self._doc, from_page=first, to_page=last)
+            return out.tobytes(garbage=3, deflate=True)
+        finally:
+            out.close()
+
+    def memo(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """Memoize a value derived from this document under ``key``."""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+
+PdfSource = Union[bytes, PdfDocument]
+
+
+@contextmanager
+def borrow_pdf(source: PdfSource) -> Iterator[PdfDocument]:
+    """Yield a ``PdfDocument`` for ``source``; only documents opened here are closed here."""
+    if isinstance(source, PdfDocument):
+        yield source
+        return
+    pdf = PdfDocument.open(source)
+    try:
+        yield pdf
+    finally:
+        pdf.close()
+
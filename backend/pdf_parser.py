@@ -2,12 +2,9 @@
 
 from __future__ import annotations
 
-import io
-from typing import Dict, List
-
-import fitz  # PyMuPDF
-import pdfplumber
+from typing import Dict, List, Tuple
 
+from backend.pdf_document import PdfDocument, PdfSource, borrow_pdf
 from backend.vision_parser import select_pages_for_vision, ocr_pages_to_text
 
 
@@ -15,68 +12,74 @@ class NoTextLayerError(Exception):
     """Raised when a PDF has no extractable text."""
 
 
-def _extract_pages_text(pdf_bytes: bytes) -> List[Dict[str, str]]:
-    if not pdf_bytes or len(pdf_bytes) < 100:
-        raise ValueError("Empty or invalid PDF file")
-
-    pages: List[Dict[str, str]] = []
-    try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    except Exception as exc:
-        raise ValueError(f"Invalid PDF: {exc}") from exc
-
-    try:
-        for page_index, page in enumerate(doc):
-            pages.append({"page": page_index, "text": page.get_text("text") or ""})
-    finally:
-        doc.close()
-
-    if any(page["text"].strip() for page in pages):
-        return pages
+def _extract_pages_text(source: PdfSource) -> List[Dict[str, str]]:
+    with borrow_pdf(source) as pdf:
+        pages: List[Dict[str, str]] = [
+            {"page": page_index, "text": pdf.page_text(page_index)}
+            for page_index in range(pdf.page_count)
+        ]
+        if any(page["text"].strip() for page in pages):
+            return pages
 
-    try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            pages = []
-            for page_index, page in enumerate(pdf.pages):
-                pages.append({"page": page_index, "text": page.extract_text() or ""})
-    except Exception:
-        return pages
-
-    return pages
+        try:
+            return [
+                {"page": page_index, "text": text}
+                for page_index, text in enumerate(pdf.plumber_page_texts())
+            ]
+        except Exception:
+            return pages
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+def extract_text_from_pdf(source: PdfSource) -> str:
     """Extract text from PDF without OCR fallback."""
-    pages = _extract_pages_text(pdf_bytes)
+    pages = _extract_pages_text(source)
     text = "\n".join(page["text"] for page in pages if page["text"])
     if not text.strip():
         raise NoTextLayerError("No text layer found in PDF. PDF appears to be image-based.")
     return text
 
 
-def extract_raw_text(pdf_bytes: bytes) -> str:
+def extract_raw_text(source: PdfSource) -> str:
     """Return raw text using text layer, with OCR fallback for image-based pages."""
-    pages = _extract_pages_text(pdf_bytes)
-    if not pages:
-        raise ValueError("PDF has no pages")
-
-    page_text = {page["page"]: (page["text"] or "") for page in pages}
-    has_text = any(text.strip() for text in page_text.values())
+    with borrow_pdf(source) as pdf:
+        return _extract_raw_text(pdf)
 
-    ocr_pages = select_pages_for_vision(pdf_bytes)
-    if not has_text and not ocr_pages:
-        ocr_pages = sorted(page_text.keys())
 
+def _extract_raw_text(pdf: PdfDocument) -> str:
+    page_text, ocr_pages = text_layer_pages(pdf)
+    ocr_results: List[Dict[str, str]] = []
     if ocr_pages:
         try:
-            ocr_results = ocr_pages_to_text(pdf_bytes, ocr_pages)
+            ocr_results = ocr_pages_to_text(pdf, ocr_pages)
         except Exception:
-            if not has_text:
+            if not any(text.strip() for text in page_text.values()):
                 raise
-        else:
-            for result in ocr_results:
-                page_index = int(result.get("page", 0))
-                page_text[page_index] = result.get("text", "") or ""
+    return merge_page_text(page_text, ocr_results)
+
+
+def text_layer_pages(source: PdfSource) -> Tuple[Dict[int, str], List[int]]:
+    """Text layer per page and the pages ``extract_raw_text`` sends to vision OCR.
+
+    The CPU half of ``extract_raw_text``; no network calls.
+    """
+    with borrow_pdf(source) as pdf:
+        pages = _extract_pages_text(pdf)
+        if not pages:
+            raise ValueError("PDF has no pages")
+
+        page_text = {page["page"]: (page["text"] or "") for page in pages}
+        ocr_pages = select_pages_for_vision(pdf)
+    if not ocr_pages and not any(text.strip() for text in page_text.values()):
+        ocr_pages = sorted(page_text.keys())
+    return page_text, ocr_pages
+
+
+def merge_page_text(page_text: Dict[int, str], ocr_results: List[Dict[str, str]]) -> str:
+    """Raw text with the OCR results replacing the text layer of their pages."""
+    page_text = dict(page_text)
+    for result in ocr_results:
+        page_index = int(result.get("page", 0))
+        page_text[page_index] = result.get("text", "") or ""
 
     raw_text = "\n\n".join(
         page_text[page_index].strip()
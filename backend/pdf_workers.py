@@ -0,0 +1,384 @@
+"""Process pool for the CPU-bound PDF work done inside request handlers.
+
+Text extraction, the legacy parser and the PyMuPDF re-save that unlocks
+password-protected uploads are pure CPU (plus GIL-holding C code), so
+running them inside an ``async def`` route stalls every other request on
+the worker's event loop. Routes hand that work to ``run_pdf_task`` instead:
+
+    page_text, ocr_pages = await run_pdf_task(extract_pdf_text_layer, spooled.path)
+
+Network-bound steps stay out of the pool: ``extract_pdf_raw_text`` and
+``parse_pdf_with_ocr_fallback`` run vision OCR on a thread between pool tasks.
+
+The pool is created lazily and shared by the process. Work is bounded:
+at most ``PDF_WORKERS`` tasks run and ``PDF_WORKER_QUEUE_DEPTH`` more wait;
+past that ``run_pdf_task`` fails fast with 503 and a ``Retry-After`` header
+instead of queueing without limit. Every task has a deadline
+(``PDF_WORKER_TIMEOUT_SEC``): the caller gets a 504, and the worker aborts
+the task with ``SIGALRM`` so a pathological PDF does not keep the slot.
+A slot is only released once its worker is actually done.
+
+Task functions must be importable module-level callables, and arguments
+and results must pickle; pass the spooled file path rather than the bytes.
+``HTTPException`` does not survive pickling, so workers raise the plain
+exceptions below and routes translate them.
+
+``PDF_WORKERS=0`` runs tasks on the default thread executor instead (still
+off the event loop, same limits, no hard deadline), which suits tests and
+single-process development servers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+
+import fitz  # PyMuPDF
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_inflight = 0
+_rejected = 0
+_timed_out = 0
+
+
+class PdfTaskTimeout(Exception):
+    """Raised inside a worker when a task runs past its deadline."""
+
+
+class PdfPasswordRequired(Exception):
+    """The PDF is encrypted and no password was given."""
+
+
+class PdfPasswordInvalid(Exception):
+    """The PDF is encrypted and the given password does not open it."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def pdf_worker_count() -> int:
+    """Worker processes in the pool; 0 means the thread executor fallback."""
+    return max(0, _env_int("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def pdf_worker_capacity() -> int:
+    """Tasks accepted at once: running plus waiting."""
+    running = pdf_worker_count() or 1
+    return running + max(0, _env_int("PDF_WORKER_QUEUE_DEPTH", 2 * running))
+
+
+def pdf_task_timeout_sec() -> float:
+    return max(1.0, _env_float("PDF_WORKER_TIMEOUT_SEC", 120.0))
+
+
+def _retry_after_sec() -> int:
+    return max(1, _env_int("PDF_WORKER_RETRY_AFTER_SEC", 5))
+
+
+def _busy() -> HTTPException:
+    retry_after = _retry_after_sec()
+    return HTTPException(
+        status_code=503,
+        detail={
+            "code": "pdf_workers_busy",
+            "message": "El servidor está procesando demasiados documentos. Inténtalo de nuevo en unos segundos.",
+            "retry_after": retry_after,
+        },
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def _timed_out_error(timeout: float) -> HTTPException:
+    return HTTPException(
+        status_code=504,
+        detail={
+            "code": "pdf_processing_timeout",
+            "message": "El documento tardó demasiado en procesarse.",
+            "timeout_sec": timeout,
+        },
+    )
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            workers = pdf_worker_count()
+            # spawn: the API process runs threads (Redis subscribers, OpenAI
+            # pools) that a fork would copy mid-flight.
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=max(1, _env_int("PDF_WORKER_MAX_TASKS_PER_CHILD", 200)),
+            )
+            logger.info("Started PDF worker pool workers=%s capacity=%s", workers, pdf_worker_capacity())
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_workers() -> None:
+    """Stop the pool (app shutdown); running tasks are cancelled."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def pdf_worker_stats() -> Dict[str, int]:
+    with _lock:
+        return {
+            "workers": pdf_worker_count(),
+            "capacity": pdf_worker_capacity(),
+            "inflight": _inflight,
+            "rejected": _rejected,
+            "timed_out": _timed_out,
+        }
+
+
+def _on_alarm(_signum, _frame) -> None:
+    raise PdfTaskTimeout("PDF task exceeded its deadline")
+
+
+def _run_with_deadline(timeout: float, fn: Callable[..., T], args: tuple) -> T:
+    """Worker-side wrapper: abort ``fn`` with ``PdfTaskTimeout`` after ``timeout`` seconds."""
+    if not hasattr(signal, "setitimer"):
+        return fn(*args)
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _acquire_slot() -> bool:
+    global _inflight, _rejected
+    with _lock:
+        if _inflight >= pdf_worker_capacity():
+            _rejected += 1
+            return False
+        _inflight += 1
+        return True
+
+
+def _release_slot(_future: Any = None) -> None:
+    global _inflight
+    with _lock:
+        _inflight -= 1
+
+
+async def run_pdf_task(fn: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+    """Run ``fn(*args)`` in the PDF pool and await its result.
+
+    Raises 503 (``Retry-After``) when the pool is saturated and 504 when the
+    task misses its deadline; exceptions raised by ``fn`` propagate.
+    """
+    timeout = pdf_task_timeout_sec() if timeout is None else timeout
+    if not _acquire_slot():
+        raise _busy()
+
+    loop = asyncio.get_running_loop()
+    executor: Optional[ProcessPoolExecutor] = None
+    if pdf_worker_count() == 0:
+        future = loop.run_in_executor(None, fn, *args)
+        future.add_done_callback(_release_slot)
+    else:
+        executor = _get_executor()
+        try:
+            # The worker-side deadline is a little shorter so it fires first.
+            cfuture: Future = executor.submit(_run_with_deadline, max(1.0, timeout - 1.0), fn, args)
+        except (BrokenProcessPool, RuntimeError):
+            _release_slot()
+            _discard_executor(executor)
+            raise
+        cfuture.add_done_callback(_release_slot)
+        future = asyncio.wrap_future(cfuture, loop=loop)
+    # After a timeout nobody awaits the task any more; don't log its outcome as unretrieved.
+    future.add_done_callback(_consume_outcome)
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except (asyncio.TimeoutError, PdfTaskTimeout):
+        _count_timeout()
+        raise _timed_out_error(timeout)
+    except BrokenProcessPool:
+        # A worker died (crash, OOM kill); start a fresh pool next time.
+        if executor is not None:
+            _discard_executor(executor)
+        logger.exception("PDF worker pool broke while running %s", getattr(fn, "__name__", fn))
+        raise
+
+
+def _consume_outcome(future: "asyncio.Future[Any]") -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+def _count_timeout() -> None:
+    global _timed_out
+    with _lock:
+        _timed_out += 1
+
+
+async def _text_with_ocr(path: str) -> Tuple[Dict[int, str], List[int], List[Dict[str, Any]]]:
+    page_text, ocr_pages = await run_pdf_task(extract_pdf_text_layer, path)
+    ocr_results: List[Dict[str, Any]] = []
+    if ocr_pages:
+        try:
+            ocr_results = await asyncio.to_thread(ocr_pdf_pages, path, ocr_pages)
+        except Exception:
+            if not any(text.strip() for text in page_text.values()):
+                raise
+    return page_text, ocr_pages, ocr_results
+
+
+async def extract_pdf_raw_text(path: str) -> str:
+    """``extract_raw_text`` for the PDF at ``path``: text layer in the pool, OCR on a thread."""
+    from backend.pdf_parser import merge_page_text
+
+    page_text, _ocr_pages, ocr_results = await _text_with_ocr(path)
+    return merge_page_text(page_text, ocr_results)
+
+
+async def parse_pdf_with_ocr_fallback(path: str) -> Dict[str, Any]:
+    """``extract_raw_text`` + ``parse_with_ocr_fallback`` for the PDF at ``path``.
+
+    Text extraction and parsing run in the pool. Vision OCR mostly waits on
+    the model (up to ``VISION_TOTAL_DEADLINE_SEC`` per document), so it runs
+    on a thread between pool tasks instead: it holds no pool slot and does
+    not count against ``PDF_WORKER_TIMEOUT_SEC``.
+    """
+    from backend.parsing.pipeline import merge_ocr_text, parse_text_layer
+    from backend.pdf_parser import merge_page_text
+
+    page_text, ocr_pages, ocr_results = await _text_with_ocr(path)
+    raw_text = merge_page_text(page_text, ocr_results)
+    parse_result = await run_pdf_task(parse_text_layer, raw_text)
+
+    if parse_result["triggered_by"]:
+        # The fallback OCRs the pages picked above (all of them when none
+        # were); reuse what the model already returned for them.
+        ocr_error: Optional[str] = None
+        if not ocr_results:
+            try:
+                ocr_results = await asyncio.to_thread(ocr_pdf_pages, path, ocr_pages or sorted(page_text))
+            except Exception as exc:
+                ocr_results, ocr_error = [], str(exc)
+        ocr_text = "\n\n".join(page["text"] for page in ocr_results if page.get("text"))
+        if ocr_text:
+            parse_result = await run_pdf_task(merge_ocr_text, parse_result, ocr_text, ocr_error)
+        else:
+            parse_result = dict(parse_result, ocr_error=ocr_error)
+    _log_parse_result(parse_result)
+    return parse_result
+
+
+def parse_pdf_inline(path: str) -> Dict[str, Any]:
+    """``parse_pdf_with_ocr_fallback`` for callers already off the event loop."""
+    from backend.parsing.pipeline import parse_with_ocr_fallback
+    from backend.pdf_document import PdfDocument
+    from backend.pdf_parser import extract_raw_text
+
+    with PdfDocument.open_file(path) as pdf:
+        parse_result = parse_with_ocr_fallback(pdf, extract_raw_text(pdf))
+    _log_parse_result(parse_result)
+    return parse_result
+
+
+def _log_parse_result(parse_result: Dict[str, Any]) -> None:
+    raw_text = parse_result["raw_text"]
+    logger.info("[RAW_TEXT] len=%s preview=%r", len(raw_text), raw_text[:200])
+    logger.info("[PARSE] records_count=%s", parse_result["metrics_before"]["records_count"])
+    if parse_result["triggered_by"]:
+        logger.info(
+            "[OCR] triggered_by=%s records_count=%s error=%s",
+            parse_result["triggered_by"],
+            parse_result["metrics"]["records_count"],
+            parse_result["ocr_error"],
+        )
+
+
+# --- task functions (run inside the workers) -------------------------------
+
+
+def extract_pdf_text_layer(path: str) -> Tuple[Dict[int, str], List[int]]:
+    """Text layer per page of the PDF at ``path`` and the pages that need vision OCR."""
+    from backend.pdf_document import PdfDocument
+    from backend.pdf_parser import text_layer_pages
+
+    with PdfDocument.open_file(path) as pdf:
+        return text_layer_pages(pdf)
+
+
+def ocr_pdf_pages(path: str, pages: List[int]) -> List[Dict[str, Any]]:
+    """Vision OCR of ``pages`` of the PDF at ``path``.
+
+    Network-bound: callers run it on a thread, not in the pool.
+    """
+    from backend.pdf_document import PdfDocument
+    from backend.vision_parser import ocr_pages_to_text
+
+    with PdfDocument.open_file(path) as pdf:
+        return ocr_pages_to_text(pdf, pages)
+
+
+def unlock_pdf(source: Union[bytes, str], password: Optional[str] = None) -> Optional[bytes]:
+    """Decrypted bytes of a password-protected PDF (bytes or a file path).
+
+    Returns None when the PDF is not encrypted (or PyMuPDF cannot open it),
+    so callers keep the bytes they already have.
+    """
+    try:
+        if isinstance(source, str):
+            doc = fitz.open(source, filetype="pdf")
+        else:
+            doc = fitz.open(stream=source, filetype="pdf")
+    except Exception:
+        return None
+
+    try:
+        if not doc.needs_pass:
+            return None
+
+        password = (password or "").strip()
+        if not password:
+            raise PdfPasswordRequired()
+        if not doc.authenticate(password):
+            raise PdfPasswordInvalid()
+
+        return doc.tobytes(encryption=fitz.PDF_ENCRYPT_NONE, garbage=4, deflate=True)
+    finally:
+        doc.close()
@@ -0,0 +1,188 @@
+"""Who is calling: the authenticated user's identity, loaded once per request.
+
+Handlers used to look up the ``User`` row, then the ``Patient`` row, then the
+active subscription, and the helpers they call (``get_upload_allowance``,
+``get_ai_allowance``, ``_ensure_doctor_access``, ...) looked the same rows up
+again; a V2 upload re-read the user and subscription four or more times.
+
+``load_principal`` builds a detached, immutable :class:`Principal` instead:
+
+* once per request: it is memoized on the ``Session`` (``get_db`` opens one
+  per request), so every helper that gets the same ``db`` shares it;
+* across requests: the identity part is served from the ``principal``
+  read-cache namespace and the subscription from the ``subscription``
+  namespace, both with a short TTL and evicted when a commit writes the
+  user's ``User``, ``Patient`` or ``Subscription`` rows.
+
+Usage counters (free uploads, AI messages) are deliberately not part of it:
+they move with every upload or message and ``entitlements`` reads them fresh.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+import datetime as dt
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.database import Patient, Subscription, User
+from backend.read_cache import get_or_build, invalidate_after_commit, register_namespace
+
+
+ACTIVE_SUBSCRIPTION_STATUSES = ("active", "trialing")
+_REQUEST_KEY = "principal"
+_WRITTEN_KEY = "principal_written"
+
+
+@dataclass(frozen=True)
+class ActiveSubscription:
+    """Detached copy of the fields entitlement checks read from a Subscription."""
+
+    id: int
+    user_id: int
+    status: str
+    period_start: dt.datetime | None
+    period_end: dt.datetime | None
+    trial_end: dt.datetime | None
+    created_at: dt.datetime | None
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Detached snapshot of the authenticated user; safe to cache and share."""
+
+    id: int
+    email: str
+    full_name: str | None
+    is_active: bool
+    is_doctor: bool
+    email_verified: bool
+    patient_id: int | None
+    subscription: ActiveSubscription | None = None
+
+    @property
+    def has_subscription(self) -> bool:
+        return self.subscription is not None
+
+
+register_namespace("subscription", maxsize=4096, ttl_sec=30.0)
+register_namespace("principal", maxsize=4096, ttl_sec=30.0)
+
+
+def _load_active_subscription(db: Session, user_id: int) -> ActiveSubscription | None:
+    subscription = (
+        db.query(Subscription)
+        .filter(
+            Subscription.user_id == user_id,
+            Subscription.status.in_(ACTIVE_SUBSCRIPTION_STATUSES),
+        )
+        .order_by(Subscription.id.desc())
+        .first()
+    )
+    if subscription is None:
+        return None
+    return ActiveSubscription(
+        id=subscription.id,
+        user_id=subscription.user_id,
+        status=subscription.status,
+        period_start=subscription.period_start,
+        period_end=subscription.period_end,
+        trial_end=subscription.trial_end,
+        created_at=subscription.created_at,
+    )
+
+
+def active_subscription_for_user(db: Session, user_id: int) -> ActiveSubscription | None:
+    """The user's newest active/trialing subscription, served from the read cache."""
+    return get_or_build("subscription", (user_id,), lambda: _load_active_subscription(db, user_id))
+
+
+def _load_identity(db: Session, user_id: int) -> Principal | None:
+    row = (
+        db.query(
+            User.id,
+            User.email,
+            User.full_name,
+            User.is_active,
+            User.is_doctor,
+            User.email_verified_at,
+            Patient.id.label("patient_id"),
+        )
+        .outerjoin(Patient, Patient.user_id == User.id)
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return Principal(
+        id=row.id,
+        email=row.email,
+        full_name=row.full_name,
+        is_active=bool(row.is_active),
+        is_doctor=bool(row.is_doctor),
+        email_verified=row.email_verified_at is not None,
+        patient_id=row.patient_id,
+    )
+
+
+def load_principal(db: Session, user_id: int) -> Principal | None:
+    """The principal for ``user_id`` (None if the user does not exist), once per session."""
+    memo: Dict[int, Optional[Principal]] = db.info.setdefault(_REQUEST_KEY, {})
+    if user_id in memo:
+        return memo[user_id]
+    principal = get_or_build("principal", (user_id,), lambda: _load_identity(db, user_id))
+    if principal is not None:
+        principal = replace(principal, subscription=active_subscription_for_user(db, user_id))
+    memo[user_id] = principal
+    return principal
+
+
+def require_principal(db: Session, user_id: int) -> Principal:
+    principal = load_principal(db, user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+def _forget(session: Session, user_ids) -> None:
+    memo = session.info.get(_REQUEST_KEY)
+    if memo:
+        for user_id in user_ids:
+            memo.pop(user_id, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_identity_writes(session: Session, _flush_context) -> None:
+    user_ids: set[int] = set()
+    subscription_user_ids: set[int] = set()
+    for collection in (session.new, session.dirty, session.deleted):
+        for obj in collection:
+            if isinstance(obj, User):
+                user_ids.add(obj.id)
+            elif isinstance(obj, Patient):
+                user_ids.add(obj.user_id)
+            elif isinstance(obj, Subscription):
+                user_ids.add(obj.user_id)
+                subscription_user_ids.add(obj.user_id)
+    if not user_ids:
+        return
+    _forget(session, user_ids)
+    # Forgotten again at commit: a load between this flush and the commit may
+    # have memoized the cached (pre-commit) identity.
+    session.info.setdefault(_WRITTEN_KEY, set()).update(user_ids)
+    invalidate_after_commit(session, user_ids, ("principal",))
+    if subscription_user_ids:
+        invalidate_after_commit(session, subscription_user_ids, ("subscription",))
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_writes(session: Session) -> None:
+    _forget(session, session.info.pop(_WRITTEN_KEY, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session: Session) -> None:
+    _forget(session, session.info.pop(_WRITTEN_KEY, ()))
@@ -0,0 +1,307 @@
+"""In-process LRU/TTL tier for hot per-user read models.
+
+Each namespace ("lab_snapshot", "analyte_list", "subscription", ...) is a
+small bounded LRU keyed by tuples that start with the owning user id. The
+tier sits in front of Redis or the database. Staleness is bounded by:
+
+* writes register invalidations on the SQLAlchemy session
+  (``invalidate_after_commit``); after commit they evict locally and are
+  published on the ``read_cache:invalidate`` Redis channel, so every
+  gunicorn/Celery process evicts the same users;
+* a short per-namespace TTL, in case a message is lost.
+
+The local tier is only used while this process is subscribed to the
+invalidation channel. Without Redis, a worker could not hear about writes
+made by its siblings, so reads go straight to the backing store as before.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "read_cache:invalidate"
+LOCAL_TIER_ENABLED = (os.getenv("READ_CACHE_LOCAL_ENABLED") or "true").strip().lower() in {"1", "true", "yes"}
+
+_ORIGIN = uuid.uuid4().hex
+_PENDING_KEY = "read_cache_pending"
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """Thread-safe bounded LRU with a per-entry TTL; keys are ``(user_id, ...)`` tuples."""
+
+    def __init__(self, namespace: str, maxsize: int, ttl_sec: float) -> None:
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a build that raced one is not stored.
+        self._sequence = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: tuple, value: Any, sequence: Optional[int] = None) -> None:
+        with self._lock:
+            if sequence is not None and sequence != self._sequence:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def sequence(self) -> int:
+        with self._lock:
+            return self._sequence
+
+    def evict_users(self, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        with self._lock:
+            self._sequence += 1
+            for key in [key for key in self._entries if key[0] in user_ids]:
+                del self._entries[key]
+            self.stats["invalidations"] += len(user_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sequence += 1
+            self._entries.clear()
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+_namespaces: Dict[str, LocalLRUCache] = {}
+_invalidation_hooks: Dict[str, Callable[[list[int]], None]] = {}
+_registry_lock = threading.Lock()
+
+
+def register_namespace(
+    namespace: str,
+    *,
+    maxsize: int = 1024,
+    ttl_sec: float = 60.0,
+    on_invalidate: Optional[Callable[[list[int]], None]] = None,
+) -> LocalLRUCache:
+    """Create (or return) the local cache for ``namespace``.
+
+    ``on_invalidate`` runs once per committed write, in the writing process
+    only, before the invalidation is published (e.g. to bump a Redis
+    generation counter).
+    """
+    with _registry_lock:
+        cache = _namespaces.get(namespace)
+        if cache is None:
+            cache = LocalLRUCache(
+                namespace,
+                maxsize=int(os.getenv(f"READ_CACHE_{namespace.upper()}_MAXSIZE", str(maxsize))),
+                ttl_sec=float(os.getenv(f"READ_CACHE_{namespace.upper()}_TTL_SEC", str(ttl_sec))),
+            )
+            _namespaces[namespace] = cache
+        if on_invalidate is not None:
+            _invalidation_hooks[namespace] = on_invalidate
+        return cache
+
+
+def read_cache_stats() -> Dict[str, Any]:
+    return {
+        "localTierActive": _subscriber_ready.is_set(),
+        "namespaces": {name: cache.snapshot_stats() for name, cache in sorted(_namespaces.items())},
+    }
+
+
+# ── Cross-process invalidation ───────────────────────────────────────────
+
+_subscriber_ready = threading.Event()
+_subscriber_stop = threading.Event()
+_subscriber_lock = threading.Lock()
+_subscriber_thread: Optional[threading.Thread] = None
+
+
+def _redis():
+    # Imported lazily: backend.deps imports backend.tasks, which imports the cache modules.
+    from backend.deps import _get_redis
+
+    return _get_redis()
+
+
+def _report_redis_failure() -> None:
+    from backend.deps import _report_redis_failure as report
+
+    report()
+
+
+def _apply_invalidation(user_ids: Iterable[int], namespaces: Optional[Iterable[str]]) -> None:
+    user_ids = [int(user_id) for user_id in user_ids]
+    names = list(namespaces) if namespaces is not None else list(_namespaces)
+    for name in names:
+        cache = _namespaces.get(name)
+        if cache is not None:
+            cache.evict_users(user_ids)
+
+
+def _clear_all() -> None:
+    for cache in list(_namespaces.values()):
+        cache.clear()
+
+
+def _subscriber_loop(client) -> None:
+    global _subscriber_thread
+    pubsub = None
+    try:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(INVALIDATION_CHANNEL)
+        # Entries cached before the subscription may have missed invalidations.
+        _clear_all()
+        _subscriber_ready.set()
+        while not _subscriber_stop.is_set():
+            # Poll below the client's socket timeout so an idle channel is not an error.
+            message = pubsub.get_message(timeout=1.0)
+            if not message or message.get("type") != "message":
+                continue
+            try:
+                payload = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            if payload.get("origin") == _ORIGIN:
+                continue
+            _apply_invalidation(payload.get("user_ids") or [], payload.get("namespaces"))
+    except Exception:
+        logger.warning("Read cache invalidation subscriber stopped; local tier disabled", exc_info=True)
+        _report_redis_failure()
+    finally:
+        _subscriber_ready.clear()
+        _clear_all()
+        with _subscriber_lock:
+            _subscriber_thread = None
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+def local_tier_active() -> bool:
+    """True while this process receives invalidations; starts the subscriber on demand."""
+    global _subscriber_thread
+    if not LOCAL_TIER_ENABLED:
+        return False
+    if _subscriber_ready.is_set():
+        return True
+    with _subscriber_lock:
+        if _subscriber_thread is None:
+            client = _redis()
+            if client is None:
+                return False
+            _subscriber_thread = threading.Thread(
+                target=_subscriber_loop, args=(client,), name="read-cache-invalidation", daemon=True
+            )
+            _subscriber_thread.start()
+    # Serve from the backing store until the subscription is confirmed.
+    return _subscriber_ready.is_set()
+
+
+def stop_invalidation_subscriber(timeout: float = 5.0) -> None:
+    """Stop the subscriber thread and drop the local tier (app shutdown, tests)."""
+    with _subscriber_lock:
+        thread = _subscriber_thread
+    if thread is not None:
+        _subscriber_stop.set()
+        thread.join(timeout)
+    _subscriber_stop.clear()
+    _clear_all()
+
+
+def invalidate_users(user_ids: Iterable[int], namespaces: Iterable[str]) -> None:
+    """Evict users' entries here, run namespace hooks, and tell the other processes."""
+    user_ids = sorted({int(user_id) for user_id in user_ids if user_id is not None})
+    namespaces = sorted(set(namespaces))
+    if not user_ids or not namespaces:
+        return
+    for name in namespaces:
+        hook = _invalidation_hooks.get(name)
+        if hook is not None:
+            hook(user_ids)
+    _apply_invalidation(user_ids, namespaces)
+    client = _redis()
+    if client is None:
+        return
+    try:
+        client.publish(
+            INVALIDATION_CHANNEL,
+            json.dumps({"origin": _ORIGIN, "user_ids": user_ids, "namespaces": namespaces}),
+        )
+    except Exception:
+        logger.warning("Failed to publish read cache invalidation for users=%s", user_ids, exc_info=True)
+        _report_redis_failure()
+
+
+def get_or_build(namespace: str, key: tuple, build: Callable[[], Any]) -> Any:
+    """Serve ``key`` from the local tier, calling ``build`` (Redis/DB) on a miss."""
+    cache = _namespaces[namespace]
+    if not local_tier_active():
+        return build()
+    value = cache.get(key)
+    if value is not _MISSING:
+        return value
+    sequence = cache.sequence()
+    value = build()
+    cache.set(key, value, sequence=sequence)
+    return value
+
+
+# ── Session integration ──────────────────────────────────────────────────
+
+def invalidate_after_commit(session: Session, user_ids: Iterable[int], namespaces: Iterable[str]) -> None:
+    """Queue an invalidation that fires when ``session`` commits (dropped on rollback)."""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for name in namespaces:
+        pending.setdefault(name, set()).update(user_id for user_id in user_ids if user_id is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _flush_pending_invalidations(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    by_users: Dict[tuple, set] = {}
+    for name, user_ids in pending.items():
+        if user_ids:
+            by_users.setdefault(tuple(sorted(user_ids)), set()).add(name)
+    for user_ids, namespaces in by_users.items():
+        invalidate_users(user_ids, namespaces)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_invalidations(session: Session, _previous_transaction) -> None:
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,170 @@
+"""Benchmark ingestion writes: one ORM INSERT per row vs the bulk insert path.
+
+Parses every PDF in a directory with the legacy text parser (no OCR, no
+LLM), then writes each document's rows into a scratch database repeatedly:
+``LabResult`` rows as ``save_parsed_records`` builds them and ``V2Metric``
+rows shaped like ``_persist_v2_document``'s. ``per-row`` adds ORM objects
+and flushes; ``bulk`` goes through ``backend.bulk_insert``. Each write is
+committed, so the timings include the transaction.
+
+    python -m backend.scripts.bench_bulk_insert --pdf-dir samples/pdfs --repeat 20
+    python -m backend.scripts.bench_bulk_insert --db-url postgresql://.../bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.bulk_insert import LAB_RESULT_COLUMNS, insert_lab_results, insert_v2_metrics
+from backend.database import Base, LabResult, Patient, User, V2Document, V2Metric, save_parsed_records
+from backend.parsing.lab_parser_v0 import parse_raw_text
+from backend.parsing.pipeline import extract_report_date
+from backend.pdf_document import PdfDocument
+from backend.pdf_parser import extract_raw_text
+
+
+def _parse_records(path: Path) -> list[dict]:
+    with PdfDocument.open(path.read_bytes()) as pdf:
+        raw_text = extract_raw_text(pdf)
+    report_date, report_source = extract_report_date(raw_text)
+    return parse_raw_text(raw_text, default_date=report_date, taken_at_source=report_source)
+
+
+def _lab_rows(session, patient_id: int, records: list[dict], name: str) -> list[dict]:
+    """The rows ``save_parsed_records`` writes for ``records`` (dedup and normalization included)."""
+    save_parsed_records(session, patient_id, records, name, f"seed-{name}")
+    columns = [getattr(LabResult, column) for column in LAB_RESULT_COLUMNS if column != "created_at"]
+    rows = session.execute(select(*columns).where(LabResult.document_hash == f"seed-{name}")).all()
+    return [dict(row._mapping) for row in rows]
+
+
+def _metric_rows(lab_rows: list[dict]) -> list[dict]:
+    return [
+        {
+            "analyte_key": row["series_key"] or row["analyte_name"],
+            "raw_name": row["analyte_name"],
+            "specimen": "unknown",
+            "context": "unknown",
+            "value_numeric": row["value"],
+            "value_text": row["value_text"],
+            "unit": row["unit"],
+            "reference_json": {"type": "range", "min": row["ref_min"], "max": row["ref_max"]},
+            "page": 1,
+            "evidence": row["analyte_name"],
+        }
+        for row in lab_rows
+    ]
+
+
+def _new_document(session, user_id: int) -> V2Document:
+    document = V2Document(user_id=user_id, document_hash=f"bench-{time.perf_counter_ns()}",
+                          analysis_date=dt.datetime.utcnow())
+    session.add(document)
+    session.flush()
+    return document
+
+
+def _lab_per_row(session, _user_id, rows):
+    session.add_all(LabResult(**row) for row in rows)
+    session.commit()
+
+
+def _lab_bulk(session, _user_id, rows):
+    insert_lab_results(session, rows)
+    session.commit()
+
+
+def _v2_per_row(session, user_id, rows):
+    document = _new_document(session, user_id)
+    session.add_all(
+        V2Metric(document_id=document.id, user_id=user_id, effective_dt=document.analysis_date, **row)
+        for row in rows
+    )
+    session.commit()
+
+
+def _v2_bulk(session, user_id, rows):
+    document = _new_document(session, user_id)
+    insert_v2_metrics(
+        session,
+        ({"document_id": document.id, "user_id": user_id, "effective_dt": document.analysis_date, **row}
+         for row in rows),
+    )
+    session.commit()
+
+
+def _time(session, fn, user_id: int, rows: list[dict], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(session, user_id, rows)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-row vs bulk ingestion inserts.")
+    parser.add_argument("--pdf-dir", default="samples/pdfs", help="Directory with sample PDFs.")
+    parser.add_argument("--db-url", default=None, help="Scratch database URL (default: temporary SQLite file).")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.pdf_dir).glob("*.pdf"))
+    if not paths:
+        print(f"[BENCH] no PDFs found in {args.pdf_dir}")
+        return 1
+
+    tmpdir = None
+    db_url = args.db_url
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{Path(tmpdir.name) / 'bench.db'}"
+
+    engine = create_engine(db_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    totals = {"lab per-row": 0.0, "lab bulk": 0.0, "v2 per-row": 0.0, "v2 bulk": 0.0}
+    try:
+        user = User(email="bench@test.local", hashed_password="x", is_active=True, is_doctor=False)
+        session.add(user)
+        session.flush()
+        patient = Patient(user_id=user.id, full_name="Bench")
+        session.add(patient)
+        session.commit()
+
+        for path in paths:
+            lab_rows = _lab_rows(session, patient.id, _parse_records(path), path.name)
+            metric_rows = _metric_rows(lab_rows)
+            timings = {
+                "lab per-row": _time(session, _lab_per_row, user.id, lab_rows, args.repeat),
+                "lab bulk": _time(session, _lab_bulk, user.id, lab_rows, args.repeat),
+                "v2 per-row": _time(session, _v2_per_row, user.id, metric_rows, args.repeat),
+                "v2 bulk": _time(session, _v2_bulk, user.id, metric_rows, args.repeat),
+            }
+            for label, ms in timings.items():
+                totals[label] += ms
+            print(f"{path.name:<24} rows={len(lab_rows):<4} " + "  ".join(
+                f"{label}={ms:7.2f} ms" for label, ms in timings.items()
+            ))
+        print(f"{'total':<24} ({engine.dialect.name}) " + "  ".join(
+            f"{label}={ms:.1f} ms" for label, ms in totals.items()
+        ))
+    finally:
+        session.close()
+        engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,186 @@
+"""Benchmark the consultation inbox: per-grant serialization vs the batched read model.
+
+Seeds a scratch database with one doctor holding N grants (each with a thread
+and a few messages), then times and counts the queries of the old
+``list_consultations`` loop (latest thread + ``_serialize_consultation_thread``
+per grant) against ``_build_consultation_inbox``.
+
+    python -m backend.scripts.bench_consultation_inbox --threads 10 100 1000
+    python -m backend.scripts.bench_consultation_inbox --db-url postgresql://.../bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.consultation_routes import _build_consultation_inbox, _serialize_consultation_thread
+from backend.database import Base, ConsultationMessage, ConsultationThread, DoctorGrant, Patient, User
+
+
+def _seed(session_factory, threads: int, messages_per_thread: int) -> int:
+    session = session_factory()
+    try:
+        doctor = User(email="bench-doctor@test.local", hashed_password="x", is_active=True, is_doctor=True)
+        session.add(doctor)
+        session.commit()
+
+        owners = [
+            {"email": f"bench-patient-{i}@test.local", "hashed_password": "x", "is_active": True, "is_doctor": False}
+            for i in range(threads)
+        ]
+        session.execute(insert(User), owners)
+        owner_ids = [
+            row.id for row in session.query(User.id).filter(User.is_doctor.is_(False)).order_by(User.id.asc())
+        ]
+        session.execute(
+            insert(Patient), [{"user_id": owner_id, "full_name": f"Paciente {owner_id}"} for owner_id in owner_ids]
+        )
+        patients = session.query(Patient.id, Patient.user_id).order_by(Patient.id.asc()).all()
+
+        start = dt.datetime.utcnow() - dt.timedelta(days=30)
+        session.execute(
+            insert(DoctorGrant),
+            [
+                {
+                    "patient_id": patient.id,
+                    "doctor_id": doctor.id,
+                    "doctor_email": doctor.email,
+                    "granted_at": start + dt.timedelta(minutes=index),
+                }
+                for index, patient in enumerate(patients)
+            ],
+        )
+        grants = session.query(DoctorGrant.id, DoctorGrant.patient_id).order_by(DoctorGrant.id.asc()).all()
+        owner_by_patient = {patient.id: patient.user_id for patient in patients}
+        session.execute(
+            insert(ConsultationThread),
+            [
+                {
+                    "patient_id": grant.patient_id,
+                    "doctor_id": doctor.id,
+                    "grant_id": grant.id,
+                    "created_by_user_id": owner_by_patient[grant.patient_id],
+                    "created_at": start,
+                    "updated_at": start + dt.timedelta(minutes=index),
+                }
+                for index, grant in enumerate(grants)
+            ],
+        )
+        thread_rows = session.query(ConsultationThread.id, ConsultationThread.patient_id).all()
+        messages = []
+        for thread in thread_rows:
+            for offset in range(messages_per_thread):
+                sender = doctor.id if offset % 2 else owner_by_patient[thread.patient_id]
+                messages.append(
+                    {
+                        "thread_id": thread.id,
+                        "sender_user_id": sender,
+                        "body": f"Mensaje {offset} de la consulta {thread.id}. " * 4,
+                        "created_at": start + dt.timedelta(minutes=offset),
+                        "read_at": None if offset >= messages_per_thread - 2 else start,
+                    }
+                )
+        session.execute(insert(ConsultationMessage), messages)
+        session.commit()
+        session.execute(text("ANALYZE"))
+        session.commit()
+        return doctor.id
+    finally:
+        session.close()
+
+
+def _grants(db, doctor_id: int):
+    return (
+        db.query(DoctorGrant)
+        .filter(DoctorGrant.doctor_id == doctor_id, DoctorGrant.revoked_at.is_(None))
+        .order_by(DoctorGrant.granted_at.desc(), DoctorGrant.id.desc())
+        .all()
+    )
+
+
+def _legacy_inbox(db, doctor_id: int):
+    """The pre-read-model list_consultations loop."""
+    items = []
+    for grant in _grants(db, doctor_id):
+        thread = (
+            db.query(ConsultationThread)
+            .filter(ConsultationThread.grant_id == grant.id)
+            .order_by(ConsultationThread.updated_at.desc(), ConsultationThread.id.desc())
+            .first()
+        )
+        items.append(_serialize_consultation_thread(db, thread, grant, doctor_id))
+    return items
+
+
+def _batched_inbox(db, doctor_id: int):
+    return _build_consultation_inbox(db, _grants(db, doctor_id), doctor_id)
+
+
+def _time(label: str, session_factory, fn, doctor_id: int, repeat: int) -> None:
+    samples, statements = [], []
+
+    def _count(*_args):
+        statements.append(1)
+
+    for _ in range(repeat):
+        db = session_factory()
+        try:
+            event.listen(db.get_bind(), "before_cursor_execute", _count)
+            statements.clear()
+            started = time.perf_counter()
+            fn(db, doctor_id)
+            samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", _count)
+            db.close()
+    print(
+        f"{label:<24} median={statistics.median(samples):8.1f} ms  "
+        f"min={min(samples):8.1f} ms  queries={len(statements)}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the consultation inbox query.")
+    parser.add_argument("--db-url", default=None, help="Scratch database URL (default: temporary SQLite file).")
+    parser.add_argument("--threads", type=int, nargs="+", default=[10, 100, 1000], help="Inbox sizes to run.")
+    parser.add_argument("--messages", type=int, default=20, help="Messages per thread.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        tmpdir = None
+        db_url = args.db_url
+        if db_url is None:
+            tmpdir = tempfile.TemporaryDirectory()
+            db_url = f"sqlite:///{Path(tmpdir.name) / 'bench.db'}"
+
+        engine = create_engine(db_url)
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        try:
+            started = time.perf_counter()
+            doctor_id = _seed(session_factory, threads, args.messages)
+            print(
+                f"[BENCH] threads={threads} messages/thread={args.messages} "
+                f"seeded in {time.perf_counter() - started:.1f}s ({engine.dialect.name})"
+            )
+            _time(f"inbox({threads}) per-grant", session_factory, _legacy_inbox, doctor_id, args.repeat)
+            _time(f"inbox({threads}) batched", session_factory, _batched_inbox, doctor_id, args.repeat)
+        finally:
+            engine.dispose()
+            if tmpdir is not None:
+                tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+"""Benchmark lab_parser_v0 throughput on large concatenated reports.
+
+Extracts the text layer of every PDF in a directory (plus the text fixtures
+of the parser tests), concatenates it ``--copies`` times at several sizes and
+reports parsed lines/sec. Throughput should stay flat as the input grows;
+a drop at the larger sizes means some step is no longer linear in the
+number of lines.
+
+    python -m backend.scripts.bench_lab_parser --pdf-dir samples/pdfs --copies 1 10 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from backend.parsing.lab_parser_v0 import parse_raw_text
+from backend.pdf_document import PdfDocument
+from backend.pdf_parser import extract_raw_text
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "tests" / "fixtures"
+
+
+def _corpus(pdf_dir: Path) -> list[str]:
+    texts = []
+    for path in sorted(pdf_dir.glob("*.pdf")):
+        with PdfDocument.open(path.read_bytes()) as pdf:
+            texts.append(extract_raw_text(pdf))
+    for path in sorted(FIXTURES_DIR.glob("*.txt")):
+        texts.append(path.read_text(encoding="utf-8"))
+    return texts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark lab_parser_v0 lines/sec.")
+    parser.add_argument("--pdf-dir", default="samples/pdfs", help="Directory with sample PDFs.")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 100],
+                        help="How many times to concatenate the corpus, one run per value.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = _corpus(Path(args.pdf_dir))
+    if not texts:
+        print(f"[BENCH] no PDFs in {args.pdf_dir} and no fixtures in {FIXTURES_DIR}")
+        return 1
+    report = "\n".join(texts)
+
+    for copies in args.copies:
+        raw_text = "\n".join([report] * copies)
+        lines = len(raw_text.splitlines())
+        samples = []
+        records = 0
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            records = len(parse_raw_text(raw_text))
+            samples.append(time.perf_counter() - started)
+        elapsed = statistics.median(samples)
+        print(
+            f"copies={copies:<5} lines={lines:<8} records={records:<7} "
+            f"median={elapsed * 1000:9.1f} ms  {lines / elapsed:12,.0f} lines/s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
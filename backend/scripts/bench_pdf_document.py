@@ -0,0 +1,85 @@
+"""Benchmark the legacy PDF pre-processing steps: bytes per call vs one shared PdfDocument.
+
+Runs the non-LLM steps of the legacy import path (text layer, vision page
+selection, page enumeration and image extraction) over every PDF in a
+directory. First each step gets the raw bytes and opens the PDF itself, then
+all of them share one ``PdfDocument``. Reports CPU time and ``fitz.open``
+calls per document.
+
+    python -m backend.scripts.bench_pdf_document --pdf-dir samples/pdfs --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from backend import pdf_document
+from backend.parsing.pipeline import _all_page_indices
+from backend.pdf_document import PdfDocument, PdfSource
+from backend.pdf_parser import extract_text_from_pdf
+from backend.vision_parser import _extract_page_text_and_images, select_pages_for_vision
+
+
+def _run_steps(source: PdfSource) -> None:
+    extract_text_from_pdf(source)
+    pages = select_pages_for_vision(source) or _all_page_indices(source)
+    _extract_page_text_and_images(source, page_indices=pages)
+
+
+def _per_call(pdf_bytes: bytes) -> None:
+    _run_steps(pdf_bytes)
+
+
+def _shared(pdf_bytes: bytes) -> None:
+    with PdfDocument.open(pdf_bytes) as pdf:
+        _run_steps(pdf)
+
+
+def _measure(fn, pdf_bytes: bytes, repeat: int) -> tuple[float, int]:
+    opens = 0
+    real_open = pdf_document.fitz.open
+
+    def _counting_open(*args, **kwargs):
+        nonlocal opens
+        opens += 1
+        return real_open(*args, **kwargs)
+
+    samples = []
+    pdf_document.fitz.open = _counting_open
+    try:
+        for _ in range(repeat):
+            started = time.process_time()
+            fn(pdf_bytes)
+            samples.append((time.process_time() - started) * 1000)
+    finally:
+        pdf_document.fitz.open = real_open
+    return statistics.median(samples), opens // repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark shared PdfDocument handles.")
+    parser.add_argument("--pdf-dir", default="samples/pdfs", help="Directory with sample PDFs.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.pdf_dir).glob("*.pdf"))
+    if not paths:
+        print(f"[BENCH] no PDFs found in {args.pdf_dir}")
+        return 1
+
+    totals = {"per-call": 0.0, "shared": 0.0}
+    for path in paths:
+        pdf_bytes = path.read_bytes()
+        for label, fn in (("per-call", _per_call), ("shared", _shared)):
+            cpu_ms, opens = _measure(fn, pdf_bytes, args.repeat)
+            totals[label] += cpu_ms
+            print(f"{path.name:<24} {label:<9} cpu={cpu_ms:8.1f} ms  opens={opens}")
+    print(f"{'total':<24} per-call={totals['per-call']:.1f} ms  shared={totals['shared']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,192 @@
+"""Benchmark V2 series/summary reads: legacy join queries vs the denormalized index.
+
+Seeds a scratch database with many documents per user, then times the old
+``v2_documents`` join/filter/sort shape against the current helpers that read
+``v2_metrics.user_id``/``effective_dt`` through ix_v2_metrics_user_analyte_dt.
+
+    python -m backend.scripts.bench_v2_series --docs 10000 --users 3
+    python -m backend.scripts.bench_v2_series --db-url postgresql://.../bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, User, V2Document, V2Metric
+from backend.utils import _summarize_metrics_v2
+from backend.v2_routes import _query_v2_series_rows_for_user
+
+ANALYTES = [
+    "CREATININE_SERUM", "UREA_SERUM", "POTASSIUM_SERUM", "SODIUM_SERUM", "GLUCOSE_SERUM",
+    "HEMOGLOBIN_BLOOD", "ALBUMIN_SERUM", "CALCIUM_SERUM", "PHOSPHORUS_SERUM", "URIC_ACID_SERUM",
+    "ALT_SERUM", "AST_SERUM", "CHOLESTEROL_SERUM", "TRIGLYCERIDES_SERUM", "PTH_SERUM",
+]
+
+
+def _seed(session_factory, users: int, docs_per_user: int, metrics_per_doc: int) -> list[int]:
+    session = session_factory()
+    try:
+        user_rows = [
+            User(email=f"bench-{i}@test.local", hashed_password="x", is_active=True, is_doctor=False)
+            for i in range(users)
+        ]
+        session.add_all(user_rows)
+        session.commit()
+        user_ids = [user.id for user in user_rows]
+
+        # Twice-daily uploads ending today, so the 180-day window holds recent data.
+        start = dt.datetime.utcnow() - dt.timedelta(hours=docs_per_user * 12)
+        for user_id in user_ids:
+            documents, metrics = [], []
+            for index in range(docs_per_user):
+                doc_id = str(uuid.uuid4())
+                analysis_date = start + dt.timedelta(hours=index * 12)
+                documents.append(
+                    {
+                        "id": doc_id,
+                        "user_id": user_id,
+                        "document_hash": f"{user_id}-{index}",
+                        "analysis_date": analysis_date,
+                        "created_at": analysis_date,
+                    }
+                )
+                for offset in range(metrics_per_doc):
+                    analyte_key = ANALYTES[(index + offset) % len(ANALYTES)]
+                    metrics.append(
+                        {
+                            "id": str(uuid.uuid4()),
+                            "document_id": doc_id,
+                            "user_id": user_id,
+                            "effective_dt": analysis_date,
+                            "analyte_key": analyte_key,
+                            "raw_name": analyte_key.split("_")[0],
+                            "specimen": "serum",
+                            "context": "random",
+                            "value_numeric": float(index % 97),
+                            "unit": "mg/dL",
+                            "reference_json": {"type": "range", "min": 1, "max": 90},
+                            "page": 1,
+                            "evidence": analyte_key,
+                        }
+                    )
+            session.execute(insert(V2Document), documents)
+            session.execute(insert(V2Metric), metrics)
+            session.commit()
+        if session.bind.dialect.name == "postgresql":
+            session.execute(text("ANALYZE v2_documents"))
+            session.execute(text("ANALYZE v2_metrics"))
+        else:
+            session.execute(text("ANALYZE"))
+        session.commit()
+        return user_ids
+    finally:
+        session.close()
+
+
+def _legacy_series(db, user_id: int, analyte_key: str):
+    dt_expr = func.coalesce(V2Document.analysis_date, V2Document.created_at)
+    return (
+        db.query(V2Metric, V2Document, dt_expr.label("dt"))
+        .join(V2Document, V2Metric.document_id == V2Document.id)
+        .filter(V2Document.user_id == user_id, V2Metric.analyte_key == analyte_key)
+        .order_by(dt_expr.asc(), V2Document.id.asc(), V2Metric.id.asc())
+        .all()
+    )
+
+
+def _legacy_summary(db, user_id: int, days: int):
+    """The pre-denormalization _summarize_metrics_v2: join, sort, then keep 5 per key in Python."""
+    since = dt.datetime.utcnow() - dt.timedelta(days=days)
+    dt_expr = func.coalesce(V2Document.analysis_date, V2Document.created_at)
+    rows = (
+        db.query(V2Metric, dt_expr.label("dt"))
+        .join(V2Document, V2Metric.document_id == V2Document.id)
+        .filter(V2Document.user_id == user_id)
+        .filter(dt_expr >= since)
+        .order_by(V2Metric.analyte_key.asc(), dt_expr.desc(), V2Metric.id.desc())
+        .all()
+    )
+    grouped: dict[str, list] = {}
+    for metric, ts in rows:
+        grouped.setdefault(metric.analyte_key, []).append((ts, metric.value_numeric))
+    return {key: values[:5] for key, values in grouped.items()}
+
+
+def _print_plan(db, query) -> None:
+    compiled = query.statement.compile(db.bind, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN" if db.bind.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN"
+    for row in db.execute(text(f"{prefix} {compiled}")):
+        print(f"    {row[-1]}")
+
+
+def _time(label: str, fn, repeat: int) -> None:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<28} median={statistics.median(samples):8.1f} ms  min={min(samples):8.1f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark V2 series/summary queries.")
+    parser.add_argument("--db-url", default=None, help="Scratch database URL (default: temporary SQLite file).")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--docs", type=int, default=10000, help="Documents per user.")
+    parser.add_argument("--metrics", type=int, default=8, help="Metrics per document.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = None
+    db_url = args.db_url
+    if db_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{Path(tmpdir.name) / 'bench.db'}"
+
+    engine = create_engine(db_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    started = time.perf_counter()
+    user_ids = _seed(session_factory, args.users, args.docs, args.metrics)
+    print(
+        f"[BENCH] seeded users={args.users} docs/user={args.docs} metrics/doc={args.metrics} "
+        f"in {time.perf_counter() - started:.1f}s ({engine.dialect.name})"
+    )
+
+    user_id = user_ids[len(user_ids) // 2]
+    db = session_factory()
+    try:
+        print("[BENCH] series plan (denormalized):")
+        _print_plan(
+            db,
+            db.query(V2Metric.id)
+            .filter(V2Metric.user_id == user_id, V2Metric.analyte_key == "CREATININE_SERUM")
+            .order_by(V2Metric.effective_dt.asc()),
+        )
+        _time("series legacy join", lambda: _legacy_series(db, user_id, "CREATININE_SERUM"), args.repeat)
+        _time("series denormalized", lambda: _query_v2_series_rows_for_user(db, user_id, "CREATININE_SERUM"), args.repeat)
+        _time("summary(180d) legacy join", lambda: _legacy_summary(db, user_id, 180), args.repeat)
+        _time("summary(180d) current", lambda: _summarize_metrics_v2(db, user_id, None, 180), args.repeat)
+        _time("summary(all) legacy join", lambda: _legacy_summary(db, user_id, 36500), args.repeat)
+        _time("summary(all) current", lambda: _summarize_metrics_v2(db, user_id, None, 36500), args.repeat)
+    finally:
+        db.close()
+        engine.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+"""Rewrite legacy Fernet-encrypted uploads in the chunked AES-GCM container format.
+
+Walks UPLOAD_DIR (or --upload-dir) and re-encrypts every file that is not
+already a container. Each file is decrypted to a temp file next to it,
+re-encrypted, and swapped in with an atomic rename, so an interrupted run
+leaves every file readable.
+
+    python -m backend.scripts.migrate_upload_encryption --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+
+from backend.encryption import DecryptionError, decrypt_file, encrypt_file, is_container
+
+
+def _migrate(path: str) -> None:
+    directory = os.path.dirname(path) or "."
+    fd, plain_path = tempfile.mkstemp(prefix=".migrate-", dir=directory)
+    os.close(fd)
+    fd, cipher_path = tempfile.mkstemp(prefix=".migrate-", dir=directory)
+    os.close(fd)
+    try:
+        decrypt_file(path, plain_path)
+        encrypt_file(plain_path, cipher_path)
+        os.replace(cipher_path, path)
+    finally:
+        for leftover in (plain_path, cipher_path):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Migrate stored uploads to the chunked encryption format.")
+    parser.add_argument("--upload-dir", default=os.getenv("UPLOAD_DIR", "uploads"))
+    parser.add_argument("--dry-run", action="store_true", help="Only report which files would be rewritten.")
+    args = parser.parse_args()
+
+    migrated = skipped = failed = 0
+    for root, _dirs, files in os.walk(args.upload_dir):
+        for name in sorted(files):
+            if name.startswith(".migrate-"):
+                continue
+            path = os.path.join(root, name)
+            if is_container(path):
+                skipped += 1
+                continue
+            if args.dry_run:
+                print(f"[MIGRATE] would rewrite {path}")
+                migrated += 1
+                continue
+            try:
+                _migrate(path)
+                migrated += 1
+            except DecryptionError as exc:
+                failed += 1
+                print(f"[MIGRATE] cannot read {path}: {exc}")
+    print(f"[MIGRATE] rewritten={migrated} already_current={skipped} unreadable={failed} dry_run={args.dry_run}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,36 @@
+"""Rebuild the v2_analyte_latest projection from v2_metrics."""
+
+from __future__ import annotations
+
+import argparse
+
+from backend.analyte_latest import rebuild_analyte_latest
+from backend.database import SessionLocal
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild the per-user latest analyte projection.")
+    parser.add_argument(
+        "--user-id",
+        type=int,
+        default=None,
+        help="Only rebuild rows for this user (default: all users).",
+    )
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        written = rebuild_analyte_latest(session, user_id=args.user_id)
+        session.commit()
+        scope = f"user_id={args.user_id}" if args.user_id is not None else "all_users"
+        print(f"[ANALYTE_LATEST] rebuilt scope={scope} rows={written}")
+        return 0
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
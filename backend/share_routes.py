@@ -104,9 +104,7 @@ async def grant_doctor_access(
 ):
     """Patient grants access to a doctor by email."""
     # Ensure patient record exists for current user
-    current_user = db.query(User).filter(User.id == user_id).first()
-    if not current_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    current_user = require_principal(db, user_id)
 
     patient = get_patient_for_user(db, user_id)
     if not patient:
@@ -0,0 +1,169 @@
+"""Versioned per-user analyte snapshot cache.
+
+Full (unfiltered) chat lab snapshots are cached in two tiers. The first is
+the in-process ``lab_snapshot`` namespace of ``backend.read_cache``. The
+second is Redis, under ``analyte_snapshot:{user_id}:g{generation}:d{days}``.
+Each user has a generation counter, ``analyte_snapshot_gen:{user_id}``.
+Every committed flush that writes ``V2Document``, ``V2Metric``,
+``V2AnalyteLatest`` or ``LabResult`` rows bumps it and publishes a local-tier
+invalidation, whatever route or worker performed the write. Stale Redis
+snapshots are never read again and simply expire.
+
+Writers that bypass the ORM unit of work (bulk Core statements, raw SQL)
+must call ``bump_lab_data_generation`` themselves.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from backend.database import LabResult, Patient, V2AnalyteLatest, V2Document, V2Metric
+from backend.read_cache import (
+    get_or_build as get_or_build_local,
+    invalidate_after_commit,
+    invalidate_users,
+    register_namespace,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL_SEC = int(os.getenv("ANALYTE_SNAPSHOT_TTL_SEC", str(3 * 3600)))
+# Must outlive any snapshot so an expired counter can never resurrect an old generation.
+GENERATION_TTL_SEC = max(SNAPSHOT_TTL_SEC * 2, 30 * 24 * 3600)
+
+# Read models derived from a user's lab rows; all are dropped on every lab data write.
+LAB_DATA_NAMESPACES = ("lab_snapshot", "analyte_list")
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "invalidations": 0, "errors": 0}
+
+
+def _redis():
+    # Imported lazily: backend.deps imports backend.tasks, which imports this module.
+    from backend.deps import _get_redis
+
+    return _get_redis()
+
+
+def _report_redis_failure() -> None:
+    from backend.deps import _report_redis_failure as report
+
+    report()
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def snapshot_cache_stats() -> Dict[str, Any]:
+    """Process-local counters for the admin metrics endpoint."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+    return stats
+
+
+def _generation_key(user_id: int) -> str:
+    return f"analyte_snapshot_gen:{user_id}"
+
+
+def _snapshot_key(user_id: int, generation: int, days: int) -> str:
+    return f"analyte_snapshot:{user_id}:g{generation}:d{days}"
+
+
+def _bump_redis_generations(user_ids: list[int]) -> None:
+    r = _redis()
+    if r is None:
+        return
+    try:
+        pipe = r.pipeline()
+        for user_id in user_ids:
+            pipe.incr(_generation_key(user_id))
+            pipe.expire(_generation_key(user_id), GENERATION_TTL_SEC)
+        pipe.execute()
+        _count("invalidations", len(user_ids))
+    except Exception:
+        _count("errors")
+        _report_redis_failure()
+        logger.warning("Failed to bump analyte snapshot generation for users=%s", user_ids, exc_info=True)
+
+
+register_namespace("lab_snapshot", maxsize=1024, ttl_sec=60.0, on_invalidate=_bump_redis_generations)
+
+
+def bump_lab_data_generation(user_ids: Iterable[int]) -> None:
+    """Invalidate every cached lab read model of the given users, in all processes."""
+    invalidate_users(user_ids, LAB_DATA_NAMESPACES)
+
+
+def get_or_build_snapshot(user_id: int, days: int, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the user's cached snapshot for ``days``, building and storing it on a miss.
+
+    ``build`` must return a JSON-serializable dict. Callers must not mutate
+    the result: local-tier hits hand out the cached object itself.
+    """
+    return get_or_build_local("lab_snapshot", (user_id, days), lambda: _redis_snapshot(user_id, days, build))
+
+
+def _redis_snapshot(user_id: int, days: int, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    # The generation is read before building, so a write that lands mid-build
+    # stores under a generation nobody reads any more instead of serving stale data.
+    r = _redis()
+    if r is None:
+        _count("bypassed")
+        return build()
+
+    try:
+        generation = int(r.get(_generation_key(user_id)) or 0)
+        key = _snapshot_key(user_id, generation, days)
+        cached = r.get(key)
+    except Exception:
+        _count("errors")
+        _report_redis_failure()
+        return build()
+
+    if cached:
+        try:
+            snapshot = json.loads(cached)
+            _count("hits")
+            return snapshot
+        except ValueError:
+            _count("errors")
+
+    _count("misses")
+    snapshot = build()
+    try:
+        r.setex(key, SNAPSHOT_TTL_SEC, json.dumps(snapshot, ensure_ascii=False))
+        _count("stores")
+    except Exception:
+        _count("errors")
+        _report_redis_failure()
+    return snapshot
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_lab_data_writes(session: Session, _flush_context) -> None:
+    user_ids = set()
+    patient_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (V2Document, V2Metric, V2AnalyteLatest)):
+            if obj.user_id is not None:
+                user_ids.add(obj.user_id)
+        elif isinstance(obj, LabResult):
+            if obj.patient_id is not None:
+                patient_ids.add(obj.patient_id)
+    if patient_ids:
+        rows = session.connection().execute(select(Patient.user_id).where(Patient.id.in_(patient_ids)))
+        user_ids.update(user_id for (user_id,) in rows)
+    if user_ids:
+        invalidate_after_commit(session, user_ids, LAB_DATA_NAMESPACES)
@@ -1,8 +1,8 @@
 """Celery tasks for PDF processing."""
 
+import asyncio
 import os
 import json
-import hashlib
 from typing import Optional
 
 try:
@@ -13,9 +13,10 @@ except ImportError:  # pragma: no cover - optional dependency
     CELERY_AVAILABLE = False
 
 from backend.database import SessionLocal, UploadStatus, save_parsed_records, ChatMessageRecord, PatientMemory
-from backend.pdf_parser import extract_raw_text
-from backend.parsing.pipeline import coerce_raw_text, parse_with_ocr_fallback
-from backend.encryption import decrypt_file_data
+from backend.pdf_workers import parse_pdf_inline
+from backend.uploads import spool_encrypted_file
+# Registers the session listeners that invalidate chat lab snapshots on writes.
+import backend.snapshot_cache  # noqa: F401
 
 
 
@@ -62,10 +63,9 @@ def _run_process_pdf_task(file_id: int):
         status.error_message = None
         session.commit()
 
-        # Read PDF bytes from disk
+        # Decrypt the stored PDF to a temp file, one segment at a time
         try:
-            with open(status.file_path, "rb") as f:
-                pdf_bytes = decrypt_file_data(f.read())
+            spooled = spool_encrypted_file(status.file_path)
         except Exception as e:
             status.status = "error"
             status.error_message = f"File read error: {e}"
@@ -73,33 +73,9 @@ def _run_process_pdf_task(file_id: int):
             return
 
         try:
-            raw_text = extract_raw_text(pdf_bytes)
-            raw_text_str = coerce_raw_text(raw_text)
-            print(
-                "[RAW_TEXT] type={type_name} len={length} preview={preview}".format(
-                    type_name=type(raw_text).__name__,
-                    length=len(raw_text_str),
-                    preview=repr(raw_text_str[:200]),
-                )
-            )
-
-            parse_result = parse_with_ocr_fallback(pdf_bytes, raw_text_str)
-            metrics_before = parse_result["metrics_before"]
-            print(
-                "[PARSE] records_count={records_count}".format(**metrics_before)
-            )
-            if parse_result["triggered_by"]:
-                print(
-                    "[OCR] triggered_by={triggered_by}".format(
-                        triggered_by=parse_result["triggered_by"]
-                    )
-                )
-                print(
-                    "[PARSE_AFTER_OCR] records_count={records_count}".format(
-                        **parse_result["metrics"]
-                    )
-                )
-            document_hash = hashlib.sha256(pdf_bytes).hexdigest()
+            # Already off the API event loop: parse and OCR inline.
+            parse_result = parse_pdf_inline(spooled.path)
+            document_hash = spooled.sha256
             file_name = os.path.basename(status.file_path)
             prefix = f"{status.id}_"
             if file_name.startswith(prefix):
@@ -118,6 +94,7 @@ def _run_process_pdf_task(file_id: int):
             status.error_message = str(e)
         finally:
             session.commit()
+            spooled.close()
     finally:
         session.close()
 
@@ -125,6 +102,7 @@ def _run_process_pdf_task(file_id: int):
 def _run_extract_patient_memory(session_id: int, user_id: int) -> None:
     """Extract patient facts from the last exchange and save to PatientMemory."""
     from backend.main import _openai_chat_completion  # import here to avoid circular
+    from backend.openai_http import close_openai_http_client
     session = SessionLocal()
     try:
         msgs = (
@@ -153,7 +131,14 @@ def _run_extract_patient_memory(session_id: int, user_id: int) -> None:
             f"donde category es 'medical', 'preference', o 'recommendation'. "
             f"Si no hay nada nuevo, devuelve []."
         )
-        raw = _openai_chat_completion(system, user_prompt)
+
+        async def _complete() -> str:
+            try:
+                return await _openai_chat_completion(system, user_prompt)
+            finally:
+                await close_openai_http_client()
+
+        raw = asyncio.run(_complete())
         raw = raw.strip()
         if raw.startswith("```"):
             raw = "\n".join(raw.split("\n")[1:])
@@ -179,12 +164,49 @@ def _run_extract_patient_memory(session_id: int, user_id: int) -> None:
         session.close()
 
 
+def _run_v2_document_job(job_id: str) -> None:
+    """Run a queued V2 extraction (see backend.v2_routes.run_v2_document_job)."""
+    from backend.v2_routes import run_v2_document_job  # import here to avoid circular
+    from backend.v2.llm_client import close_client
+
+    async def _run() -> None:
+        try:
+            await run_v2_document_job(job_id)
+        finally:
+            # The shared AsyncOpenAI client is bound to this task's event loop.
+            await close_client()
+
+    asyncio.run(_run())
+
+
+def _run_v2_document_batch(job_ids: list[str]) -> None:
+    """Run a queued V2 batch (see backend.v2_routes.run_v2_document_batch)."""
+    from backend.v2_routes import run_v2_document_batch  # import here to avoid circular
+    from backend.v2.llm_client import close_client
+
+    async def _run() -> None:
+        try:
+            await run_v2_document_batch(job_ids)
+        finally:
+            await close_client()
+
+    asyncio.run(_run())
+
+
 if CELERY_ENABLED:
 
     @celery.task(name="process_pdf_task")
     def process_pdf_task(file_id: int):
         return _run_process_pdf_task(file_id)
 
+    @celery.task(name="process_v2_document_job")
+    def process_v2_document_job(job_id: str):
+        return _run_v2_document_job(job_id)
+
+    @celery.task(name="process_v2_document_batch")
+    def process_v2_document_batch(job_ids: list[str]):
+        return _run_v2_document_batch(job_ids)
+
     @celery.task(name="extract_patient_memory")
     def extract_patient_memory(session_id: int, user_id: int):
         return _run_extract_patient_memory(session_id, user_id)
@@ -210,5 +232,21 @@ else:
         def __call__(self, *args, **kwargs):
             return _run_extract_patient_memory(*args, **kwargs)
 
+    class _V2DocumentJobTaskStub:
+        def delay(self, *args, **kwargs):
+            _missing_celery()
+
+        def __call__(self, *args, **kwargs):
+            return _run_v2_document_job(*args, **kwargs)
+
+    class _V2DocumentBatchTaskStub:
+        def delay(self, *args, **kwargs):
+            _missing_celery()
+
+        def __call__(self, *args, **kwargs):
+            return _run_v2_document_batch(*args, **kwargs)
+
     process_pdf_task = _CeleryTaskStub()
+    process_v2_document_job = _V2DocumentJobTaskStub()
+    process_v2_document_batch = _V2DocumentBatchTaskStub()
     extract_patient_memory = _ExtractMemoryTaskStub()
@@ -50,7 +50,10 @@ def test_advice_works_with_v2_data_when_patient_row_missing(monkeypatch):
     )
     db.commit()
 
-    monkeypatch.setattr("backend.chat_routes._openai_chat_with_tools", lambda *_args, **_kwargs: "respuesta v2")
+    async def _fake_chat_with_tools(*_args, **_kwargs):
+        return "respuesta v2"
+
+    monkeypatch.setattr("backend.chat_routes._openai_chat_with_tools", _fake_chat_with_tools)
     monkeypatch.setattr("backend.main._get_redis", lambda: None)
 
     response = asyncio.run(
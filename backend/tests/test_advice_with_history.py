@@ -1,5 +1,6 @@
 import asyncio
 import datetime as dt
+import json
 from unittest.mock import patch
 import pytest
 from fastapi import HTTPException
@@ -7,7 +8,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from backend.database import AiUsagePeriod, AuditLog, Base, User, V2Document, V2Metric, ChatSession, ChatMessageRecord, Subscription
 from backend.chat_routes import AI_SCOPE_REFUSAL_ES, _build_positive_trend_notes
-from backend.main import AdviceRequest, get_advice
+from backend.main import AdviceRequest, get_advice, stream_advice
 
 
 def _setup_db():
@@ -254,3 +255,76 @@ def test_monthly_chat_limit_returns_structured_429():
     assert exc.value.detail["code"] == "ai_monthly_limit_reached"
     assert exc.value.detail["remaining"] == 0
     db.close()
+
+
+def _collect_advice_stream(req, user_id, db):
+    async def _run():
+        response = await stream_advice(req=req, user_id=user_id, db=db)
+        frames = [chunk async for chunk in response.body_iterator]
+        events = []
+        for frame in frames:
+            event_line, data_line = frame.strip().split("\n")
+            events.append((event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))))
+        return events
+
+    return asyncio.run(_run())
+
+
+def test_advice_stream_emits_deltas_and_persists_final_answer():
+    db = _setup_db()
+    user = _seed_user_with_metric(db)
+
+    async def _fake_stream(*_args, **_kwargs):
+        for part in ["Tu creatinina ", "está estable."]:
+            yield part
+
+    with patch("backend.chat_routes._openai_chat_with_tools_stream", _fake_stream), \
+         patch("backend.main._get_redis", return_value=None):
+        events = _collect_advice_stream(AdviceRequest(question="Como esta mi creatinina?"), user.id, db)
+
+    assert [name for name, _ in events] == ["delta", "delta", "done"]
+    done = events[-1][1]
+    assert done["answer"] == "Tu creatinina está estable."
+    assert done["ai_messages_remaining"] == 19
+    saved = db.query(ChatMessageRecord).filter_by(session_id=done["session_id"], role="assistant").one()
+    assert saved.content == "Tu creatinina está estable."
+    assert db.query(AuditLog).filter_by(action="patient_ai_chat_completed").count() == 1
+    db.close()
+
+
+def test_advice_stream_failure_refunds_allowance_and_drops_user_message():
+    db = _setup_db()
+    user = _seed_user_with_metric(db)
+
+    async def _failing_stream(*_args, **_kwargs):
+        yield "Tu creat"
+        raise HTTPException(status_code=502, detail="OpenAI error: boom")
+
+    with patch("backend.chat_routes._openai_chat_with_tools_stream", _failing_stream), \
+         patch("backend.main._get_redis", return_value=None):
+        events = _collect_advice_stream(AdviceRequest(question="Como esta mi creatinina?"), user.id, db)
+
+    assert [name for name, _ in events] == ["delta", "error"]
+    assert events[-1][1] == {"detail": "OpenAI error: boom"}
+    assert db.query(ChatMessageRecord).count() == 0
+    assert db.query(AiUsagePeriod).one().messages_used == 0
+    db.close()
+
+
+def test_advice_stream_failure_after_commit_keeps_the_charge():
+    db = _setup_db()
+    user = _seed_user_with_metric(db)
+
+    async def _fake_stream(*_args, **_kwargs):
+        yield "Tu creatinina está estable."
+
+    with patch("backend.chat_routes._openai_chat_with_tools_stream", _fake_stream), \
+         patch("backend.chat_routes.AdviceMetric", side_effect=RuntimeError("boom")), \
+         patch("backend.main._get_redis", return_value=None):
+        with pytest.raises(RuntimeError):
+            _collect_advice_stream(AdviceRequest(question="Como esta mi creatinina?"), user.id, db)
+
+    assert db.query(ChatMessageRecord).filter_by(role="assistant").one().content == "Tu creatinina está estable."
+    assert db.query(ChatMessageRecord).filter_by(role="user").count() == 1
+    assert db.query(AiUsagePeriod).one().messages_used == 1
+    db.close()
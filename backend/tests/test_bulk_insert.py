@@ -0,0 +1,128 @@
+import datetime as dt
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import bulk_insert, read_cache
+from backend.database import Base, LabResult, Patient, User, V2AnalyteLatest, V2Document, V2Metric, save_parsed_records
+from backend.v2.schemas import Context, ImportV2, MetricV2, ReferenceType, ReferenceV2, Specimen
+from backend.v2_routes import _persist_v2_document
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(email="bulk@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add(user)
+    db.flush()
+    patient = Patient(user_id=user.id, full_name="Bulk")
+    db.add(patient)
+    db.commit()
+    return db, user, patient
+
+
+def _record(name, value, unit="mg/dL"):
+    return {"test_name_raw": name, "value_num": value, "unit_raw": unit, "specimen": "SUERO",
+            "ref_min": 0.5, "ref_max": 1.2, "taken_at": "2026-01-10"}
+
+
+@pytest.fixture
+def invalidations(monkeypatch):
+    calls = []
+    monkeypatch.setattr(read_cache, "invalidate_users", lambda user_ids, namespaces: calls.append(
+        (sorted(user_ids), sorted(namespaces))
+    ))
+    return calls
+
+
+def test_save_parsed_records_bulk_inserts_deduplicated_rows(invalidations):
+    db, user, patient = _session()
+    invalidations.clear()  # creating the user and patient invalidates their principal
+    records = [_record("CREATININA", 1.1), _record("UREA", 40.0), _record("CREATININA", 1.1)]
+
+    assert save_parsed_records(db, patient.id, records, "lab.pdf", "hash-1") == 2
+    assert save_parsed_records(db, patient.id, records, "lab.pdf", "hash-1") == 0
+
+    rows = db.query(LabResult).order_by(LabResult.analyte_name).all()
+    assert [(row.analyte_name, row.value, row.ref_range) for row in rows] == [
+        ("CREATININA", 1.1, "0.5 a 1.2"),
+        ("UREA", 40.0, "0.5 a 1.2"),
+    ]
+    assert all(row.created_at is not None and row.taken_at == dt.datetime(2026, 1, 10) for row in rows)
+    assert invalidations == [([user.id], ["analyte_list", "lab_snapshot"])]
+    db.close()
+
+
+def test_bulk_insert_is_discarded_with_a_rollback(invalidations):
+    db, _user, patient = _session()
+    invalidations.clear()
+    bulk_insert.insert_lab_results(db, [{"patient_id": patient.id, "analyte_name": "UREA", "value": 40.0}])
+    db.rollback()
+    db.commit()
+
+    assert db.query(LabResult).count() == 0
+    assert invalidations == []
+    db.close()
+
+
+def test_multi_values_and_executemany_insert_the_same_rows(monkeypatch):
+    db, user, _patient = _session()
+    document = V2Document(user_id=user.id, document_hash="h", analysis_date=dt.datetime(2026, 1, 10))
+    db.add(document)
+    db.flush()
+    rows = [
+        {"id": f"m-{index}", "document_id": document.id, "user_id": user.id, "effective_dt": document.analysis_date,
+         "analyte_key": f"K{index}", "raw_name": f"K{index}", "specimen": "serum", "context": "random",
+         "value_numeric": float(index), "reference_json": {"type": "range", "min": 0, "max": index}}
+        for index in range(7)
+    ]
+
+    complete = bulk_insert._complete_rows(rows, bulk_insert.V2_METRIC_COLUMNS)
+    bulk_insert._executemany_insert(db, V2Metric.__table__, complete[:3])
+    monkeypatch.setattr(bulk_insert, "MAX_BIND_PARAMS", 30)  # two rows per statement
+    bulk_insert._multi_values_insert(db, V2Metric.__table__, complete[3:])
+    db.commit()
+
+    stored = db.query(V2Metric).order_by(V2Metric.id).all()
+    assert [metric.id for metric in stored] == [f"m-{index}" for index in range(7)]
+    assert stored[6].reference_json == {"type": "range", "min": 0, "max": 6}
+    db.close()
+
+
+def test_bulk_v2_metrics_require_the_denormalized_columns():
+    db, _user, _patient = _session()
+    with pytest.raises(ValueError):
+        bulk_insert.insert_v2_metrics(db, [{"document_id": "d", "analyte_key": "K", "raw_name": "K",
+                                            "specimen": "serum", "context": "random"}])
+    db.close()
+
+
+def test_persisted_v2_document_fills_metrics_and_latest_projection():
+    db, user, _patient = _session()
+    reference = ReferenceV2(type=ReferenceType.range, min=0.5, max=1.2, threshold=None, categories=None,
+                            stages=None, ref_text_raw="0.5 - 1.2")
+    payload = ImportV2(
+        analysis_date=dt.date(2026, 1, 10),
+        report_date=None,
+        patient_age=30,
+        patient_sex="F",
+        metrics=[
+            MetricV2(raw_name=name, analyte_key=key, specimen=Specimen.serum, context=Context.random,
+                     value_numeric=value, value_text=None, unit="mg/dL", reference=reference,
+                     evidence=f"{name} {value}", page=1)
+            for name, key, value in (("CREATININA", "CREATININE_SERUM", 1.1), ("UREA", "UREA_SERUM", 40.0))
+        ],
+    )
+
+    doc = _persist_v2_document(db, user_id=user.id, document_hash="h", source_filename="lab.pdf",
+                               payload=payload, free_credit_reserved=False)
+    db.commit()
+
+    metrics = db.query(V2Metric).filter(V2Metric.document_id == doc.id).all()
+    assert len(metrics) == 2
+    assert {(metric.user_id, metric.effective_dt) for metric in metrics} == {(user.id, doc.analysis_date)}
+    latest = {row.analyte_key: row.metric_id for row in db.query(V2AnalyteLatest)}
+    assert latest == {metric.analyte_key: metric.id for metric in metrics}
+    db.close()
@@ -3,10 +3,10 @@ import datetime as dt
 
 import pytest
 from fastapi import HTTPException
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
-from backend.database import AuditLog, Base, DoctorGrant, Patient, User
+from backend.database import AuditLog, Base, ConsultationMessage, ConsultationThread, DoctorGrant, Patient, User
 from backend.main import (
     ConsultationMessageCreate,
     ConsultationThreadCreate,
@@ -22,6 +22,7 @@ from backend.main import (
     update_consultation_call,
     update_consultation_permissions,
     ConsultationPermissionsUpdate,
+    _serialize_consultation_thread,
 )
 
 
@@ -294,3 +295,139 @@ def test_call_start_requires_livekit_configuration(monkeypatch):
         assert exc.value.status_code == 503
     finally:
         db.close()
+
+
+def _seed_inbox(db, doctor, count):
+    """Add ``count`` patients with a grant; every other one gets a thread with messages."""
+    for index in range(count):
+        owner = User(email=f"inbox-{count}-{index}@test.local", hashed_password="x", is_active=True, is_doctor=False)
+        db.add(owner)
+        db.flush()
+        patient = Patient(user_id=owner.id, full_name=f"Paciente {index}")
+        db.add(patient)
+        db.flush()
+        # Grants issued by email before the doctor registered are claimed by the listing.
+        grant = DoctorGrant(
+            patient_id=patient.id,
+            doctor_id=None if index % 3 == 0 else doctor.id,
+            doctor_email=doctor.email.upper() if index % 3 == 0 else doctor.email,
+            granted_at=dt.datetime(2026, 5, 3, 9, 0, index % 60),
+        )
+        db.add(grant)
+        db.flush()
+        if index % 2:
+            continue
+        thread = ConsultationThread(
+            patient_id=patient.id,
+            doctor_id=doctor.id,
+            grant_id=grant.id,
+            created_by_user_id=owner.id,
+            updated_at=dt.datetime(2026, 5, 4, 9, 0, index % 60),
+        )
+        db.add(thread)
+        db.flush()
+        for offset in range(3):
+            db.add(
+                ConsultationMessage(
+                    thread_id=thread.id,
+                    sender_user_id=owner.id if offset != 1 else doctor.id,
+                    body=f"mensaje {index}-{offset} " + "x" * 200,
+                    created_at=dt.datetime(2026, 5, 4, 10, offset, 0),
+                    read_at=dt.datetime(2026, 5, 4, 11, 0, 0) if offset == 0 and index % 4 else None,
+                )
+            )
+    db.commit()
+
+
+def test_inbox_is_built_in_a_constant_number_of_queries():
+    db, _patient_owner, _patient, doctor, _doctor_without_grant, _grant = _seed_db()
+    statements = []
+
+    def _count(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    doctor_id = doctor.id
+
+    try:
+        event.listen(db.get_bind(), "before_cursor_execute", _count)
+        query_counts = []
+        for count in (3, 12):
+            _seed_inbox(db, doctor, count)
+            # A fresh session per listing, as each request gets one from get_db.
+            request_db = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())()
+            statements.clear()
+            inbox = asyncio.run(list_consultations(user_id=doctor_id, db=request_db))
+            query_counts.append(len(statements))
+            request_db.close()
+        event.remove(db.get_bind(), "before_cursor_execute", _count)
+
+        assert query_counts[0] == query_counts[1] <= 9
+        assert len(inbox) == 1 + 3 + 12
+        assert all(item.doctor_id == doctor.id for item in inbox)
+
+        expected = []
+        for grant in db.query(DoctorGrant).order_by(DoctorGrant.granted_at.desc(), DoctorGrant.id.desc()).all():
+            thread = db.query(ConsultationThread).filter(ConsultationThread.grant_id == grant.id).first()
+            expected.append(_serialize_consultation_thread(db, thread, grant, doctor.id))
+        expected.sort(key=lambda item: item.updated_at, reverse=True)
+        assert [item.model_dump() for item in inbox] == [item.model_dump() for item in expected]
+        assert sum(item.unread_count for item in inbox) > 0
+        assert all(len(item.last_message) == 120 for item in inbox if item.id is not None)
+    finally:
+        db.close()
+
+
+def test_message_history_is_keyset_paginated_both_ways():
+    db, patient_owner, patient, doctor, _doctor_without_grant, grant = _seed_db()
+    try:
+        thread = ConsultationThread(
+            patient_id=patient.id, doctor_id=doctor.id, grant_id=grant.id, created_by_user_id=patient_owner.id
+        )
+        db.add(thread)
+        db.flush()
+        # Two pairs share a timestamp, so the page boundary has to break ties on id.
+        stamps = [0, 1, 1, 2, 3, 3, 4]
+        for index, minute in enumerate(stamps):
+            db.add(
+                ConsultationMessage(
+                    thread_id=thread.id,
+                    sender_user_id=doctor.id if index % 2 else patient_owner.id,
+                    body=f"m{index}",
+                    created_at=dt.datetime(2024, 5, 4, 10, minute, 0),
+                )
+            )
+        db.commit()
+
+        def _page(**params):
+            items = asyncio.run(list_consultation_messages(thread_id=thread.id, user_id=doctor.id, db=db, **params))
+            return [item.body for item in items], items
+
+        newest, items = _page(limit=3)
+        assert newest == ["m4", "m5", "m6"]
+        assert items[0].sender_role == "patient" and items[1].sender_role == "doctor"
+
+        older, older_items = _page(limit=3, before=items[0].cursor)
+        assert older == ["m1", "m2", "m3"]
+        assert _page(limit=3, before=older_items[0].cursor)[0] == ["m0"]
+
+        # A client that last saw m2 reconnects and only fetches what it missed.
+        assert _page(limit=3, since=older_items[1].cursor)[0] == ["m3", "m4", "m5"]
+        assert _page(since=items[-1].cursor)[0] == []
+
+        message = asyncio.run(
+            create_consultation_message(
+                thread_id=thread.id,
+                payload=ConsultationMessageCreate(body="nuevo"),
+                user_id=patient_owner.id,
+                db=db,
+            )
+        )
+        assert _page(since=items[-1].cursor)[0] == ["nuevo"]
+        assert message.cursor is not None
+
+        for params in ({"before": "%%%"}, {"since": "bm90LWEtY3Vyc29y"}, {"before": items[0].cursor, "since": items[0].cursor}):
+            with pytest.raises(HTTPException) as exc:
+                _page(**params)
+            assert exc.value.status_code == 400
+    finally:
+        db.close()
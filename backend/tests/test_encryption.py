@@ -0,0 +1,85 @@
+import io
+import os
+
+import pytest
+
+from backend import encryption
+from backend.encryption import (
+    DecryptionError,
+    EncryptedFileReader,
+    decrypt_file_data,
+    decrypt_stream,
+    encrypt_file_data,
+    encrypt_stream,
+    get_fernet,
+)
+from backend.uploads import spool_encrypted_file
+
+
+def _encrypt(data, segment_size=1024):
+    out = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), out, segment_size=segment_size)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("size", [0, 1, 1023, 1024, 1025, 10 * 1024 + 7])
+def test_stream_round_trip(size):
+    data = os.urandom(size)
+    token = _encrypt(data)
+
+    out = io.BytesIO()
+    assert decrypt_stream(io.BytesIO(token), out) == size
+    assert out.getvalue() == data
+    assert decrypt_file_data(token) == data
+
+
+def test_random_access_reads_only_need_the_overlapping_segments(tmp_path):
+    data = os.urandom(10 * 1024 + 7)
+    path = tmp_path / "blob"
+    path.write_bytes(_encrypt(data))
+
+    with EncryptedFileReader(str(path)) as reader:
+        assert reader.size == len(data)
+        assert reader.read_range(1000, 100) == data[1000:1100]
+        assert reader.read_range(3000, 5000) == data[3000:8000]
+        assert reader.read_range(len(data) - 3, 50) == data[-3:]
+        assert reader.read_range(len(data) + 10, 5) == b""
+
+
+def test_tampering_reordering_and_truncation_are_detected():
+    data = os.urandom(4 * 1024)
+    token = _encrypt(data)
+    stored = 1024 + encryption.TAG_SIZE
+    header, body = token[: encryption.HEADER_SIZE], token[encryption.HEADER_SIZE:]
+
+    flipped = bytearray(token)
+    flipped[-1] ^= 1
+    swapped = header + body[stored:2 * stored] + body[:stored] + body[2 * stored:]
+    truncated = header + body[: 3 * stored]
+
+    for corrupt in (bytes(flipped), swapped, truncated):
+        with pytest.raises(DecryptionError):
+            decrypt_file_data(corrupt)
+
+
+def test_legacy_fernet_files_are_read_and_garbage_is_rejected():
+    data = b"%PDF-1.4 legacy"
+    assert decrypt_file_data(get_fernet().encrypt(data)) == data
+    assert decrypt_file_data(data) == data
+
+    with pytest.raises(DecryptionError):
+        decrypt_file_data(b"not encrypted and not a pdf")
+    with pytest.raises(DecryptionError):
+        decrypt_file_data(b"gAAAAAbroken-token")
+
+
+def test_stored_upload_is_decrypted_to_a_hashed_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_TMP_DIR", str(tmp_path))
+    data = b"%PDF-1.7\n" + os.urandom(200_000)
+    stored = tmp_path / "stored.enc"
+    stored.write_bytes(encrypt_file_data(data))
+
+    with spool_encrypted_file(str(stored)) as spooled:
+        assert spooled.size == len(data)
+        assert spooled.read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ["stored.enc"]
@@ -0,0 +1,116 @@
+import datetime as dt
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.chat_routes import _build_doctor_chat_context
+from backend.database import Base, LabResult, Patient, User, V2Document, V2Metric
+from backend.lab_context import SOURCE_LEGACY, SOURCE_V2, PatientLabContext, select_metrics
+
+
+def _setup_db():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(email="context@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add(user)
+    db.flush()
+    patient = Patient(user_id=user.id, full_name="Context")
+    db.add(patient)
+    db.commit()
+    return engine, db, user, patient
+
+
+def _add_v2_metric(db, user, when, key="CREATININE__SERUM__NUM", value=1.2):
+    document = V2Document(user_id=user.id, document_hash=f"{key}-{when.isoformat()}", analysis_date=when)
+    db.add(document)
+    db.flush()
+    db.add(V2Metric(document_id=document.id, analyte_key=key, raw_name=key.split("__")[0], specimen="serum",
+                    context="random", value_numeric=value, unit="mg/dL", page=1, evidence="x"))
+    db.commit()
+
+
+def _count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_recent_legacy_data_wins_over_old_v2_data():
+    engine, db, user, patient = _setup_db()
+    now = dt.datetime.utcnow()
+    _add_v2_metric(db, user, now - dt.timedelta(days=900))
+    db.add(LabResult(patient_id=patient.id, analyte_name="UREA", value=40.0, unit="mg/dL",
+                     taken_at=now - dt.timedelta(days=20), created_at=now - dt.timedelta(days=15)))
+    db.commit()
+
+    user_id, patient_id = user.id, patient.id
+    statements = _count_statements(engine)
+    context = PatientLabContext.probe(db, user_id, patient_id)
+    summary = context.summarize(db, days=180)
+
+    assert len(statements) == 2
+    assert context.summary_source(180) == (SOURCE_LEGACY, 180)
+    assert list(summary) == ["UREA"]
+    assert context.summary_source(30) == (SOURCE_LEGACY, 30)
+    assert context.summary_source(10) == (SOURCE_V2, 36500)
+    db.close()
+
+
+def test_requested_names_narrow_summary_and_fall_back_when_unknown():
+    engine, db, user, patient = _setup_db()
+    now = dt.datetime.utcnow()
+    _add_v2_metric(db, user, now - dt.timedelta(days=5), key="CREATININE__SERUM__NUM")
+    _add_v2_metric(db, user, now - dt.timedelta(days=6), key="GLUCOSE__SERUM__NUM", value=98.0)
+
+    context = PatientLabContext.probe(db, user.id, patient.id)
+    assert context.has_v2 and not context.has_legacy
+    assert list(context.summarize(db, metric_names=["glucose__serum__num"])) == ["GLUCOSE__SERUM__NUM"]
+    assert sorted(context.summarize(db, metric_names=["UNKNOWN"])) == ["CREATININE__SERUM__NUM", "GLUCOSE__SERUM__NUM"]
+    db.close()
+
+
+def test_probe_without_patient_or_data_returns_empty_summary():
+    engine, db, user, _patient = _setup_db()
+
+    user_id = user.id
+    statements = _count_statements(engine)
+    context = PatientLabContext.probe(db, user_id)
+
+    assert not context.has_data
+    assert context.summarize(db) == {}
+    assert len(statements) == 1
+    db.close()
+
+
+def test_doctor_context_skips_the_legacy_query_for_v2_only_patients(monkeypatch):
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    engine, db, user, patient = _setup_db()
+    # V2 rows exist but none has a usable name, so the V2 summary is empty.
+    _add_v2_metric(db, user, dt.datetime.utcnow() - dt.timedelta(days=5), key="")
+
+    statements = _count_statements(engine)
+    context = _build_doctor_chat_context(db, patient)
+
+    assert context["metrics_snapshot"] == [] and context["recent_analyses"] == []
+    assert not any("FROM lab_results" in statement and "min(" not in statement.lower() for statement in statements)
+    db.close()
+
+
+def test_requested_raw_names_narrow_in_sql_and_in_the_cached_summary():
+    engine, db, user, patient = _setup_db()
+    now = dt.datetime.utcnow()
+    _add_v2_metric(db, user, now - dt.timedelta(days=5), key="CREATININE__SERUM__NUM")
+    _add_v2_metric(db, user, now - dt.timedelta(days=6), key="GLUCOSE__SERUM__NUM", value=98.0)
+
+    context = PatientLabContext.probe(db, user.id, patient.id)
+    statements = _count_statements(engine)
+    assert list(context.summarize(db, metric_names=[" glucose "])) == ["GLUCOSE__SERUM__NUM"]
+    # One summarization query, with the names in its WHERE clause.
+    assert len(statements) == 1 and "upper(trim(v2_metrics.raw_name)) IN" in statements[0]
+
+    full = context.summarize(db)
+    assert full["GLUCOSE__SERUM__NUM"][0]["raw_name"] == "GLUCOSE"
+    assert list(select_metrics(full, ["Glucose"])) == ["GLUCOSE__SERUM__NUM"]
+    assert select_metrics(full, ["UNKNOWN"]) == full
+    db.close()
@@ -169,3 +169,35 @@ def test_extract_report_date_priority():
     report_date, report_source = extract_report_date(missing)
     assert report_date is None
     assert report_source == "missing"
+
+
+def test_concatenated_reports_parse_like_their_parts():
+    text = _load_fixture_text()
+    single = parse_raw_text(text)
+
+    repeated = parse_raw_text("\n".join([text] * 3))
+
+    # Specimen/section state carries across the copies; values must not.
+    values = [(r["test_name_raw"], r["value_num"], r["value_cat"], r["ref_min"], r["ref_max"]) for r in single]
+    assert len(repeated) == 3 * len(single)
+    assert [(r["test_name_raw"], r["value_num"], r["value_cat"], r["ref_min"], r["ref_max"]) for r in repeated] == values * 3
+
+
+def test_stitched_multiline_record_with_band_rows():
+    text = "\n".join([
+        "TFG ESTIMADA 75 mL/min/1.73m2 60 a 120",
+        "90 a 120",
+        "ESTADIO 1 NORMAL",
+        "60 a 89",
+        "ESTADIO 2 LEVE",
+        "CREATININA",
+        "1.2",
+        "mg/dL",
+        "0.7 a 1.3",
+    ])
+
+    records = parse_raw_text(text)
+
+    assert [(r["test_name_raw"], r["value_num"]) for r in records] == [("TFG ESTIMADA", 75.0), ("CREATININA", 1.2)]
+    assert records[0]["derived_stage"] == "G2"
+    assert (records[1]["ref_min"], records[1]["ref_max"]) == (0.7, 1.3)
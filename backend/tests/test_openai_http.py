@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+import httpx
+
+from backend import openai_http
+from backend.chat_routes import _openai_chat_completion, _openai_chat_with_tools, _openai_chat_with_tools_stream
+
+
+def _mock_client(handler):
+    return lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_chat_with_tools_resolves_tool_call_over_async_client(monkeypatch):
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests_seen.append(body)
+        if len(requests_seen) == 1:
+            return httpx.Response(200, json={
+                "choices": [{
+                    "finish_reason": "tool_calls",
+                    "message": {
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [{
+                            "id": "call_1",
+                            "type": "function",
+                            "function": {
+                                "name": "get_metric_details",
+                                "arguments": json.dumps({"metric_names": ["creatinine"]}),
+                            },
+                        }],
+                    },
+                }],
+            })
+        return httpx.Response(200, json={
+            "choices": [{"finish_reason": "stop", "message": {"role": "assistant", "content": " Estable. "}}],
+        })
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(openai_http, "_build_client", _mock_client(handler))
+
+    async def _run():
+        try:
+            return await _openai_chat_with_tools(
+                "system",
+                [{"role": "user", "content": "¿Cómo va mi creatinina?"}],
+                {"CREATININE": [{"value": 1.1}]},
+            )
+        finally:
+            await openai_http.close_openai_http_client()
+
+    answer = asyncio.run(_run())
+
+    assert answer == "Estable."
+    assert len(requests_seen) == 2
+    tool_message = requests_seen[1]["messages"][-1]
+    assert tool_message["role"] == "tool"
+    assert json.loads(tool_message["content"]) == {"CREATININE": [{"value": 1.1}]}
+
+
+def test_chat_completion_retries_with_alternate_token_param(monkeypatch):
+    token_params = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        token_params.append("max_tokens" if "max_tokens" in body else "max_completion_tokens")
+        if "max_tokens" in body:
+            return httpx.Response(400, text="Unsupported parameter: 'max_tokens'")
+        return httpx.Response(200, json={"choices": [{"message": {"content": "[]"}}]})
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o")
+    monkeypatch.setattr(openai_http, "_build_client", _mock_client(handler))
+
+    async def _run():
+        try:
+            return await _openai_chat_completion("system", "user")
+        finally:
+            await openai_http.close_openai_http_client()
+
+    assert asyncio.run(_run()) == "[]"
+    assert token_params == ["max_tokens", "max_completion_tokens"]
+
+
+def test_pooled_client_is_reused_within_a_loop(monkeypatch):
+    monkeypatch.setattr(openai_http, "_build_client", _mock_client(lambda request: httpx.Response(200)))
+
+    async def _run():
+        first = openai_http.get_openai_http_client()
+        second = openai_http.get_openai_http_client()
+        await openai_http.close_openai_http_client()
+        return first, second, first.is_closed
+
+    first, second, closed = asyncio.run(_run())
+    assert first is second
+    assert closed
+
+
+def _sse_body(chunks):
+    return "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+
+
+def test_streaming_tool_loop_accumulates_tool_call_and_yields_text(monkeypatch):
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests_seen.append(body)
+        if len(requests_seen) == 1:
+            chunks = [
+                {"choices": [{"delta": {"tool_calls": [{
+                    "index": 0, "id": "call_1",
+                    "function": {"name": "get_metric_details", "arguments": "{\"metric_"},
+                }]}}]},
+                {"choices": [{"delta": {"tool_calls": [{
+                    "index": 0, "function": {"arguments": "names\": [\"urea\"]}"},
+                }]}, "finish_reason": "tool_calls"}]},
+            ]
+        else:
+            chunks = [
+                {"choices": [{"delta": {"content": "Urea "}}]},
+                {"choices": [{"delta": {"content": "normal."}, "finish_reason": "stop"}]},
+            ]
+        return httpx.Response(200, text=_sse_body(chunks), headers={"content-type": "text/event-stream"})
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(openai_http, "_build_client", _mock_client(handler))
+
+    async def _run():
+        try:
+            return [
+                part async for part in _openai_chat_with_tools_stream(
+                    "system", [{"role": "user", "content": "urea?"}], {"UREA": [{"value": 30}]}
+                )
+            ]
+        finally:
+            await openai_http.close_openai_http_client()
+
+    assert asyncio.run(_run()) == ["Urea ", "normal."]
+    assert all(body["stream"] is True for body in requests_seen)
+    tool_message = requests_seen[1]["messages"][-1]
+    assert tool_message["tool_call_id"] == "call_1"
+    assert json.loads(tool_message["content"]) == {"UREA": [{"value": 30}]}
@@ -0,0 +1,58 @@
+import fitz
+import pytest
+
+from backend import pdf_document
+from backend.parsing.pipeline import _all_page_indices
+from backend.pdf_document import PdfDocument, borrow_pdf
+from backend.vision_parser import select_pages_for_vision
+
+
+def _text_pdf(*pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def test_page_data_is_extracted_once_per_document(monkeypatch):
+    pdf_bytes = _text_pdf("Creatinina 1.2 mg/dL", "Urea 40 mg/dL")
+    opens = []
+    real_open = pdf_document.fitz.open
+    monkeypatch.setattr(pdf_document.fitz, "open", lambda *a, **kw: opens.append(1) or real_open(*a, **kw))
+
+    with PdfDocument.open(pdf_bytes) as pdf:
+        assert _all_page_indices(pdf) == [0, 1]
+        assert select_pages_for_vision(pdf) == []
+        assert "Creatinina" in pdf.page_text(0)
+        assert pdf.page_word_count(0) == 3
+        assert pdf.page_number_count(0) == 1
+        calls = []
+        assert pdf.memo("key", lambda: calls.append(1) or "value") == "value"
+        assert pdf.memo("key", lambda: calls.append(1) or "other") == "value"
+
+    assert len(opens) == 1
+    assert len(calls) == 1
+
+
+def test_borrow_pdf_only_closes_documents_it_opened():
+    pdf_bytes = _text_pdf("Urea 40 mg/dL")
+
+    with PdfDocument.open(pdf_bytes) as pdf:
+        with borrow_pdf(pdf) as borrowed:
+            assert borrowed is pdf
+        assert pdf.page_text(0)
+
+        with borrow_pdf(pdf_bytes) as opened:
+            assert opened is not pdf
+            assert opened.page_count == 1
+
+
+def test_open_rejects_invalid_bytes():
+    with pytest.raises(ValueError, match="Empty or invalid PDF file"):
+        PdfDocument.open(b"%PDF-1.4")
+    with pytest.raises(ValueError, match="Invalid PDF"):
+        PdfDocument.open(b"not a pdf" * 20)
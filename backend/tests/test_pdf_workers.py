@@ -0,0 +1,111 @@
+import asyncio
+import io
+import threading
+import time
+
+import fitz
+import pytest
+from fastapi import HTTPException
+
+from backend import pdf_workers
+from backend.pdf_workers import PdfPasswordRequired, parse_pdf_with_ocr_fallback, run_pdf_task, unlock_pdf
+
+
+@pytest.fixture(autouse=True)
+def _fresh_pool():
+    yield
+    pdf_workers.shutdown_pdf_workers()
+
+
+def _encrypted_pdf(tmp_path, password="cedula123"):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "CREATININA 1.1 mg/dL")
+    out = io.BytesIO()
+    doc.save(out, encryption=fitz.PDF_ENCRYPT_AES_256, owner_pw="owner-secret", user_pw=password)
+    doc.close()
+    path = tmp_path / "locked.pdf"
+    path.write_bytes(out.getvalue())
+    return str(path)
+
+
+def test_process_pool_unlocks_pdf_and_maps_worker_errors(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_WORKERS", "1")
+    path = _encrypted_pdf(tmp_path)
+
+    async def _run():
+        unlocked = await run_pdf_task(unlock_pdf, path, "cedula123")
+        with pytest.raises(PdfPasswordRequired):
+            await run_pdf_task(unlock_pdf, path, None)
+        return unlocked
+
+    unlocked = asyncio.run(_run())
+    doc = fitz.open(stream=unlocked, filetype="pdf")
+    assert not doc.needs_pass
+    assert "CREATININA" in doc[0].get_text()
+    doc.close()
+    assert pdf_workers.pdf_worker_stats()["inflight"] == 0
+
+
+def test_saturated_pool_rejects_with_retry_after(monkeypatch):
+    monkeypatch.setenv("PDF_WORKERS", "0")
+    monkeypatch.setenv("PDF_WORKER_QUEUE_DEPTH", "0")
+    monkeypatch.setenv("PDF_WORKER_RETRY_AFTER_SEC", "7")
+    release = threading.Event()
+
+    async def _run():
+        first = asyncio.create_task(run_pdf_task(release.wait, 5))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc_info:
+            await run_pdf_task(len, "x")
+        release.set()
+        assert await first is True
+        return exc_info.value
+
+    error = asyncio.run(_run())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "7"}
+    assert error.detail["code"] == "pdf_workers_busy"
+    assert pdf_workers.pdf_worker_stats()["inflight"] == 0
+
+
+def test_task_past_its_deadline_times_out_and_frees_the_worker(monkeypatch):
+    monkeypatch.setenv("PDF_WORKERS", "1")
+
+    async def _run():
+        started = time.monotonic()
+        with pytest.raises(HTTPException) as exc_info:
+            await run_pdf_task(time.sleep, 30, timeout=2.0)
+        assert time.monotonic() - started < 10
+        # The worker aborted the sleep itself, so the next task runs right away.
+        assert await run_pdf_task(len, "abc", timeout=10) == 3
+        return exc_info.value
+
+    error = asyncio.run(_run())
+    assert error.status_code == 504
+    assert error.detail["code"] == "pdf_processing_timeout"
+    assert pdf_workers.pdf_worker_stats()["inflight"] == 0
+
+
+def test_ocr_fallback_runs_outside_the_pool(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_WORKERS", "0")
+    monkeypatch.setenv("PDF_WORKER_QUEUE_DEPTH", "0")
+    doc = fitz.open()
+    doc.new_page()
+    path = tmp_path / "scanned.pdf"
+    doc.save(str(path))
+    doc.close()
+    seen = {}
+
+    def _fake_ocr(_path, pages):
+        seen.setdefault("calls", []).append((pages, pdf_workers.pdf_worker_stats()["inflight"]))
+        return [{"page": 0, "text": "ANTIGENO PROSTATICO ESPECIFICO 0.65 ng/mL 0.0 a 2.5"}]
+
+    monkeypatch.setattr(pdf_workers, "ocr_pdf_pages", _fake_ocr)
+
+    result = asyncio.run(parse_pdf_with_ocr_fallback(str(path)))
+
+    # One (slow, network-bound) OCR call, made while holding no pool slot.
+    assert seen["calls"] == [([0], 0)]
+    assert "ANTIGENO" in result["raw_text"]
+    assert result["metrics"]["records_count"] >= 1
+    assert pdf_workers.pdf_worker_stats()["inflight"] == 0
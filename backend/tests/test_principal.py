@@ -0,0 +1,73 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, Patient, Subscription, User
+from backend.deps import get_principal
+from backend.entitlements import get_ai_allowance, get_upload_allowance
+from backend.principal import load_principal
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def _count_statements(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_principal_is_loaded_once_per_session_and_shared_by_entitlements(monkeypatch):
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    db = _session()
+    user = User(email="principal@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add(user)
+    db.flush()
+    db.add(Patient(user_id=user.id, full_name="Principal"))
+    db.add(Subscription(user_id=user.id, status="active"))
+    db.commit()
+    user_id = user.id
+    statements = _count_statements(db)
+
+    principal = get_principal(user_id=user_id, db=db)
+    assert (principal.email, principal.is_doctor, principal.has_subscription) == ("principal@test.local", False, True)
+    assert principal.patient_id is not None
+    loaded = len(statements)
+
+    assert load_principal(db, user_id) is principal
+    assert get_upload_allowance(db, user_id).has_subscription
+    assert get_ai_allowance(db, user_id).limit > 0
+    later = statements[loaded:]
+    # Only the usage counters are read; no User, Patient or Subscription lookups repeat.
+    assert not any("FROM subscriptions" in statement or "FROM patients" in statement for statement in later)
+    assert sum("FROM users" in statement for statement in later) == 1
+    db.close()
+
+
+def test_writes_through_the_session_refresh_the_principal(monkeypatch):
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    db = _session()
+    user = User(email="late@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    before = load_principal(db, user_id)
+    assert before.patient_id is None and not before.has_subscription
+
+    db.add(Patient(user_id=user_id, full_name="Late"))
+    db.add(Subscription(user_id=user_id, status="trialing"))
+    db.commit()
+
+    after = load_principal(db, user_id)
+    assert after.patient_id is not None
+    assert after.subscription.status == "trialing"
+
+    with pytest.raises(HTTPException) as exc:
+        get_principal(user_id=user_id + 1, db=db)
+    assert exc.value.status_code == 404
+    db.close()
@@ -0,0 +1,226 @@
+import asyncio
+import datetime as dt
+import json
+import queue
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import deps, read_cache, snapshot_cache
+from backend.chat_routes import _summarize_patient_metrics_for_ai
+from backend.database import Base, LabResult, Patient, Subscription, User, V2Document, V2Metric
+from backend.entitlements import active_subscription_for_user
+from backend.v2_routes import delete_v2_document
+
+
+class _FakeRedis:
+    """Just enough of redis.Redis (including pub/sub) for the read caches."""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = []
+        self.commands = 0
+
+    def get(self, key):
+        self.commands += 1
+        return self.data.get(key)
+
+    def setex(self, key, _ttl, value):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key) or 0) + 1
+        return self.data[key]
+
+    def expire(self, _key, _ttl):
+        return True
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+    def publish(self, _channel, message):
+        for subscriber in self.subscribers:
+            subscriber.put({"type": "message", "data": message})
+        return len(self.subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return _FakePubSub(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def incr(self, key):
+        self.calls.append(lambda: self.redis.incr(key))
+
+    def expire(self, key, ttl):
+        self.calls.append(lambda: self.redis.expire(key, ttl))
+
+    def execute(self):
+        return [call() for call in self.calls]
+
+
+class _FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+    def subscribe(self, _channel):
+        self.redis.subscribers.append(self.messages)
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.messages.get(timeout=min(timeout, 0.05))
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.redis.subscribers.remove(self.messages)
+
+
+@pytest.fixture(autouse=True)
+def _stop_local_tier():
+    yield
+    read_cache.stop_invalidation_subscriber()
+
+
+def _wait_for_local_tier():
+    deadline = time.monotonic() + 2
+    while not read_cache.local_tier_active():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _setup(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr("backend.deps._get_redis", lambda: fake)
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(email="snapshot@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add(user)
+    db.flush()
+    patient = Patient(user_id=user.id, full_name="Snapshot")
+    db.add(patient)
+    db.commit()
+    return fake, db, user, patient
+
+
+def _add_document(db, user, key, value, days_ago=5):
+    when = dt.datetime.utcnow() - dt.timedelta(days=days_ago)
+    document = V2Document(user_id=user.id, document_hash=f"{key}-{value}", analysis_date=when)
+    db.add(document)
+    db.flush()
+    db.add(V2Metric(document_id=document.id, analyte_key=key, raw_name=key, specimen="serum",
+                    context="random", value_numeric=value, unit="mg/dL", page=1, evidence="x"))
+    db.commit()
+    return document.id
+
+
+def test_snapshot_is_cached_until_a_write_bumps_the_generation(monkeypatch):
+    fake, db, user, patient = _setup(monkeypatch)
+    monkeypatch.setattr(read_cache, "LOCAL_TIER_ENABLED", False)
+    _add_document(db, user, "CREATININE__SERUM__NUM", 1.2)
+    before = snapshot_cache.snapshot_cache_stats()
+
+    first = _summarize_patient_metrics_for_ai(db, patient)
+    second = _summarize_patient_metrics_for_ai(db, patient)
+
+    after = snapshot_cache.snapshot_cache_stats()
+    assert first == second
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    urea_doc = _add_document(db, user, "UREA__SERUM__NUM", 40.0)
+    assert sorted(_summarize_patient_metrics_for_ai(db, patient)) == ["CREATININE__SERUM__NUM", "UREA__SERUM__NUM"]
+
+    asyncio.run(delete_v2_document(document_id=urea_doc, user_id=user.id, db=db))
+    assert sorted(_summarize_patient_metrics_for_ai(db, patient)) == ["CREATININE__SERUM__NUM"]
+    assert int(fake.get(f"analyte_snapshot_gen:{user.id}")) == 3
+    db.close()
+
+
+def test_legacy_writes_invalidate_through_patient_owner(monkeypatch):
+    fake, db, user, patient = _setup(monkeypatch)
+    assert _summarize_patient_metrics_for_ai(db, patient) == {}
+
+    db.add(LabResult(patient_id=patient.id, analyte_name="UREA", value=40.0, unit="mg/dL",
+                     taken_at=dt.datetime.utcnow()))
+    db.commit()
+
+    assert list(_summarize_patient_metrics_for_ai(db, patient)) == ["UREA"]
+    db.close()
+
+
+def test_rolled_back_writes_do_not_bump(monkeypatch):
+    fake, db, user, _patient = _setup(monkeypatch)
+    document = V2Document(user_id=user.id, document_hash="rolled-back")
+    db.add(document)
+    db.flush()
+    db.rollback()
+    db.commit()
+
+    assert fake.get(f"analyte_snapshot_gen:{user.id}") is None
+    db.close()
+
+
+def test_local_tier_serves_repeat_reads_without_redis(monkeypatch):
+    fake, db, user, patient = _setup(monkeypatch)
+    _add_document(db, user, "CREATININE__SERUM__NUM", 1.2)
+    _wait_for_local_tier()
+
+    first = _summarize_patient_metrics_for_ai(db, patient)
+    commands = fake.commands
+    assert _summarize_patient_metrics_for_ai(db, patient) == first
+    assert fake.commands == commands
+
+    _add_document(db, user, "UREA__SERUM__NUM", 40.0)
+    assert sorted(_summarize_patient_metrics_for_ai(db, patient)) == ["CREATININE__SERUM__NUM", "UREA__SERUM__NUM"]
+    db.close()
+
+
+def test_invalidations_from_other_processes_evict_local_entries(monkeypatch):
+    fake, db, user, _patient = _setup(monkeypatch)
+    _wait_for_local_tier()
+    assert active_subscription_for_user(db, user.id) is None
+
+    # A Core insert stands in for another worker's write: no local session event fires,
+    # so only the published message can evict the cached "no subscription".
+    db.execute(Subscription.__table__.insert().values(user_id=user.id, status="active"))
+    db.commit()
+    assert active_subscription_for_user(db, user.id) is None
+
+    fake.publish(read_cache.INVALIDATION_CHANNEL, json.dumps(
+        {"origin": "other-worker", "user_ids": [user.id], "namespaces": ["subscription"]}
+    ))
+    deadline = time.monotonic() + 2
+    while active_subscription_for_user(db, user.id) is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert active_subscription_for_user(db, user.id).status == "active"
+    db.close()
+
+
+def test_redis_circuit_breaker_skips_reconnects_while_open(monkeypatch):
+    attempts = []
+
+    def _failing_from_url(*_args, **_kwargs):
+        attempts.append(1)
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(deps, "_redis_client", None)
+    monkeypatch.setattr(deps, "_redis_retry_at", 0.0)
+    monkeypatch.setenv("REDIS_RETRY_BACKOFF_SEC", "60")
+    monkeypatch.setattr(deps.redis_lib, "from_url", _failing_from_url)
+
+    assert deps._get_redis() is None
+    assert deps._get_redis() is None
+    assert len(attempts) == 1
+
+    monkeypatch.setattr(deps, "_redis_retry_at", 0.0)
+    assert deps._get_redis() is None
+    assert len(attempts) == 2
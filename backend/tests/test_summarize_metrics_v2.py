@@ -0,0 +1,65 @@
+import datetime as dt
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, User, V2Document, V2Metric
+from backend.utils import _summarize_metrics_v2
+
+
+def _seed():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(email="summary@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    other = User(email="summary-other@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add_all([user, other])
+    db.commit()
+
+    now = dt.datetime.utcnow()
+    for index in range(8):
+        document = V2Document(
+            user_id=user.id,
+            document_hash=f"doc-{index}",
+            analysis_date=now - dt.timedelta(days=10 * (index + 1)),
+        )
+        db.add(document)
+        db.flush()
+        db.add_all([
+            V2Metric(document_id=document.id, analyte_key="CREATININE__SERUM__NUM", raw_name="Creatinina",
+                     specimen="serum", context="random", value_numeric=1.0 + index / 10, unit="mg/dL",
+                     reference_json={"type": "range", "min": 0.7, "max": 1.3}, page=1, evidence="x" * 500),
+            V2Metric(document_id=document.id, analyte_key="UREA__SERUM__NUM", raw_name="Urea",
+                     specimen="serum", context="random", value_numeric=30.0 + index, unit="mg/dL",
+                     reference_json={"type": "max", "threshold": 45}, page=1, evidence="urea"),
+        ])
+    foreign = V2Document(user_id=other.id, document_hash="foreign", analysis_date=now)
+    db.add(foreign)
+    db.flush()
+    db.add(V2Metric(document_id=foreign.id, analyte_key="CREATININE__SERUM__NUM", raw_name="Creatinina",
+                    specimen="serum", context="random", value_numeric=9.9, unit="mg/dL", page=1, evidence="x"))
+    db.commit()
+    return db, user
+
+
+def test_summary_keeps_five_latest_points_per_analyte():
+    db, user = _seed()
+
+    summary = _summarize_metrics_v2(db, user.id, metric_names=None, days=365)
+
+    assert list(summary) == ["CREATININE__SERUM__NUM", "UREA__SERUM__NUM"]
+    assert [point["value"] for point in summary["CREATININE__SERUM__NUM"]] == [1.0, 1.1, 1.2, 1.3, 1.4]
+    assert summary["CREATININE__SERUM__NUM"][0]["ref_min"] == 0.7
+    assert summary["UREA__SERUM__NUM"][0]["ref_max"] == 45
+    db.close()
+
+
+def test_summary_filters_by_analyte_key_or_raw_name_and_window():
+    db, user = _seed()
+
+    by_raw_name = _summarize_metrics_v2(db, user.id, metric_names=[" urea "], days=365)
+    assert list(by_raw_name) == ["UREA__SERUM__NUM"]
+
+    by_key = _summarize_metrics_v2(db, user.id, metric_names=["creatinine__serum__num"], days=25)
+    assert [point["value"] for point in by_key["CREATININE__SERUM__NUM"]] == [1.0, 1.1]
+    db.close()
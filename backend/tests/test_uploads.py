@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from backend import uploads
+from backend.uploads import spool_pdf_upload
+
+
+class _CountingReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def _spooled_files(tmp_path):
+    return sorted(os.listdir(tmp_path))
+
+
+@pytest.fixture(autouse=True)
+def _tmp_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("UPLOAD_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1024)
+
+
+def test_upload_is_hashed_and_spooled_to_disk(tmp_path):
+    body = b"%PDF-1.7\n" + os.urandom(5000)
+
+    with asyncio.run(spool_pdf_upload(UploadFile(filename="a.pdf", file=io.BytesIO(body)))) as upload:
+        assert upload.size == len(body)
+        assert upload.sha256 == hashlib.sha256(body).hexdigest()
+        assert upload.read_bytes() == body
+        assert _spooled_files(tmp_path) == [os.path.basename(upload.path)]
+
+    assert _spooled_files(tmp_path) == []
+
+
+def test_oversized_upload_is_rejected_before_it_is_fully_read(tmp_path):
+    reader = _CountingReader(b"%PDF-1.7\n" + b"x" * 100_000)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_pdf_upload(UploadFile(filename="big.pdf", file=reader), max_bytes=4096))
+
+    assert exc.value.status_code == 413
+    assert reader.reads == 5
+    assert _spooled_files(tmp_path) == []
+
+
+def test_declared_size_over_the_limit_is_rejected_without_reading():
+    reader = _CountingReader(b"%PDF-1.7\n")
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_pdf_upload(UploadFile(filename="big.pdf", file=reader, size=10_000), max_bytes=4096))
+
+    assert exc.value.status_code == 413
+    assert reader.reads == 0
+
+
+@pytest.mark.parametrize("body", [b"PK\x03\x04" + b"z" * 3000, b"<html>not a pdf</html>"])
+def test_non_pdf_content_is_rejected(tmp_path, body):
+    reader = _CountingReader(body)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_pdf_upload(UploadFile(filename="x.pdf", file=reader)))
+
+    assert exc.value.status_code == 415
+    assert reader.reads <= 2
+    assert _spooled_files(tmp_path) == []
+
+
+def test_empty_upload_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(spool_pdf_upload(UploadFile(filename="empty.pdf", file=io.BytesIO(b""))))
+
+    assert exc.value.status_code == 400
@@ -0,0 +1,276 @@
+import asyncio
+import datetime as dt
+import json
+import queue
+import threading
+
+from backend import user_events
+from backend.consultation_routes import ConsultationCallItem
+from backend.deps import ConsultationConnectionManager
+
+
+class _FakeSocket:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, payload):
+        if self.fail:
+            raise RuntimeError("closed")
+        self.sent.append(json.loads(payload))
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+class _Broker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.round_trips = 0
+
+
+class _FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.messages = queue.Queue()
+
+    def subscribe(self, *channels):
+        with self.broker.lock:
+            for channel in channels:
+                self.broker.channels.setdefault(channel, set()).add(self)
+
+    def unsubscribe(self, *channels):
+        with self.broker.lock:
+            for channel in channels:
+                self.broker.channels.get(channel, set()).discard(self)
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.messages.get(timeout=timeout) if timeout else self.messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.unsubscribe(*list(self.broker.channels))
+
+
+class _FakePipeline:
+    def __init__(self, broker):
+        self.broker = broker
+        self.pending = []
+
+    def publish(self, channel, payload):
+        self.pending.append((channel, payload))
+
+    def execute(self):
+        self.broker.round_trips += 1
+        with self.broker.lock:
+            for channel, payload in self.pending:
+                for pubsub in self.broker.channels.get(channel, ()):
+                    pubsub.messages.put({"type": "message", "channel": channel.encode(), "data": payload})
+
+
+class _FakeRedis:
+    def __init__(self, broker):
+        self.broker = broker
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self.broker)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return _FakePubSub(self.broker)
+
+
+async def _until(condition, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.02)
+
+
+def test_in_process_bus_delivers_and_drops_dead_sockets():
+    bus = user_events.InProcessEventBus()
+    manager = ConsultationConnectionManager(bus=bus)
+    doctor, patient, dead = _FakeSocket(), _FakeSocket(), _FakeSocket(fail=True)
+
+    async def _run():
+        bus.start(asyncio.get_running_loop(), manager.deliver)
+        await manager.connect(1, doctor)
+        await manager.connect(2, patient)
+        await manager.connect(2, dead)
+        await manager.publish([1, 2, 2], {"type": "message.created", "thread_id": 7})
+        await _until(lambda: doctor.sent and patient.sent and set(manager._connections[2]) == {patient})
+        bus.stop()
+
+    asyncio.run(_run())
+    assert doctor.sent == patient.sent == [{"type": "message.created", "thread_id": 7}]
+
+
+def test_redis_bus_fans_out_across_workers(monkeypatch):
+    broker = _Broker()
+    monkeypatch.setattr("backend.deps._get_redis", lambda: _FakeRedis(broker))
+    workers = [user_events.RedisEventBus(), user_events.RedisEventBus()]
+    managers = [ConsultationConnectionManager(bus=bus) for bus in workers]
+    doctor, patient = _FakeSocket(), _FakeSocket()
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        for bus, manager in zip(workers, managers):
+            bus.start(loop, manager.deliver)
+        try:
+            await managers[0].connect(1, doctor)
+            await managers[1].connect(2, patient)
+            await _until(lambda: {"user_events:1", "user_events:2"} <= {
+                channel for channel, subscribers in broker.channels.items() if subscribers
+            })
+            # Published on worker 0, the patient's socket lives on worker 1.
+            await managers[0].publish([1, 2], {"type": "message.created", "thread_id": 7})
+            await _until(lambda: doctor.sent and patient.sent)
+
+            managers[1].disconnect(2, patient)
+            await _until(lambda: not broker.channels["user_events:2"])
+        finally:
+            for bus in workers:
+                bus.stop()
+
+    asyncio.run(_run())
+    assert doctor.sent == patient.sent == [{"type": "message.created", "thread_id": 7}]
+    assert broker.round_trips == 1
+    # Each worker only subscribed to the users it holds sockets for.
+    assert workers[0]._wanted == {1} and workers[1]._wanted == set()
+
+
+def test_publish_without_redis_falls_back_to_local_sockets(monkeypatch):
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    manager = ConsultationConnectionManager(bus=user_events.RedisEventBus())
+    socket = _FakeSocket()
+
+    async def _run():
+        await manager.connect(3, socket)
+        await manager.publish([3], {"type": "thread.updated"})
+        await _until(lambda: socket.sent)
+
+    asyncio.run(_run())
+    assert socket.sent == [{"type": "thread.updated"}]
+
+
+def test_local_sockets_do_not_wait_for_the_relay(monkeypatch):
+    broker = _Broker()
+    monkeypatch.setattr("backend.deps._get_redis", lambda: _FakeRedis(broker))
+    bus = user_events.RedisEventBus()
+    manager = ConsultationConnectionManager(bus=bus)
+    socket = _FakeSocket()
+
+    async def _run():
+        # The relay is down (reconnecting) or has not subscribed yet.
+        await manager.connect(4, socket)
+        await manager.publish([4], {"type": "thread.updated", "thread_id": 1})
+        await _until(lambda: socket.sent)
+
+        bus.start(asyncio.get_running_loop(), manager.deliver)
+        try:
+            await _until(lambda: broker.channels.get("user_events:4"))
+            await manager.publish([4], {"type": "thread.updated", "thread_id": 2})
+            # A message from another process still comes in through the relay.
+            user_events.RedisEventBus().publish([4], {"type": "thread.updated", "thread_id": 3})
+            await _until(lambda: len(socket.sent) == 3)
+            await asyncio.sleep(0.3)
+        finally:
+            bus.stop()
+
+    asyncio.run(_run())
+    # Our own messages came back through Redis too, and were dropped.
+    assert [event["thread_id"] for event in socket.sent] == [1, 2, 3]
+    assert broker.round_trips == 3
+
+
+class _StuckSocket(_FakeSocket):
+    """A client on a bad connection: the first send never completes."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def send_text(self, payload):
+        await self.release.wait()
+        self.sent.append(json.loads(payload))
+
+
+def test_slow_socket_never_blocks_the_sender_and_is_dropped_on_overflow(monkeypatch):
+    monkeypatch.setenv("WS_SEND_QUEUE_SIZE", "2")
+    manager = ConsultationConnectionManager(bus=user_events.InProcessEventBus())
+    fast, slow = _FakeSocket(), _StuckSocket()
+
+    async def _run():
+        await manager.connect(1, fast)
+        await manager.connect(1, slow)
+        for index in range(3):
+            await manager.send_to_users([1], {"type": "message.created", "message": {"id": index}})
+            await asyncio.sleep(0)
+        await _until(lambda: len(fast.sent) == 3)
+        stats = manager.stats()
+        await manager.send_to_users([1], {"type": "message.created", "message": {"id": 3}})
+        await _until(lambda: slow.closed is not None)
+        return stats
+
+    stats = asyncio.run(_run())
+    # The stuck send holds message 0; 1 and 2 fill the queue; 3 overflows it.
+    assert stats["max_queue_depth"] == 2
+    assert slow.closed == 1013
+    assert [event["message"]["id"] for event in fast.sent] == [0, 1, 2, 3]
+    assert set(manager._connections[1]) == {fast}
+    assert manager.stats()["slow_disconnects"] == 1
+    assert manager.stats()["dropped"] == 3
+
+
+def test_state_snapshots_are_coalesced_and_stuck_sends_time_out(monkeypatch):
+    monkeypatch.setenv("WS_SEND_TIMEOUT_SEC", "0.3")
+    manager = ConsultationConnectionManager(bus=user_events.InProcessEventBus())
+    slow = _StuckSocket()
+
+    async def _run():
+        await manager.connect(1, slow)
+        for unread in range(5):
+            await manager.send_to_user(1, {"type": "thread.updated", "thread_id": 7, "thread": {"unread": unread}})
+            await asyncio.sleep(0)
+        depth = manager.stats()["queued"]
+        await _until(lambda: slow.closed is not None)
+        return depth
+
+    # The first event is in flight; the other four collapse into one queued snapshot.
+    assert asyncio.run(_run()) == 1
+    assert manager.stats()["coalesced"] == 3
+    assert slow.closed == 1013
+    assert 1 not in manager._connections
+
+
+def test_model_payloads_are_coalesced_on_the_local_fallback(monkeypatch):
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    manager = ConsultationConnectionManager(bus=user_events.RedisEventBus())
+    slow = _StuckSocket()
+
+    def _call(status):
+        return ConsultationCallItem(
+            id=5, thread_id=7, doctor_id=1, patient_id=2, status=status, created_at=dt.datetime(2026, 5, 4, 10, 0)
+        )
+
+    async def _run():
+        await manager.connect(1, slow)
+        # Routes publish the Pydantic item itself; with Redis down it never becomes a dict.
+        for status in ("ringing", "accepted", "ended"):
+            await manager.publish([1], {"type": "call.updated", "thread_id": 7, "call": _call(status)})
+            await asyncio.sleep(0)
+        stats = manager.stats()
+        slow.release.set()
+        await _until(lambda: len(slow.sent) == 2)
+        return stats
+
+    stats = asyncio.run(_run())
+    assert stats["coalesced"] == 1
+    assert [event["call"]["status"] for event in slow.sent] == ["ringing", "ended"]
@@ -0,0 +1,153 @@
+import asyncio
+import datetime as dt
+import io
+from types import SimpleNamespace
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.analyte_latest import apply_document_to_analyte_latest, rebuild_analyte_latest
+from backend.database import Base, Subscription, User, V2AnalyteLatest, V2Document
+from backend.v2_routes import create_v2_document, delete_v2_document, list_v2_analytes
+from backend.v2.schemas import Context, ImportV2, MetricV2, ReferenceType, ReferenceV2, Specimen
+
+
+def _setup_db():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(email="latest@test.local", hashed_password="x", full_name="Latest", is_active=True, is_doctor=False)
+    db.add(user)
+    db.flush()
+    db.add(Subscription(user_id=user.id, stripe_customer_id="cus_test_123", plan_id="price_monthly", status="active"))
+    db.commit()
+    db.refresh(user)
+    return db, user
+
+
+def _payload(analysis_date, values: dict[str, float]) -> ImportV2:
+    return ImportV2(
+        analysis_date=analysis_date,
+        report_date=None,
+        patient_age=None,
+        patient_sex=None,
+        metrics=[
+            MetricV2(
+                raw_name=key.split("_")[0],
+                analyte_key=key,
+                specimen=Specimen.serum,
+                context=Context.random,
+                value_numeric=value,
+                value_text=None,
+                unit="mg/dL",
+                reference=ReferenceV2(
+                    type=ReferenceType.none,
+                    min=None,
+                    max=None,
+                    threshold=None,
+                    categories=None,
+                    stages=None,
+                    ref_text_raw=None,
+                ),
+                evidence=f"{key} {value}",
+                page=1,
+            )
+            for key, value in values.items()
+        ],
+        warnings=[],
+    )
+
+
+def _upload(db, user, monkeypatch, name: str, payload: ImportV2) -> str:
+    async def fake_extract_v2(_pdf_bytes: bytes, **_kwargs) -> ImportV2:
+        return payload
+
+    monkeypatch.setattr("backend.v2_routes.extract_v2", fake_extract_v2)
+    upload = UploadFile(filename=f"{name}.pdf", file=io.BytesIO(f"%PDF-1.4 {name}".encode()))
+    return asyncio.run(create_v2_document(file=upload, user_id=user.id, db=db))["document_id"]
+
+
+def _latest_values(db, user):
+    analytes = asyncio.run(list_v2_analytes(user_id=user.id, db=db))
+    return {item.analyte_key: item.last_value_numeric for item in analytes}
+
+
+def test_projection_tracks_uploads_out_of_order_and_deletes(monkeypatch):
+    db, user = _setup_db()
+
+    june = _upload(db, user, monkeypatch, "june", _payload(dt.datetime(2025, 6, 1), {"CREATININE_SERUM": 1.4, "UREA_SERUM": 40.0}))
+    _upload(db, user, monkeypatch, "march", _payload(dt.datetime(2025, 3, 1), {"CREATININE_SERUM": 1.1, "GLUCOSE_SERUM": 95.0}))
+
+    # The older report must not displace the June values.
+    assert _latest_values(db, user) == {"CREATININE_SERUM": 1.4, "GLUCOSE_SERUM": 95.0, "UREA_SERUM": 40.0}
+
+    asyncio.run(delete_v2_document(document_id=june, user_id=user.id, db=db))
+
+    # Creatinine falls back to March; urea only existed in June and disappears.
+    assert _latest_values(db, user) == {"CREATININE_SERUM": 1.1, "GLUCOSE_SERUM": 95.0}
+    db.close()
+
+
+def test_rebuild_matches_incremental_maintenance(monkeypatch):
+    db, user = _setup_db()
+    _upload(db, user, monkeypatch, "a", _payload(dt.datetime(2025, 1, 1), {"ALT_SERUM": 30.0}))
+    _upload(db, user, monkeypatch, "b", _payload(dt.datetime(2025, 2, 1), {"ALT_SERUM": 35.0, "AST_SERUM": 22.0}))
+
+    def snapshot():
+        return sorted(
+            (row.analyte_key, row.metric_id, row.document_id, row.value_numeric, row.dt)
+            for row in db.query(V2AnalyteLatest).filter(V2AnalyteLatest.user_id == user.id)
+        )
+
+    incremental = snapshot()
+    db.query(V2AnalyteLatest).delete()
+    db.commit()
+
+    assert rebuild_analyte_latest(db) == 2
+    db.commit()
+    assert snapshot() == incremental
+    db.close()
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["on_conflict", "portable"])
+def test_apply_upserts_rows_written_by_another_transaction(upsert, monkeypatch):
+    if not upsert:
+        monkeypatch.setattr("backend.analyte_latest._upsert_insert", lambda _db: None)
+    db, user = _setup_db()
+    newer = V2Document(user_id=user.id, document_hash="newer", analysis_date=dt.datetime(2025, 6, 1))
+    older = V2Document(user_id=user.id, document_hash="older", analysis_date=dt.datetime(2025, 3, 1))
+    db.add_all([newer, older])
+    db.commit()
+
+    def metric(metric_id, key, value):
+        return SimpleNamespace(id=metric_id, analyte_key=key, raw_name=key, value_numeric=value, value_text=None, unit="mg/dL")
+
+    # Rows stored by another session, like a concurrent upload of the same user.
+    other = sessionmaker(bind=db.get_bind())()
+    apply_document_to_analyte_latest(other, newer, [metric("m-new", "CREATININE_SERUM", 1.4)])
+    apply_document_to_analyte_latest(other, older, [metric("m-old", "UREA_SERUM", 30.0)])
+    other.commit()
+    other.close()
+
+    apply_document_to_analyte_latest(
+        db,
+        older,
+        [metric("m-old-2", "CREATININE_SERUM", 1.1)],
+    )
+    apply_document_to_analyte_latest(
+        db,
+        newer,
+        [metric("m-new-2", "UREA_SERUM", 42.0), metric("m-new-3", "GLUCOSE_SERUM", 90.0)],
+    )
+    db.commit()
+
+    rows = {row.analyte_key: (row.metric_id, row.value_numeric) for row in db.query(V2AnalyteLatest)}
+    # The older report does not displace the newer value; the newer one does.
+    assert rows == {
+        "CREATININE_SERUM": ("m-new", 1.4),
+        "GLUCOSE_SERUM": ("m-new-3", 90.0),
+        "UREA_SERUM": ("m-new-2", 42.0),
+    }
+    db.close()
@@ -7,6 +7,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from unittest.mock import patch
 
+from backend.analyte_latest import rebuild_analyte_latest
 from backend.database import AuditLog, Base, DoctorGrant, Patient, User, V2Document, V2Metric
 from backend.main import (
     DoctorChatRequest,
@@ -87,6 +88,8 @@ def _seed_db():
             evidence="ALT 36 U/L <41",
         )
     )
+    db.flush()
+    rebuild_analyte_latest(db)
     db.commit()
 
     return db, patient_owner, patient, doctor_with_grant, doctor_without_grant
@@ -0,0 +1,328 @@
+import asyncio
+import datetime as dt
+import io
+import os
+
+import pytest
+from fastapi import BackgroundTasks, UploadFile
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base, User, V2Document, V2DocumentJob
+from backend.v2_routes import (
+    create_v2_document_batch,
+    create_v2_document_job,
+    get_v2_document_batch,
+    get_v2_document_job,
+    run_v2_document_batch,
+    run_v2_document_job,
+)
+from backend.v2.schemas import Context, ImportV2, MetricV2, ReferenceType, ReferenceV2, Specimen
+
+
+def _payload() -> ImportV2:
+    return ImportV2(
+        analysis_date=None,
+        report_date=None,
+        patient_age=30,
+        patient_sex="F",
+        metrics=[
+            MetricV2(
+                raw_name="CREATININA",
+                analyte_key="CREATININE_SERUM",
+                specimen=Specimen.serum,
+                context=Context.random,
+                value_numeric=1.1,
+                value_text=None,
+                unit="mg/dL",
+                reference=ReferenceV2(
+                    type=ReferenceType.range,
+                    min=0.7,
+                    max=1.3,
+                    threshold=None,
+                    categories=None,
+                    stages=None,
+                    ref_text_raw="0.7 - 1.3",
+                ),
+                evidence="CREATININA 1.1",
+                page=1,
+            )
+        ],
+    )
+
+
+def _upload(name="job.pdf", body=b"%PDF-1.4 job"):
+    return UploadFile(filename=name, file=io.BytesIO(body))
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    user = User(email="jobs@test.local", hashed_password="x", is_active=True, is_doctor=False)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+    calls = []
+
+    async def fake_extract(pdf_bytes):
+        calls.append(pdf_bytes)
+        return _payload()
+
+    monkeypatch.setenv("UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    monkeypatch.setattr("backend.v2_routes.CELERY_ENABLED", False)
+    monkeypatch.setattr("backend.v2_routes.extract_v2", fake_extract)
+    yield db, factory, user, calls
+    db.close()
+
+
+def _queue(db, user, upload=None):
+    background = BackgroundTasks()
+    response = asyncio.run(
+        create_v2_document_job(background_tasks=background, file=upload or _upload(), user_id=user.id, db=db)
+    )
+    return response, background
+
+
+def test_job_is_queued_then_processed_by_the_runner(env):
+    db, factory, user, calls = env
+
+    response, background = _queue(db, user)
+    assert response["status"] == "queued"
+    assert response["free_uploads_remaining"] == 1
+    assert [task.func for task in background.tasks] == [run_v2_document_job]
+    job = db.query(V2DocumentJob).one()
+    assert os.path.exists(job.file_path)
+    assert calls == []
+
+    asyncio.run(run_v2_document_job(response["job_id"], session_factory=factory))
+
+    db.expire_all()
+    status = asyncio.run(get_v2_document_job(job_id=response["job_id"], user_id=user.id, db=db))
+    assert status["status"] == "done"
+    assert status["num_metrics"] == 1
+    assert status["document_id"] == db.query(V2Document).one().id
+    assert status["free_uploads_remaining"] == 1
+    assert calls == [b"%PDF-1.4 job"]
+    assert db.query(V2DocumentJob).one().file_path is None
+
+    # A redelivered task does nothing.
+    asyncio.run(run_v2_document_job(response["job_id"], session_factory=factory))
+    assert len(calls) == 1
+
+
+def test_failed_job_refunds_the_free_upload(env, monkeypatch):
+    db, factory, user, _calls = env
+
+    async def failing_extract(_pdf_bytes):
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr("backend.v2_routes.extract_v2", failing_extract)
+    response, _background = _queue(db, user)
+    assert response["free_uploads_remaining"] == 1
+
+    asyncio.run(run_v2_document_job(response["job_id"], session_factory=factory))
+
+    db.expire_all()
+    status = asyncio.run(get_v2_document_job(job_id=response["job_id"], user_id=user.id, db=db))
+    assert status["status"] == "failed"
+    assert status["error_code"] == "extraction_failed"
+    assert status["free_uploads_remaining"] == 2
+    assert db.query(V2Document).count() == 0
+
+
+def test_known_document_is_reported_as_duplicate_without_a_job(env):
+    db, factory, user, _calls = env
+    response, _background = _queue(db, user)
+    asyncio.run(run_v2_document_job(response["job_id"], session_factory=factory))
+
+    duplicate, background = _queue(db, user)
+
+    assert isinstance(duplicate, JSONResponse)
+    assert duplicate.status_code == 200
+    assert background.tasks == []
+    assert db.query(V2DocumentJob).count() == 1
+
+
+def test_jobs_are_private_to_their_owner(env):
+    db, _factory, user, _calls = env
+    response, _background = _queue(db, user)
+
+    with pytest.raises(Exception) as exc:
+        asyncio.run(get_v2_document_job(job_id=response["job_id"], user_id=user.id + 1, db=db))
+    assert exc.value.status_code == 404
+
+
+def _queue_batch(db, user, uploads):
+    background = BackgroundTasks()
+    response = asyncio.run(
+        create_v2_document_batch(background_tasks=background, files=uploads, user_id=user.id, db=db)
+    )
+    return response, background
+
+
+def test_batch_dedupes_reserves_credits_and_reports_each_file(env):
+    db, factory, user, calls = env
+    known, _background = _queue(db, user, _upload("known.pdf", b"%PDF-1.4 known"))
+    asyncio.run(run_v2_document_job(known["job_id"], session_factory=factory))
+
+    response, background = _queue_batch(db, user, [
+        _upload("a.pdf", b"%PDF-1.4 a"),
+        _upload("known-again.pdf", b"%PDF-1.4 known"),
+        _upload("a-copy.pdf", b"%PDF-1.4 a"),
+        _upload("notes.txt", b"just some notes"),
+    ])
+
+    assert response["status"] == "processing"
+    assert [item["status"] for item in response["items"]] == ["queued", "duplicate", "duplicate", "rejected"]
+    assert response["items"][1]["document_id"] == db.query(V2Document).one().id
+    assert response["items"][2]["job_id"] == response["items"][0]["job_id"]
+    assert response["items"][3]["error_code"] == "not_a_pdf"
+    assert response["counts"] == {"queued": 1, "duplicate": 2, "rejected": 1}
+    assert response["free_uploads_remaining"] == 0
+    assert [task.func for task in background.tasks] == [run_v2_document_batch]
+
+    asyncio.run(run_v2_document_batch(background.tasks[0].args[0], session_factory=factory))
+
+    db.expire_all()
+    status = asyncio.run(get_v2_document_batch(batch_id=response["batch_id"], user_id=user.id, db=db))
+    assert status["status"] == "done"
+    assert [(item["filename"], item["status"]) for item in status["items"]] == [("a.pdf", "done")]
+    assert calls == [b"%PDF-1.4 known", b"%PDF-1.4 a"]
+
+
+def test_batch_credits_are_reserved_all_or_nothing(env):
+    db, _factory, user, _calls = env
+
+    with pytest.raises(Exception) as exc:
+        _queue_batch(db, user, [_upload(f"{name}.pdf", f"%PDF-1.4 {name}".encode()) for name in "abc"])
+
+    assert exc.value.status_code == 403
+    assert exc.value.detail["free_uploads_remaining"] == 2
+    assert db.query(V2DocumentJob).count() == 0
+    assert not os.listdir(os.path.join(os.environ["UPLOAD_DIR"], "v2_jobs"))
+    db.refresh(user)
+    assert user.free_uploads_used == 0
+
+
+def test_batch_extractions_run_concurrently_under_the_cap(env, monkeypatch):
+    db, factory, user, _calls = env
+    user.free_upload_limit = 10
+    db.commit()
+    active = {"now": 0, "max": 0}
+
+    async def slow_extract(_pdf_bytes):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return _payload()
+
+    monkeypatch.setattr("backend.v2_routes.extract_v2", slow_extract)
+    monkeypatch.setattr("backend.v2_routes.V2_BATCH_MAX_CONCURRENCY", 2)
+    response, background = _queue_batch(db, user, [
+        _upload(f"{name}.pdf", f"%PDF-1.4 {name}".encode()) for name in "abcde"
+    ])
+
+    # A second batch waits for the first one.
+    with pytest.raises(Exception) as exc:
+        _queue_batch(db, user, [_upload("f.pdf", b"%PDF-1.4 f")])
+    assert exc.value.status_code == 409
+    assert exc.value.detail["batch_id"] == response["batch_id"]
+
+    asyncio.run(run_v2_document_batch(background.tasks[0].args[0], session_factory=factory))
+
+    assert active["max"] == 2
+    db.expire_all()
+    status = asyncio.run(get_v2_document_batch(batch_id=response["batch_id"], user_id=user.id, db=db))
+    assert status["counts"] == {"done": 5}
+    assert db.query(V2Document).count() == 5
+
+
+def test_batch_jobs_waiting_their_turn_are_not_expired(env, monkeypatch):
+    db, factory, user, _calls = env
+    user.free_upload_limit = 10
+    db.commit()
+    polls = []
+
+    async def polling_extract(_pdf_bytes):
+        poll_db = factory()
+        try:
+            batch = await get_v2_document_batch(batch_id=response["batch_id"], user_id=user_id, db=poll_db)
+            polls.append(sorted(item["status"] for item in batch["items"]))
+        finally:
+            poll_db.close()
+        return _payload()
+
+    monkeypatch.setattr("backend.v2_routes.extract_v2", polling_extract)
+    monkeypatch.setattr("backend.v2_routes.V2_BATCH_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr("backend.v2_routes.V2_JOB_STALE_SEC", 60)
+    user_id = user.id
+    response, background = _queue_batch(db, user, [
+        _upload(f"{name}.pdf", f"%PDF-1.4 {name}".encode()) for name in "abc"
+    ])
+    # The batch has been waiting far longer than V2_JOB_STALE_SEC.
+    db.query(V2DocumentJob).update(
+        {
+            V2DocumentJob.created_at: dt.datetime.utcnow() - dt.timedelta(hours=1),
+            V2DocumentJob.updated_at: dt.datetime.utcnow() - dt.timedelta(hours=1),
+        }
+    )
+    db.commit()
+
+    asyncio.run(run_v2_document_batch(background.tasks[0].args[0], session_factory=factory))
+
+    assert polls == [
+        ["processing", "queued", "queued"],
+        ["done", "processing", "queued"],
+        ["done", "done", "processing"],
+    ]
+    db.expire_all()
+    status = asyncio.run(get_v2_document_batch(batch_id=response["batch_id"], user_id=user_id, db=db))
+    assert status["counts"] == {"done": 3}
+
+
+def test_single_job_behind_a_queue_backlog_is_not_expired(env, monkeypatch):
+    db, factory, user, calls = env
+    monkeypatch.setattr("backend.v2_routes.V2_JOB_STALE_SEC", 60)
+    response, _background = _queue(db, user)
+    job = db.query(V2DocumentJob).one()
+    job.created_at = job.updated_at = dt.datetime.utcnow() - dt.timedelta(hours=1)
+    db.commit()
+
+    status = asyncio.run(get_v2_document_job(job_id=response["job_id"], user_id=user.id, db=db))
+    assert status["status"] == "queued"
+
+    asyncio.run(run_v2_document_job(response["job_id"], session_factory=factory))
+    db.expire_all()
+    assert db.query(V2DocumentJob).one().status == "done"
+    assert len(calls) == 1
+
+
+def test_jobs_expire_after_their_claim_or_a_long_queue_wait(env, monkeypatch):
+    db, _factory, user, _calls = env
+    monkeypatch.setattr("backend.v2_routes.V2_JOB_STALE_SEC", 60)
+    monkeypatch.setattr("backend.v2_routes.V2_JOB_QUEUED_STALE_SEC", 3600)
+    claimed, _background = _queue(db, user, _upload("claimed.pdf", b"%PDF-1.4 claimed"))
+    forgotten, _background = _queue(db, user, _upload("forgotten.pdf", b"%PDF-1.4 forgotten"))
+    now = dt.datetime.utcnow()
+    db.query(V2DocumentJob).filter(V2DocumentJob.id == claimed["job_id"]).update(
+        {V2DocumentJob.status: "processing", V2DocumentJob.updated_at: now - dt.timedelta(minutes=2)}
+    )
+    db.query(V2DocumentJob).filter(V2DocumentJob.id == forgotten["job_id"]).update(
+        {V2DocumentJob.created_at: now - dt.timedelta(hours=2)}
+    )
+    db.commit()
+
+    for response in (claimed, forgotten):
+        status = asyncio.run(get_v2_document_job(job_id=response["job_id"], user_id=user.id, db=db))
+        assert (status["status"], status["error_code"]) == ("failed", "job_expired")
+    assert status["free_uploads_remaining"] == 2
@@ -7,7 +7,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from backend.database import AuditLog, Base, User, V2Document, V2Metric
-from backend.main import delete_v2_document, list_v2_documents
+from backend.main import delete_v2_document, get_v2_series, list_v2_documents
 
 
 def _setup_db():
@@ -125,3 +125,40 @@ def test_delete_v2_document_not_found():
         asyncio.run(delete_v2_document(document_id="no-such-doc", user_id=user.id, db=db))
     assert exc.value.status_code == 404
     db.close()
+
+
+def test_v2_metrics_denormalize_owner_and_effective_date_for_series():
+    db = _setup_db()
+    user = User(email="series@test.local", hashed_password="x", full_name="Series", is_active=True, is_doctor=False)
+    other = User(email="series-other@test.local", hashed_password="x", full_name="Other", is_active=True, is_doctor=False)
+    db.add_all([user, other])
+    db.commit()
+
+    dated = V2Document(user_id=user.id, document_hash="dated", analysis_date=dt.datetime(2025, 3, 1))
+    undated = V2Document(user_id=user.id, document_hash="undated", created_at=dt.datetime(2025, 1, 5))
+    foreign = V2Document(user_id=other.id, document_hash="foreign", analysis_date=dt.datetime(2025, 2, 1))
+    db.add_all([dated, undated, foreign])
+    db.flush()
+    for document, value in ((dated, 1.3), (undated, 1.1), (foreign, 9.9)):
+        db.add(
+            V2Metric(
+                document_id=document.id,
+                analyte_key="CREATININE_SERUM",
+                raw_name="CREATININA",
+                specimen="serum",
+                context="random",
+                value_numeric=value,
+                unit="mg/dL",
+                page=1,
+                evidence="CREATININA",
+            )
+        )
+    db.commit()
+
+    metric = db.query(V2Metric).filter(V2Metric.document_id == undated.id).one()
+    assert metric.user_id == user.id
+    assert metric.effective_dt == dt.datetime(2025, 1, 5)
+
+    series = asyncio.run(get_v2_series(analyte_key="CREATININE_SERUM", user_id=user.id, db=db))
+    assert [point["y"] for point in series["points"]] == [1.1, 1.3]
+    db.close()
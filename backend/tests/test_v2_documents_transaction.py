@@ -126,7 +126,7 @@ def test_create_v2_document_rolls_back_and_recovers(monkeypatch):
 
     payload = _build_payload()
 
-    async def fake_extract_v2(_pdf_bytes: bytes) -> ImportV2:
+    async def fake_extract_v2(_pdf_bytes: bytes, **_kwargs) -> ImportV2:
         return payload
 
     monkeypatch.setattr("backend.v2_routes.extract_v2", fake_extract_v2)
@@ -175,7 +175,7 @@ def test_inactive_user_gets_two_successful_unique_uploads(monkeypatch):
     db.commit()
     db.refresh(user)
 
-    async def fake_extract_v2(_pdf_bytes: bytes) -> ImportV2:
+    async def fake_extract_v2(_pdf_bytes: bytes, **_kwargs) -> ImportV2:
         return _build_payload()
 
     monkeypatch.setattr("backend.v2_routes.extract_v2", fake_extract_v2)
@@ -206,7 +206,7 @@ def test_failed_free_upload_refunds_credit(monkeypatch):
     db.commit()
     db.refresh(user)
 
-    async def failing_extract(_pdf_bytes: bytes):
+    async def failing_extract(_pdf_bytes: bytes, **_kwargs):
         raise RuntimeError("extract failed")
 
     monkeypatch.setattr("backend.v2_routes.extract_v2", failing_extract)
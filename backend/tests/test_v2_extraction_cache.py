@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from backend.v2 import extraction_cache, extractor
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, _ttl, value):
+        self.data[key] = value
+
+
+def _raw_payload(value=1.1):
+    return {
+        "analysis_date": None,
+        "report_date": None,
+        "patient_age": 30,
+        "patient_sex": "F",
+        "metrics": [
+            {
+                "raw_name": "CREATININA",
+                "analyte_key": "CREATININE_SERUM",
+                "specimen": "serum",
+                "context": "random",
+                "value_numeric": value,
+                "value_text": None,
+                "unit": "mg/dL",
+                "reference": {
+                    "type": "range",
+                    "min": 0.7,
+                    "max": 1.3,
+                    "threshold": None,
+                    "categories": None,
+                    "stages": None,
+                    "ref_text_raw": "0.7 - 1.3",
+                },
+                "evidence": "CREATININA 1.1",
+                "page": 1,
+            }
+        ],
+    }
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    fake = _FakeRedis()
+    calls = []
+
+    async def _extract(pdf_bytes):
+        calls.append(pdf_bytes)
+        return _raw_payload()
+
+    monkeypatch.setattr("backend.deps._get_redis", lambda: fake)
+    monkeypatch.setattr(extraction_cache, "_local", extraction_cache.LocalLRUCache("test", maxsize=8, ttl_sec=60))
+    monkeypatch.setattr(extractor, "extract_import_v2_from_pdf_bytes", _extract)
+    return fake, calls
+
+
+def test_same_bytes_are_extracted_once(fake_llm):
+    fake, calls = fake_llm
+
+    first = asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+    second = asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+    asyncio.run(extractor.extract(b"%PDF-1.4 other report"))
+
+    assert len(calls) == 2
+    assert second == first
+    assert second.metrics[0].analyte_key == "CREATININA__SERUM__NUM"
+    assert all(key.startswith(f"v2_extract:{extraction_cache.EXTRACTION_VERSION}:") for key in fake.data)
+
+
+def test_entries_are_encrypted_and_shared_through_redis(fake_llm, monkeypatch):
+    fake, calls = fake_llm
+    asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+    (stored,) = fake.data.values()
+    assert b"CREATININA" not in stored
+
+    # Another worker: empty local tier, same Redis.
+    monkeypatch.setattr(extraction_cache, "_local", extraction_cache.LocalLRUCache("test", maxsize=8, ttl_sec=60))
+    asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+    assert len(calls) == 1
+
+
+def test_version_change_misses(fake_llm, monkeypatch):
+    _fake, calls = fake_llm
+    asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_VERSION", "new-prompt")
+    asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+    assert len(calls) == 2
+
+
+def test_invalid_model_output_is_not_cached(fake_llm, monkeypatch):
+    _fake, calls = fake_llm
+
+    async def _broken(pdf_bytes):
+        calls.append(pdf_bytes)
+        return {"metrics": "nope"}
+
+    monkeypatch.setattr(extractor, "extract_import_v2_from_pdf_bytes", _broken)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            asyncio.run(extractor.extract(b"%PDF-1.4 report"))
+    assert len(calls) == 2
@@ -0,0 +1,99 @@
+import asyncio
+
+import fitz
+import pytest
+
+from backend.v2 import extraction_cache, extractor
+
+
+def _lab_page(name, value):
+    return [f"HOJA {name}", "Muestra Analitica: SUERO", name, str(value), "mg/dL", "0.5 a 50.0"]
+
+
+def _pdf(pages):
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for offset, line in enumerate(lines):
+            page.insert_text((72, 72 + 14 * offset), line)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _answer(group_pdf):
+    """What the model would return for a group: one metric per page, dates only from page 1."""
+    doc = fitz.open(stream=group_pdf, filetype="pdf")
+    metrics = []
+    first_page = False
+    for number, page in enumerate(doc, start=1):
+        name, value = page.get_text().split("\n")[2:4]
+        first_page = first_page or name == "CREATININA"
+        metrics.append({
+            "raw_name": name, "analyte_key": name, "specimen": "serum", "context": "random",
+            "value_numeric": float(value), "value_text": None, "unit": "mg/dL",
+            "reference": {"type": "range", "min": 0.5, "max": 50.0, "threshold": None,
+                          "categories": None, "stages": None, "ref_text_raw": "0.5 a 50.0"},
+            "evidence": f"{name} {value}", "page": number,
+        })
+    doc.close()
+    return {
+        "analysis_date": "2026-01-10" if first_page else None, "report_date": None,
+        "patient_age": 30 if first_page else None, "patient_sex": "F" if first_page else None,
+        "metrics": metrics, "warnings": [],
+    }
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    calls = []
+    failing = set()
+
+    async def _extract(pdf_bytes):
+        names = tuple(metric["raw_name"] for metric in _answer(pdf_bytes)["metrics"])
+        calls.append(names)
+        if failing & set(names):
+            raise asyncio.TimeoutError()
+        return _answer(pdf_bytes)
+
+    monkeypatch.setenv("PDF_WORKERS", "0")
+    monkeypatch.setenv("V2_EXTRACTION_MODE", "pages")
+    monkeypatch.setenv("V2_EXTRACTION_PAGE_GROUP", "2")
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    monkeypatch.setattr(extraction_cache, "_local", extraction_cache.LocalLRUCache("test", maxsize=32, ttl_sec=60))
+    monkeypatch.setattr(extractor, "extract_import_v2_from_pdf_bytes", _extract)
+    return calls, failing
+
+
+PAGES = [_lab_page("CREATININA", 1.1), _lab_page("UREA", 32.0), _lab_page("SODIO", 40.0), _lab_page("POTASIO", 4.2)]
+
+
+def test_pages_are_extracted_in_groups_and_merged(fake_llm):
+    calls, _failing = fake_llm
+
+    payload = asyncio.run(extractor.extract(_pdf(PAGES)))
+
+    assert sorted(calls) == [("CREATININA", "UREA"), ("SODIO", "POTASIO")]
+    assert [(metric.raw_name, metric.page) for metric in payload.metrics] == [
+        ("CREATININA", 1), ("UREA", 2), ("SODIO", 3), ("POTASIO", 4),
+    ]
+    assert payload.analysis_date.isoformat().startswith("2026-01-10")
+    assert payload.patient_age == 30
+
+
+def test_retry_and_edited_reupload_only_redo_the_changed_groups(fake_llm):
+    calls, failing = fake_llm
+    failing.add("SODIO")
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(extractor.extract(_pdf(PAGES)))
+
+    failing.clear()
+    calls.clear()
+    assert len(asyncio.run(extractor.extract(_pdf(PAGES))).metrics) == 4
+    assert calls == [("SODIO", "POTASIO")]
+
+    calls.clear()
+    edited = PAGES[:3] + [_lab_page("POTASIO", 5.0)]
+    payload = asyncio.run(extractor.extract(_pdf(edited)))
+    assert calls == [("SODIO", "POTASIO")]
+    assert payload.metrics[-1].value_numeric == 5.0
@@ -0,0 +1,139 @@
+import asyncio
+
+import fitz
+import pytest
+
+from backend.v2 import extraction_cache, extractor
+from backend.v2.triage import NotALabReport, triage_pdf, unlock_and_triage_pdf
+
+LAB_PAGE = [
+    "QUIMICA SANGUINEA",
+    "Muestra Analitica: SUERO",
+    "CREATININA",
+    "1.1",
+    "mg/dL",
+    "0.7 a 1.3",
+    "UREA",
+    "32.0",
+    "mg/dL",
+    "15.0 a 45.0",
+]
+PROSE_PAGE = [
+    "Estimado paciente, gracias por confiar en nuestro laboratorio.",
+    "Conserve este documento junto con su historia clinica.",
+    "Horario de atencion de lunes a sabado en todas las sucursales.",
+]
+
+
+def _pdf(pages):
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for offset, line in enumerate(lines):
+            page.insert_text((72, 72 + 14 * offset), line)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _raw_payload(page):
+    return {
+        "analysis_date": None, "report_date": None, "patient_age": 30, "patient_sex": "F",
+        "metrics": [{
+            "raw_name": "UREA", "analyte_key": "UREA", "specimen": "serum", "context": "random",
+            "value_numeric": 32.0, "value_text": None, "unit": "mg/dL",
+            "reference": {"type": "range", "min": 15.0, "max": 45.0, "threshold": None,
+                          "categories": None, "stages": None, "ref_text_raw": "15.0 a 45.0"},
+            "evidence": "UREA 32.0", "page": page,
+        }],
+    }
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    calls = []
+
+    async def _extract(pdf_bytes):
+        calls.append(pdf_bytes)
+        return _raw_payload(page=2)
+
+    monkeypatch.setenv("PDF_WORKERS", "0")
+    monkeypatch.setattr("backend.deps._get_redis", lambda: None)
+    monkeypatch.setattr(extraction_cache, "_local", extraction_cache.LocalLRUCache("test", maxsize=8, ttl_sec=60))
+    monkeypatch.setattr(extractor, "extract_import_v2_from_pdf_bytes", _extract)
+    return calls
+
+
+def test_triage_keeps_the_first_and_lab_pages():
+    triage = triage_pdf(_pdf([LAB_PAGE, PROSE_PAGE, PROSE_PAGE, PROSE_PAGE, LAB_PAGE]))
+
+    assert triage.is_lab_report
+    assert triage.kept_pages == (0, 4)
+    assert [triage.original_page(page) for page in (1, 2, None)] == [1, 5, None]
+    trimmed = fitz.open(stream=triage.trimmed_pdf, filetype="pdf")
+    assert trimmed.page_count == 2
+    assert "UREA" in trimmed[1].get_text()
+    trimmed.close()
+
+
+def test_extraction_sends_the_trimmed_pdf_and_maps_pages_back(fake_llm):
+    pdf_bytes = _pdf([PROSE_PAGE, PROSE_PAGE, LAB_PAGE, PROSE_PAGE])
+
+    payload = asyncio.run(extractor.extract(pdf_bytes))
+
+    sent = fitz.open(stream=fake_llm[0], filetype="pdf")
+    assert sent.page_count == 2
+    sent.close()
+    assert payload.metrics[0].page == 3
+
+
+def test_route_triage_is_reused_by_the_extraction(fake_llm, tmp_path, monkeypatch):
+    pdf_bytes = _pdf([PROSE_PAGE, PROSE_PAGE, LAB_PAGE, PROSE_PAGE])
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(pdf_bytes)
+    unlocked, triage = unlock_and_triage_pdf(str(path))
+    assert unlocked is None and triage.is_trimmed and triage.trimmed_pdf is None
+
+    def _no_second_triage(*_args, **_kwargs):
+        raise AssertionError("the upload was triaged twice")
+
+    monkeypatch.setattr(extractor, "triage_pdf", _no_second_triage)
+    payload = asyncio.run(extractor.extract(pdf_bytes, triage=triage, source_path=str(path)))
+
+    sent = fitz.open(stream=fake_llm[0], filetype="pdf")
+    assert sent.page_count == 2
+    sent.close()
+    assert payload.metrics[0].page == 3
+
+
+def test_cached_extraction_skips_building_the_trimmed_copy(fake_llm, tmp_path, monkeypatch):
+    pdf_bytes = _pdf([PROSE_PAGE, PROSE_PAGE, LAB_PAGE, PROSE_PAGE])
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(pdf_bytes)
+    asyncio.run(extractor.extract(pdf_bytes))
+    _, triage = unlock_and_triage_pdf(str(path))
+
+    def _no_trim(*_args, **_kwargs):
+        raise AssertionError("the trimmed copy was built for a cached extraction")
+
+    monkeypatch.setattr(extractor, "trim_pdf", _no_trim)
+    payload = asyncio.run(extractor.extract(pdf_bytes, triage=triage, source_path=str(path)))
+
+    assert len(fake_llm) == 1
+    assert payload.metrics[0].page == 3
+
+
+def test_text_document_without_lab_content_is_rejected_before_the_llm(fake_llm):
+    pdf_bytes = _pdf([PROSE_PAGE, PROSE_PAGE])
+    assert not triage_pdf(pdf_bytes).is_lab_report
+
+    with pytest.raises(NotALabReport):
+        asyncio.run(extractor.extract(pdf_bytes))
+    assert fake_llm == []
+
+
+def test_unreadable_or_scanned_documents_pass_through():
+    assert triage_pdf(b"%PDF-1.4 not really").is_lab_report
+    scanned = triage_pdf(_pdf([[], PROSE_PAGE, []]))
+    assert scanned.is_lab_report
+    assert scanned.kept_pages == (0, 2)
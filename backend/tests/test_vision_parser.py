@@ -0,0 +1,133 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import fitz
+import httpx
+import pytest
+from openai import APIConnectionError
+
+from backend import vision_parser
+from backend.pdf_document import PdfDocument
+
+
+def _blank_pdf(pages=1):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+_PDF = _blank_pdf()
+
+
+class _FakeCompletions:
+    """Records concurrency and returns the page number that was sent as the OCR text."""
+
+    def __init__(self, delays=None, failures=None):
+        self.delays = delays or {}
+        self.failures = failures or {}
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def create(self, *, messages, **_kwargs):
+        page = int(messages[1]["content"][0]["image_url"]["url"].rsplit(",", 1)[1])
+        with self.lock:
+            self.calls.append(page)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = self.failures.get(page, 0) > 0
+            if fail:
+                self.failures[page] -= 1
+        try:
+            time.sleep(self.delays.get(page, 0.01))
+            if fail:
+                raise APIConnectionError(request=httpx.Request("POST", "https://api.openai.test"))
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"page {page}"))])
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class _FakeClient:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+    def with_options(self, **_kwargs):
+        return self
+
+
+def _install(monkeypatch, completions, pages=6):
+    monkeypatch.setattr(vision_parser, "_get_openai_client", lambda: _FakeClient(completions))
+    monkeypatch.setattr(
+        vision_parser,
+        "_extract_page_text_and_images",
+        lambda _pdf, page_indices=None: [
+            {"page_index": index, "text": "", "images": [str(index)]} for index in page_indices
+        ],
+    )
+    monkeypatch.setattr(vision_parser, "VISION_RETRY_BASE_DELAY_SEC", 0.01)
+    return list(range(pages))
+
+
+def test_ocr_runs_pages_concurrently_and_keeps_page_order(monkeypatch):
+    completions = _FakeCompletions(delays={0: 0.3, 1: 0.2, 2: 0.1})
+    pages = _install(monkeypatch, completions)
+    monkeypatch.setattr(vision_parser, "VISION_MAX_CONCURRENCY", 3)
+
+    started = time.monotonic()
+    results = vision_parser.ocr_pages_to_text(_PDF, pages)
+
+    assert [result["page"] for result in results] == pages
+    assert [result["text"] for result in results] == [f"page {page}" for page in pages]
+    assert completions.max_active == 3
+    assert time.monotonic() - started < 0.6
+
+
+def test_transient_page_errors_are_retried(monkeypatch):
+    completions = _FakeCompletions(failures={2: 2})
+    pages = _install(monkeypatch, completions, pages=3)
+
+    results = vision_parser.ocr_pages_to_text(_PDF, pages)
+
+    assert results[2]["text"] == "page 2"
+    assert completions.calls.count(2) == 3
+
+
+def test_retries_are_bounded(monkeypatch):
+    completions = _FakeCompletions(failures={1: 5})
+    pages = _install(monkeypatch, completions, pages=2)
+    monkeypatch.setattr(vision_parser, "VISION_PAGE_RETRIES", 1)
+
+    with pytest.raises(APIConnectionError):
+        vision_parser.ocr_pages_to_text(_PDF, pages)
+    assert completions.calls.count(1) == 2
+
+
+def test_total_deadline_aborts_slow_documents(monkeypatch):
+    completions = _FakeCompletions(delays={0: 0.01, 1: 1.0})
+    pages = _install(monkeypatch, completions, pages=2)
+    monkeypatch.setattr(vision_parser, "VISION_TOTAL_DEADLINE_SEC", 0.2)
+
+    started = time.monotonic()
+    with pytest.raises(vision_parser.VisionDeadlineExceeded):
+        vision_parser.ocr_pages_to_text(_PDF, pages)
+    assert time.monotonic() - started < 0.8
+
+
+def test_ocr_results_are_memoized_on_a_shared_document(monkeypatch):
+    completions = _FakeCompletions()
+    _install(monkeypatch, completions, pages=3)
+
+    with PdfDocument.open(_PDF) as pdf:
+        first = vision_parser.ocr_pages_to_text(pdf, [0, 1])
+        second = vision_parser.ocr_pages_to_text(pdf, [0, 1, 2])
+
+    assert [result["page"] for result in first] == [0, 1]
+    assert [result["page"] for result in second] == [0, 1, 2]
+    assert sorted(completions.calls) == [0, 1, 2]
@@ -0,0 +1,158 @@
+"""Streaming intake for uploaded PDFs.
+
+``await file.read()`` materializes the whole upload as one ``bytes`` object
+before anything is checked, and every later stage (hashing, encryption,
+password unlock) adds another copy. ``spool_pdf_upload`` instead copies
+the upload to a private temp file in ``UPLOAD_CHUNK_SIZE`` chunks and
+hashes it along the way. It rejects oversized bodies as soon as the limit
+is crossed and non-PDF content from the first chunk:
+
+    upload = await spool_pdf_upload(file)
+    try:
+        with PdfDocument.open_file(upload.path) as pdf:
+            ...
+    finally:
+        upload.close()
+
+Stages that need the content as bytes (the OpenAI file upload) call
+``upload.read_bytes()`` once, at the point of use. Stored uploads are
+encrypted from and decrypted back to spooled files
+(``spool_encrypted_file``), one segment at a time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+from backend.encryption import decrypt_stream
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+PDF_MAGIC = b"%PDF-"
+# The PDF spec lets readers accept a header anywhere in the first 1024 bytes.
+PDF_HEADER_WINDOW = 1024
+
+
+def max_upload_bytes() -> int:
+    default = os.getenv("OPENAI_MAX_FILE_SIZE_BYTES", str(DEFAULT_MAX_UPLOAD_BYTES))
+    return int(os.getenv("MAX_UPLOAD_BYTES", default))
+
+
+class SpooledUpload:
+    """An upload written to a temp file, with its size and sha256."""
+
+    def __init__(self, path: str, size: int, sha256: str, filename: Optional[str]) -> None:
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail={
+            "code": "file_too_large",
+            "message": f"El archivo supera el tamaño máximo permitido ({limit // (1024 * 1024)} MB).",
+            "max_bytes": limit,
+        },
+    )
+
+
+def _not_a_pdf() -> HTTPException:
+    return HTTPException(
+        status_code=415,
+        detail={"code": "not_a_pdf", "message": "El archivo no es un PDF válido."},
+    )
+
+
+async def spool_pdf_upload(file: UploadFile, max_bytes: Optional[int] = None) -> SpooledUpload:
+    """Copy ``file`` to a temp file, enforcing the size limit and the PDF signature.
+
+    Raises 400 for an empty body, 413 past ``max_bytes`` and 415 when the
+    header window has no ``%PDF-`` marker.
+    """
+    limit = max_upload_bytes() if max_bytes is None else max_bytes
+    # Starlette knows the part size once the multipart body is parsed.
+    if file.size is not None and file.size > limit:
+        raise _too_large(limit)
+
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=os.getenv("UPLOAD_TMP_DIR") or None)
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise _too_large(limit)
+                if len(head) < PDF_HEADER_WINDOW:
+                    head += chunk[: PDF_HEADER_WINDOW - len(head)]
+                    if len(head) >= PDF_HEADER_WINDOW and PDF_MAGIC not in head:
+                        raise _not_a_pdf()
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+        if PDF_MAGIC not in head:
+            raise _not_a_pdf()
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+    return SpooledUpload(path, size, digest.hexdigest(), file.filename)
+
+
+class _HashingWriter:
+    def __init__(self, out) -> None:
+        self._out = out
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self._out.write(data)
+
+
+def spool_encrypted_file(path: str, filename: Optional[str] = None) -> SpooledUpload:
+    """Decrypt a stored upload into a temp file, hashing it on the way."""
+    fd, tmp_path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=os.getenv("UPLOAD_TMP_DIR") or None)
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+            writer = _HashingWriter(out)
+            decrypt_stream(src, writer)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return SpooledUpload(tmp_path, writer.size, writer.digest.hexdigest(), filename)
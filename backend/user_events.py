@@ -0,0 +1,268 @@
+"""Per-user event bus behind the consultation / job WebSocket fan-out.
+
+Sockets live in the API process that accepted them
+(``deps.ConsultationConnectionManager``), but events are raised anywhere:
+in another gunicorn worker, another API container, or a Celery worker. All
+of them publish through the bus, and every API process delivers the events
+for the users connected to it.
+
+Two backends, picked with ``EVENT_BUS_BACKEND``:
+
+* ``redis`` (default): one pub/sub channel per user
+  (``user_events:{user_id}``). A process subscribes to a user's channel
+  while it holds at least one socket for that user, so it only receives
+  events it can deliver and the fan-out scales with connected users rather
+  than with the number of processes. Publishing to several users is one
+  pipelined round trip. The relay thread hands everything it drained in one
+  poll to the event loop as a single batch.
+* ``memory``: delivery inside this process only (single worker, tests).
+
+An API process delivers what it publishes to its own sockets directly
+(``publish(..., skip_local=True)``) instead of waiting for the copy the
+relay would bring back: the relay may be reconnecting, or not subscribed
+yet to a user who just connected. Every message carries the publishing
+bus's ``origin`` in that case and the relay drops its own.
+
+Events are best effort. When Redis is unavailable, ``publish`` returns
+False; clients that missed an event catch up by polling the resource it
+refers to.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+USER_EVENTS_CHANNEL = "user_events"
+_RECONNECT_DELAY_SEC = 5.0
+# How long the relay blocks for a message before applying (un)subscriptions.
+_POLL_INTERVAL_SEC = 0.2
+# Messages handed to the event loop in one batch at most.
+_MAX_BATCH = 256
+
+UserEvent = Tuple[int, Dict[str, Any]]
+Deliver = Callable[[List[UserEvent]], Awaitable[None]]
+
+
+def _redis():
+    # Imported lazily: backend.deps imports backend.tasks, which publishes through this module.
+    from backend.deps import _get_redis
+
+    return _get_redis()
+
+
+def _report_redis_failure() -> None:
+    from backend.deps import _report_redis_failure as report
+
+    report()
+
+
+def user_channel(user_id: int) -> str:
+    return f"{USER_EVENTS_CHANNEL}:{user_id}"
+
+
+class InProcessEventBus:
+    """Delivers to the sockets of this process; ``publish`` fails until ``start``."""
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._deliver: Optional[Deliver] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop, deliver: Deliver) -> None:
+        self._loop, self._deliver = loop, deliver
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._loop = self._deliver = None
+
+    def subscribe(self, user_id: int) -> None:
+        pass
+
+    def unsubscribe(self, user_id: int) -> None:
+        pass
+
+    def publish(self, user_ids: Iterable[int], event: Dict[str, Any], skip_local: bool = False) -> bool:
+        if skip_local:
+            # There is no other process: the caller has delivered it already.
+            return True
+        loop, deliver = self._loop, self._deliver
+        if loop is None or deliver is None or loop.is_closed():
+            return False
+        batch = [(user_id, event) for user_id in set(user_ids)]
+        asyncio.run_coroutine_threadsafe(deliver(batch), loop)
+        return True
+
+
+class RedisEventBus:
+    """Per-user Redis pub/sub channels, relayed to the event loop by a thread."""
+
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._wanted: Set[int] = set()
+        self._changed = threading.Event()
+        # Tags the messages this process already delivered to its own sockets.
+        self.origin = uuid.uuid4().hex
+
+    def publish(self, user_ids: Iterable[int], event: Dict[str, Any], skip_local: bool = False) -> bool:
+        """Publish ``event`` to the channels of ``user_ids``.
+
+        With ``skip_local`` the caller delivers to this process's sockets
+        itself and the relay here ignores the message.
+        """
+        client = _redis()
+        if client is None:
+            return False
+        payload = json.dumps(
+            {"origin": self.origin if skip_local else None, "event": jsonable_encoder(event)}
+        )
+        user_ids = set(user_ids)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.publish(user_channel(user_id), payload)
+            pipe.execute()
+            return True
+        except Exception:
+            logger.warning("Failed to publish user event for user_ids=%s", sorted(user_ids), exc_info=True)
+            _report_redis_failure()
+            return False
+
+    def subscribe(self, user_id: int) -> None:
+        with self._lock:
+            self._wanted.add(user_id)
+        self._changed.set()
+
+    def unsubscribe(self, user_id: int) -> None:
+        with self._lock:
+            self._wanted.discard(user_id)
+        self._changed.set()
+
+    def _sync_subscriptions(self, pubsub, current: Set[int]) -> None:
+        # Runs on the relay thread only: a PubSub object is not thread-safe.
+        self._changed.clear()
+        with self._lock:
+            wanted = set(self._wanted)
+        added, removed = wanted - current, current - wanted
+        if added:
+            pubsub.subscribe(*(user_channel(user_id) for user_id in added))
+        if removed:
+            pubsub.unsubscribe(*(user_channel(user_id) for user_id in removed))
+        current.clear()
+        current.update(wanted)
+
+    def _parse(self, message: Optional[Dict[str, Any]]) -> Optional[UserEvent]:
+        if not message or message.get("type") != "message":
+            return None
+        channel = message.get("channel")
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8", "replace")
+        try:
+            user_id = int(str(channel).rsplit(":", 1)[1])
+            envelope = json.loads(message["data"])
+            if envelope.get("origin") == self.origin:
+                return None
+            return user_id, dict(envelope["event"])
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            return None
+
+    def _relay_loop(self, loop: asyncio.AbstractEventLoop, deliver: Deliver) -> None:
+        while not self._stop.is_set():
+            client = _redis()
+            if client is None:
+                self._stop.wait(_RECONNECT_DELAY_SEC)
+                continue
+            pubsub = None
+            current: Set[int] = set()
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                self._changed.set()
+                while not self._stop.is_set():
+                    if self._changed.is_set():
+                        self._sync_subscriptions(pubsub, current)
+                    if not current:
+                        # Nothing to listen to (and no connection to poll) until a user connects.
+                        self._changed.wait(_POLL_INTERVAL_SEC)
+                        continue
+                    batch: List[UserEvent] = []
+                    # Poll below the client's socket timeout so an idle channel is not an error,
+                    # then drain whatever else is already buffered without blocking.
+                    timeout = _POLL_INTERVAL_SEC
+                    while len(batch) < _MAX_BATCH:
+                        message = pubsub.get_message(timeout=timeout)
+                        if message is None:
+                            break
+                        parsed = self._parse(message)
+                        if parsed is not None:
+                            batch.append(parsed)
+                        timeout = 0.0
+                    if batch:
+                        asyncio.run_coroutine_threadsafe(deliver(batch), loop)
+            except Exception:
+                logger.warning("User event relay disconnected; retrying", exc_info=True)
+                _report_redis_failure()
+                self._stop.wait(_RECONNECT_DELAY_SEC)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self, loop: asyncio.AbstractEventLoop, deliver: Deliver) -> None:
+        """Relay events for subscribed users to ``deliver`` on ``loop`` until stopped."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._relay_loop, args=(loop, deliver), name="user-event-relay", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        self._changed.set()
+        thread.join(timeout)
+        self._thread = None
+
+
+def _make_event_bus():
+    backend = (os.getenv("EVENT_BUS_BACKEND") or "redis").strip().lower()
+    if backend == "memory":
+        return InProcessEventBus()
+    if backend != "redis":
+        logger.warning("Unknown EVENT_BUS_BACKEND=%r; using redis", backend)
+    return RedisEventBus()
+
+
+event_bus = _make_event_bus()
+
+
+def publish_user_event(user_id: int, event: Dict[str, Any]) -> bool:
+    """Publish ``event`` for ``user_id``; returns False when it could not be sent."""
+    return event_bus.publish([user_id], event)
+
+
+def publish_user_events(user_ids: Iterable[int], event: Dict[str, Any]) -> bool:
+    """Publish the same ``event`` to several users at once."""
+    return event_bus.publish(user_ids, event)
+
+
+def start_user_event_relay(loop: asyncio.AbstractEventLoop, deliver: Deliver) -> None:
+    event_bus.start(loop, deliver)
+
+
+def stop_user_event_relay(timeout: float = 5.0) -> None:
+    event_bus.stop(timeout)
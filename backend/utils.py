@@ -4,7 +4,7 @@ from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Web
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy import func, text
+from sqlalchemy import func, or_, text
 from sqlalchemy.sql import over
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -63,6 +63,7 @@ from backend.database import (
     save_parsed_records,
 )
 from backend.auth import decode_token, get_current_user_id
+from backend.principal import Principal
 from backend.encryption import encrypt_file_data
 from backend.auth_routes import router as auth_router, UserResponse as AuthUserResponse
 from backend.patient_routes import router as patient_router
@@ -187,53 +188,72 @@ def _reference_bounds_from_v2(reference_json: Optional[dict]) -> tuple[Optional[
 
 
 def _summarize_metrics_v2(db: Session, user_id: int, metric_names=None, days: int = 180):
-    """Collect recent V2 lab data for the user."""
+    """Collect recent V2 lab data for the user: the five latest points per analyte.
+
+    Ranking, the name filter and the top-5 cut all run in one window query that
+    only selects the columns the summary needs.
+    """
     since = dt.datetime.utcnow() - dt.timedelta(days=days)
-    dt_expr = func.coalesce(V2Document.analysis_date, V2Document.created_at)
+    key_expr = func.coalesce(
+        func.nullif(V2Metric.analyte_key, ""),
+        func.upper(func.trim(V2Metric.raw_name)),
+    )
+    rn = func.row_number().over(
+        partition_by=key_expr,
+        order_by=(V2Metric.effective_dt.desc(), V2Metric.id.desc()),
+    ).label("rn")
+
+    query = (
+        db.query(
+            key_expr.label("key"),
+            V2Metric.effective_dt.label("dt"),
+            V2Metric.value_numeric.label("value_numeric"),
+            V2Metric.raw_name.label("raw_name"),
+            V2Metric.value_text.label("value_text"),
+            V2Metric.unit.label("unit"),
+            V2Metric.reference_json.label("reference_json"),
+            rn,
+        )
+        .filter(V2Metric.user_id == user_id)
+        .filter(V2Metric.effective_dt >= since)
+    )
 
+    if metric_names:
+        metric_filters = sorted({str(name).strip().upper() for name in metric_names if str(name).strip()})
+        if metric_filters:
+            query = query.filter(
+                or_(
+                    func.upper(key_expr).in_(metric_filters),
+                    func.upper(func.trim(V2Metric.raw_name)).in_(metric_filters),
+                )
+            )
+
+    ranked = query.subquery()
     rows = (
-        db.query(V2Metric, dt_expr.label("dt"))
-        .join(V2Document, V2Metric.document_id == V2Document.id)
-        .filter(V2Document.user_id == user_id)
-        .filter(dt_expr >= since)
-        .order_by(V2Metric.analyte_key.asc(), dt_expr.desc(), V2Metric.id.desc())
+        db.query(ranked)
+        .filter(ranked.c.rn <= 5)
+        .order_by(ranked.c.key.asc(), ranked.c.rn.asc())
         .all()
     )
 
-    metric_filters = None
-    if metric_names:
-        metric_filters = {str(name).strip().upper() for name in metric_names if str(name).strip()}
-
     grouped: Dict[str, List[Dict[str, Any]]] = {}
-    for metric, ts in rows:
-        key = metric.analyte_key or (metric.raw_name or "").strip().upper()
-        if not key:
+    for row in rows:
+        if not row.key:
             continue
-
-        if metric_filters:
-            raw_name = (metric.raw_name or "").strip().upper()
-            if key.upper() not in metric_filters and raw_name not in metric_filters:
-                continue
-
-        grouped.setdefault(key, [])
-        reference_json = metric.reference_json if isinstance(metric.reference_json, dict) else None
+        reference_json = row.reference_json if isinstance(row.reference_json, dict) else None
         ref_min, ref_max = _reference_bounds_from_v2(reference_json)
-        grouped[key].append(
+        grouped.setdefault(row.key, []).append(
             {
-                "t": ts.isoformat() if ts else None,
-                "value": metric.value_numeric,
-                "value_text": metric.value_text,
-                "unit": metric.unit,
+                "t": row.dt.isoformat() if row.dt else None,
+                "raw_name": row.raw_name,
+                "value": row.value_numeric,
+                "value_text": row.value_text,
+                "unit": row.unit,
                 "ref_min": ref_min,
                 "ref_max": ref_max,
             }
         )
 
-    for name in list(grouped.keys()):
-        grouped[name] = grouped[name][:5]
-        if not grouped[name]:
-            grouped.pop(name, None)
-
     return grouped
 
 
@@ -432,7 +452,7 @@ def _classify_v2_series_type(rows: list[tuple[Any, Any, Any]]) -> str:
     return "text"
 
 
-def _ensure_doctor_access(db: Session, doctor_user: User, patient_id: int) -> Patient:
+def _ensure_doctor_access(db: Session, doctor_user: Optional[Principal], patient_id: int) -> Patient:
     """Ensure doctor has an active grant to the patient and return patient."""
     if not doctor_user or not doctor_user.is_doctor:
         raise HTTPException(status_code=403, detail="Not a doctor")
@@ -466,7 +486,7 @@ def _resolve_doctor_user(db: Session, doctor_id: Optional[int], doctor_email: Op
     return doctor_user
 
 
-def _active_grant_for_doctor(db: Session, doctor: User, patient_id: int) -> Optional[DoctorGrant]:
+def _active_grant_for_doctor(db: Session, doctor: Principal, patient_id: int) -> Optional[DoctorGrant]:
     """Return active grant for doctor/patient, matching either doctor_id or email."""
     return (
         db.query(DoctorGrant)
@@ -0,0 +1,163 @@
+"""Content-addressed cache of V2 LLM extraction results.
+
+``extract_import_v2_from_pdf_bytes`` uploads the whole PDF to the model and
+waits for a structured parse, which can take minutes. The same report is
+often extracted more than once: a preview followed by the real upload, or
+a patient and a caregiver/doctor uploading the same file. Results are
+cached under the sha256 of the (unlocked) PDF bytes plus
+``EXTRACTION_VERSION``. That version is a fingerprint of the model, system
+prompt, ``ImportV2`` schema and page triage (``backend.v2.triage``), so
+changing any of them starts a fresh keyspace.
+
+Entries are Fernet-encrypted at rest, both in Redis
+(``v2_extract:{version}:{sha256}``, ``SETEX`` with
+``V2_EXTRACTION_CACHE_TTL_SEC``; Redis' maxmemory policy handles LRU) and
+in a small in-process LRU that serves as the tier in front of Redis, or
+alone when Redis is down. A hit requires the exact bytes of the document,
+so nothing is disclosed to a caller who does not already hold the file.
+
+Page-granular extraction (``backend.v2.page_extraction``) stores each page
+group under ``pages:{hash}`` in the same keyspace, where the hash covers
+what the pages show (content streams, text, images). It also requires the
+content itself, not a guessable identifier.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from cryptography.fernet import InvalidToken
+
+from backend.encryption import get_fernet
+from backend.read_cache import LocalLRUCache
+from backend.v2.llm_client import EXTRACT_MODEL
+from backend.v2.prompts import EXTRACT_SYSTEM_PROMPT
+from backend.v2.schemas import ImportV2
+from backend.v2.triage import TRIAGE_VERSION
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = (os.getenv("V2_EXTRACTION_CACHE_ENABLED") or "true").strip().lower() in {"1", "true", "yes"}
+CACHE_TTL_SEC = int(os.getenv("V2_EXTRACTION_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+
+EXTRACTION_VERSION = hashlib.sha256(
+    json.dumps(
+        [EXTRACT_MODEL, EXTRACT_SYSTEM_PROMPT, ImportV2.model_json_schema(), TRIAGE_VERSION],
+        sort_keys=True,
+        ensure_ascii=False,
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+_local = LocalLRUCache(
+    "v2_extraction",
+    maxsize=int(os.getenv("V2_EXTRACTION_CACHE_LOCAL_MAXSIZE", "256")),
+    ttl_sec=float(CACHE_TTL_SEC),
+)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+
+def _redis():
+    # Imported lazily: backend.deps imports backend.tasks, which imports the cache modules.
+    from backend.deps import _get_redis
+
+    return _get_redis()
+
+
+def _report_redis_failure() -> None:
+    from backend.deps import _report_redis_failure as report
+
+    report()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def extraction_cache_stats() -> Dict[str, Any]:
+    """Process-local counters for the admin metrics endpoint."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+    stats["version"] = EXTRACTION_VERSION
+    stats["local"] = _local.snapshot_stats()
+    return stats
+
+
+def content_key(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _redis_key(digest: str) -> str:
+    return f"v2_extract:{EXTRACTION_VERSION}:{digest}"
+
+
+def _decrypt(token: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(get_fernet().decrypt(token))
+    except (InvalidToken, ValueError):
+        _count("errors")
+        return None
+
+
+def _get(digest: str) -> Optional[Dict[str, Any]]:
+    if not CACHE_ENABLED:
+        return None
+    token = _local.get((digest, EXTRACTION_VERSION))
+    if not isinstance(token, bytes):
+        token = None
+        r = _redis()
+        if r is not None:
+            try:
+                token = r.get(_redis_key(digest))
+            except Exception:
+                _count("errors")
+                _report_redis_failure()
+            if token:
+                _local.set((digest, EXTRACTION_VERSION), token)
+    payload = _decrypt(token) if token else None
+    _count("hits" if payload is not None else "misses")
+    return payload
+
+
+def _store(digest: str, payload: Dict[str, Any]) -> None:
+    if not CACHE_ENABLED:
+        return
+    token = get_fernet().encrypt(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    _local.set((digest, EXTRACTION_VERSION), token)
+    _count("stores")
+    r = _redis()
+    if r is None:
+        return
+    try:
+        r.setex(_redis_key(digest), CACHE_TTL_SEC, token)
+    except Exception:
+        _count("errors")
+        _report_redis_failure()
+        logger.warning("Failed to store V2 extraction cache entry %s", digest[:12], exc_info=True)
+
+
+def get_cached_extraction(pdf_bytes: bytes) -> Optional[Dict[str, Any]]:
+    """Return the cached raw extraction dict for these exact bytes, or None."""
+    return _get(content_key(pdf_bytes))
+
+
+def store_extraction(pdf_bytes: bytes, payload: Dict[str, Any]) -> None:
+    _store(content_key(pdf_bytes), payload)
+
+
+def get_cached_page_extraction(page_key: str) -> Optional[Dict[str, Any]]:
+    """Cached extraction of one page group (``backend.v2.page_extraction``), or None."""
+    return _get(f"pages:{page_key}")
+
+
+def store_page_extraction(page_key: str, payload: Dict[str, Any]) -> None:
+    _store(f"pages:{page_key}", payload)
@@ -2,9 +2,22 @@ from __future__ import annotations
 
 import re
 import unicodedata
+from typing import Any, Optional
 
+from fastapi import HTTPException
+
+from backend.pdf_workers import run_pdf_task
+from backend.v2.extraction_cache import get_cached_extraction, store_extraction
 from backend.v2.llm_client import extract_import_v2_from_pdf_bytes
+from backend.v2.page_extraction import (
+    PageGroup,
+    extract_by_pages,
+    page_extraction_enabled,
+    page_group_size,
+    split_pdf_pages,
+)
 from backend.v2.schemas import ImportV2
+from backend.v2.triage import NotALabReport, PdfTriage, triage_enabled, triage_pdf, trim_pdf
 
 
 def _normalize_key_chunk(value: str) -> str:
@@ -68,9 +81,84 @@ def _normalize_scientific_units(payload: ImportV2) -> ImportV2:
     return payload
 
 
-async def extract(pdf_bytes: bytes) -> ImportV2:
-    raw_dict = await extract_import_v2_from_pdf_bytes(pdf_bytes)
-    payload = ImportV2.model_validate(raw_dict)
+async def _triage(source: bytes | str) -> Optional[PdfTriage]:
+    if not triage_enabled():
+        return None
+    try:
+        return await run_pdf_task(triage_pdf, source)
+    except HTTPException:
+        # Pool saturated or too slow: triage only saves cost, send the whole file.
+        return None
+
+
+async def _trimmed_copy(source: bytes | str, triage: PdfTriage) -> Optional[bytes]:
+    if triage.trimmed_pdf is not None:
+        return triage.trimmed_pdf
+    try:
+        return await run_pdf_task(trim_pdf, source, triage.kept_pages)
+    except (HTTPException, ValueError):
+        # Saturated pool or a file PyMuPDF cannot re-save: send the whole file.
+        return None
+
+
+async def _page_groups(source: bytes | str) -> Optional[list[PageGroup]]:
+    try:
+        return await run_pdf_task(split_pdf_pages, source, page_group_size())
+    except (HTTPException, ValueError):
+        # Saturated pool or a file PyMuPDF cannot split: extract it whole.
+        return None
+
+
+async def _extract_raw(pdf_bytes: bytes, source: bytes | str) -> dict[str, Any]:
+    """One model call for the document, or one per page group with V2_EXTRACTION_MODE=pages."""
+    if page_extraction_enabled():
+        groups = await _page_groups(source)
+        if groups is not None and len(groups) > 1:
+            return await extract_by_pages(pdf_bytes, extract_import_v2_from_pdf_bytes, groups)
+    return await extract_import_v2_from_pdf_bytes(pdf_bytes)
+
+
+async def _extract_triaged(
+    pdf_bytes: bytes, triage: Optional[PdfTriage], source_path: Optional[str]
+) -> dict[str, Any]:
+    # Pool tasks read the file when there is one instead of pickling the bytes.
+    source = source_path or pdf_bytes
+    if triage is None:
+        triage = await _triage(source)
+    if triage is None:
+        return await _extract_raw(pdf_bytes, source)
+    if not triage.is_lab_report:
+        raise NotALabReport("No page of the document looks like a lab report")
+    trimmed = await _trimmed_copy(source, triage) if triage.is_trimmed else None
+    if trimmed is None:
+        return await _extract_raw(pdf_bytes, source)
+    raw_dict = await _extract_raw(trimmed, trimmed)
+    for metric in raw_dict.get("metrics") or []:
+        if isinstance(metric, dict):
+            metric["page"] = triage.original_page(metric.get("page"))
+    return raw_dict
+
+
+async def extract(
+    pdf_bytes: bytes,
+    triage: Optional[PdfTriage] = None,
+    source_path: Optional[str] = None,
+) -> ImportV2:
+    """Extract ``pdf_bytes`` into an ``ImportV2`` payload.
+
+    ``triage`` is the route's ``PdfTriage`` of the same bytes; when given the
+    document is not scored again, and a trimmed copy it does not carry is
+    built only on a cache miss.
+    ``source_path`` is a file holding exactly ``pdf_bytes``.
+    """
+    raw_dict = get_cached_extraction(pdf_bytes)
+    if raw_dict is None:
+        raw_dict = await _extract_triaged(pdf_bytes, triage, source_path)
+        # Validate before caching so a malformed model answer is retried next time.
+        payload = ImportV2.model_validate(raw_dict)
+        store_extraction(pdf_bytes, raw_dict)
+    else:
+        payload = ImportV2.model_validate(raw_dict)
     payload = _assign_series_keys(payload)
     payload = _normalize_scientific_units(payload)
     return payload
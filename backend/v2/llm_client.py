@@ -12,6 +12,7 @@ from backend.v2.schemas import ImportV2
 _client: AsyncOpenAI | None = None
 DEFAULT_MAX_FILE_SIZE_BYTES = 20 * 1024 * 1024
 DEFAULT_TIMEOUT_SEC = 300.0
+EXTRACT_MODEL = "gpt-5.2"
 
 
 def get_client() -> AsyncOpenAI:
@@ -24,6 +25,14 @@ def get_client() -> AsyncOpenAI:
     return _client
 
 
+async def close_client() -> None:
+    """Close the shared client (call before the event loop that used it ends)."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
+
+
 async def extract_import_v2_from_pdf_bytes(pdf_bytes: bytes) -> dict[str, Any]:
     max_file_size_bytes = int(os.getenv("OPENAI_MAX_FILE_SIZE_BYTES", str(DEFAULT_MAX_FILE_SIZE_BYTES)))
     if len(pdf_bytes) > max_file_size_bytes:
@@ -46,7 +55,7 @@ async def extract_import_v2_from_pdf_bytes(pdf_bytes: bytes) -> dict[str, Any]:
 
         response = await asyncio.wait_for(
             client.responses.parse(
-                model="gpt-5.2",
+                model=EXTRACT_MODEL,
                 input=[
                     {"role": "system", "content": [{"type": "input_text", "text": EXTRACT_SYSTEM_PROMPT}]},
                     {
@@ -0,0 +1,133 @@
+"""Page-granular V2 extraction with a per-page-group result cache.
+
+Whole-document extraction is all or nothing: a timeout at
+``OPENAI_EXTRACT_TIMEOUT_SEC`` or an answer that fails validation halfway
+through a long report throws away everything, and the retry or re-upload
+pays for every page again. With ``V2_EXTRACTION_MODE=pages`` the PDF is
+split into groups of ``V2_EXTRACTION_PAGE_GROUP`` consecutive pages,
+extracted concurrently (at most ``V2_EXTRACTION_PAGE_CONCURRENCY`` model
+calls per document) and merged into one ``ImportV2`` dict:
+
+* metrics are concatenated in page order, with ``page`` mapped from the
+  group's copy back to the document;
+* ``analysis_date``, ``report_date``, ``patient_age`` and ``patient_sex``
+  come from the first group that has them (usually the header on page 1);
+* warnings are concatenated without duplicates.
+
+Each group's validated answer is cached (``extraction_cache``) under a
+hash of its pages' content (``PdfDocument.page_content_hash``), not of the
+file. A failed run keeps the groups that succeeded, so a retry only redoes
+the ones that failed, and a re-upload of an edited report only redoes the
+pages that changed. If any group fails, the whole extraction still raises.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from backend.pdf_document import PdfDocument
+from backend.v2.extraction_cache import get_cached_page_extraction, store_page_extraction
+from backend.v2.schemas import ImportV2
+
+logger = logging.getLogger(__name__)
+
+HEADER_FIELDS = ("analysis_date", "report_date", "patient_age", "patient_sex")
+
+# (0-based page indices in the document, content key, one-group PDF bytes)
+PageGroup = Tuple[Tuple[int, ...], str, bytes]
+
+
+def page_extraction_enabled() -> bool:
+    return (os.getenv("V2_EXTRACTION_MODE") or "document").strip().lower() == "pages"
+
+
+def page_group_size() -> int:
+    try:
+        return max(1, int(os.getenv("V2_EXTRACTION_PAGE_GROUP", "2")))
+    except ValueError:
+        return 2
+
+
+def page_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("V2_EXTRACTION_PAGE_CONCURRENCY", "4")))
+    except ValueError:
+        return 4
+
+
+def split_pdf_pages(source: Union[bytes, str], group_size: int) -> List[PageGroup]:
+    """Cut a PDF (bytes or a file path) into one-group copies; runs in the PDF worker pool."""
+    groups: List[PageGroup] = []
+    pdf = PdfDocument.open_file(source) if isinstance(source, str) else PdfDocument.open(source)
+    with pdf:
+        for start in range(0, pdf.page_count, group_size):
+            pages = tuple(range(start, min(start + group_size, pdf.page_count)))
+            key = hashlib.sha256(
+                "|".join(pdf.page_content_hash(index) for index in pages).encode("ascii")
+            ).hexdigest()
+            groups.append((pages, key, pdf.subset_bytes(pages)))
+    return groups
+
+
+def merge_page_results(results: List[Tuple[Tuple[int, ...], Dict[str, Any]]]) -> Dict[str, Any]:
+    """Merge per-group ImportV2 dicts (in page order) into one for the whole document."""
+    merged: Dict[str, Any] = {field: None for field in HEADER_FIELDS}
+    merged["metrics"] = []
+    merged["warnings"] = []
+    for pages, payload in results:
+        for field in HEADER_FIELDS:
+            if merged[field] is None and payload.get(field) is not None:
+                merged[field] = payload[field]
+        for metric in payload.get("metrics") or []:
+            metric = dict(metric)
+            page = metric.get("page")
+            if isinstance(page, int) and 1 <= page <= len(pages):
+                metric["page"] = pages[page - 1] + 1
+            merged["metrics"].append(metric)
+        for warning in payload.get("warnings") or []:
+            if warning not in merged["warnings"]:
+                merged["warnings"].append(warning)
+    return merged
+
+
+async def _extract_group(
+    group: PageGroup,
+    extract_func: Callable[[bytes], Awaitable[Dict[str, Any]]],
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    pages, key, group_pdf = group
+    cached = get_cached_page_extraction(key)
+    if cached is not None:
+        return cached
+    async with semaphore:
+        raw_dict = await extract_func(group_pdf)
+    # Validate before caching so a malformed answer for this group is retried next time.
+    ImportV2.model_validate(raw_dict)
+    store_page_extraction(key, raw_dict)
+    return raw_dict
+
+
+async def extract_by_pages(
+    pdf_bytes: bytes,
+    extract_func: Callable[[bytes], Awaitable[Dict[str, Any]]],
+    groups: Optional[List[PageGroup]] = None,
+) -> Dict[str, Any]:
+    """Extract ``pdf_bytes`` group by group with ``extract_func`` and merge the answers."""
+    if groups is None:
+        groups = split_pdf_pages(pdf_bytes, page_group_size())
+    semaphore = asyncio.Semaphore(page_concurrency())
+    results = await asyncio.gather(
+        *(_extract_group(group, extract_func, semaphore) for group in groups),
+        return_exceptions=True,
+    )
+    failures = [(group[0], result) for group, result in zip(groups, results) if isinstance(result, BaseException)]
+    if failures:
+        for pages, exc in failures:
+            logger.warning("V2 page extraction failed pages=%s-%s: %s", pages[0] + 1, pages[-1] + 1, type(exc).__name__)
+        # The groups that succeeded are cached; a retry only redoes these.
+        raise failures[0][1]
+    return merge_page_results([(group[0], result) for group, result in zip(groups, results)])
@@ -172,6 +172,37 @@ class V2CreateDocumentDuplicateResponse(BaseModel):
     free_uploads_remaining: int | None = None
 
 
+class V2DocumentJobResponse(BaseModel):
+    job_id: str
+    batch_id: str | None = None
+    status: Literal["queued", "processing", "done", "duplicate", "failed"]
+    document_id: str | None = None
+    num_metrics: int | None = None
+    error_code: str | None = None
+    error_message: str | None = None
+    created_at: str | None = None
+    finished_at: str | None = None
+    free_uploads_remaining: int | None = None
+
+
+class V2DocumentBatchItemResponse(BaseModel):
+    filename: str | None = None
+    status: Literal["queued", "processing", "done", "duplicate", "failed", "rejected"]
+    job_id: str | None = None
+    document_id: str | None = None
+    num_metrics: int | None = None
+    error_code: str | None = None
+    error_message: str | None = None
+
+
+class V2DocumentBatchResponse(BaseModel):
+    batch_id: str
+    status: Literal["processing", "done"]
+    counts: dict[str, int]
+    items: list[V2DocumentBatchItemResponse]
+    free_uploads_remaining: int | None = None
+
+
 class V2AnalyteItemResponse(BaseModel):
     analyte_key: str
     raw_name: str | None = None
@@ -0,0 +1,182 @@
+"""Local pre-flight triage of an upload before the V2 LLM extraction.
+
+``extract_import_v2_from_pdf_bytes`` uploads the whole file to the model,
+even when it is not a lab report or when two of its 60 pages hold the
+results. ``triage_pdf`` scores every page on its PyMuPDF text layer with
+the ``lab_parser_v0`` heuristics (parsed records, reference ranges, unit
+tokens) and decides:
+
+* which pages go to the model: the first page (patient, dates), every page
+  with lab signals, every page without a usable text layer (a scan the
+  model has to read itself) and every page with more image area than the
+  document's plainest page (a result pasted in as a picture, typically
+  from a reference lab, on top of the letterhead all pages share); the
+  rest are dropped from a trimmed copy;
+* whether the document is obviously not a lab report: every page has text,
+  none shows a single lab signal and none is mostly image. Those are
+  rejected before any credit is spent or any byte leaves the server.
+
+Anything the triage cannot read (not a PDF to PyMuPDF, still encrypted)
+passes through untouched. Page numbers in the model's answer refer to the
+trimmed copy; ``PdfTriage.original_page`` maps them back.
+
+``V2_TRIAGE_ENABLED=false`` turns the stage off; ``V2_TRIAGE_REJECT_NON_LAB=false``
+keeps the trimming but never rejects.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+from backend.parsing.lab_parser_v0 import REF_RANGE_RE, UNIT_LIKE_RE, parse_raw_text
+from backend.pdf_document import PdfDocument
+from backend.pdf_workers import unlock_pdf
+
+# Bump when the scoring or page selection changes (part of the extraction cache key).
+TRIAGE_VERSION = "1"
+# Fewer non-blank characters than this and the page is treated as a scan.
+MIN_TEXT_CHARS = 40
+# Image area (share of the page) above the plainest page that keeps a page.
+EXTRA_IMAGE_COVERAGE = 0.1
+# Image area that makes a page a possible scan, so the document is never rejected.
+SCAN_IMAGE_COVERAGE = 0.3
+
+NOT_A_LAB_REPORT_DETAIL = {
+    "code": "not_a_lab_report",
+    "message": "El documento no parece un informe de laboratorio.",
+}
+
+
+class NotALabReport(ValueError):
+    """The triage found no lab content on any page of a text PDF."""
+
+
+def _env_flag(name: str, default: bool = True) -> bool:
+    value = (os.getenv(name) or "").strip().lower()
+    if not value:
+        return default
+    return value in {"1", "true", "yes"}
+
+
+def triage_enabled() -> bool:
+    return _env_flag("V2_TRIAGE_ENABLED")
+
+
+@dataclass(frozen=True)
+class PageScore:
+    index: int
+    chars: int
+    records: int
+    ref_lines: int
+    unit_lines: int
+    image_coverage: float = 0.0
+
+    @property
+    def has_text(self) -> bool:
+        return self.chars >= MIN_TEXT_CHARS
+
+    @property
+    def is_lab(self) -> bool:
+        return self.records > 0 or self.ref_lines > 0 or self.unit_lines >= 2
+
+
+@dataclass(frozen=True)
+class PdfTriage:
+    page_count: int
+    pages: Tuple[PageScore, ...]
+    # 0-based indices of the original pages sent to the model, ascending.
+    kept_pages: Tuple[int, ...]
+    # The PDF to send instead of the original; None to send the original.
+    trimmed_pdf: Optional[bytes] = None
+
+    @property
+    def is_lab_report(self) -> bool:
+        if not self.pages or not _env_flag("V2_TRIAGE_REJECT_NON_LAB"):
+            return True
+        return any(
+            page.is_lab or not page.has_text or page.image_coverage >= SCAN_IMAGE_COVERAGE
+            for page in self.pages
+        )
+
+    @property
+    def is_trimmed(self) -> bool:
+        return len(self.kept_pages) < self.page_count
+
+    def original_page(self, page: Optional[int]) -> Optional[int]:
+        """Map a 1-based page number of the trimmed copy to the original document."""
+        if page is None or not self.is_trimmed or not 1 <= page <= len(self.kept_pages):
+            return page
+        return self.kept_pages[page - 1] + 1
+
+
+def _passthrough(page_count: int = 0) -> PdfTriage:
+    return PdfTriage(page_count=page_count, pages=(), kept_pages=tuple(range(page_count)))
+
+
+def score_page(index: int, text: str, image_coverage: float = 0.0) -> PageScore:
+    lines = [line for line in text.splitlines() if line.strip()]
+    return PageScore(
+        index=index,
+        chars=sum(len(line.strip()) for line in lines),
+        records=len(parse_raw_text(text)),
+        ref_lines=sum(1 for line in lines if REF_RANGE_RE.search(line)),
+        unit_lines=sum(1 for line in lines if UNIT_LIKE_RE.search(line)),
+        image_coverage=image_coverage,
+    )
+
+
+def _kept_pages(pages: Tuple[PageScore, ...]) -> Tuple[int, ...]:
+    baseline = min((page.image_coverage for page in pages), default=0.0)
+    return tuple(
+        page.index
+        for page in pages
+        if page.index == 0
+        or page.is_lab
+        or not page.has_text
+        or page.image_coverage - baseline >= EXTRA_IMAGE_COVERAGE
+    )
+
+
+def triage_pdf(source: Union[bytes, str], build_trimmed: bool = True) -> PdfTriage:
+    """Score the pages of a PDF (bytes or a file path) and pick the ones worth extracting."""
+    try:
+        pdf = PdfDocument.open_file(source) if isinstance(source, str) else PdfDocument.open(source)
+    except ValueError:
+        return _passthrough()
+
+    with pdf:
+        if pdf.needs_pass:
+            return _passthrough(pdf.page_count)
+        pages = tuple(
+            score_page(index, pdf.page_text(index), pdf.page_image_coverage(index))
+            for index in range(pdf.page_count)
+        )
+        kept = _kept_pages(pages)
+        trimmed = None
+        if build_trimmed and len(kept) < len(pages):
+            trimmed = pdf.subset_bytes(kept)
+    return PdfTriage(page_count=len(pages), pages=pages, kept_pages=kept, trimmed_pdf=trimmed)
+
+
+def trim_pdf(source: Union[bytes, str], kept_pages: Tuple[int, ...]) -> bytes:
+    """Build the trimmed copy for a triage that was scored without it."""
+    pdf = PdfDocument.open_file(source) if isinstance(source, str) else PdfDocument.open(source)
+    with pdf:
+        return pdf.subset_bytes(kept_pages)
+
+
+def unlock_and_triage_pdf(
+    path: str, password: Optional[str] = None, build_trimmed: bool = False
+) -> Tuple[Optional[bytes], PdfTriage]:
+    """Pool task for the upload routes: ``unlock_pdf`` then ``triage_pdf``.
+
+    Routes that extract right away hand the triage to ``extractor.extract``,
+    so the document is scored once; the trimmed copy is only built there, on
+    an extraction cache miss.
+    """
+    unlocked = unlock_pdf(path, password)
+    if not triage_enabled():
+        return unlocked, _passthrough()
+    return unlocked, triage_pdf(path if unlocked is None else unlocked, build_trimmed=build_trimmed)
@@ -1,12 +1,12 @@
-__all__ = ['_query_v2_analytes_for_user', '_query_v2_series_rows_for_user', 'create_v2_document', 'list_v2_analytes', 'list_v2_documents', 'get_v2_series', 'delete_v2_document', 'get_v2_document']
+__all__ = ['_query_v2_analytes_for_user', '_query_v2_series_rows_for_user', 'create_v2_document', 'run_v2_document_job', 'create_v2_document_job', 'get_v2_document_job', 'run_v2_document_batch', 'create_v2_document_batch', 'get_v2_document_batch', 'list_v2_analytes', 'list_v2_documents', 'get_v2_series', 'delete_v2_document', 'get_v2_document']
 
 import logging
 logger = logging.getLogger(__name__)
 
 from backend.deps import *
 from backend.utils import *
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import BackgroundTasks, FastAPI, File, UploadFile, Form, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
@@ -15,7 +15,8 @@ from sqlalchemy.sql import over
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, ValidationError
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import asyncio
 import io
 import os
 import logging
@@ -23,8 +24,9 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from dotenv import load_dotenv
 import hashlib
+import uuid
 from pathlib import Path
-import fitz
+from types import SimpleNamespace
 from backend.models import ImportJson
 from backend.v2.extractor import extract as extract_v2
 from backend.v2.schemas import (
@@ -35,7 +37,9 @@ from backend.v2.schemas import (
     V2DeleteDocumentResponse,
     V2DoctorNoteResponse,
     V2DoctorPatientResponse,
+    V2DocumentBatchResponse,
     V2DocumentDetailResponse,
+    V2DocumentJobResponse,
     V2DocumentListItemResponse,
     V2UpsertDoctorNoteRequest,
     V2SeriesResponse,
@@ -43,12 +47,13 @@ from backend.v2.schemas import (
 from backend.analyte_utils import normalize_analyte_name
 from backend.pdf_parser import extract_raw_text
 from backend.parsing.pipeline import coerce_raw_text, parse_with_ocr_fallback
-from backend.tasks import process_pdf_task, CELERY_ENABLED
+from backend.tasks import process_pdf_task, process_v2_document_batch, process_v2_document_job, CELERY_ENABLED
 from backend.database import (
     create_db_engine,
     get_session_factory,
     init_db,
     get_database_url,
+    SessionLocal,
     DoctorGrant,
     DoctorNote,
     ConsultationThread,
@@ -60,7 +65,9 @@ from backend.database import (
     UploadStatus,
     Subscription,
     V2DoctorNote,
+    V2AnalyteLatest,
     V2Document,
+    V2DocumentJob,
     V2Metric,
     ChatSession,
     ChatMessageRecord,
@@ -70,13 +77,19 @@ from backend.database import (
     AuditLog,
     save_parsed_records,
 )
+from backend.analyte_latest import apply_document_to_analyte_latest, remove_document_from_analyte_latest
+from backend.bulk_insert import insert_v2_metrics
+from backend.read_cache import get_or_build as get_or_build_cached, register_namespace
 from backend.auth import decode_token, get_current_user_id
-from backend.encryption import encrypt_file_data
+from backend.encryption import decrypt_file_data, encrypt_file_data, encrypt_stream
+from backend.uploads import SpooledUpload, spool_pdf_upload
+from backend.pdf_workers import PdfPasswordInvalid, PdfPasswordRequired, run_pdf_task, unlock_pdf
+from backend.v2.triage import NOT_A_LAB_REPORT_DETAIL, NotALabReport, PdfTriage, unlock_and_triage_pdf
 from backend.entitlements import (
-    active_subscription_for_user,
     get_upload_allowance,
     refund_free_upload,
     reserve_free_upload,
+    reserve_free_uploads,
 )
 from backend.auth_routes import router as auth_router, UserResponse as AuthUserResponse
 from backend.patient_routes import router as patient_router
@@ -105,61 +118,64 @@ PDF_PASSWORD_INVALID_DETAIL = {
 
 def _prepare_pdf_bytes_for_extraction(pdf_bytes: bytes, pdf_password: str | None = None) -> bytes:
     """Return unlocked PDF bytes when the upload is password-protected."""
-    try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    except Exception:
-        return pdf_bytes
+    with _pdf_password_errors():
+        unlocked = unlock_pdf(pdf_bytes, pdf_password)
+    return pdf_bytes if unlocked is None else unlocked
+
+
+class _PreparedPdf(NamedTuple):
+    pdf_bytes: bytes
+    triage: PdfTriage
+    # The spooled file when it holds exactly ``pdf_bytes`` (the upload was not unlocked).
+    source_path: Optional[str]
+
+
+async def _prepare_spooled_pdf(spooled: SpooledUpload, pdf_password: str | None = None) -> _PreparedPdf:
+    """Unlock and triage a spooled upload in the PDF worker pool.
+
+    Rejects an obvious non-lab document (``backend.v2.triage``) with 422
+    before any credit is reserved. The triage can be handed to ``extract_v2``,
+    which builds the trimmed copy only if the extraction is not cached.
+    """
+    with _pdf_password_errors():
+        unlocked, triage = await run_pdf_task(unlock_and_triage_pdf, spooled.path, pdf_password)
+    if not triage.is_lab_report:
+        raise HTTPException(status_code=422, detail=NOT_A_LAB_REPORT_DETAIL)
+    if unlocked is None:
+        return _PreparedPdf(spooled.read_bytes(), triage, spooled.path)
+    return _PreparedPdf(unlocked, triage, None)
+
+
+async def _prepare_spooled_pdf_for_extraction(spooled: SpooledUpload, pdf_password: str | None = None) -> bytes:
+    """``_prepare_pdf_bytes_for_extraction`` for a spooled upload that is extracted later."""
+    return (await _prepare_spooled_pdf(spooled, pdf_password)).pdf_bytes
 
+
+@contextmanager
+def _pdf_password_errors():
     try:
-        if not doc.needs_pass:
-            return pdf_bytes
+        yield
+    except PdfPasswordRequired:
+        raise HTTPException(status_code=423, detail=PDF_PASSWORD_REQUIRED_DETAIL)
+    except PdfPasswordInvalid:
+        raise HTTPException(status_code=400, detail=PDF_PASSWORD_INVALID_DETAIL)
 
-        password = (pdf_password or "").strip()
-        if not password:
-            raise HTTPException(status_code=423, detail=PDF_PASSWORD_REQUIRED_DETAIL)
 
-        if not doc.authenticate(password):
-            raise HTTPException(status_code=400, detail=PDF_PASSWORD_INVALID_DETAIL)
+register_namespace("analyte_list", maxsize=2048, ttl_sec=60.0)
 
-        unlocked = io.BytesIO()
-        doc.save(unlocked, encryption=fitz.PDF_ENCRYPT_NONE, garbage=4, deflate=True)
-        return unlocked.getvalue()
-    finally:
-        doc.close()
 
 def _query_v2_analytes_for_user(db: Session, scoped_user_id: int) -> list[V2AnalyteItemResponse]:
-    dt_expr = func.coalesce(V2Document.analysis_date, V2Document.created_at)
-    rn = func.row_number().over(
-        partition_by=V2Metric.analyte_key,
-        order_by=(dt_expr.desc(), V2Document.id.desc(), V2Metric.id.desc()),
-    ).label("rn")
-
-    subq = (
-        db.query(
-            V2Metric.analyte_key.label("analyte_key"),
-            V2Metric.raw_name.label("raw_name"),
-            V2Metric.value_numeric.label("last_value_numeric"),
-            V2Metric.value_text.label("last_value_text"),
-            V2Metric.unit.label("unit"),
-            dt_expr.label("dt"),
-            rn,
-        )
-        .join(V2Document, V2Metric.document_id == V2Document.id)
-        .filter(V2Document.user_id == scoped_user_id)
-        .subquery()
+    # Invalidated with the lab snapshot on every lab data write (see backend.snapshot_cache).
+    return list(
+        get_or_build_cached("analyte_list", (scoped_user_id,), lambda: _load_v2_analytes_for_user(db, scoped_user_id))
     )
 
+
+def _load_v2_analytes_for_user(db: Session, scoped_user_id: int) -> list[V2AnalyteItemResponse]:
     rows = (
-        db.query(
-            subq.c.analyte_key,
-            subq.c.raw_name,
-            subq.c.last_value_numeric,
-            subq.c.last_value_text,
-            subq.c.unit,
-            subq.c.dt,
-        )
-        .filter(subq.c.rn == 1)
-        .order_by(subq.c.analyte_key.asc())
+        db.query(V2AnalyteLatest)
+        .filter(V2AnalyteLatest.user_id == scoped_user_id)
+        .order_by(V2AnalyteLatest.analyte_key.asc())
         .all()
     )
 
@@ -167,8 +183,8 @@ def _query_v2_analytes_for_user(db: Session, scoped_user_id: int) -> list[V2Anal
         V2AnalyteItemResponse(
             analyte_key=row.analyte_key,
             raw_name=row.raw_name,
-            last_value_numeric=row.last_value_numeric,
-            last_value_text=row.last_value_text,
+            last_value_numeric=row.value_numeric,
+            last_value_text=row.value_text,
             last_date=_iso_or_none(row.dt),
             unit=row.unit,
         )
@@ -177,19 +193,140 @@ def _query_v2_analytes_for_user(db: Session, scoped_user_id: int) -> list[V2Anal
 
 
 def _query_v2_series_rows_for_user(db: Session, scoped_user_id: int, analyte_key: str):
-    dt_expr = func.coalesce(V2Document.analysis_date, V2Document.created_at)
+    # Filters and sort run on the denormalized columns so Postgres can walk
+    # ix_v2_metrics_user_analyte_dt instead of every row for this analyte_key.
     return (
-        db.query(V2Metric, V2Document, dt_expr.label("dt"))
+        db.query(V2Metric, V2Document, V2Metric.effective_dt.label("dt"))
         .join(V2Document, V2Metric.document_id == V2Document.id)
         .filter(
-            V2Document.user_id == scoped_user_id,
+            V2Metric.user_id == scoped_user_id,
             V2Metric.analyte_key == analyte_key,
         )
-        .order_by(dt_expr.asc(), V2Document.id.asc(), V2Metric.id.asc())
+        .order_by(V2Metric.effective_dt.asc(), V2Metric.document_id.asc(), V2Metric.id.asc())
         .all()
     )
 
 
+def _v2_duplicate_response(db: Session, user_id: int, existing_doc: V2Document) -> Dict[str, Any]:
+    """Audit a re-upload of an already imported document and describe the existing one."""
+    num_metrics = (
+        db.query(func.count(V2Metric.id))
+        .filter(V2Metric.document_id == existing_doc.id)
+        .scalar()
+        or 0
+    )
+    write_audit_log(
+        db,
+        actor_user_id=user_id,
+        actor_role="patient",
+        action="v2_document_duplicate_upload",
+        resource_type="v2_document",
+        resource_id=existing_doc.id,
+        metadata={"num_metrics": int(num_metrics)},
+    )
+    db.commit()
+    return {
+        "status": "duplicate",
+        "document_id": existing_doc.id,
+        "analysis_date": _iso_or_none(existing_doc.analysis_date),
+        "num_metrics": int(num_metrics),
+        "free_uploads_remaining": get_upload_allowance(db, user_id).remaining,
+    }
+
+
+def _reserve_v2_upload_credit(db: Session, user: Principal, count: int = 1) -> bool:
+    """Reserve ``count`` free uploads (all or none) for patients without a subscription.
+
+    Returns whether credits were reserved; 403 when not enough are left.
+    """
+    if user.is_doctor or user.has_subscription:
+        return False
+    allowance = reserve_free_uploads(db, user.id, count) if count > 1 else reserve_free_upload(db, user.id)
+    if allowance is None:
+        remaining = get_upload_allowance(db, user.id).remaining
+        write_audit_log(
+            db,
+            actor_user_id=user.id,
+            actor_role="patient",
+            action="v2_free_upload_limit_reached",
+            resource_type="v2_document",
+            metadata={"free_uploads_remaining": remaining, "requested": count},
+        )
+        db.commit()
+        if count > 1 and remaining > 0:
+            message = f"Solo te quedan {remaining} cargas gratuitas y el lote tiene {count} documentos nuevos."
+        else:
+            message = "Ya usaste tus 2 cargas gratuitas. Activa tu prueba para subir más documentos."
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "code": "free_upload_limit_reached",
+                "message": message,
+                "free_uploads_remaining": remaining,
+            },
+        )
+    return True
+
+
+def _persist_v2_document(
+    db: Session,
+    *,
+    user_id: int,
+    document_hash: str,
+    source_filename: Optional[str],
+    payload: ImportV2,
+    free_credit_reserved: bool,
+) -> V2Document:
+    """Add the document, its metrics and the latest-value projection; the caller commits."""
+    doc = V2Document(
+        user_id=user_id,
+        document_hash=document_hash,
+        source_filename=source_filename,
+        analysis_date=payload.analysis_date,
+        report_date=payload.report_date,
+    )
+    db.add(doc)
+    db.flush()
+
+    effective_dt = doc.analysis_date or doc.created_at
+    metric_rows = insert_v2_metrics(
+        db,
+        (
+            {
+                "document_id": doc.id,
+                "user_id": user_id,
+                "effective_dt": effective_dt,
+                "analyte_key": metric.analyte_key,
+                "raw_name": metric.raw_name,
+                "specimen": metric.specimen.value if hasattr(metric.specimen, "value") else str(metric.specimen),
+                "context": metric.context.value if hasattr(metric.context, "value") else str(metric.context),
+                "value_numeric": metric.value_numeric,
+                "value_text": metric.value_text,
+                "unit": metric.unit,
+                "reference_json": metric.reference.model_dump(mode="json") if metric.reference else None,
+                "page": metric.page,
+                "evidence": metric.evidence,
+            }
+            for metric in payload.metrics
+        ),
+    )
+    apply_document_to_analyte_latest(db, doc, [SimpleNamespace(**row) for row in metric_rows])
+
+    write_audit_log(
+        db,
+        actor_user_id=user_id,
+        actor_role="patient",
+        action="v2_document_created",
+        resource_type="v2_document",
+        resource_id=doc.id,
+        metadata={
+            "num_metrics": len(payload.metrics),
+            "access_mode": "free" if free_credit_reserved else "subscription",
+        },
+    )
+    return doc
+
+
 @router.post("/api/v2/documents", response_model=V2CreateDocumentResponse | V2CreateDocumentDuplicateResponse)
 async def create_v2_document(
     file: UploadFile = File(...),
@@ -198,15 +335,10 @@ async def create_v2_document(
     db: Session = Depends(get_db),
 ):
     """Persist a parsed V2 document and metrics for the authenticated user."""
-    pdf_bytes = await file.read()
-    if not pdf_bytes:
-        raise HTTPException(status_code=400, detail="Empty file")
-
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = require_principal(db, user_id)
 
-    document_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    spooled = await spool_pdf_upload(file)
+    document_hash = spooled.sha256
     free_credit_reserved = False
     document_committed = False
     try:
@@ -219,105 +351,28 @@ async def create_v2_document(
             .first()
         )
         if existing_doc:
-            num_metrics = (
-                db.query(func.count(V2Metric.id))
-                .filter(V2Metric.document_id == existing_doc.id)
-                .scalar()
-                or 0
-            )
-            write_audit_log(
-                db,
-                actor_user_id=user_id,
-                actor_role="patient",
-                action="v2_document_duplicate_upload",
-                resource_type="v2_document",
-                resource_id=existing_doc.id,
-                metadata={"num_metrics": int(num_metrics)},
-            )
-            db.commit()
-            return {
-                "status": "duplicate",
-                "document_id": existing_doc.id,
-                "analysis_date": _iso_or_none(existing_doc.analysis_date),
-                "num_metrics": int(num_metrics),
-                "free_uploads_remaining": get_upload_allowance(db, user_id).remaining,
-            }
+            return _v2_duplicate_response(db, user_id, existing_doc)
 
-        extraction_pdf_bytes = _prepare_pdf_bytes_for_extraction(pdf_bytes, pdf_password)
-        if not user.is_doctor and active_subscription_for_user(db, user_id) is None:
-            allowance = reserve_free_upload(db, user_id)
-            if allowance is None:
-                write_audit_log(
-                    db,
-                    actor_user_id=user_id,
-                    actor_role="patient",
-                    action="v2_free_upload_limit_reached",
-                    resource_type="v2_document",
-                    metadata={"free_uploads_remaining": 0},
-                )
-                db.commit()
-                raise HTTPException(
-                    status_code=403,
-                    detail={
-                        "code": "free_upload_limit_reached",
-                        "message": "Ya usaste tus 2 cargas gratuitas. Activa tu prueba para subir más documentos.",
-                        "free_uploads_remaining": 0,
-                    },
-                )
-            free_credit_reserved = True
+        prepared = await _prepare_spooled_pdf(spooled, pdf_password)
+        free_credit_reserved = _reserve_v2_upload_credit(db, user)
 
         try:
-            payload = await extract_v2(extraction_pdf_bytes)
+            payload = await extract_v2(prepared.pdf_bytes, triage=prepared.triage, source_path=prepared.source_path)
         except ValidationError as e:
             raise HTTPException(status_code=422, detail=e.errors())
+        except NotALabReport:
+            raise HTTPException(status_code=422, detail=NOT_A_LAB_REPORT_DETAIL)
 
-        doc = V2Document(
+        doc = _persist_v2_document(
+            db,
             user_id=user_id,
             document_hash=document_hash,
             source_filename=file.filename,
-            analysis_date=payload.analysis_date,
-            report_date=payload.report_date,
-        )
-        db.add(doc)
-        db.flush()
-
-        for metric in payload.metrics:
-            db.add(
-                V2Metric(
-                    document_id=doc.id,
-                    analyte_key=metric.analyte_key,
-                    raw_name=metric.raw_name,
-                    specimen=metric.specimen.value if hasattr(metric.specimen, "value") else str(metric.specimen),
-                    context=metric.context.value if hasattr(metric.context, "value") else str(metric.context),
-                    value_numeric=metric.value_numeric,
-                    value_text=metric.value_text,
-                    unit=metric.unit,
-                    reference_json=metric.reference.model_dump(mode="json") if metric.reference else None,
-                    page=metric.page,
-                    evidence=metric.evidence,
-                )
-            )
-
-        write_audit_log(
-            db,
-            actor_user_id=user_id,
-            actor_role="patient",
-            action="v2_document_created",
-            resource_type="v2_document",
-            resource_id=doc.id,
-            metadata={
-                "num_metrics": len(payload.metrics),
-                "access_mode": "free" if free_credit_reserved else "subscription",
-            },
+            payload=payload,
+            free_credit_reserved=free_credit_reserved,
         )
         db.commit()
         document_committed = True
-        r = _get_redis()
-        if r:
-            try:
-                r.delete(f"analyte_snapshot:{user_id}")
-            except Exception:
-                pass
         db.refresh(doc)
         return {
             "document_id": doc.id,
@@ -363,6 +418,584 @@ async def create_v2_document(
             document_hash,
         )
         raise HTTPException(status_code=500, detail=f"Failed to persist V2 document: {type(e).__name__}")
+    finally:
+        spooled.close()
+
+
+# ── Queued extraction (POST /api/v2/documents/jobs) ─────────────────────
+
+# A claimed ("processing") job whose runner has been silent this long is presumed dead.
+V2_JOB_STALE_SEC = int(os.getenv("V2_JOB_STALE_SEC", "900"))
+# A "queued" job may legitimately wait behind a Celery backlog or its batch's
+# semaphore, so it only expires when nothing has picked it up for much longer.
+V2_JOB_QUEUED_STALE_SEC = int(os.getenv("V2_JOB_QUEUED_STALE_SEC", str(24 * 3600)))
+_V2_JOB_ACTIVE_STATUSES = {"queued", "processing"}
+
+
+def _write_v2_job_blob(job_id: str, pdf_bytes: bytes) -> str:
+    job_dir = os.path.join(os.getenv("UPLOAD_DIR", "uploads"), "v2_jobs")
+    os.makedirs(job_dir, exist_ok=True)
+    file_path = os.path.join(job_dir, f"{job_id}.pdf")
+    with open(file_path, "wb") as f:
+        encrypt_stream(io.BytesIO(pdf_bytes), f)
+    return file_path
+
+
+def _remove_v2_job_blob(job: V2DocumentJob) -> None:
+    if job.file_path:
+        try:
+            os.remove(job.file_path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Failed to remove V2 job blob job_id=%s", job.id, exc_info=True)
+            return
+        job.file_path = None
+
+
+def _v2_job_response(db: Session, job: V2DocumentJob, free_uploads_remaining: Optional[int] = None) -> Dict[str, Any]:
+    if free_uploads_remaining is None:
+        free_uploads_remaining = get_upload_allowance(db, job.user_id).remaining
+    return {
+        "job_id": job.id,
+        "batch_id": job.batch_id,
+        "status": job.status,
+        "document_id": job.document_id,
+        "num_metrics": job.num_metrics,
+        "error_code": job.error_code,
+        "error_message": job.error_message,
+        "created_at": _iso_or_none(job.created_at),
+        "finished_at": _iso_or_none(job.finished_at),
+        "free_uploads_remaining": free_uploads_remaining,
+    }
+
+
+def _finish_v2_job(
+    db: Session,
+    job: V2DocumentJob,
+    status: str,
+    *,
+    error_code: Optional[str] = None,
+    error_message: Optional[str] = None,
+) -> None:
+    """Record the outcome, refund an unused free upload and drop the blob; commits."""
+    job.status = status
+    job.error_code = error_code
+    job.error_message = error_message
+    job.finished_at = dt.datetime.utcnow()
+    _remove_v2_job_blob(job)
+    if status == "failed":
+        write_audit_log(
+            db,
+            actor_user_id=job.user_id,
+            actor_role="patient",
+            action="v2_document_job_failed",
+            resource_type="v2_document_job",
+            resource_id=job.id,
+            status="error",
+            metadata={"error_code": error_code},
+        )
+    db.commit()
+    if job.free_credit_reserved and status != "done":
+        refund_free_upload(db, job.user_id)
+
+
+def _v2_job_error(exc: Exception) -> Tuple[str, str]:
+    if isinstance(exc, ValidationError):
+        return "extraction_invalid", "The extracted report did not match the ImportV2 schema."
+    if isinstance(exc, asyncio.TimeoutError):
+        return "extraction_timeout", "The extraction timed out."
+    if isinstance(exc, NotALabReport):
+        return "not_a_lab_report", NOT_A_LAB_REPORT_DETAIL["message"]
+    if isinstance(exc, HTTPException):
+        return "extraction_failed", str(exc.detail)
+    return "extraction_failed", f"Failed to process V2 document: {type(exc).__name__}"
+
+
+async def _notify_v2_job(db: Session, job: V2DocumentJob) -> None:
+    event = {"type": "v2_document_job", **_v2_job_response(db, job)}
+    # From a Celery worker the event reaches the API processes through the bus;
+    # without Redis it can still reach this process' own sockets.
+    await consultation_ws_manager.publish([job.user_id], event)
+
+
+async def run_v2_document_job(job_id: str, session_factory=None) -> None:
+    """Extract and persist a queued upload; the free-upload credit is refunded unless it succeeds."""
+    db = (session_factory or SessionLocal)()
+    try:
+        claimed = (
+            db.query(V2DocumentJob)
+            .filter(V2DocumentJob.id == job_id, V2DocumentJob.status == "queued")
+            # updated_at marks the claim: staleness of a processing job is measured from it.
+            .update(
+                {V2DocumentJob.status: "processing", V2DocumentJob.updated_at: dt.datetime.utcnow()},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed != 1:
+            # Redelivered, already handled or expired.
+            logger.info("V2 document job not claimable job_id=%s", job_id)
+            return
+        job = db.query(V2DocumentJob).filter(V2DocumentJob.id == job_id).first()
+
+        try:
+            with open(job.file_path, "rb") as f:
+                pdf_bytes = decrypt_file_data(f.read())
+            existing_doc = (
+                db.query(V2Document)
+                .filter(
+                    V2Document.user_id == job.user_id,
+                    V2Document.document_hash == job.document_hash,
+                )
+                .first()
+            )
+            if existing_doc is None:
+                # Hand the connection back to the pool for the duration of the LLM call.
+                db.commit()
+                payload = await extract_v2(pdf_bytes)
+                doc = _persist_v2_document(
+                    db,
+                    user_id=job.user_id,
+                    document_hash=job.document_hash,
+                    source_filename=job.source_filename,
+                    payload=payload,
+                    free_credit_reserved=job.free_credit_reserved,
+                )
+                job.document_id = doc.id
+                job.num_metrics = len(payload.metrics)
+                _finish_v2_job(db, job, "done")
+            else:
+                job.document_id = existing_doc.id
+                job.num_metrics = db.query(V2Metric).filter(V2Metric.document_id == existing_doc.id).count()
+                _finish_v2_job(db, job, "duplicate")
+        except IntegrityError:
+            # Another upload of the same file committed first.
+            db.rollback()
+            existing_doc = (
+                db.query(V2Document)
+                .filter(
+                    V2Document.user_id == job.user_id,
+                    V2Document.document_hash == job.document_hash,
+                )
+                .first()
+            )
+            job.document_id = existing_doc.id if existing_doc else None
+            if existing_doc:
+                _finish_v2_job(db, job, "duplicate")
+            else:
+                _finish_v2_job(
+                    db,
+                    job,
+                    "failed",
+                    error_code="extraction_failed",
+                    error_message="Failed to persist V2 document: IntegrityError",
+                )
+        except Exception as exc:
+            db.rollback()
+            logger.exception("V2 document job failed job_id=%s user_id=%s", job.id, job.user_id)
+            error_code, error_message = _v2_job_error(exc)
+            _finish_v2_job(db, job, "failed", error_code=error_code, error_message=error_message)
+
+        await _notify_v2_job(db, job)
+    finally:
+        db.close()
+
+
+def _v2_job_is_stale(job: V2DocumentJob) -> bool:
+    if job.status == "processing":
+        since, limit = job.updated_at, V2_JOB_STALE_SEC
+    elif job.status == "queued":
+        since, limit = job.created_at, V2_JOB_QUEUED_STALE_SEC
+    else:
+        return False
+    return since is None or (dt.datetime.utcnow() - since).total_seconds() >= limit
+
+
+def _expire_stale_v2_job(db: Session, job: V2DocumentJob) -> None:
+    """Fail a job whose worker died, so the client stops polling and the credit is returned.
+
+    A processing job expires ``V2_JOB_STALE_SEC`` after it was claimed; a
+    queued one only after ``V2_JOB_QUEUED_STALE_SEC``.
+    """
+    if not _v2_job_is_stale(job):
+        return
+    _finish_v2_job(
+        db,
+        job,
+        "failed",
+        error_code="job_expired",
+        error_message="The extraction did not finish in time.",
+    )
+
+
+@router.post(
+    "/api/v2/documents/jobs",
+    status_code=202,
+    response_model=V2DocumentJobResponse | V2CreateDocumentDuplicateResponse,
+)
+async def create_v2_document_job(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    pdf_password: Optional[str] = Form(None),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Queue V2 extraction of an uploaded PDF and return 202 with a job id.
+
+    Poll GET /api/v2/documents/jobs/{job_id}, or wait for the
+    ``v2_document_job`` event on the /api/consultations/ws socket.
+    """
+    user = require_principal(db, user_id)
+
+    with await spool_pdf_upload(file) as spooled:
+        document_hash = spooled.sha256
+        existing_doc = (
+            db.query(V2Document)
+            .filter(
+                V2Document.user_id == user_id,
+                V2Document.document_hash == document_hash,
+            )
+            .first()
+        )
+        if existing_doc:
+            return JSONResponse(status_code=200, content=_v2_duplicate_response(db, user_id, existing_doc))
+
+        extraction_pdf_bytes = await _prepare_spooled_pdf_for_extraction(spooled, pdf_password)
+    free_credit_reserved = _reserve_v2_upload_credit(db, user)
+    try:
+        job = V2DocumentJob(
+            user_id=user_id,
+            document_hash=document_hash,
+            source_filename=file.filename,
+            free_credit_reserved=free_credit_reserved,
+        )
+        db.add(job)
+        db.flush()
+        job.file_path = _write_v2_job_blob(job.id, extraction_pdf_bytes)
+        write_audit_log(
+            db,
+            actor_user_id=user_id,
+            actor_role="patient",
+            action="v2_document_job_queued",
+            resource_type="v2_document_job",
+            resource_id=job.id,
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if free_credit_reserved:
+            refund_free_upload(db, user_id)
+        logger.exception("Failed to queue V2 document user_id=%s filename=%s", user_id, file.filename)
+        raise HTTPException(status_code=500, detail=f"Failed to queue V2 document: {type(e).__name__}")
+
+    try:
+        if CELERY_ENABLED:
+            process_v2_document_job.delay(job.id)
+        else:
+            background_tasks.add_task(run_v2_document_job, job.id)
+    except Exception:
+        logger.exception("Failed to enqueue V2 document job job_id=%s", job.id)
+        _finish_v2_job(
+            db,
+            job,
+            "failed",
+            error_code="queue_unavailable",
+            error_message="The processing queue is unavailable.",
+        )
+        raise HTTPException(
+            status_code=503,
+            detail={"code": "queue_unavailable", "message": "No pudimos procesar el documento. Inténtalo de nuevo."},
+        )
+
+    return _v2_job_response(db, job)
+
+
+@router.get("/api/v2/documents/jobs/{job_id}", response_model=V2DocumentJobResponse)
+async def get_v2_document_job(
+    job_id: str,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Status of a queued V2 upload."""
+    job = (
+        db.query(V2DocumentJob)
+        .filter(V2DocumentJob.id == job_id, V2DocumentJob.user_id == user_id)
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    _expire_stale_v2_job(db, job)
+    return _v2_job_response(db, job)
+
+
+# ── Batch upload (POST /api/v2/documents/batch) ─────────────────────────
+
+V2_BATCH_MAX_FILES = int(os.getenv("V2_BATCH_MAX_FILES", "50"))
+# Extractions of one batch in flight at once; a user has at most one active batch.
+V2_BATCH_MAX_CONCURRENCY = int(os.getenv("V2_BATCH_MAX_CONCURRENCY", "4"))
+
+
+async def run_v2_document_batch(job_ids: List[str], session_factory=None) -> None:
+    """Run the jobs of a batch concurrently, at most ``V2_BATCH_MAX_CONCURRENCY`` at a time.
+
+    Every job commits and announces its own outcome, so clients see files
+    finish one by one and the batch takes about as long as its slowest reports.
+    """
+    semaphore = asyncio.Semaphore(max(1, V2_BATCH_MAX_CONCURRENCY))
+
+    async def _run(job_id: str) -> None:
+        async with semaphore:
+            await run_v2_document_job(job_id, session_factory=session_factory)
+
+    results = await asyncio.gather(*(_run(job_id) for job_id in job_ids), return_exceptions=True)
+    for job_id, result in zip(job_ids, results):
+        if isinstance(result, Exception):
+            # The job stays "processing" until _expire_stale_v2_job fails it and refunds the credit.
+            logger.error("V2 batch job crashed job_id=%s", job_id, exc_info=result)
+
+
+def _active_v2_batch_id(db: Session, user_id: int) -> Optional[str]:
+    jobs = (
+        db.query(V2DocumentJob)
+        .filter(
+            V2DocumentJob.user_id == user_id,
+            V2DocumentJob.batch_id.isnot(None),
+            V2DocumentJob.status.in_(_V2_JOB_ACTIVE_STATUSES),
+        )
+        .all()
+    )
+    for job in jobs:
+        _expire_stale_v2_job(db, job)
+        if job.status in _V2_JOB_ACTIVE_STATUSES:
+            return job.batch_id
+    return None
+
+
+def _rejected_batch_item(filename: Optional[str], exc: HTTPException) -> Dict[str, Any]:
+    detail = exc.detail
+    if isinstance(detail, dict):
+        error_code, error_message = detail.get("code") or "rejected", detail.get("message")
+    else:
+        error_code, error_message = "rejected", str(detail)
+    return {"filename": filename, "status": "rejected", "error_code": error_code, "error_message": error_message}
+
+
+def _v2_batch_response(batch_id: str, items: List[Dict[str, Any]], free_uploads_remaining: int) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    pending = counts.get("queued", 0) + counts.get("processing", 0)
+    return {
+        "batch_id": batch_id,
+        "status": "processing" if pending else "done",
+        "counts": counts,
+        "items": items,
+        "free_uploads_remaining": free_uploads_remaining,
+    }
+
+
+@router.post("/api/v2/documents/batch", status_code=202, response_model=V2DocumentBatchResponse)
+async def create_v2_document_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    pdf_password: Optional[str] = Form(None),
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Queue V2 extraction of several PDFs at once and return 202 with a result per file.
+
+    All hashes are checked against the user's documents in one query; known
+    files come back as ``duplicate`` and unreadable ones as ``rejected``.
+    Free uploads for the new files are reserved all or nothing. Follow
+    progress with GET /api/v2/documents/batches/{batch_id} or the
+    per-file ``v2_document_job`` events on the /api/consultations/ws socket.
+    """
+    user = require_principal(db, user_id)
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if len(files) > V2_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "too_many_files",
+                "message": f"Puedes subir hasta {V2_BATCH_MAX_FILES} documentos por lote.",
+                "max_files": V2_BATCH_MAX_FILES,
+            },
+        )
+    active_batch_id = _active_v2_batch_id(db, user_id)
+    if active_batch_id:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "code": "batch_in_progress",
+                "message": "Ya hay un lote de documentos en proceso. Espera a que termine.",
+                "batch_id": active_batch_id,
+            },
+        )
+
+    batch_id = str(uuid.uuid4())
+    items: List[Dict[str, Any]] = []
+    spooled_files: List[Optional[SpooledUpload]] = []
+    new_jobs: List[V2DocumentJob] = []
+    free_credit_reserved = False
+    try:
+        for file in files:
+            try:
+                spooled_files.append(await spool_pdf_upload(file))
+            except HTTPException as exc:
+                spooled_files.append(None)
+                items.append(_rejected_batch_item(file.filename, exc))
+            else:
+                items.append({"filename": file.filename, "status": "queued"})
+
+        hashes = {spooled.sha256 for spooled in spooled_files if spooled is not None}
+        existing_docs = {}
+        if hashes:
+            existing_docs = {
+                doc.document_hash: doc
+                for doc in db.query(V2Document).filter(
+                    V2Document.user_id == user_id,
+                    V2Document.document_hash.in_(hashes),
+                )
+            }
+        metric_counts: Dict[str, int] = {}
+        if existing_docs:
+            metric_counts = dict(
+                db.query(V2Metric.document_id, func.count(V2Metric.id))
+                .filter(V2Metric.document_id.in_([doc.id for doc in existing_docs.values()]))
+                .group_by(V2Metric.document_id)
+                .all()
+            )
+
+        queued_by_hash: Dict[str, Dict[str, Any]] = {}
+        for item, spooled in zip(items, spooled_files):
+            if spooled is None:
+                continue
+            existing_doc = existing_docs.get(spooled.sha256)
+            if existing_doc is not None:
+                num_metrics = int(metric_counts.get(existing_doc.id, 0))
+                item.update(status="duplicate", document_id=existing_doc.id, num_metrics=num_metrics)
+                write_audit_log(
+                    db,
+                    actor_user_id=user_id,
+                    actor_role="patient",
+                    action="v2_document_duplicate_upload",
+                    resource_type="v2_document",
+                    resource_id=existing_doc.id,
+                    metadata={"num_metrics": num_metrics, "batch_id": batch_id},
+                )
+                continue
+            first = queued_by_hash.get(spooled.sha256)
+            if first is not None:
+                item.update(status="duplicate", job_id=first["job_id"])
+                continue
+            try:
+                extraction_pdf_bytes = await _prepare_spooled_pdf_for_extraction(spooled, pdf_password)
+            except HTTPException as exc:
+                item.update(_rejected_batch_item(item["filename"], exc))
+                continue
+            job = V2DocumentJob(
+                id=str(uuid.uuid4()),
+                batch_id=batch_id,
+                user_id=user_id,
+                document_hash=spooled.sha256,
+                source_filename=item["filename"],
+            )
+            job.file_path = _write_v2_job_blob(job.id, extraction_pdf_bytes)
+            new_jobs.append(job)
+            item["job_id"] = job.id
+            queued_by_hash[spooled.sha256] = item
+
+        if new_jobs:
+            free_credit_reserved = _reserve_v2_upload_credit(db, user, len(new_jobs))
+        for job in new_jobs:
+            job.free_credit_reserved = free_credit_reserved
+            db.add(job)
+        write_audit_log(
+            db,
+            actor_user_id=user_id,
+            actor_role="patient",
+            action="v2_document_batch_queued",
+            resource_type="v2_document_batch",
+            resource_id=batch_id,
+            metadata={
+                "files": len(files),
+                "queued": len(new_jobs),
+                "access_mode": "free" if free_credit_reserved else "subscription",
+            },
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if free_credit_reserved:
+            refund_free_upload(db, user_id, len(new_jobs))
+        for job in new_jobs:
+            _remove_v2_job_blob(job)
+        if isinstance(e, HTTPException):
+            raise
+        logger.exception("Failed to queue V2 document batch user_id=%s files=%s", user_id, len(files))
+        raise HTTPException(status_code=500, detail=f"Failed to queue V2 document batch: {type(e).__name__}")
+    finally:
+        for spooled in spooled_files:
+            if spooled is not None:
+                spooled.close()
+
+    if new_jobs:
+        job_ids = [job.id for job in new_jobs]
+        try:
+            if CELERY_ENABLED:
+                process_v2_document_batch.delay(job_ids)
+            else:
+                background_tasks.add_task(run_v2_document_batch, job_ids)
+        except Exception:
+            logger.exception("Failed to enqueue V2 document batch batch_id=%s", batch_id)
+            for job in new_jobs:
+                _finish_v2_job(
+                    db,
+                    job,
+                    "failed",
+                    error_code="queue_unavailable",
+                    error_message="The processing queue is unavailable.",
+                )
+            raise HTTPException(
+                status_code=503,
+                detail={"code": "queue_unavailable", "message": "No pudimos procesar los documentos. Inténtalo de nuevo."},
+            )
+
+    return _v2_batch_response(batch_id, items, get_upload_allowance(db, user_id).remaining)
+
+
+@router.get("/api/v2/documents/batches/{batch_id}", response_model=V2DocumentBatchResponse)
+async def get_v2_document_batch(
+    batch_id: str,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    """Per-file status of the queued files of a batch (duplicates and rejects are only in the POST response)."""
+    jobs = (
+        db.query(V2DocumentJob)
+        .filter(V2DocumentJob.batch_id == batch_id, V2DocumentJob.user_id == user_id)
+        .order_by(V2DocumentJob.created_at.asc(), V2DocumentJob.id.asc())
+        .all()
+    )
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    for job in jobs:
+        _expire_stale_v2_job(db, job)
+    items = [
+        {
+            "filename": job.source_filename,
+            "status": job.status,
+            "job_id": job.id,
+            "document_id": job.document_id,
+            "num_metrics": job.num_metrics,
+            "error_code": job.error_code,
+            "error_message": job.error_message,
+        }
+        for job in jobs
+    ]
+    return _v2_batch_response(batch_id, items, get_upload_allowance(db, user_id).remaining)
 
 
 @router.get("/api/v2/analytes", response_model=List[V2AnalyteItemResponse])
@@ -495,6 +1128,7 @@ async def delete_v2_document(
             resource_id=document.id,
             metadata={"num_metrics_deleted": int(num_metrics)},
         )
+        remove_document_from_analyte_latest(db, user_id, document.id)
         db.delete(document)
         db.commit()
     except Exception as exc:
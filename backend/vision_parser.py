@@ -3,14 +3,17 @@
 import base64
 import io
 import os
-import re
-from typing import List, Dict, Any, Optional
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Any, Optional, TypeVar
 
-import fitz  # PyMuPDF
 from PIL import Image
-from openai import OpenAI
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
 
 from backend.models import ImportJson, ImportedLabItem
+from backend.pdf_document import PdfDocument, PdfSource, borrow_pdf
 
 
 SYSTEM_PROMPT = (
@@ -32,74 +35,151 @@ OCR_SYSTEM_PROMPT = (
 MIN_TEXT_WORDS = int(os.getenv("VISION_MIN_TEXT_WORDS", "30"))
 MIN_TEXT_NUMBERS = int(os.getenv("VISION_MIN_TEXT_NUMBERS", "6"))
 
+# Pages are sent concurrently; a report takes roughly the latency of its slowest page.
+VISION_MAX_CONCURRENCY = max(1, int(os.getenv("VISION_MAX_CONCURRENCY", "4")))
+VISION_PAGE_RETRIES = max(0, int(os.getenv("VISION_PAGE_RETRIES", "2")))
+VISION_RETRY_BASE_DELAY_SEC = float(os.getenv("VISION_RETRY_BASE_DELAY_SEC", "1.0"))
+VISION_REQUEST_TIMEOUT_SEC = float(os.getenv("VISION_REQUEST_TIMEOUT_SEC", "60"))
+VISION_TOTAL_DEADLINE_SEC = float(os.getenv("VISION_TOTAL_DEADLINE_SEC", "180"))
 
-def select_pages_for_vision(pdf_bytes: bytes) -> List[int]:
+_RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+_clients: Dict[tuple, OpenAI] = {}
+_clients_lock = threading.Lock()
+
+T = TypeVar("T")
+
+
+class VisionDeadlineExceeded(TimeoutError):
+    """Raised when the pages of one document did not finish within VISION_TOTAL_DEADLINE_SEC."""
+
+
+def _get_openai_client() -> OpenAI:
+    """Shared (thread-safe, connection-pooled) client; retries are handled per page below."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not set")
+    base_url = os.getenv("OPENAI_BASE_URL")
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=VISION_REQUEST_TIMEOUT_SEC, max_retries=0)
+            _clients[key] = client
+        return client
+
+
+def _call_with_retries(call: Callable[[float], T], deadline: float) -> T:
+    """Run ``call(timeout)`` with exponential backoff on transient API errors."""
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise VisionDeadlineExceeded("Vision extraction deadline exceeded")
+        try:
+            return call(min(VISION_REQUEST_TIMEOUT_SEC, remaining))
+        except _RETRYABLE_ERRORS:
+            delay = VISION_RETRY_BASE_DELAY_SEC * (2 ** attempt) * random.uniform(0.5, 1.0)
+            if attempt >= VISION_PAGE_RETRIES or time.monotonic() + delay >= deadline:
+                raise
+            print(f"[VISION] transient error, retry {attempt + 1}/{VISION_PAGE_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def _map_pages(pages: List[Dict[str, Any]], worker: Callable[[Dict[str, Any], float], T]) -> List[T]:
+    """Run ``worker(page, deadline)`` for every page concurrently; results keep page order.
+
+    The first failing page aborts the document, as the sequential loop did.
+    """
+    deadline = time.monotonic() + VISION_TOTAL_DEADLINE_SEC
+    if len(pages) <= 1:
+        return [worker(page, deadline) for page in pages]
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(VISION_MAX_CONCURRENCY, len(pages)),
+        thread_name_prefix="vision-page",
+    )
+    try:
+        futures = [executor.submit(worker, page, deadline) for page in pages]
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
+        if pending:
+            raise VisionDeadlineExceeded(
+                f"Vision extraction deadline exceeded ({len(pending)}/{len(pages)} pages unfinished)"
+            )
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def select_pages_for_vision(source: PdfSource) -> List[int]:
     """Pick pages that likely need vision (low text, images present)."""
     pages: List[int] = []
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    try:
-        for page_index, page in enumerate(doc):
-            text = page.get_text("text") or ""
-            words = re.findall(r"[A-Za-zÀ-ÿ]{2,}", text)
-            numbers = re.findall(r"\d+(?:[.,]\d+)?", text)
-            images = page.get_images(full=True)
-
-            text_rich = len(words) >= MIN_TEXT_WORDS or len(numbers) >= MIN_TEXT_NUMBERS
-            if images and not text_rich:
+    with borrow_pdf(source) as pdf:
+        for page_index in range(pdf.page_count):
+            text_rich = (
+                pdf.page_word_count(page_index) >= MIN_TEXT_WORDS
+                or pdf.page_number_count(page_index) >= MIN_TEXT_NUMBERS
+            )
+            if pdf.page_images(page_index) and not text_rich:
                 pages.append(page_index)
-    finally:
-        doc.close()
 
     return pages
 
 
+def _compressed_page_images(pdf: PdfDocument, page_index: int) -> List[str]:
+    page_images: List[str] = []
+    for img in pdf.page_images(page_index):
+        xref = img[0]
+        extracted = pdf.extract_image(xref)
+        img_bytes = extracted.get("image", b"")
+        if not img_bytes:
+            continue
+        # Skip tiny images (<10KB) to avoid noise
+        if len(img_bytes) < 10 * 1024:
+            continue
+
+        # Compress with Pillow: JPEG, quality 70, max dimension 1024px
+        try:
+            with Image.open(io.BytesIO(img_bytes)) as im:
+                im = im.convert("RGB")
+                im.thumbnail((1024, 1024))
+                buf = io.BytesIO()
+                im.save(buf, format="JPEG", quality=70, optimize=True)
+                img_bytes = buf.getvalue()
+        except Exception:
+            # If Pillow fails, fall back to original bytes
+            pass
+
+        page_images.append(base64.b64encode(img_bytes).decode("ascii"))
+    return page_images
+
+
 def _extract_page_text_and_images(
-    pdf_bytes: bytes,
+    source: PdfSource,
     page_indices: Optional[List[int]] = None,
 ) -> List[Dict[str, Any]]:
     """Extract text and embedded images per page as base64 strings, with size filtering and compression."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     pages: List[Dict[str, Any]] = []
 
-    page_set = set(page_indices) if page_indices is not None else None
-
-    try:
-        for page_index, page in enumerate(doc):
+    with borrow_pdf(source) as pdf:
+        page_set = set(page_indices) if page_indices is not None else None
+        for page_index in range(pdf.page_count):
             if page_set is not None and page_index not in page_set:
                 continue
-
-            page_text = page.get_text("text") or ""
-            page_images: List[str] = []
-
-            for img in page.get_images(full=True):
-                xref = img[0]
-                extracted = doc.extract_image(xref)
-                img_bytes = extracted.get("image", b"")
-                if not img_bytes:
-                    continue
-                # Skip tiny images (<10KB) to avoid noise
-                if len(img_bytes) < 10 * 1024:
-                    continue
-
-                # Compress with Pillow: JPEG, quality 70, max dimension 1024px
-                try:
-                    with Image.open(io.BytesIO(img_bytes)) as im:
-                        im = im.convert("RGB")
-                        im.thumbnail((1024, 1024))
-                        buf = io.BytesIO()
-                        im.save(buf, format="JPEG", quality=70, optimize=True)
-                        img_bytes = buf.getvalue()
-                except Exception:
-                    # If Pillow fails, fall back to original bytes
-                    pass
-
-                page_images.append(base64.b64encode(img_bytes).decode("ascii"))
-
             pages.append(
-                {"page_index": page_index, "text": page_text, "images": page_images}
+                {
+                    "page_index": page_index,
+                    "text": pdf.page_text(page_index),
+                    "images": pdf.memo(
+                        ("vision_images", page_index),
+                        lambda: _compressed_page_images(pdf, page_index),
+                    ),
+                }
             )
-    finally:
-        doc.close()
 
     return pages
 
@@ -162,37 +242,28 @@ def _postprocess_item(item: ImportedLabItem) -> ImportedLabItem:
 
 
 def parse_pdf_vision(
-    pdf_bytes: bytes,
+    source: PdfSource,
     page_indices: Optional[List[int]] = None,
 ) -> ImportJson:
     """
     Parse PDF bytes using GPT-4o vision with structured outputs.
 
     Hybrid approach: use text layer for speed and send embedded images alongside for completeness.
-    Processes each page separately to stay under token limits on large files.
+    Processes each page separately (concurrently, see _map_pages) to stay under token limits on large files.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY is not set")
+    client = _get_openai_client()
 
-    client = OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL"), timeout=60.0)
-
-    pages = _extract_page_text_and_images(pdf_bytes, page_indices=page_indices)
+    pages = _extract_page_text_and_images(source, page_indices=page_indices)
     if not pages:
         raise ValueError("PDF has no readable content")
 
-    aggregated_items = []
-    patient_id = None
-    source_pdf = None
-    normalization_method = None
-
-    for idx, page in enumerate(pages):
+    def _parse_page(page: Dict[str, Any], deadline: float) -> Optional[ImportJson]:
         text = page.get("text", "")
         images = page.get("images", [])
-        page_index = page.get("page_index", idx)
+        page_index = page.get("page_index", 0)
 
         if not text.strip() and not images:
-            continue
+            return None
 
         print(f"--- Page {page_index + 1}... ---")
 
@@ -218,16 +289,27 @@ def parse_pdf_vision(
             else os.getenv("OPENAI_MODEL_TEXT", model_default)
         )
 
-        completion = client.beta.chat.completions.parse(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_content},
-            ],
-            response_format=ImportJson,
+        completion = _call_with_retries(
+            lambda timeout: client.with_options(timeout=timeout).beta.chat.completions.parse(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_content},
+                ],
+                response_format=ImportJson,
+            ),
+            deadline,
         )
+        return completion.choices[0].message.parsed
+
+    aggregated_items = []
+    patient_id = None
+    source_pdf = None
+    normalization_method = None
 
-        parsed = completion.choices[0].message.parsed
+    for parsed in _map_pages(pages, _parse_page):
+        if parsed is None:
+            continue
         if patient_id is None:
             patient_id = parsed.patient_id
         if source_pdf is None:
@@ -258,25 +340,33 @@ def parse_pdf_vision(
     )
 
 
-def ocr_pages_to_text(pdf_bytes: bytes, page_indices: List[int]) -> List[Dict[str, Any]]:
-    """OCR pages using a vision model and return plain text per page."""
+def ocr_pages_to_text(source: PdfSource, page_indices: List[int]) -> List[Dict[str, Any]]:
+    """OCR pages using a vision model and return plain text per page.
+
+    Results are memoized on the PdfDocument, so the pipeline's second OCR
+    pass over the same pages does not call the model again.
+    """
     if not page_indices:
         return []
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY is not set")
+    with borrow_pdf(source) as pdf:
+        done: Dict[int, Dict[str, Any]] = pdf.memo("ocr_pages", dict)
+        missing = [page_index for page_index in page_indices if page_index not in done]
+        if missing:
+            pages = _extract_page_text_and_images(pdf, page_indices=missing)
+            for result in _ocr_pages(pages):
+                done[result["page"]] = result
+        return [done[page_index] for page_index in sorted(set(page_indices)) if page_index in done]
+
 
-    client = OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL"), timeout=60.0)
-    pages = _extract_page_text_and_images(pdf_bytes, page_indices=page_indices)
-    results: List[Dict[str, Any]] = []
+def _ocr_pages(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    client = _get_openai_client()
 
-    for page in pages:
+    def _ocr_page(page: Dict[str, Any], deadline: float) -> Dict[str, Any]:
         images = page.get("images", [])
         page_index = int(page.get("page_index", 0))
         if not images:
-            results.append({"page": page_index, "text": page.get("text", "") or ""})
-            continue
+            return {"page": page_index, "text": page.get("text", "") or ""}
 
         user_content: List[dict] = []
         for img_b64 in images:
@@ -288,16 +378,19 @@ def ocr_pages_to_text(pdf_bytes: bytes, page_indices: List[int]) -> List[Dict[st
             )
 
         model_name = os.getenv("OPENAI_MODEL_OCR", "gpt-4o-mini")
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": OCR_SYSTEM_PROMPT},
-                {"role": "user", "content": user_content},
-            ],
-            temperature=0,
+        completion = _call_with_retries(
+            lambda timeout: client.with_options(timeout=timeout).chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": OCR_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_content},
+                ],
+                temperature=0,
+            ),
+            deadline,
         )
 
         text = completion.choices[0].message.content or ""
-        results.append({"page": page_index, "text": text})
+        return {"page": page_index, "text": text}
 
-    return results
+    return _map_pages(pages, _ocr_page)
@@ -24,6 +24,7 @@ export interface ConsultationMessage {
   message_type: string;
   read_at?: string | null;
   created_at: string;
+  cursor?: string | null;
 }
 
 export interface ConsultationCall {